@@ -273,6 +273,8 @@ def start(mainconfig, options):
 
     sys.stdout.write('Starting B3      : %s\n' % getB3versionString())
     sys.stdout.write('Autorestart mode : %s\n' % ('ON' if options.autorestart else 'OFF'))
+    if getattr(options, 'replay', None):
+        sys.stdout.write('Replay mode      : %s\n' % options.replay)
 
     sys.stdout.flush()
 
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+__version__ = '1.0'
+
+import json
+import os
+import re
+import time
+
+from hashlib import sha1
+
+
+class LogCheckpoint(object):
+    """
+    Keep track of how far a remote game log has been read, so that the remote log tailers can resume where
+    they left off after B3 restarts.
+
+    Besides the offset, the checkpoint holds a fingerprint of the last bytes read. Every read starts that many
+    bytes before the offset: when those bytes don't match the fingerprint, the remote file has been replaced
+    (rotated) even if it is not smaller than the offset.
+    """
+    def __init__(self, url, path=None, fingerprint_size=64, interval=1):
+        """
+        Object constructor.
+        :param url: The url of the remote game log (credentials are not saved)
+        :param path: The checkpoint file path (None to keep the checkpoint in memory only)
+        :param fingerprint_size: The amount of bytes before the offset to check
+        :param interval: The minimum amount of seconds between two writes of the checkpoint file
+        """
+        self.url = re.sub(r'^([a-z]+://)[^/@]*@', r'\1', url)
+        self.path = path
+        self.fingerprint_size = fingerprint_size
+        self.interval = interval
+        self.offset = None      # amount of bytes of the remote file read
+        self.rotated = False    # whether the last read detected the remote file rotation
+        self._tail = ''         # last bytes read (up to fingerprint_size)
+        self._expected = None   # (length, digest) of the bytes expected before the offset
+        self._pending = None    # bytes received while checking the fingerprint
+        self._saved = None      # (offset, tail) last written to the checkpoint file
+        self._lastSave = 0
+
+    def load(self):
+        """
+        Load the checkpoint file.
+        :return: True if a checkpoint matching the remote game log url was loaded, False otherwise
+        """
+        if not self.path or not os.path.isfile(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data['url'] != self.url:
+                return False
+            offset = int(data['offset'])
+            length = int(data['length'])
+            digest = str(data['digest'])
+        except (IOError, ValueError, KeyError, TypeError):
+            return False
+        if offset < 0 or not 0 <= length <= offset:
+            return False
+        self.offset = offset
+        self._tail = ''
+        self._expected = (length, digest) if length else None
+        self._saved = (offset, None)
+        return True
+
+    def save(self, force=False):
+        """
+        Write the checkpoint file (at most once every interval seconds unless forced).
+        The file is replaced atomically: a crash while writing leaves the previous checkpoint in place.
+        :param force: Whether to write the file even if the interval did not elapse
+        """
+        if not self.path or self.offset is None or self._saved == (self.offset, self._tail):
+            return
+        if not force and time.time() - self._lastSave < self.interval:
+            return
+        if self._expected and not self._tail:
+            # the fingerprint loaded from the checkpoint file has not been checked yet
+            length, digest = self._expected
+        else:
+            length, digest = len(self._tail), sha1(self._tail).hexdigest()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'url': self.url, 'offset': self.offset, 'length': length, 'digest': digest}, f)
+        if os.name == 'nt' and os.path.exists(self.path):
+            # os.rename doesn't replace existing files on Windows
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+        self._saved = (self.offset, self._tail)
+        self._lastSave = time.time()
+
+    def reset(self, offset):
+        """
+        Move to the given offset: the bytes before it are not checked on the next read.
+        :param offset: The new offset
+        """
+        self.offset = offset
+        self._tail = ''
+        self._expected = None
+        self._pending = None
+
+    def start(self):
+        """
+        Start reading the remote file.
+        :return: The offset to read the remote file from
+        """
+        if self._tail:
+            self._expected = (len(self._tail), sha1(self._tail).hexdigest())
+        self._pending = '' if self._expected else None
+        self.rotated = False
+        return self.offset - (self._expected[0] if self._expected else 0)
+
+    def feed(self, data):
+        """
+        Handle bytes read from the remote file (the ones following those fed since the last call to start()).
+        :param data: The bytes read
+        :return: The bytes past the offset (nothing if the remote file has been rotated)
+        """
+        if self.rotated:
+            return ''
+        if self._pending is not None:
+            self._pending += data
+            length, digest = self._expected
+            if len(self._pending) < length:
+                return ''
+            checked, data = self._pending[:length], self._pending[length:]
+            self._pending = None
+            if sha1(checked).hexdigest() != digest:
+                self.rotated = True
+                return ''
+            self._tail = checked
+        if data:
+            self.offset += len(data)
+            self._tail = (self._tail + data)[-self.fingerprint_size:]
+        return data
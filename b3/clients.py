@@ -1629,6 +1629,9 @@ class Clients(dict):
         """
         Synchronize the clients list.
         """
+        if self.console.replay:
+            # the game log file being replayed is the only source of truth: there is no server to sync with
+            return
         mlist = self.console.sync()
         # remove existing clients
         self.clear()
@@ -23,8 +23,13 @@
 # ################################################################### #
 #
 __author__ = 'ThorN, Courgette'
-__version__ = '1.5'
+__version__ = '1.7'
 
+import b3.metrics
+import calendar
+import heapq
+import itertools
+import Queue
 import re
 import thread
 import threading
@@ -55,6 +60,10 @@ class ReMatcher(object):
 
 class CronTab(object):
 
+    # what to do when the tab matches while its previous run is not over yet
+    SKIP = 'skip'           # forget about this run
+    COALESCE = 'coalesce'   # run once more as soon as the previous run is over (missed runs are merged into one)
+
     _second = None
     _minute = None
     _hour = None
@@ -66,6 +75,13 @@ class CronTab(object):
     maxRuns = 0
     numRuns = 0
 
+    overrun = SKIP
+    running = False         # whether a run is queued or in progress (see Cron.execute)
+    pending = False         # whether a coalesced run is waiting for the current one to be over
+    overruns = 0            # number of times the tab matched while its previous run was not over
+    lastDuration = 0.0      # duration of the last run (in seconds)
+    totalDuration = 0.0     # duration of all the runs (in seconds)
+
     def __init__(self, command, second=0, minute='*', hour='*', day='*', month='*', dow='*'):
         """
         Object constructor.
@@ -84,6 +100,15 @@ class CronTab(object):
         """
         self.command()
 
+    def _get_name(self):
+        name = getattr(self.command, '__name__', None) or repr(self.command)
+        owner = getattr(self.command, 'im_self', None)
+        if owner is not None:
+            name = '%s.%s' % (owner.__class__.__name__, name)
+        return name
+
+    name = property(_get_name)
+
     def _set_second(self, value):
         self._second = self._getRate(value, 60)
 
@@ -214,6 +239,57 @@ class CronTab(object):
             return True
         return False
 
+    def nextTime(self, after):
+        """
+        Return the first time (GMT timestamp) after the given one matching this tab rates.
+        The time units which don't match are skipped as a whole (i.e: a month at once if the month doesn't match).
+        :param after: The timestamp to start from
+        :return: The next time this tab matches or None if it doesn't match within the next 4 years
+        """
+        t = int(after) + 1
+        limit = t + 4 * 366 * 86400
+        while t < limit:
+            tt = time.gmtime(t)
+            if not self._match(self.month, tt[1]):
+                year, month = (tt[0] + 1, 1) if tt[1] == 12 else (tt[0], tt[1] + 1)
+                t = calendar.timegm((year, month, 1, 0, 0, 0))
+            elif not self._match(self.day, tt[2]) or not self._match(self.dow, tt[6]):
+                t += 86400 - tt[3] * 3600 - tt[4] * 60 - tt[5]
+            elif not self._match(self.hour, tt[3]):
+                t += 3600 - tt[4] * 60 - tt[5]
+            else:
+                minute = self._first(self.minute, tt[4], 59)
+                if minute is None:
+                    t += 3600 - tt[4] * 60 - tt[5]
+                    continue
+                second = self._first(self.second, tt[5] if minute == tt[4] else 0, 59)
+                if second is not None:
+                    return t + (minute - tt[4]) * 60 + second - tt[5]
+                minute = self._first(self.minute, tt[4] + 1, 59)
+                if minute is None:
+                    t += 3600 - tt[4] * 60 - tt[5]
+                else:
+                    t += (minute - tt[4]) * 60 - tt[5]
+        return None
+
+    @staticmethod
+    def _first(unit, value, maxvalue):
+        """
+        Return the first value of a time unit matching the given rate.
+        :param unit: The rate of the time unit
+        :param value: The value to start from
+        :param maxvalue: The greatest value of the time unit
+        :return: The first matching value greater or equal to the given one, None if there is none
+        """
+        if type(unit) == int:
+            if unit == -1:
+                return value if value <= maxvalue else None
+            return unit if value <= unit <= maxvalue else None
+        for v in range(value, maxvalue + 1):
+            if v in unit:
+                return v
+        return None
+
     def match(self, timetuple):
         # second
         timematch = self._match(self.second, timetuple[5] - (timetuple[5] % 1))
@@ -269,12 +345,27 @@ class PluginCronTab(CronTab):
 
 class Cron(object):
 
-    def __init__(self, console):
+    def __init__(self, console, workers=4):
         """
         Object constructor.
+        :param console: The console instance
+        :param workers: The maximum number of threads running the tabs (0 to run them in the scheduler thread)
         """
         self._tabs = {}
+        self._generations = {}  # tab id -> token of the last add: heap entries of a previous add are stale
         self.console = console
+        self.workers = workers
+
+        # (next run time, sequence number, tab, generation) heap: the scheduler sleeps until the first tab has to run
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+
+        # tabs are run by worker threads started when needed, so that a slow tab doesn't delay the other ones
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._busy = 0  # number of tabs queued or being run by the workers
+        self._lock = threading.Lock()
 
         # thread will stop if this event gets set
         self._stopEvent = threading.Event()
@@ -289,8 +380,12 @@ class Cron(object):
     def add(self, tab):
         """
         Add a CronTab to the list of active cron tabs.
+        The tab rates are read when it's added: to change them the tab has to be cancelled and added again.
         """
-        self._tabs[id(tab)] = tab
+        with self._cond:
+            self._tabs[id(tab)] = tab
+            self._generations[id(tab)] = next(self._sequence)
+        self._schedule(tab, self.time())
         self.console.verbose('Added crontab %s (%s) - %ss %sm %sh %sd %sM %sDOW' % (tab.command, id(tab), tab.second,
                                                                                     tab.minute, tab.hour, tab.day,
                                                                                     tab.month, tab.dow))
@@ -301,7 +396,9 @@ class Cron(object):
         Remove a CronTab from the list of active cron tabs.
         """
         try:
-            del self._tabs[tab_id]
+            with self._cond:
+                del self._tabs[tab_id]
+                del self._generations[tab_id]
             self.console.verbose('Removed crontab %s' % tab_id)
         except KeyError:
             self.console.verbose('Crontab %s not found' % tab_id)
@@ -330,6 +427,76 @@ class Cron(object):
         Stop the cron scheduler.
         """
         self._stopEvent.set()
+        with self._cond:
+            self._cond.notify()
+        with self._lock:
+            for i in range(len(self._threads)):
+                self._queue.put(None)
+            self._threads = []
+
+    def execute(self, tab):
+        """
+        Hand the given tab over to the worker threads.
+        The tab is not run if its previous run is not over yet (see CronTab.overrun).
+        :param tab: The tab to run
+        :return: True if the tab will be run, False otherwise
+        """
+        with self._lock:
+            if tab.running:
+                tab.overruns += 1
+                if tab.overrun == CronTab.COALESCE:
+                    tab.pending = True
+                b3.metrics.cron_overruns_total.inc(tab.name)
+                self.console.verbose('Crontab %s (%s) is still running: %s', tab.name, id(tab),
+                                     'run delayed' if tab.pending else 'run skipped')
+                return False
+            tab.running = True
+            tab.numRuns += 1
+            if self.workers > 0:
+                self._queue.put(tab)
+                self._busy += 1
+                if self._busy > len(self._threads) and len(self._threads) < self.workers:
+                    worker = threading.Thread(target=self._work, name='cron-worker-%s' % len(self._threads))
+                    worker.daemon = True
+                    self._threads.append(worker)
+                    worker.start()
+                return True
+
+        self._runTab(tab)
+        return True
+
+    def _work(self):
+        """
+        Run the tabs handed over to the worker threads.
+        """
+        while True:
+            tab = self._queue.get()
+            if tab is None:
+                break
+            self._runTab(tab)
+            with self._lock:
+                self._busy -= 1
+
+    def _runTab(self, tab):
+        """
+        Run a tab (again if it matched during the run and its runs are coalesced).
+        """
+        while True:
+            start = time.time()
+            try:
+                tab.run()
+            except Exception, msg:
+                self.console.error('Exception raised while executing crontab %s: %s\n%s', tab.command,
+                                   msg, traceback.extract_tb(sys.exc_info()[2]))
+            tab.lastDuration = time.time() - start
+            tab.totalDuration += tab.lastDuration
+            b3.metrics.cron_seconds.observe(tab.lastDuration, tab.name)
+            with self._lock:
+                if not tab.pending:
+                    tab.running = False
+                    return
+                tab.pending = False
+                tab.numRuns += 1
 
     def run(self):
         """
@@ -337,38 +504,77 @@ class Cron(object):
         Will terminate when stop event is set.
         """
         self.console.info("Cron scheduler started")
-        nexttime = self.getNextTime()
+        lasttime = self.time()
+        self._reschedule(lasttime)
         while not self._stopEvent.isSet():
             now = self.time()
-            if now < nexttime:
-                self._stopEvent.wait(nexttime - now + .1)
-
-            # Check if the time has changed by more than two minutes. This
-            # case arises when the system clock is changed. We must reset the timer.
-            if abs(self.time() - nexttime) > 120:
-                nexttime = self.getNextTime()
-
-            t = time.gmtime(nexttime)
-            for k, c in self._tabs.items():
-                if c.match(t):
-                    if 0 < c.maxRuns < c.numRuns + 1:
-                        # reached max executions, remove tab
-                        del self._tabs[k]
-                    else:
-                        c.numRuns += 1
-                        try:
-                            c.run()
-                        except Exception, msg:
-                            self.console.error('Exception raised while executing crontab %s: %s\n%s', c.command,
-                                               msg, traceback.extract_tb(sys.exc_info()[2]))
-            nexttime += 1
+            # Check if the time went back by more than two minutes. This
+            # case arises when the system clock is changed. We must reschedule the tabs.
+            if now < lasttime - 120:
+                self._reschedule(now)
+            lasttime = now
+
+            self._runDue(now)
+
+            with self._cond:
+                if self._stopEvent.isSet():
+                    break
+                timeout = 60
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - self.time())
+                if timeout > 0:
+                    self._cond.wait(timeout)
 
         self.console.info("Cron scheduler ended")
 
-    @staticmethod
-    def getNextTime():
-        # store the time first, we don't want it to change on us
-        t = time.time()
-        # current time, minus it's 1 second remainder, plus 1 seconds
-        # will round to the next nearest 1 seconds
-        return (t - t % 1) + 1
\ No newline at end of file
+    def _runDue(self, now):
+        """
+        Run the tabs whose next run time is reached and compute their following run time.
+        :param now: The current timestamp
+        """
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                runtime, sequence, tab, generation = heapq.heappop(self._heap)
+                # entries of cancelled tabs (or of a tab added again since) are left in the heap and dropped here
+                if self._tabs.get(id(tab)) is tab and self._generations.get(id(tab)) == generation:
+                    due.append((runtime, tab, generation))
+
+        for runtime, tab, generation in due:
+            if tab.match(time.gmtime(runtime)):
+                self.execute(tab)
+            if 0 < tab.maxRuns <= tab.numRuns:
+                # reached max executions, remove tab
+                with self._cond:
+                    if self._generations.get(id(tab)) == generation:
+                        self._tabs.pop(id(tab), None)
+                        self._generations.pop(id(tab), None)
+            else:
+                # a late scheduler doesn't make the tab run several times in a row
+                self._schedule(tab, max(runtime, int(now)), generation)
+
+    def _schedule(self, tab, after, generation=None):
+        """
+        Compute the next run time of a tab and add it to the heap.
+        :param generation: The token of the add the entry belongs to (defaults to the last add of the tab)
+        """
+        runtime = tab.nextTime(after)
+        if runtime is None:
+            self.console.verbose('Crontab %s (%s) will never run', tab.name, id(tab))
+            return
+        with self._cond:
+            if generation is None:
+                generation = self._generations.get(id(tab))
+            heapq.heappush(self._heap, (runtime, next(self._sequence), tab, generation))
+            if self._heap[0][2] is tab:
+                # wake the scheduler up since this tab has to run first
+                self._cond.notify()
+
+    def _reschedule(self, now):
+        """
+        Compute again the next run time of all the tabs.
+        """
+        with self._cond:
+            self._heap = []
+        for tab in self._tabs.values():
+            self._schedule(tab, now)
@@ -23,10 +23,11 @@
 # ################################################################### #
 
 __author__ = 'Courgette, Fenix'
-__version__ = '1.3'
+__version__ = '1.4'
 
 import re
 import functools
+import sre_parse
 
 from b3.exceptions import ProgrammingError
 
@@ -83,6 +84,49 @@ class Memoize(object):
         return res
 
 
+class _GameEvent(object):
+    """
+    A regular expression mapped to a handler function by a GameEventRouter.
+    """
+    __slots__ = ('index', 'regex', 'func', 'prefix', 'literal', 'hits')
+
+    def __init__(self, index, regex, func):
+        self.index = index      # declaration order
+        self.regex = regex
+        self.func = func
+        self.hits = 0
+        self.prefix, self.literal = self._getLiterals(regex)
+
+    @staticmethod
+    def _getLiterals(regex):
+        """
+        Return the text any string matched by the given regular expression starts with, and the longest text
+        it contains (both empty when unknown).
+        """
+        if regex.flags & re.IGNORECASE:
+            return '', ''
+        try:
+            items = sre_parse.parse(regex.pattern, regex.flags).data
+        except (re.error, TypeError):
+            return '', ''
+        prefix = None
+        literal = run = ''
+        for op, av in items:
+            if op == 'literal' and av < 128:
+                run += chr(av)
+                continue
+            if prefix is None and not (op == 'at' and av in ('at_beginning', 'at_beginning_string') and not run):
+                prefix = run
+            if len(run) > len(literal):
+                literal = run
+            run = ''
+        if prefix is None:
+            prefix = run
+        if len(run) > len(literal):
+            literal = run
+        return prefix, literal
+
+
 class GameEventRouter(object):
     """
     This module helps defining handlers functions to be called when a game event is received by providing :
@@ -123,10 +167,21 @@ class GameEventRouter(object):
     Note that the handler function must have parameters that matches the regular expression groups.
     The @ger.gameEvent decorator accepts multiple parameters if you need to have one handling function for
     multiple kind of game events. Note that those regular expressions should all define the same groups.
+
+    To avoid running every regular expression on every game event, the router only tries the regular expressions
+    whose literal prefix and longest literal text are found in the game event, starting with the ones which matched
+    the most game events so far. When a game event matches more than one regular expression, the first declared
+    one still wins.
     """
+    # amount of game events routed between two sorts of the regular expressions by number of hits
+    sort_interval = 512
+
     def __init__(self):
         # will hold mapping between regular expressions and handler functions
         self._gameevents_mapping = list()
+        self._gameevents = list()
+        self._candidates = None     # first character of the game event -> game events to try
+        self._routed = 0
 
     def gameEvent(self, *decorator_param):
         """
@@ -139,19 +194,59 @@ class GameEventRouter(object):
                     self._gameevents_mapping.append((param, func))
                 elif isinstance(param, basestring):
                     self._gameevents_mapping.append((re.compile(str(param)), func))
+            self._gameevents = [_GameEvent(index, regex, hfunc)
+                                for index, (regex, hfunc) in enumerate(self._gameevents_mapping)]
+            self._candidates = None
             return func
         return wrapper
 
+    def _sortCandidates(self):
+        """
+        Index the game events by the first character of their literal prefix,
+        most matched first (then in declaration order).
+        """
+        gameevents = sorted(self._gameevents, key=lambda x: (-x.hits, x.index))
+        candidates = {'': [x for x in gameevents if not x.prefix]}
+        for char in set(x.prefix[0] for x in gameevents if x.prefix):
+            candidates[char] = [x for x in gameevents if not x.prefix or x.prefix[0] == char]
+        self._candidates = candidates
+
+    def getHits(self):
+        """
+        Return a list of tuples (regular expression pattern, handler function name, number of game events matched)
+        in the declaration order.
+        """
+        return [(x.regex.pattern, x.func.__name__, x.hits) for x in self._gameevents]
+
 
     def getHandler(self, gameEvent):
         """
         For a given game event, return the corresponding handler
         function and a dict of the matched regular expression groups
         """
-        for regex, hfunc in self._gameevents_mapping:
-            match = regex.match(gameEvent)
+        if self._candidates is None:
+            self._sortCandidates()
+        candidates = self._candidates.get(gameEvent[:1])
+        if candidates is None:
+            candidates = self._candidates['']
+
+        for position, gameevent in enumerate(candidates):
+            if gameevent.literal not in gameEvent or not gameEvent.startswith(gameevent.prefix):
+                continue
+            match = gameevent.regex.match(gameEvent)
             if match:
-                return hfunc, match.groupdict()
+                # a game event declared before this one and matching as well has precedence
+                for other in candidates[position + 1:]:
+                    if other.index < gameevent.index and other.literal in gameEvent and \
+                            gameEvent.startswith(other.prefix):
+                        other_match = other.regex.match(gameEvent)
+                        if other_match:
+                            gameevent, match = other, other_match
+                gameevent.hits += 1
+                self._routed += 1
+                if self._routed % self.sort_interval == 0:
+                    self._sortCandidates()
+                return gameevent.func, match.groupdict()
         return None, {}
 
 
@@ -23,16 +23,22 @@
 # ################################################################### #
 
 __author__ = 'ThorN, xlr8or, Courgette'
-__version__ = '1.8.2'
+__version__ = '1.11'
 
+import Queue
 import re
+import sys
+import threading
 import time
 
+import b3.metrics
+
 from b3.functions import meanstdv
 from b3.decorators import Memoize
 from b3.output import VERBOSE
 from collections import deque
 from logging import DEBUG
+from traceback import extract_tb
 
 
 class Events:
@@ -194,7 +200,10 @@ class EventsStats(object):
         self._max_samples = max_samples
         self._handling_timers = {}
         self._queue_wait = deque(maxlen=max_samples)
-        
+        self._dropped = {}
+        self._expired = {}
+        self._counters_lock = threading.Lock()
+
     def add_event_handled(self, plugin_name, event_name, milliseconds_elapsed):
         """
         Add an event to the dict of handled ones.
@@ -202,11 +211,11 @@ class EventsStats(object):
         :param event_name: The event name
         :param milliseconds_elapsed: The amount of milliseconds necessary to handle the event
         """
-        if plugin_name not in self._handling_timers:
-            self._handling_timers[plugin_name] = {}
-        if event_name not in self._handling_timers[plugin_name]:
-            self._handling_timers[plugin_name][event_name] = deque(maxlen=self._max_samples)
-        self._handling_timers[plugin_name][event_name].append(milliseconds_elapsed)
+        # use setdefault since this may be called concurrently by the event dispatcher workers
+        plugin_timers = self._handling_timers.setdefault(plugin_name, {})
+        event_timers = plugin_timers.setdefault(event_name, deque(maxlen=self._max_samples))
+        event_timers.append(milliseconds_elapsed)
+        b3.metrics.event_handler_seconds.observe(milliseconds_elapsed / 1000.0, plugin_name, event_name)
         self.console.verbose2("%s event handled by %s in %0.3f ms", event_name, plugin_name, milliseconds_elapsed)
 
     def add_event_wait(self, milliseconds_wait):
@@ -215,7 +224,40 @@ class EventsStats(object):
         :param milliseconds_wait: The amount of milliseconds to wait
         """
         self._queue_wait.append(milliseconds_wait)
-        
+        b3.metrics.event_queue_wait_seconds.observe(milliseconds_wait / 1000.0)
+
+    def add_event_dropped(self, event_name):
+        """
+        Count an event which has been dropped because there was no room left for it.
+        :param event_name: The event name
+        """
+        with self._counters_lock:
+            self._dropped[event_name] = self._dropped.get(event_name, 0) + 1
+        b3.metrics.events_dropped_total.inc(event_name)
+
+    def add_event_expired(self, event_name):
+        """
+        Count an event which has been discarded because it waited too long to be handled.
+        :param event_name: The event name
+        """
+        with self._counters_lock:
+            self._expired[event_name] = self._expired.get(event_name, 0) + 1
+        b3.metrics.events_expired_total.inc(event_name)
+
+    def get_dropped_events(self):
+        """
+        Return the number of dropped events by event name.
+        """
+        with self._counters_lock:
+            return dict(self._dropped)
+
+    def get_expired_events(self):
+        """
+        Return the number of expired events by event name.
+        """
+        with self._counters_lock:
+            return dict(self._expired)
+
     def dumpStats(self):
         """
         Print event stats in the log file.
@@ -234,7 +276,296 @@ class EventsStats(object):
             if len(self._queue_wait):
                 self.console.debug("Events waiting in queue stats : (ms) min(%0.1f), max(%0.1f), mean(%0.1f), "
                                    "stddev(%0.1f)", min(self._queue_wait), max(self._queue_wait), mean, stdv)
-    
+
+        for label, counters in (('dropped', self.get_dropped_events()), ('expired', self.get_expired_events())):
+            if counters:
+                self.console.debug("Events %s : %s", label, ', '.join(['%s(%s)' % (event_name, counters[event_name])
+                                                                        for event_name in sorted(counters)]))
+
+
+class EventQueue(object):
+    """
+    Bounded queue of events waiting to be handled, served by priority.
+    Events are split into three priorities (high, normal and low) each one having its own capacity and its own policy
+    to apply when it is full, so that chat messages (commands) or penalties are never held back (or dropped) because
+    of the high-volume damage and kill traffic. Events of the same priority are served in the order they were queued.
+    The interface is the one of Queue.Queue: items are (time queued, expire time, event) tuples.
+    """
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+    BLOCK = 'block'  # wait for some room (up to the given timeout) then refuse the new event
+    DROP_NEW = 'drop_new'  # refuse the new event right away
+    DROP_OLD = 'drop_old'  # drop the oldest event of the same priority to make room for the new one
+
+    priority_names = {'high': HIGH, 'normal': NORMAL, 'low': LOW}
+    policy_names = {'block': BLOCK, 'drop_new': DROP_NEW, 'drop_old': DROP_OLD}
+
+    high_priority_events = ('EVT_CLIENT_SAY', 'EVT_CLIENT_TEAM_SAY', 'EVT_CLIENT_SQUAD_SAY', 'EVT_CLIENT_PRIVATE_SAY',
+                            'EVT_CLIENT_AUTH', 'EVT_CLIENT_KICK', 'EVT_CLIENT_BAN', 'EVT_CLIENT_BAN_TEMP',
+                            'EVT_CLIENT_UNBAN', 'EVT_CLIENT_WARN', 'EVT_CLIENT_NOTICE')
+
+    low_priority_events = ('EVT_CLIENT_DAMAGE', 'EVT_CLIENT_DAMAGE_SELF', 'EVT_CLIENT_KILL', 'EVT_CLIENT_SUICIDE',
+                           'EVT_CLIENT_GIB', 'EVT_CLIENT_GIB_SELF', 'EVT_CLIENT_ITEM_PICKUP', 'EVT_CLIENT_ACTION')
+
+    def __init__(self, maxsize=50, policies=None, events=None):
+        """
+        Object constructor.
+        :param maxsize: The capacity of every priority, or a dict of capacities by priority (0 or less for no limit)
+        :param policies: A dict of policies to apply by priority when the queue is full (default to block)
+        :param events: The events manager used to lookup event IDs (default to the global one)
+        """
+        if not isinstance(maxsize, dict):
+            maxsize = dict.fromkeys((self.HIGH, self.NORMAL, self.LOW), maxsize)
+        self.maxsize = dict((p, maxsize.get(p, 50)) for p in (self.HIGH, self.NORMAL, self.LOW))
+        self.policies = dict((p, (policies or {}).get(p, self.BLOCK)) for p in (self.HIGH, self.NORMAL, self.LOW))
+        self._queues = (deque(), deque(), deque())
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        self._priorities = {}
+        events = events or eventManager
+        for keys, priority in ((self.high_priority_events, self.HIGH), (self.low_priority_events, self.LOW)):
+            for key in keys:
+                event_id = events.getId(key)
+                if event_id is not None:
+                    self._priorities[event_id] = priority
+
+    def getPriority(self, event_type):
+        """
+        Return the priority of the given event type.
+        :param event_type: The event ID
+        """
+        return self._priorities.get(event_type, self.NORMAL)
+
+    def setPriority(self, event_type, priority):
+        """
+        Change the priority of the given event type.
+        :param event_type: The event ID
+        :param priority: The new priority (EventQueue.HIGH, EventQueue.NORMAL or EventQueue.LOW)
+        """
+        self._priorities[event_type] = priority
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Put an event into the queue.
+        :param item: A (time queued, expire time, event) tuple
+        :param block: Whether to wait for some room when the queue of the event priority is full (block policy only)
+        :param timeout: The maximum amount of seconds to wait for some room
+        :raise Queue.Full: If the event could not be queued
+        :return: The item which has been dropped to make room for the new one (drop_old policy only), or None
+        """
+        priority = self.getPriority(item[2].type)
+        queue = self._queues[priority]
+        policy = self.policies[priority]
+        dropped = None
+        with self._not_full:
+            if self._full(priority):
+                if policy == self.DROP_OLD:
+                    dropped = queue.popleft()
+                elif policy == self.DROP_NEW or not block:
+                    raise Queue.Full
+                else:
+                    expire = None if timeout is None else time.time() + timeout
+                    while self._full(priority):
+                        remaining = None if expire is None else expire - time.time()
+                        if remaining is not None and remaining <= 0:
+                            raise Queue.Full
+                        self._not_full.wait(remaining)
+            queue.append(item)
+            self._not_empty.notify()
+        return dropped
+
+    def _full(self, priority):
+        maxsize = self.maxsize[priority]
+        return 0 < maxsize <= len(self._queues[priority])
+
+    def get(self, block=True, timeout=None):
+        """
+        Remove and return the oldest event having the highest priority.
+        :param block: Whether to wait for an event to be available
+        :param timeout: The maximum amount of seconds to wait for an event
+        :raise Queue.Empty: If no event is available
+        """
+        with self._not_empty:
+            if block:
+                expire = None if timeout is None else time.time() + timeout
+                while not self._qsize():
+                    remaining = None if expire is None else expire - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise Queue.Empty
+                    self._not_empty.wait(remaining)
+            for queue in self._queues:
+                if queue:
+                    item = queue.popleft()
+                    self._not_full.notify_all()
+                    return item
+            raise Queue.Empty
+
+    def qsize(self, priority=None):
+        """
+        Return the number of events in the queue.
+        :param priority: Count only the events of the given priority
+        """
+        with self._mutex:
+            return self._qsize(priority)
+
+    def _qsize(self, priority=None):
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(queue) for queue in self._queues)
+
+    def empty(self):
+        """
+        Return True if the queue is empty, False otherwise.
+        """
+        return not self.qsize()
+
+
+class EventLane(object):
+    """
+    Hold the events waiting to be handled by a single event handler.
+    """
+    __slots__ = ('handler', 'events', 'scheduled')
+
+    def __init__(self, handler):
+        """
+        Object constructor.
+        :param handler: The event handler (usually a plugin instance) served by this lane
+        """
+        self.handler = handler
+        self.events = deque()
+        self.scheduled = False
+
+
+class EventDispatcher(object):
+    """
+    Dispatch events to handlers using a pool of worker threads.
+    Every handler is given its own lane: events for the same handler are processed one at a time and in the same
+    order they have been dispatched, while different handlers are served concurrently by the workers, so that a
+    slow (or stuck) handler only delays its own events.
+    """
+    def __init__(self, console, callback, workers=4, lane_size=50, stats=None):
+        """
+        Object constructor.
+        :param console: The console class instance
+        :param callback: The function to invoke to handle an event: callback(handler, event, event_name)
+        :param workers: The number of worker threads
+        :param lane_size: The maximum number of events which can be waiting in a single lane (0 or less for no limit)
+        :param stats: The EventsStats instance used to count expired events
+        """
+        self.console = console
+        self.stats = stats
+        self.callback = callback
+        self.workers = workers
+        self.lane_size = lane_size
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._scheduled = 0  # number of lanes holding events
+        self._ready = Queue.Queue()
+        self._threads = []
+
+    def start(self):
+        """
+        Start the worker threads.
+        """
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name='EventDispatcher-%s' % (i + 1))
+            t.setDaemon(True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=5):
+        """
+        Stop the worker threads once all the events dispatched have been handled.
+        :param timeout: The amount of seconds to wait for the lanes to be drained, and then for every worker to complete
+        """
+        expire = time.time() + timeout
+        with self._drained:
+            # the workers put the lanes still holding events back in the ready queue: they must be drained
+            # before the workers are told to exit, otherwise the last events (i.e: EVT_EXIT) would be lost
+            while self._scheduled and self._threads:
+                remaining = expire - time.time()
+                if remaining <= 0:
+                    break
+                self._drained.wait(remaining)
+        for t in self._threads:
+            self._ready.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def dispatch(self, handler, event, event_name, expire):
+        """
+        Append an event to the lane of the given handler.
+        :param handler: The event handler
+        :param event: The event to be handled
+        :param event_name: The event name
+        :param expire: The time after which the event is discarded if not handled yet
+        :return: True if the event has been dispatched, False if the handler lane is full
+        """
+        with self._lock:
+            try:
+                lane = self._lanes[handler]
+            except KeyError:
+                lane = self._lanes[handler] = EventLane(handler)
+            if 0 < self.lane_size <= len(lane.events):
+                return False
+            lane.events.append((event, event_name, expire))
+            if not lane.scheduled:
+                lane.scheduled = True
+                self._scheduled += 1
+                self._ready.put(lane)
+        return True
+
+    def pending(self, handler):
+        """
+        Return the number of events waiting in the lane of the given handler.
+        :param handler: The event handler
+        """
+        with self._lock:
+            try:
+                return len(self._lanes[handler].events)
+            except KeyError:
+                return 0
+
+    def _work(self):
+        """
+        Worker thread main loop.
+        """
+        while True:
+            lane = self._ready.get()
+            if lane is None:
+                break
+
+            with self._lock:
+                event, event_name, expire = lane.events.popleft()
+
+            if self.console.time() >= expire:
+                self.console.error('**** Event sat in %s lane too long: %s %s', lane.handler.__class__.__name__,
+                                   event_name, self.console.time() - expire)
+                if self.stats:
+                    self.stats.add_event_expired(event_name)
+            elif lane.handler.isEnabled():
+                try:
+                    self.callback(lane.handler, event, event_name)
+                except Exception, msg:
+                    self.console.error('Event dispatcher could not handle event %s: %s: %s %s', event_name,
+                                       msg.__class__.__name__, msg, extract_tb(sys.exc_info()[2]))
+
+            # handle one event at a time and put the lane back at the end of the ready
+            # queue so that a busy handler cannot monopolize the worker threads
+            with self._lock:
+                if lane.events:
+                    self._ready.put(lane)
+                else:
+                    lane.scheduled = False
+                    self._scheduled -= 1
+                    if not self._scheduled:
+                        self._drained.notify_all()
+
 
 class VetoEvent(Exception):
     """
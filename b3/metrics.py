@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+__version__ = '1.0'
+
+import BaseHTTPServer
+import SocketServer
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# default histogram buckets (in seconds): from half a millisecond up to 10 seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    """
+    Escape a label value for the text exposition format.
+    """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    """
+    Format a sample value for the text exposition format.
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return '%d' % value
+    return repr(value)
+
+
+def _format_sample(name, labelnames, labelvalues, value, extra=None):
+    """
+    Format a sample line for the text exposition format.
+    """
+    labels = zip(labelnames, labelvalues)
+    if extra:
+        labels.append(extra)
+    if labels:
+        name = '%s{%s}' % (name, ','.join(['%s="%s"' % (k, _escape(v)) for k, v in labels]))
+    return '%s %s' % (name, _format_value(value))
+
+
+class Metric(object):
+    """
+    Base class for metrics.
+    Metrics are updated without any lock: every thread records its samples into its own shard
+    which is merged with the other ones only when the metric is collected (i.e: on scrape).
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Object constructor.
+        :param name: The metric name
+        :param documentation: The metric help text
+        :param labelnames: The names of the labels identifying the metric series
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+
+    def _new_series(self):
+        """
+        Return a new, empty, series.
+        """
+        raise NotImplementedError
+
+    def _merge_series(self, into, series):
+        """
+        Add the values of a series to another one.
+        """
+        for i, value in enumerate(series):
+            into[i] += value
+
+    def _shard(self):
+        """
+        Return the shard of the current thread.
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _series(self, labelvalues):
+        """
+        Return the series of the current thread matching the given label values.
+        """
+        shard = self._shard()
+        try:
+            return shard[labelvalues]
+        except KeyError:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError('%s expects %s label values: %r' % (self.name, len(self.labelnames), labelvalues))
+            series = shard[labelvalues] = self._new_series()
+            return series
+
+    def _collect_series(self):
+        """
+        Merge the shards of all the threads.
+        :return: A dict of series by label values
+        """
+        merged = {}
+        with self._shards_lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                    target = merged
+                else:
+                    # the thread is gone: its shard will not change anymore
+                    target = self._retired
+                for labelvalues, series in shard.items():
+                    if labelvalues not in target:
+                        target[labelvalues] = self._new_series()
+                    self._merge_series(target[labelvalues], series)
+            self._shards = alive
+            for labelvalues, series in self._retired.items():
+                if labelvalues not in merged:
+                    merged[labelvalues] = self._new_series()
+                self._merge_series(merged[labelvalues], series)
+        if not merged and not self.labelnames:
+            # metrics without labels are always exposed, even before the first sample
+            merged[()] = self._new_series()
+        return merged
+
+    def collect(self):
+        """
+        Return the metric samples lines in the text exposition format.
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    A value which can only go up.
+    """
+    type = 'counter'
+
+    def _new_series(self):
+        return [0]
+
+    def inc(self, *labelvalues, **kwargs):
+        """
+        Increment the counter.
+        :param labelvalues: The label values identifying the series to increment
+        :param amount: The amount to add to the counter (default to 1)
+        """
+        self._series(labelvalues)[0] += kwargs.get('amount', 1)
+
+    def value(self, *labelvalues):
+        """
+        Return the current value of the counter.
+        """
+        return self._collect_series().get(labelvalues, [0])[0]
+
+    def collect(self):
+        series = self._collect_series()
+        return [_format_sample(self.name, self.labelnames, k, series[k][0]) for k in sorted(series)]
+
+
+class Histogram(Metric):
+    """
+    Count observed values into buckets.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Object constructor.
+        :param name: The metric name
+        :param documentation: The metric help text
+        :param labelnames: The names of the labels identifying the metric series
+        :param buckets: The upper bounds of the buckets
+        """
+        Metric.__init__(self, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        # one counter per bucket, one for the values above the last bucket, the sum of the values
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value, *labelvalues):
+        """
+        Observe a value.
+        :param value: The value to observe
+        :param labelvalues: The label values identifying the series
+        """
+        series = self._series(labelvalues)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """
+        Observe the amount of seconds needed to execute the with block.
+        :param labelvalues: The label values identifying the series
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, *labelvalues)
+
+    def count(self, *labelvalues):
+        """
+        Return the number of observed values.
+        """
+        series = self._collect_series().get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def collect(self):
+        lines = []
+        merged = self._collect_series()
+        for labelvalues in sorted(merged):
+            series = merged[labelvalues]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                lines.append(_format_sample(self.name + '_bucket', self.labelnames, labelvalues, cumulative,
+                                            ('le', _format_value(float(bound)))))
+            lines.append(_format_sample(self.name + '_sum', self.labelnames, labelvalues, series[-1]))
+            lines.append(_format_sample(self.name + '_count', self.labelnames, labelvalues, cumulative))
+        return lines
+
+
+class Gauge(Metric):
+    """
+    A value computed when the metric is collected.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        """
+        Object constructor.
+        :param name: The metric name
+        :param documentation: The metric help text
+        :param labelnames: The names of the labels identifying the metric series
+        :param function: A callable returning the gauge value, or a dict of values by label values
+        """
+        Metric.__init__(self, name, documentation, labelnames)
+        self.function = function
+
+    def collect(self):
+        if not self.function:
+            return []
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [_format_sample(self.name, self.labelnames, k, values[k]) for k in sorted(values)]
+
+
+class MetricsRegistry(object):
+    """
+    Hold the metrics to be exposed.
+    """
+    def __init__(self):
+        """
+        Object constructor.
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Register a metric (replacing the one having the same name, if any).
+        :param metric: The metric to register
+        :return: The registered metric
+        """
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Create and register a new counter.
+        """
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Create and register a new histogram.
+        """
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        """
+        Create and register a new gauge.
+        """
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def get(self, name):
+        """
+        Return the metric having the given name (or None).
+        """
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Return all the metrics in the text exposition format.
+        """
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.documentation.replace('\\', '\\\\').replace('\n', '\\n')))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serve the metrics of the server registry.
+    """
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        try:
+            body = self.server.registry.render()
+        except Exception, e:
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        if self.server.console:
+            self.server.console.verbose2('Metrics: %s - %s', self.client_address[0], fmt % args)
+
+
+class MetricsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    HTTP server exposing the metrics of a registry on /metrics.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, registry, host='127.0.0.1', port=9137, console=None):
+        """
+        Object constructor.
+        :param registry: The registry holding the metrics to expose
+        :param host: The address to bind
+        :param port: The port to listen on (0 to pick a free one)
+        :param console: The console instance (used for logging)
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), _MetricsRequestHandler)
+        self.registry = registry
+        self.console = console
+        self._thread = None
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name='MetricsServer')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving requests.
+        """
+        if self._thread:
+            self.shutdown()
+            self._thread.join(5)
+            self._thread = None
+        self.server_close()
+
+
+########################################################################################################################
+#                                                                                                                      #
+#   B3 METRICS                                                                                                         #
+#                                                                                                                      #
+########################################################################################################################
+
+registry = MetricsRegistry()
+
+event_handler_seconds = registry.histogram('b3_event_handler_seconds', 'Time spent by plugins handling events.',
+                                           ('plugin', 'event'))
+event_queue_wait_seconds = registry.histogram('b3_event_queue_wait_seconds',
+                                              'Time spent by events in the event queue.')
+events_dropped_total = registry.counter('b3_events_dropped_total',
+                                        'Events dropped because the event queue (or a plugin lane) was full.',
+                                        ('event',))
+events_expired_total = registry.counter('b3_events_expired_total',
+                                        'Events discarded because they waited too long to be handled.', ('event',))
+event_queue_depth = registry.gauge('b3_event_queue_depth', 'Number of events waiting in the event queue.',
+                                   ('priority',))
+lines_parsed_total = registry.counter('b3_lines_parsed_total', 'Game log lines parsed.')
+rcon_seconds = registry.histogram('b3_rcon_seconds', 'Round-trip time of the commands sent to the game server.')
+storage_query_seconds = registry.histogram('b3_storage_query_seconds', 'Time spent executing storage queries.')
+cron_seconds = registry.histogram('b3_cron_seconds', 'Time spent running crontabs.', ('tab',))
+cron_overruns_total = registry.counter('b3_cron_overruns_total',
+                                       'Crontab runs skipped or delayed because the previous run was not over.',
+                                       ('tab',))
+httpytail_request_seconds = registry.histogram('b3_httpytail_request_seconds',
+                                               'Round-trip time of the requests fetching the remote game log.')
+httpytail_bytes_total = registry.counter('b3_httpytail_bytes_total', 'Bytes of the remote game log fetched over HTTP.')
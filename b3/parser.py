@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'ThorN, Courgette, xlr8or, Bakes, Ozon, Fenix'
-__version__ = '1.43.6'
+__version__ = '1.50'
 
 
 import os
@@ -46,8 +46,10 @@ import b3.events
 import b3.output
 import b3.game
 import b3.cron
+import b3.metrics
 import b3.parsers.q3a.rcon
 import b3.timezones
+import b3.watcher
 
 from ConfigParser import NoOptionError
 from collections import OrderedDict
@@ -80,11 +82,16 @@ class Parser(object):
 
     _commands = {}  # will hold RCON commands for the current game
     _cron = None  # cron instance
+    _dispatcher = None  # event dispatcher instance (None when events are handled only by the handler thread)
     _events = {}  # available events (K=>EVENT)
     _eventNames = {}  # available event names (K=>NAME)
     _eventsStats_cronTab = None  # crontab used to log event statistics
     _handlers = {}  # event handlers
     _lineTime = None  # used to track log file time changes
+    _logTimeLast = 0  # game log time of the last parsed line (relative to _logTimeStart)
+    _logTimeStart = None  # game log time of the first parsed line (or of the first one after a game log time reset)
+    _logWatcher = None  # used to wait for the game log file to change (polling or inotify)
+    _metricsServer = None  # HTTP server exposing B3 metrics (see b3.metrics)
     _lineFormat = re.compile('^([a-z ]+): (.*?)', re.IGNORECASE)
     _line_color_prefix = ''  # a color code prefix to be added to every line resulting from getWrap
     _line_length = 80  # max wrap length
@@ -100,6 +107,10 @@ class Parser(object):
     _rconIp = ''  # the ip address where to forward RCON commands
     _rconPort = None  # the virtual port where to forward RCON commands
     _rconPassword = ''  # the rcon password set on the server
+    _replayClockStart = 0  # timestamp of the first replayed game log line (see _replayTime)
+    _replayEvents = 0  # number of events handled while replaying the game log file
+    _replayLines = 0  # number of lines parsed while replaying the game log file
+    _replayTimeStart = None  # timestamp when the game log file replay started (wall clock)
     _reColor = re.compile(r'\^[0-9a-z]') # regex used to strip out color codes from a given string
     _timeStart = None  # timestamp when B3 has first started
     _use_color_codes = True  # whether the game supports color codes or not
@@ -109,6 +120,8 @@ class Parser(object):
     config = None  # parser configuration file instance
     delay = 0.33  # time between each game log lines fetching
     delay2 = 0.02  # time between each game log line processing: max number of lines processed in one second
+    pacing = 'fixed'  # game log pacing mode: 'fixed' (sleep delay2 after each line) or 'adaptive' (sleep only when idle)
+    pacing_min_delay = 0.01  # time between game log reads, in adaptive pacing mode, right after the log went idle
     encoding = 'latin-1'
     game = None
     gameName = None # console name
@@ -120,6 +133,11 @@ class Parser(object):
     queue = None  # event queue
     rconTest = False  # whether to perform RCON testing or not
     remoteLog = False
+    replay = False  # whether B3 is replaying an archived game log file (see b3_run.py --replay)
+    replay_batch_size = 1000  # number of storage queries committed at once while replaying a game log file
+    event_queue_policies = {b3.events.EventQueue.HIGH: b3.events.EventQueue.BLOCK,
+                            b3.events.EventQueue.NORMAL: b3.events.EventQueue.BLOCK,
+                            b3.events.EventQueue.LOW: b3.events.EventQueue.DROP_OLD}  # what to do when the queue is full
     screen = None
     storage = None  # storage module instance
     type = None
@@ -199,6 +217,10 @@ class Parser(object):
         # plugins can react on this and perform different operations
         self.autorestart = options.autorestart
 
+        # store in the parser whether we are replaying an archived game log file: in replay mode the game
+        # log is parsed at full speed, events never expire and nothing is sent to the game server
+        self.replay = bool(getattr(options, 'replay', None))
+
         if not self.loadConfig(conf):
             print('CRITICAL ERROR : COULD NOT LOAD CONFIG')
             raise SystemExit(220)
@@ -309,6 +331,18 @@ class Parser(object):
             if delay2 > 0:
                 self.delay2 = 1/delay2
 
+        # game log pacing mode
+        if self.config.has_option('server', 'pacing'):
+            pacing = self.config.get('server', 'pacing').lower()
+            if pacing in ('fixed', 'adaptive'):
+                self.pacing = pacing
+            else:
+                self.warning("Invalid value specified for server::pacing (%s): using default (%s)", pacing, self.pacing)
+
+        if self.replay:
+            # replayed lines are not paced: they are parsed as fast as their events can be handled
+            self.pacing = 'adaptive'
+
         try:
             # setup storage module
             dsn = self.config.get('b3', 'database')
@@ -318,10 +352,25 @@ class Parser(object):
             # Plugin loading so it makes no sense to keep going with the console initialization
             self.critical('Could not setup storage module: %s', e)
 
+        # size the connection pool used to run queries concurrently (when supported by the storage module)
+        poolsizes = {'database_pool_min': 1, 'database_pool_max': 4}
+        for option in poolsizes:
+            if self.config.has_option('b3', option):
+                try:
+                    poolsizes[option] = self.config.getint('b3', option)
+                except ValueError, err:
+                    self.warning("Invalid value specified for b3::%s: using default (%s): %s",
+                                 option, poolsizes[option], err)
+        self.storage.setPoolSize(poolsizes['database_pool_min'], poolsizes['database_pool_max'])
+
         # establish a connection with the database
         self.storage.connect()
 
-        if self.config.has_option('server', 'game_log'):
+        if self.replay:
+            # commit replayed data in batches rather than query by query
+            self.storage.startBatch(self.replay_batch_size)
+            self.openReplayLog(options.replay)
+        elif self.config.has_option('server', 'game_log'):
             # open log file
             game_log = self.config.get('server', 'game_log')
             if game_log[0:6] == 'ftp://' or game_log[0:7] == 'sftp://' or game_log[0:7] == 'http://':
@@ -365,6 +414,14 @@ class Parser(object):
                         self.input.seek(0, os.SEEK_END)
                 else:
                     self.input.seek(0, os.SEEK_END)
+
+                use_inotify = False
+                if self.config.has_option('server', 'inotify'):
+                    use_inotify = self.config.getboolean('server', 'inotify')
+                self._logWatcher = b3.watcher.getLogWatcher(f, use_inotify=use_inotify)
+                if use_inotify and not isinstance(self._logWatcher, b3.watcher.InotifyLogWatcher):
+                    self.warning('Inotify is not available on this system: falling back to game log polling')
+                self.bot('Watching game log using %s', self._logWatcher.__class__.__name__)
             else:
                 self.screen.write(">>> Cannot read file: %s\n" % os.path.abspath(f))
                 self.screen.flush()
@@ -404,7 +461,7 @@ class Parser(object):
             self.bot('Setting multiline_noprefix to: %s', self._multiline_noprefix)
 
         # testing rcon
-        if self.rconTest:
+        if self.rconTest and not self.replay:
             res = self.output.write('status')
             self.output.flush()
             self.screen.write('Testing RCON     : ')
@@ -434,16 +491,46 @@ class Parser(object):
 
         self.game = b3.game.Game(self, self.gameName)
 
+        queuesizes = self._getEventQueueSetting('event_queue_size', 50, int)
+        queuepolicies = self._getEventQueueSetting('event_queue_policy', self.event_queue_policies,
+                                                   b3.events.EventQueue.policy_names.__getitem__)
+        queuesize = queuesizes[b3.events.EventQueue.NORMAL]
+        self.debug("Creating the event queue with sizes %s and policies %s", queuesizes, queuepolicies)
+        self.queue = b3.events.EventQueue(queuesizes, queuepolicies, events=self.Events)
+        b3.metrics.event_queue_depth.function = self._getEventQueueDepth
+
         try:
-            queuesize = self.config.getint('b3', 'event_queue_size')
+            workers = self.config.getint('b3', 'event_workers')
         except NoOptionError:
-            queuesize = 50
+            workers = 4
         except ValueError, err:
-            queuesize = 50
+            workers = 4
             self.warning(err)
 
-        self.debug("Creating the event queue with size %s", queuesize)
-        self.queue = Queue.Queue(queuesize)
+        if self.replay:
+            self.debug("Event dispatcher disabled: replayed events are handled by the game log reading thread")
+        elif workers > 0:
+            self.debug("Creating the event dispatcher with %s workers", workers)
+            self._dispatcher = b3.events.EventDispatcher(self, self._handleEventWith, workers=workers,
+                                                         lane_size=queuesize, stats=self._eventsStats)
+        else:
+            self.debug("Event dispatcher disabled: all the events will be handled by the handler thread")
+
+        if self.config.has_option('b3', 'metrics_port'):
+            try:
+                port = self.config.getint('b3', 'metrics_port')
+            except ValueError, err:
+                port = 0
+                self.warning(err)
+            if port > 0:
+                bind = '127.0.0.1'
+                if self.config.has_option('b3', 'metrics_bind'):
+                    bind = self.config.get('b3', 'metrics_bind')
+                try:
+                    self._metricsServer = b3.metrics.MetricsServer(b3.metrics.registry, bind, port, console=self)
+                    self.bot('Exposing B3 metrics on http://%s:%s/metrics', bind, port)
+                except socket.error, err:
+                    self.error('Could not expose B3 metrics on %s:%s: %s', bind, port, err)
 
         atexit.register(self.shutdown)
 
@@ -474,11 +561,68 @@ class Parser(object):
         self.cron.add(self._eventsStats_cronTab)
         self.bot("All plugins started")
         self.pluginsStarted()
+        if self._metricsServer:
+            self._metricsServer.start()
         self.bot("Starting event dispatching thread")
+        if self._dispatcher:
+            self._dispatcher.start()
         thread.start_new_thread(self.handleEvents, ())
         self.bot("Start reading game events")
         self.run()
 
+    def openReplayLog(self, path):
+        """
+        Open an archived game log file to be replayed from its beginning.
+        The parser clock is replaced by a virtual one following the game log time: it is set so that
+        the last line of the file is replayed at the time the file was last modified.
+        :param path: The path of the game log file
+        """
+        f = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isfile(f):
+            self.screen.write(">>> Cannot read file: %s\n" % f)
+            self.screen.flush()
+            self.critical("Cannot read file: %s", f)
+
+        self.bot('Replaying game log file: %s', f)
+        self.screen.write('Replaying gamelog: %s\n' % b3.getShortPath(f))
+        self.screen.flush()
+
+        span = 0
+        if self._lineTime is not None:
+            # measure the amount of game log time covered by the file
+            with open(f, 'r') as game_log:
+                for line in game_log:
+                    self.trackLogTime(line.strip())
+            span = self.logTime
+            self.logTime = 0
+            self._logTimeStart = None
+            self._logTimeLast = 0
+
+        self._replayClockStart = int(os.path.getmtime(f)) - span
+        self._replayTimeStart = time.time()
+        self.time = self._replayTime
+        self._timeStart = self.time()
+        self.input = file(f, 'r')
+
+    def replayComplete(self):
+        """
+        Called when the whole game log file has been replayed: report the replay throughput and stop B3.
+        """
+        elapsed = max(time.time() - self._replayTimeStart, 0.001)
+        msg = 'Replay complete  : %s lines and %s events in %.1f sec (%.0f lines/sec, %.0f events/sec)' % (
+            self._replayLines, self._replayEvents, elapsed, self._replayLines / elapsed, self._replayEvents / elapsed)
+        self.bot(msg)
+        self.screen.write('%s\n' % msg)
+        self.screen.flush()
+        self.storage.endBatch()
+        self.shutdown()
+
+    def _replayTime(self):
+        """
+        Return the current time in GMT/UTC according to the game log file being replayed.
+        """
+        return self._replayClockStart + int(self.logTime)
+
     def die(self):
         """
         Stop B3 with the die exit status (222)
@@ -1129,9 +1273,10 @@ class Parser(object):
         self.screen.flush()
         self.updateDocumentation()
 
-        log_time_start = None
-        log_time_last = 0
+        idle_delay = self.pacing_min_delay
         while self.working:
+            parsed = 0
+            eof = False
             if self._paused:
                 if not self._pauseNotice:
                     self.bot('PAUSED - not parsing any lines: B3 will be out of sync')
@@ -1142,25 +1287,7 @@ class Parser(object):
                     for line in lines:
                         line = str(line).strip()
                         if line and self._lineTime is not None:
-                            # Track the log file time changes. This is mostly for
-                            # parsing old log files for testing and to have time increase
-                            # predictably
-                            m = self._lineTime.match(line)
-                            if m:
-                                log_time_current = (int(m.group('minutes')) * 60) + int(m.group('seconds'))
-                                if log_time_start and log_time_current - log_time_start < log_time_last:
-                                    # Time in log has reset
-                                    log_time_start = log_time_current
-                                    log_time_last = 0
-                                    self.debug('log time reset %d' % log_time_current)
-                                elif not log_time_start:
-                                    log_time_start = log_time_current
-
-                                # Remove starting offset, we want the first line to be at 0 seconds
-                                log_time_current -= log_time_start
-                                self.logTime += log_time_current - log_time_last
-                                log_time_last = log_time_current
-
+                            self.trackLogTime(line)
                             self.console(line)
 
                             try:
@@ -1169,20 +1296,75 @@ class Parser(object):
                                 raise
                             except Exception, msg:
                                 self.error('Could not parse line %s: %s', msg, extract_tb(sys.exc_info()[2]))
-                            
-                            time.sleep(self.delay2)
 
-            time.sleep(self.delay)
+                            parsed += 1
+                            if self.pacing == 'fixed':
+                                time.sleep(self.delay2)
+                else:
+                    eof = True
+
+            if parsed:
+                b3.metrics.lines_parsed_total.inc(amount=parsed)
+
+            if self.replay:
+                if parsed:
+                    self._replayLines += parsed
+                    self.verbose('Replayed %s lines', self._replayLines)
+                elif eof:
+                    # the whole game log file has been replayed
+                    self.replayComplete()
+                elif self._paused:
+                    time.sleep(self.delay)
+            elif self.pacing == 'adaptive':
+                if parsed:
+                    # keep on draining the game log as long as there are new lines
+                    idle_delay = self.pacing_min_delay
+                    continue
+                if isinstance(self._logWatcher, b3.watcher.InotifyLogWatcher):
+                    # no need to back off: we will be woken up as soon as the game log changes
+                    self._logWatcher.wait(self.delay)
+                else:
+                    # the game log is idle: back off progressively up to the configured read delay
+                    time.sleep(idle_delay)
+                    idle_delay = min(idle_delay * 2, self.delay)
+            elif self._logWatcher:
+                self._logWatcher.wait(self.delay)
+            else:
+                time.sleep(self.delay)
 
         self.bot('Stop reading')
 
         with self.exiting:
+            if self._logWatcher:
+                self._logWatcher.close()
             self.input.close()
             self.output.close()
 
             if self.exitcode:
                 sys.exit(self.exitcode)
 
+    def trackLogTime(self, line):
+        """
+        Track the log file time changes. This is mostly for parsing old log files
+        for testing and to have time increase predictably.
+        :param line: The game log line being parsed
+        """
+        m = self._lineTime.match(line)
+        if m:
+            log_time_current = (int(m.group('minutes')) * 60) + int(m.group('seconds'))
+            if self._logTimeStart and log_time_current - self._logTimeStart < self._logTimeLast:
+                # Time in log has reset
+                self._logTimeStart = log_time_current
+                self._logTimeLast = 0
+                self.debug('log time reset %d' % log_time_current)
+            elif not self._logTimeStart:
+                self._logTimeStart = log_time_current
+
+            # Remove starting offset, we want the first line to be at 0 seconds
+            log_time_current -= self._logTimeStart
+            self.logTime += log_time_current - self._logTimeLast
+            self._logTimeLast = log_time_current
+
     def parseLine(self, line):
         """
         Parse a single line from the log file
@@ -1218,22 +1400,47 @@ class Parser(object):
             return False
         elif event.type in self._handlers:  # queue only if there are handlers to listen for this event
             self.verbose('Queueing event %s : %s', self.getEventName(event.type), event.data)
-            try:
-                time.sleep(0.001)  # wait a bit so event doesnt get jumbled
-                self.queue.put((self.time(), self.time() + expire, event), True, 2)
+            if self.replay:
+                # replayed events are handled right away: they never expire and they are never dropped
+                event.time = self.time()
+                self._replayEvents += 1
+                self._dispatchEvent(event, self.getEventName(event.type))
                 return True
+            if self.queue.getPriority(event.type) == b3.events.EventQueue.HIGH:
+                # chat messages (commands) and penalties are better handled late than never
+                expire_time = float('inf')
+            else:
+                expire_time = self.time() + expire
+            try:
+                if self.pacing == 'fixed':
+                    time.sleep(0.001)  # wait a bit so event doesnt get jumbled
+                dropped = self.queue.put((self.time(), expire_time, event), True, 2)
             except Queue.Full:
-                self.error('**** Event queue was full (%s)', self.queue.qsize())
+                self.error('**** Event queue was full (%s): dropping event %s', self.queue.qsize(),
+                           self.getEventName(event.type))
+                self._eventsStats.add_event_dropped(self.getEventName(event.type))
                 return False
+            if dropped:
+                self.error('**** Event queue was full (%s): dropping oldest event %s', self.queue.qsize(),
+                           self.getEventName(dropped[2].type))
+                self._eventsStats.add_event_dropped(self.getEventName(dropped[2].type))
+            return True
 
         return False
 
     def handleEvents(self):
         """
         Event handler thread.
+        Handlers of plugins which can veto events are run in this thread, in the order they have been registered, so
+        that a veto stops the event propagation. All the other handlers are given to the event dispatcher (if any) which
+        runs them concurrently, in a separate lane per plugin.
         """
         while self.working:
-            added, expire, event = self.queue.get(True)
+            try:
+                added, expire, event = self.queue.get(True, 1)
+            except Queue.Empty:
+                continue
+
             if event.type == self.getEventID('EVT_EXIT') or event.type == self.getEventID('EVT_STOP'):
                 self.working = False
 
@@ -1241,44 +1448,112 @@ class Parser(object):
             self._eventsStats.add_event_wait((self.time() - added)*1000)
             if self.time() >= expire:  # events can only sit in the queue until expire time
                 self.error('**** Event sat in queue too long: %s %s', event_name, self.time() - expire)
+                self._eventsStats.add_event_expired(event_name)
             else:
-                nomore = False
-                for hfunc in self._handlers[event.type]:
-                    if not hfunc.isEnabled():
-                        continue
-                    elif nomore:
-                        break
-
-                    self.verbose('Parsing event: %s: %s', event_name, hfunc.__class__.__name__)
-                    timer_plugin_begin = time.clock()
-                    try:
-                        hfunc.parseEvent(event)
-                        time.sleep(0.001)
-                    except b3.events.VetoEvent:
-                        # plugin called for event hault, do not continue processing
-                        self.bot('Event %s vetoed by %s', event_name, str(hfunc))
-                        nomore = True
-                    except SystemExit, e:
-                        self.exitcode = e.code
-                    except Exception, msg:
-                        self.error('Handler %s could not handle event %s: %s: %s %s', hfunc.__class__.__name__,
-                                   event_name, msg.__class__.__name__, msg, extract_tb(sys.exc_info()[2]))
-                    finally:
-                        elapsed = time.clock() - timer_plugin_begin
-                        self._eventsStats.add_event_handled(hfunc.__class__.__name__, event_name, elapsed * 1000)
-                    
+                self._dispatchEvent(event, event_name, expire)
+
+        if self._dispatcher:
+            self.bot('Stopping event dispatcher')
+            self._dispatcher.stop()
+
         self.bot('Shutting down event handler')
 
         # releasing lock if it was set by self.shutdown() for instance
         if self.exiting.locked():
             self.exiting.release()
 
+    def _dispatchEvent(self, event, event_name, expire=None):
+        """
+        Make the registered handlers process an event.
+        :param event: The event to be handled
+        :param event_name: The event name
+        :param expire: The time after which the event should not be handled anymore
+        """
+        for hfunc in self._handlers[event.type]:
+            if not hfunc.isEnabled():
+                continue
+
+            if self._dispatcher and not getattr(hfunc, 'canVetoEvents', True):
+                if not self._dispatcher.dispatch(hfunc, event, event_name, expire):
+                    self.error('**** Event lane of %s was full (%s): dropping event %s',
+                               hfunc.__class__.__name__, self._dispatcher.pending(hfunc), event_name)
+                    self._eventsStats.add_event_dropped(event_name)
+            elif self._handleEventWith(hfunc, event, event_name):
+                # plugin called for event hault, do not continue processing
+                break
+
+    def _getEventQueueDepth(self):
+        """
+        Return the number of events waiting in the event queue by priority (see b3.metrics).
+        """
+        return dict(((name,), self.queue.qsize(priority))
+                    for name, priority in b3.events.EventQueue.priority_names.iteritems())
+
+    def _getEventQueueSetting(self, option, default, convert):
+        """
+        Read an event queue setting from the [b3] section of the main config file: the setting can be a single value
+        applying to every event priority or a comma separated list of priority:value pairs (ie: high:100, low:20).
+        :param option: The setting name
+        :param default: The default value (or a dict of default values by priority)
+        :param convert: The function to use to convert the setting value(s)
+        :return: A dict of values by event priority
+        """
+        priorities = (b3.events.EventQueue.HIGH, b3.events.EventQueue.NORMAL, b3.events.EventQueue.LOW)
+        if not isinstance(default, dict):
+            default = dict.fromkeys(priorities, default)
+        values = dict(default)
+        if self.config.has_option('b3', option):
+            raw = self.config.get('b3', option).strip()
+            try:
+                if ':' not in raw:
+                    values = dict.fromkeys(priorities, convert(raw))
+                else:
+                    for pair in raw.split(','):
+                        name, value = [x.strip().lower() for x in pair.split(':', 1)]
+                        values[b3.events.EventQueue.priority_names[name]] = convert(value)
+            except (KeyError, ValueError):
+                self.warning('Invalid value specified for b3::%s (%s): using default (%s)', option, raw, default)
+                values = dict(default)
+        return values
+
+    def _handleEventWith(self, hfunc, event, event_name):
+        """
+        Make the given handler process an event.
+        :param hfunc: The event handler (usually a plugin instance)
+        :param event: The event to be handled
+        :param event_name: The event name
+        :return: True if the handler vetoed the event, False otherwise
+        """
+        self.verbose('Parsing event: %s: %s', event_name, hfunc.__class__.__name__)
+        timer_plugin_begin = time.time()
+        try:
+            hfunc.parseEvent(event)
+            if self.pacing == 'fixed':
+                time.sleep(0.001)
+        except b3.events.VetoEvent:
+            if self._dispatcher and not getattr(hfunc, 'canVetoEvents', True):
+                self.warning('Event %s vetoed by %s which does not declare canVetoEvents: veto ignored',
+                             event_name, str(hfunc))
+                return False
+            self.bot('Event %s vetoed by %s', event_name, str(hfunc))
+            return True
+        except SystemExit, e:
+            self.exitcode = e.code
+        except Exception, msg:
+            self.error('Handler %s could not handle event %s: %s: %s %s', hfunc.__class__.__name__,
+                       event_name, msg.__class__.__name__, msg, extract_tb(sys.exc_info()[2]))
+        finally:
+            elapsed = time.time() - timer_plugin_begin
+            self._eventsStats.add_event_handled(hfunc.__class__.__name__, event_name, elapsed * 1000)
+        return False
+
     def write(self, msg, maxRetries=None, socketTimeout=None):
         """
         Write a message to Rcon/Console
         """
-        if self.output:
-            res = self.output.write(msg, maxRetries=maxRetries, socketTimeout=socketTimeout)
+        if self.output and not self.replay:
+            with b3.metrics.rcon_seconds.time():
+                res = self.output.write(msg, maxRetries=maxRetries, socketTimeout=socketTimeout)
             self.output.flush()
             return res
 
@@ -1287,8 +1562,9 @@ class Parser(object):
         Write a sequence of messages to Rcon/Console. Optimized for speed.
         :param msg: The message to be sent to Rcon/Console.
         """
-        if self.output and msg:
-            res = self.output.writelines(msg)
+        if self.output and msg and not self.replay:
+            with b3.metrics.rcon_seconds.time():
+                res = self.output.writelines(msg)
             self.output.flush()
             return res
 
@@ -1314,6 +1590,10 @@ class Parser(object):
             self.critical("Cannot read game log file: check that you have a correct "
                           "value for the 'game_log' setting in your main config file")
 
+        if self.replay:
+            # do not load the whole game log file in memory at once
+            return self.input.readlines(1048576)
+
         # Getting the stats of the game log (we are looking for the size)
         filestats = os.fstat(self.input.fileno())
         # Compare the current cursor position against the current file size,
@@ -1340,6 +1620,10 @@ class Parser(object):
                 if self._cron:
                     self.bot('Stopping cron')
                     self._cron.stop()
+                if self._metricsServer:
+                    self.bot('Stopping metrics server')
+                    self._metricsServer.stop()
+                    self._metricsServer = None
                 if self.storage:
                     self.bot('Shutting down database connection')
                     self.storage.shutdown()
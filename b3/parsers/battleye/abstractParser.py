@@ -45,7 +45,7 @@ from b3.clients import Clients
 from logging import Formatter
 
 __author__  = '82ndab-Bravo17, Courgette'
-__version__ = '1.3.4'
+__version__ = '1.4'
 
 
 # disable the authorizing timer that come by default with the b3.clients.Clients class
@@ -89,6 +89,30 @@ class AbstractParser(b3.parser.Parser):
     # list available cvar
     _gameServerVars = ()
 
+    # BattlEye server messages routing table:
+    # first word of the message -> (message prefix, handler name, payload start, text appended to the payload)
+    _battleyeEvents = {
+        'RCon': ('RCon admin #', 'OnServerMessage', 12, ''),
+        'Verified': ('Verified GUID', 'OnVerifiedGUID', 15, ''),
+        '(Lobby)': ('(Lobby)', 'OnPlayerChat', 8, ' (Lobby)'),
+        '(Global)': ('(Global)', 'OnPlayerChat', 9, ' (Global)'),
+        '(Direct)': ('(Direct)', 'OnPlayerChat', 9, ' (Direct)'),
+        '(Vehicle)': ('(Vehicle)', 'OnPlayerChat', 10, ' (Vehicle)'),
+        '(Group)': ('(Group)', 'OnPlayerChat', 8, ' (Group)'),
+        '(Side)': ('(Side)', 'OnPlayerChat', 7, ' (Side)'),
+        '(Command)': ('(Command)', 'OnPlayerChat', 10, ' (Command)'),
+        '(Unknown)': ('(Unknown)', 'OnPlayerChat', 10, ' (Unknown)'),
+    }
+
+    # 'Player #' messages routing table:
+    # last character of the message -> ((message suffix, handler name, payload end), ...)
+    # other 'Player #' messages are BattlEye kicks
+    _battleyePlayerEvents = {
+        'd': ((' disconnected', 'OnPlayerLeave', -13),
+              (' connected', 'OnPlayerConnected', -10)),
+        ')': (('(unverified)', 'OnUnverifiedGUID', -13),),
+    }
+
     _commands = {
         'message': ('say', '%(cid)s', '%(message)s'),
         'say': ('say -1' , '%(message)s'),
@@ -362,67 +386,36 @@ class AbstractParser(b3.parser.Parser):
         if message is None:
             self.warning('Cannot route empty event')
 
-        self.info('Server message is: %s' % message)
+        self.verbose('Server message is: %s', message)
 
-        if message.startswith('RCon admin #'):
-            func = self.OnServerMessage
-            eventData = message[12:]
+        func, eventData = self.getBattleyeEventRoute(message)
+        event = getattr(self, func)(eventData)
+        if event:
+            self.queueEvent(event)
+
+    def getBattleyeEventRoute(self, message):
+        """
+        Find the handler of a BattlEye server message.
+        :param message: The message received from the BattlEye server
+        :return: A tuple (handler name, handler data)
+        """
+        space = message.find(' ')
+        route = self._battleyeEvents.get(message[:space] if space != -1 else message)
+        if route:
+            prefix, func, start, suffix = route
+            if message.startswith(prefix):
+                return func, message[start:] + suffix
         elif message.startswith('Player #'):
-            if message.endswith(' disconnected'):
-                func = self.OnPlayerLeave
-                eventData = message[8:len(message)-13]
-            elif message.endswith(' connected'):
-                func = self.OnPlayerConnected
-                eventData = message[8:len(message)-10]
-            elif message.endswith('(unverified)'):
-                func = self.OnUnverifiedGUID
-                eventData = message[8:len(message)-13]
-            elif message.find(' has been kicked by BattlEye: '):
-                func = self.OnBattleyeKick
-                eventData = message[8:]
-            else:
-                self.debug('Unhandled server message: %s' % message)
-                eventData = None
-                func = self.OnUnknownEvent
-        elif message.startswith('Verified GUID'):
-            func = self.OnVerifiedGUID
-            eventData = message[15:]
-        elif message.startswith('(Lobby)'):
-            func = self.OnPlayerChat
-            eventData = message[8:] + ' (Lobby)'
-        elif message.startswith('(Global)'):
-            func = self.OnPlayerChat
-            eventData = message[9:] + ' (Global)'
-        elif message.startswith('(Direct)'):
-            func = self.OnPlayerChat
-            eventData = message[9:] + ' (Direct)'
-        elif message.startswith('(Vehicle)'):
-            func = self.OnPlayerChat
-            eventData = message[10:] + ' (Vehicle)'
-        elif message.startswith('(Group)'):
-            func = self.OnPlayerChat
-            eventData = message[8:] + ' (Group)'
-        elif message.startswith('(Side)'):
-            func = self.OnPlayerChat
-            eventData = message[7:] + ' (Side)'
-        elif message.startswith('(Command)'):
-            func = self.OnPlayerChat
-            eventData = message[10:] + ' (Command)'
-        elif message.startswith('(Unknown)'):
-            func = self.OnPlayerChat
-            eventData = message[10:] + ' (Unknown)'
-        elif message.find(' Log: #') != -1:
-            func = self.OnBattleyeScriptLog
-            eventData = message
+            for suffix, func, end in self._battleyePlayerEvents.get(message[-1:], ()):
+                if message.endswith(suffix):
+                    return func, message[8:end]
+            return 'OnBattleyeKick', message[8:]
 
-        else:
-            self.debug('unhandled server message: %s' % message)
-            eventData = None
-            func = self.OnUnknownEvent
+        if ' Log: #' in message:
+            return 'OnBattleyeScriptLog', message
 
-        event = func(eventData)
-        if event:
-            self.queueEvent(event)
+        self.debug('unhandled server message: %s', message)
+        return 'OnUnknownEvent', None
 
     def sayqueuelistener_worker(self):
         self.info("sayqueuelistener job started")
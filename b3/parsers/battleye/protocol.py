@@ -36,7 +36,7 @@ from threading import Event
 from threading import Lock
 
 __author__ = '82ndab-Bravo17, Courgette'
-__version__ = '1.2.1'
+__version__ = '1.3'
 
 ########################################################################################################################
 ##
@@ -100,6 +100,77 @@ class CommandFailedError(CommandError):
     pass
 
 
+class CommandFuture(object):
+    """
+    Response to a command sent to the BattlEye server.
+    The response is set by the reading thread when the (possibly multipart) response matching the command
+    sequence number is received, so that many commands can be waiting for their response at the same time.
+    """
+    def __init__(self, cmd, sequence, timeout=None, discard=None):
+        """
+        Object constructor.
+        :param cmd: The command
+        :param sequence: The command packet sequence number
+        :param timeout: The default amount of seconds to wait for the response
+        :param discard: A function called with the future when no response is received in time
+        """
+        self.cmd = cmd
+        self.sequence = sequence
+        self.timeout = timeout
+        self._discard = discard
+        self._event = Event()
+        self._response = None
+        self._error = None
+
+    def __repr__(self):
+        return 'CommandFuture(#%s %r)' % (self.sequence, self.cmd)
+
+    def done(self):
+        """
+        Return True if the response has been received (or if the command failed).
+        """
+        return self._event.is_set()
+
+    def set_response(self, message):
+        """
+        Set the response message and wake up the threads waiting for it.
+        """
+        self._response = message
+        self._event.set()
+
+    def set_error(self, error):
+        """
+        Make the command fail and wake up the threads waiting for its response.
+        """
+        self._error = error
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the response is received or until timeout is reached.
+        :return: True if the response has been received, False otherwise
+        """
+        return self._event.wait(self.timeout if timeout is None else timeout)
+
+    def result(self, timeout=None):
+        """
+        Block until the response is received and return it.
+        A command not receiving any response in time is forgotten and a late response for it is dropped.
+        :param timeout: The amount of seconds to wait (defaults to the future timeout)
+        :raise CommandTimeoutError: If no response has been received in time
+        :raise CommandFailedError: If the BattlEye server does not know the command
+        """
+        if not self.wait(timeout):
+            if self._discard is not None:
+                self._discard(self)
+            raise CommandTimeoutError("no response for command : %s" % self.cmd)
+        if self._error is not None:
+            raise self._error
+        if self._response == "Unknown command":
+            raise CommandFailedError("unknown command: %s" % self.cmd)
+        return self._response
+
+
 class BattleyeServer(Thread):
 
     def __init__(self, host, port, password):
@@ -123,19 +194,17 @@ class BattleyeServer(Thread):
         self.command_queue = Queue.Queue([])    # put here commands to be sent
         self.observers = set()                  # functions to call when a BattleEye event is received
         self.read_queue = Queue.Queue([])       # get here packets received
-        self.sent_data_seq = []
+        self.sent_data_seq = {}                 # sequence number -> time the command packet was sent
         self.server = None
         self.write_queue = deque([])            # put here packets to be sent
 
-        self._command_lock = Lock()             # only one command than be managed at once
+        self._pending_lock = Lock()             # protects the sequence numbers and the pending commands
         self._isconnected = False               # whether we are connected or not
         self._multi_packet_response = {}        # some responses comes in multiple parts which are hold in this dict
+                                                # (sequence number -> {part index: data})
         self._stopEvent = Event()               # can make the threads stop
-        self._command_reply_event = Event()     # thread event used to notify the thread waiting for a response
-
 
-        self.pending_command = None             # holds the current command we are waitting a response for
-        self.pending_command_response = None    # holds the current command full response once received
+        self.pending_commands = {}              # sequence number -> CommandFuture waiting for a response
         self.command_timeout = 3                # after how long should the thread waiting for the command response
                                                 # decides that no response will ever come
 
@@ -183,7 +252,8 @@ class BattleyeServer(Thread):
                         self.getLogger().error("socket error %s" % err)
                         self.stop()
                 elif writable:
-                    if len(self.write_queue):
+                    # send every queued packet: many commands can be waiting for their response at once
+                    while len(self.write_queue):
                         data = self.write_queue.popleft()
                         self.getLogger().debug("data to send: %s" % repr(data))
                         try:
@@ -191,12 +261,13 @@ class BattleyeServer(Thread):
                         except Exception, err:
                             self.getLogger().error("data send error, trying again: %s" % err, exc_info=err)
                             self.write_queue.appendleft(data)
+                            break
                         else:
                             #store seq_no, type, data
                             if data[7:8] == chr(1):
                                 seq = ord(data[8:9])
                                 self.getLogger().debug("sent sequence was %s" % seq)
-                                self.sent_data_seq.append(seq)
+                                self.sent_data_seq[seq] = time.time()
                     readable, writable, exception = select.select([self.server],[],[], .05)
             else:
                 self.stop()
@@ -219,9 +290,10 @@ class BattleyeServer(Thread):
             self.write_thread.start()
 
         while self._isconnected and not self.isStopped():
-            if self.crc_error_count > 10 or len(self.sent_data_seq) > 10:
-                self.getLogger().debug('CRC errors %s: commands not replied to %s' % (self.crc_error_count, self.sent_data_seq))
-                # 10 + consecutive crc errors or 10 commands not replied to
+            stalled = self._stalled_commands()
+            if self.crc_error_count > 10 or len(stalled) > 10:
+                self.getLogger().debug('CRC errors %s: commands not replied to %s' % (self.crc_error_count, stalled))
+                # 10 + consecutive crc errors or 10 commands not replied to in time
                 self.stop()
             time.sleep(10)
 
@@ -241,15 +313,12 @@ class BattleyeServer(Thread):
                     self._on_event(data.decode('UTF-8', 'replace'))
                 elif tp == 1:
                     #self.getLogger().debug('Command Response : %s' % repr(data))
-                    try:
-                        self.sent_data_seq.remove(sequence)
-                    except ValueError:
-                        pass
+                    self.sent_data_seq.pop(sequence, None)
                     self.crc_error_count = 0
                     if data[0:1] == chr(0):
-                        data = self._handle_multipacket_part(ord(data[1]), ord(data[2]), data[3:])
+                        data = self._handle_multipacket_part(sequence, ord(data[1]), ord(data[2]), data[3:])
                     if data:
-                        self._on_command_response(data.decode('UTF-8', 'replace'))
+                        self._on_command_response(sequence, data.decode('UTF-8', 'replace'))
                 elif tp == 255:
                     #CRC Error
                     self.crc_error_count += 1
@@ -263,22 +332,20 @@ class BattleyeServer(Thread):
 
     def writing_thread(self):
         self.getLogger().info("starting writing thread")
-        self.write_seq = 0
         self.last_write_time = time.time()
 
-        def enqueue_packet(data):
-            self.write_queue.append(self.encode_packet(1, self.write_seq, data))
+        def enqueue_packet(sequence, data):
+            self.write_queue.append(self.encode_packet(1, sequence, data))
             self.last_write_time = time.time()
-            self.write_seq += 1
-            if self.write_seq > 255:
-                self.write_seq -= 256
 
         while self._isconnected and not self.isStopped():
             try:
-                enqueue_packet(self.command_queue.get(timeout=2))
+                enqueue_packet(*self.command_queue.get(timeout=2))
             except Queue.Empty:
                 if self.last_write_time + 30 < time.time():
-                    enqueue_packet(None) # keep connection alive
+                    with self._pending_lock:
+                        sequence = self._next_sequence()
+                    enqueue_packet(sequence, None) # keep connection alive
             except Exception, err:
                 self.getLogger().error("error in writing_thread", exc_info=err)
 
@@ -322,16 +389,16 @@ class BattleyeServer(Thread):
             except:
                 pass
             self._isconnected = False
+        self._fail_pending_commands(NetworkError("disconnected from BattlEye server"))
 
     def command(self, cmd, timeout=None):
+        """
+        Send a command to the BattlEye server and wait for its response (unless the command has no response).
+        Other commands can be sent by other threads while waiting.
+        """
         if not cmd:
             return
-        if not self._isconnected:
-            raise NetworkError("not connected to BattlEye server")
-        if self.isStopped():
-            raise BattleyeError("BattlEye server stopped")
-
-        self._command_lock.acquire() # this will eventually wait for the lock to be released
+        self._check_connection()
 
         try:
             if timeout or not any(filter(lambda x: cmd.startswith(x + ' '), COMMANDS_WITH_NO_RESPONSE)):
@@ -345,54 +412,75 @@ class BattleyeServer(Thread):
         except Exception, err:
             tp, value, traceback = sys.exc_info()
             raise CommandFailedError, ("command \"%s\" failed: %s" % (cmd, err), tp, value), traceback
-        finally:
-            self._command_lock.release() # release the lock so another command can be sent
+
+    def command_async(self, cmd):
+        """
+        Send a command to the BattlEye server without waiting for its response.
+        :return: A CommandFuture providing the response once received
+        """
+        self._check_connection()
+        with self._pending_lock:
+            sequence = self._next_sequence()
+            future = CommandFuture(cmd, sequence, timeout=self.command_timeout, discard=self._discard_command)
+            previous = self.pending_commands.get(sequence)
+            self.pending_commands[sequence] = future
+            self._multi_packet_response.pop(sequence, None)
+        if previous is not None:
+            # the 256 sequence numbers have all been used since that command was sent
+            previous.set_error(CommandTimeoutError("no response for command : %s" % previous.cmd))
+        self.command_queue.put((sequence, cmd))
+        return future
+
+    def _stalled_commands(self):
+        """
+        Return the sequence numbers of the commands sent which did not get any response within command_timeout.
+        Many commands can be waiting for their response at once: only the late ones tell the connection is lost.
+        """
+        expire = time.time() - self.command_timeout
+        return sorted(seq for seq, sent in self.sent_data_seq.items() if sent < expire)
+
+    def _check_connection(self):
+        if not self._isconnected:
+            raise NetworkError("not connected to BattlEye server")
+        if self.isStopped():
+            raise BattleyeError("BattlEye server stopped")
+
+    def _next_sequence(self):
+        """
+        Return the sequence number of the next command packet (must be called holding the pending lock).
+        """
+        sequence = self.write_seq
+        self.write_seq = (self.write_seq + 1) % 256
+        return sequence
+
+    def _discard_command(self, future):
+        with self._pending_lock:
+            if self.pending_commands.get(future.sequence) is future:
+                del self.pending_commands[future.sequence]
+
+    def _fail_pending_commands(self, error):
+        with self._pending_lock:
+            futures = self.pending_commands.values()
+            self.pending_commands.clear()
+        for future in futures:
+            future.set_error(error)
 
     def _command_no_wait(self, cmd):
         """
         Send a command and do not expect any response.
         """
-        self.command_queue.put(cmd)
+        with self._pending_lock:
+            sequence = self._next_sequence()
+        self.command_queue.put((sequence, cmd))
 
     def _command_and_wait(self, cmd, timeout=None):
         """
         Send command to the BattlEye server in a synchronous way.
         Calling this method will block until we receive the command response from the server or until we reach the timeout.
         """
-        self.pending_command = cmd
-        self.pending_command_response = None
-        self._command_no_wait(cmd)
-        response = self._wait_for_response(timeout)
-        if response == "Unknown command":
-            raise CommandFailedError("unknown command: %s" % cmd)
-        return response
-
-    def _wait_for_response(self, timeout):
-        """
-        Block until response to for the current command has been received or until timeout is reached.
-        """
-        if self.isStopped():
-            return
-
-        if timeout is None:
-            timeout = self.command_timeout
-
-        self.getLogger().debug("waiting response for command: %s " % self.pending_command)
-        self._command_reply_event.clear()
-        self._command_reply_event.wait(timeout)
-
-        cmd = self.pending_command
-        self.pending_command = None
-
-        response = self.pending_command_response
-        self.pending_command_response = None
-
-        if not response:
-            # then we stopped waitting because the timeout is reached
-            raise CommandTimeoutError("no response for command : %s" % cmd)
-        else:
-            # we have our response \o/
-            return response
+        future = self.command_async(cmd)
+        self.getLogger().debug("waiting response for command: %s " % cmd)
+        return future.result(timeout)
 
     def compute_crc(self, data):
         buf = buffer(data)
@@ -440,30 +528,21 @@ class BattleyeServer(Thread):
         #self.getLogger().debug("Request is type : %s" % type(request))
         return request
 
-    def _handle_multipacket_part(self, total_num_packets, current_packet_index, data):
+    def _handle_multipacket_part(self, sequence, total_num_packets, current_packet_index, data):
         """
         Command responses can be received over multiple packest.
+        The parts are hold by sequence number so that the responses of many commands can be received at once.
         """
-        self._multi_packet_response[current_packet_index] = data
-        if current_packet_index == total_num_packets - 1:
-            # we got all the packets that make a full command response
-            data = ''
-            for p in range(0, total_num_packets):
-                if p in self._multi_packet_response:
-                    data = data + self._multi_packet_response[p]
-                else:
-                    self.getLogger().debug('part #%s of multi packet response is missing' % p)
-                    for pp in range(0, total_num_packets-1):
-                        self._multi_packet_response[pp] = ''
-                    return 'Error retrieving Bans list from server'
-
-            # Packet reconstituted, so delete segments
-            for pp in range(0, total_num_packets-1):
-                del self._multi_packet_response[pp]
-
-            return data
-        else:
+        parts = self._multi_packet_response.setdefault(sequence, {})
+        parts[current_packet_index] = data
+        if len(parts) < total_num_packets:
+            if current_packet_index == total_num_packets - 1:
+                self.getLogger().debug('multi packet response #%s is missing parts (got %s of %s)' % (
+                                       sequence, len(parts), total_num_packets))
             return
+        # we got all the packets that make a full command response
+        del self._multi_packet_response[sequence]
+        return ''.join([parts[p] for p in range(0, total_num_packets)])
 
     def _on_event(self, message):
         """
@@ -473,13 +552,17 @@ class BattleyeServer(Thread):
         for func in self.observers:
             func(message)
 
-    def _on_command_response(self, message):
+    def _on_command_response(self, sequence, message):
         """
         We received a full Command response message (one or more type 1 BattlEye packets).
         """
-        self.getLogger().debug("received BattlEye command response : %s" % message)
-        self.pending_command_response = message
-        self._command_reply_event.set() # notify the waitting thread that a response is ready
+        self.getLogger().debug("received BattlEye command #%s response : %s" % (sequence, message))
+        with self._pending_lock:
+            future = self.pending_commands.pop(sequence, None)
+        if future is None:
+            self.getLogger().debug("dropping BattlEye command #%s response as we are not waiting for it" % sequence)
+        else:
+            future.set_response(message) # notify the waitting thread that a response is ready
 
     def __getattr__(self, name):
         if name == 'connected':
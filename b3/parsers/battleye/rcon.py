@@ -31,11 +31,12 @@ not require a separated socket connection for rcon commands
 To use that Rcon class, instantiate and use the set_battleye_server() method. 
 Then you can expect this class to work like the other Rcon classes
 """
+from b3.parsers.battleye.protocol import COMMANDS_WITH_NO_RESPONSE
 from b3.parsers.battleye.protocol import CommandError
 from b3.parsers.battleye.protocol import CommandTimeoutError
 
 __author__ = 'Courgette'
-__version__ = '1.2'
+__version__ = '1.3'
 
 
 class Rcon(object):
@@ -48,16 +49,34 @@ class Rcon(object):
         self.battleye_server = battleye_server
     
     def writelines(self, lines):
+        """
+        Send all the commands at once, then wait for their responses.
+        """
+        if not self.battleye_server or not self.battleye_server.connected:
+            return
+        futures = []
         for line in lines:
-            self.write(line)
+            if any(line.startswith(x + ' ') for x in COMMANDS_WITH_NO_RESPONSE):
+                self.write(line)
+            else:
+                self.console.bot(u'RCON > %s' % repr(line))
+                futures.append(self.battleye_server.command_async(line))
+        for future in futures:
+            self._call(future.result)
 
     def write(self, cmd, *args, **kwargs):
         if not self.battleye_server or not self.battleye_server.connected:
             return
         self.console.bot(u'RCON > %s' % repr(cmd))
+        return self._call(self.battleye_server.command, cmd)
+
+    def _call(self, func, *args):
+        """
+        Call a BattleyeServer command method logging the response or the error.
+        """
         response = None
         try:
-            response = self.battleye_server.command(cmd)
+            response = func(*args)
             self.console.bot(u'RCON < %s' % repr(response))
         except CommandTimeoutError, err:
             self.console.error("RCON # %s" % err)
@@ -240,8 +240,8 @@ class Cod7Parser(b3.parsers.cod5.Cod5Parser):
 
         #self.debug("-==== FUNC!!: " + func)
 
-        if hasattr(self, func):
-            func = getattr(self, func)
+        func = self.getActionHandler(action)
+        if func:
             event = func(action, data, match)
 
             if event:
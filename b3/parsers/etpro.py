@@ -277,9 +277,9 @@ class EtproParser(AbstractParser):
         :param line: The line to be parsed
         """
         m = None
-        line = re.sub(self._lineClear, '', line, 1)
-        for f in self._lineFormats:
-            m = re.match(f, line)
+        line = self._lineClear.sub('', line, 1)
+        for f in self.getLineFormats(line):
+            m = f.match(line)
             if m:
                 break
         if m:
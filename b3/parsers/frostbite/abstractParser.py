@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__  = 'Courgette'
-__version__ = '1.9'
+__version__ = '1.10'
 
 
 import sys
@@ -38,6 +38,7 @@ import b3.cron
 import b3.parser
 import b3.parsers.frostbite.rcon as rcon
 import b3.events
+import b3.metrics
 import b3.cvar
 
 from b3.functions import soundex
@@ -293,7 +294,8 @@ class AbstractParser(b3.parser.Parser):
         else:
             # then we got a command
             if self.output:
-                res = self.output.write(msg, maxRetries=maxRetries, needConfirmation=needConfirmation)
+                with b3.metrics.rcon_seconds.time():
+                    res = self.output.write(msg, maxRetries=maxRetries, needConfirmation=needConfirmation)
                 self.output.flush()
                 return res
 
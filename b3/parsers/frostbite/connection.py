@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__  = 'Courgette'
-__version__ = '2.1'
+__version__ = '2.2'
 
 debug = True
 
@@ -86,7 +86,7 @@ class FrostbiteConnection(object):
         """
         try:
             self.console.debug('opening FrostbiteConnection socket')
-            self._receiveBuffer = ''
+            self._receiveBuffer = protocol.PacketBuffer()
             self._serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._serverSocket.connect((self._host, self._port))
         except Exception, err:
@@ -125,14 +125,10 @@ class FrostbiteConnection(object):
 
         try:
             self._serverSocket.sendall(request)
-            [response, self._receiveBuffer] = protocol.receivePacket(self._serverSocket, self._receiveBuffer)
+            decodedResponse = self._receiveBuffer.receive(self._serverSocket)
         except socket.error, detail:
             raise FrostbiteNetworkException(detail)
-        
-        if response is None:
-            return None
 
-        decodedResponse = protocol.DecodePacket(response)
         self.printPacket(decodedResponse)
         #[isFromServer, isResponse, sequence, words] = decodedResponse
         return decodedResponse[3]
@@ -188,8 +184,8 @@ class FrostbiteConnection(object):
                     self._connect()
                     self._auth()
                     self.subscribeToEvents()
-                [tmppacket, self._receiveBuffer] = protocol.receivePacket(self._serverSocket, self._receiveBuffer)
-                [isFromServer, isResponse, sequence, words] = protocol.DecodePacket(tmppacket)
+                tmppacket = self._receiveBuffer.receive(self._serverSocket)
+                [isFromServer, isResponse, sequence, words] = tmppacket
                 if isFromServer and not isResponse:
                     packet = tmppacket
                 else:
@@ -206,13 +202,12 @@ class FrostbiteConnection(object):
                     timeout_counter = 0
             except socket.error, detail:
                 raise FrostbiteNetworkException('readEvent: %r'% detail)
+            except ValueError, detail:
+                raise FrostbiteException('readEvent: failed to decodePacket: %s' % detail)
+
+        [isFromServer, isResponse, sequence, words] = packet
+        self.printPacket(packet)
 
-        try:
-            [isFromServer, isResponse, sequence, words] = protocol.DecodePacket(packet)
-            self.printPacket(protocol.DecodePacket(packet))
-        except:
-            raise FrostbiteException('readEvent: failed to decodePacket {%s}' % packet)
-        
         # If this was a command from the server, we should respond to it
         # For now, we always respond with an "OK"
         if isResponse:
@@ -22,11 +22,11 @@
 #                                                                     #
 # ################################################################### #
 
-__version__ = '1.1'
+__version__ = '1.2'
 
 import socket
 
-from struct import *
+from struct import Struct
 
 try:
     from hashlib import md5 as newmd5
@@ -35,63 +35,63 @@ except ImportError:
     from md5 import new as newmd5
 
 
-def EncodeHeader(isFromServer, isResponse, sequence):
+_int32 = Struct('<I')
+_packetHeader = Struct('<III')
+
+
+def _headerValue(isFromServer, isResponse, sequence):
     header = sequence & 0x3fffffff
     if isFromServer:
         header += 0x80000000
     if isResponse:
         header += 0x40000000
-    return pack('<I', header)
+    return header
+
+
+def EncodeHeader(isFromServer, isResponse, sequence):
+    return _int32.pack(_headerValue(isFromServer, isResponse, sequence))
 
 
-def DecodeHeader(data):
-    [header] = unpack('<I', data[0 : 4])
+def DecodeHeader(data, offset=0):
+    [header] = _int32.unpack_from(data, offset)
     return [header & 0x80000000, header & 0x40000000, header & 0x3fffffff]
 
 
 def EncodeInt32(size):
-    return pack('<I', size)
+    return _int32.pack(size)
+
+
+def DecodeInt32(data, offset=0):
+    return _int32.unpack_from(data, offset)[0]
 
 
-def DecodeInt32(data):
-    return unpack('<I', data[0 : 4])[0]
-    
-    
 def EncodeWords(words):
-    size = 0
-    encodedWords = ''
-    for word in words:
-        strWord = str(word)
-        encodedWords += EncodeInt32(len(strWord))
-        encodedWords += strWord
-        encodedWords += '\x00'
-        size += len(strWord) + 5
-    
-    return size, encodedWords
+    pack = _int32.pack
+    encodedWords = ''.join([pack(len(strWord)) + strWord + '\x00' for strWord in map(str, words)])
+    return len(encodedWords), encodedWords
 
 
-def DecodeWords(size, data):
-    numWords = DecodeInt32(data[0:])
+def DecodeWords(size, data, offset=0):
+    unpack = _int32.unpack
     words = []
-    offset = 0
-    while offset < size:
-        wordLen = DecodeInt32(data[offset : offset + 4])        
-        word = data[offset + 4 : offset + 4 + wordLen]
-        words.append(word)
-        offset += wordLen + 5
+    append = words.append
+    end = offset + size
+    while offset < end:
+        start = offset + 4
+        wordEnd = start + unpack(data[offset : start])[0]
+        append(data[start : wordEnd])
+        offset = wordEnd + 1
 
     return words
 
 
 def EncodePacket(isFromServer, isResponse, sequence, words):
-    encodedHeader = EncodeHeader(isFromServer, isResponse, sequence)
-    encodedNumWords = EncodeInt32(len(words))
     [wordsSize, encodedWords] = EncodeWords(words)
-    encodedSize = EncodeInt32(wordsSize + 12)
-    return encodedHeader + encodedSize + encodedNumWords + encodedWords
+    header = _headerValue(isFromServer, isResponse, sequence)
+    return _packetHeader.pack(header, wordsSize + 12, len(words)) + encodedWords
 
 
-def DecodePacket(data):
+def DecodePacket(data, offset=0):
     """
     Decode a request or response packet.
     Return format is:
@@ -101,11 +101,77 @@ def DecodePacket(data):
         is_response = True if this is a response, False otherwise
         sequence = sequence number
         words = list of words
+    :param data: The packet (a string or a bytearray holding it)
+    :param offset: The position of the packet in data
+    """
+    header, packetSize = _packetHeader.unpack_from(data, offset)[0:2]
+    if type(data) is not str:
+        # copy the packet once instead of copying each word out of the bytearray
+        data = str(buffer(data, offset, packetSize))
+        offset = 0
+    words = DecodeWords(packetSize - 12, data, offset + 12)
+    return [header & 0x80000000, header & 0x40000000, header & 0x3fffffff, words]
+
+
+class PacketBuffer(object):
     """
-    [isFromServer, isResponse, sequence] = DecodeHeader(data)
-    wordsSize = DecodeInt32(data[4:8]) - 12
-    words = DecodeWords(wordsSize, data[12:])
-    return [isFromServer, isResponse, sequence, words]
+    Buffer of the data received from a Frostbite server.
+    Received data is appended to a bytearray and packets are decoded in place at a read cursor, so that
+    big responses are neither copied each time more data is received nor each time a packet is removed.
+    """
+    def __init__(self):
+        """
+        Object constructor.
+        """
+        self._data = bytearray()
+        self._offset = 0
+
+    def __len__(self):
+        return len(self._data) - self._offset
+
+    def feed(self, data):
+        """
+        Append received data to the buffer.
+        """
+        if self._offset:
+            # drop the packets decoded since the last call
+            del self._data[:self._offset]
+            self._offset = 0
+        self._data += data
+
+    def read(self):
+        """
+        Decode the next packet of the buffer.
+        :return: The decoded packet (see DecodePacket) or None if it is not complete yet
+        """
+        offset = self._offset
+        available = len(self._data) - offset
+        if available < 12:
+            return None
+        packetSize = _int32.unpack_from(self._data, offset + 4)[0]
+        if packetSize < 12:
+            raise ValueError('invalid packet size: %s' % packetSize)
+        if available < packetSize:
+            return None
+        self._offset = offset + packetSize
+        return DecodePacket(self._data, offset)
+
+    def receive(self, _socket):
+        """
+        Wait until the buffer contains a full packet (appending data from the network socket) and decode it.
+        :return: The decoded packet (see DecodePacket)
+        """
+        packet = self.read()
+        while packet is None:
+            data = _socket.recv(4096)
+            # make sure we raise a socket error when the socket is hanging
+            # on a loose end (receiving no data after server restart)
+            if not data:
+                raise socket.error('no data received: remote end unexpectedly closed socket')
+            self.feed(data)
+            packet = self.read()
+        return packet
+
 
 clientSequenceNr = 0
 
@@ -160,7 +226,7 @@ def generatePasswordHash(salt, password):
 def containsCompletePacket(data):
     if len(data) < 8:
         return False
-    if len(data) < DecodeInt32(data[4:8]):
+    if len(data) < DecodeInt32(data, 4):
         return False
     return True
 
@@ -178,7 +244,7 @@ def receivePacket(_socket, receiveBuffer):
             raise socket.error('no data received: remote end unexpectedly closed socket')
         receiveBuffer += data
 
-    packetSize = DecodeInt32(receiveBuffer[4:8])
+    packetSize = DecodeInt32(receiveBuffer, 4)
     packet = receiveBuffer[0:packetSize]
     receiveBuffer = receiveBuffer[packetSize:len(receiveBuffer)]
 
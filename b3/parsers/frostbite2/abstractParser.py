@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'Courgette'
-__version__ = '1.15'
+__version__ = '1.16'
 
 
 import re
@@ -37,6 +37,7 @@ import new
 import b3.clients
 import b3.cron
 import b3.events
+import b3.metrics
 import b3.parser
 
 from b3.cvar import Cvar
@@ -441,7 +442,8 @@ class AbstractParser(b3.parser.Parser):
         else:
             # then we got a command
             if self.output:
-                res = self.output.write(msg, maxRetries=maxRetries, needConfirmation=needConfirmation)
+                with b3.metrics.rcon_seconds.time():
+                    res = self.output.write(msg, maxRetries=maxRetries, needConfirmation=needConfirmation)
                 self.output.flush()
                 return res
 
@@ -22,7 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
-__version__ = '1.2'
+__version__ = '1.4'
 
 import logging
 import time
@@ -31,84 +31,22 @@ import socket
 import threading
 import hashlib
 
-from struct import pack
-from struct import unpack
-
-
-def EncodeHeader(isFromServer, isResponse, sequence):
-    header = sequence & 0x3fffffff
-    if isFromServer:
-        header += 0x80000000
-    if isResponse:
-        header += 0x40000000
-    return pack('<I', header)
-
-
-def DecodeHeader(data):
-    [header] = unpack('<I', data[0 : 4])
-    return [header & 0x80000000, header & 0x40000000, header & 0x3fffffff]
-
-
-def EncodeInt32(size):
-    return pack('<I', size)
-
-
-def DecodeInt32(data):
-    return unpack('<I', data[0 : 4])[0]
-    
-    
-def EncodeWords(words):
-    size = 0
-    encodedWords = ''
-    for word in words:
-        strWord = str(word)
-        encodedWords += EncodeInt32(len(strWord))
-        encodedWords += strWord
-        encodedWords += '\x00'
-        size += len(strWord) + 5
-    
-    return size, encodedWords
-
-
-def DecodeWords(size, data):
-    numWords = DecodeInt32(data[0:])
-    words = []
-    offset = 0
-    while offset < size:
-        wordLen = DecodeInt32(data[offset : offset + 4])        
-        word = data[offset + 4 : offset + 4 + wordLen]
-        words.append(word)
-        offset += wordLen + 5
-
-    return words
-
-
-def EncodePacket(isFromServer, isResponse, sequence, words):
-    encodedHeader = EncodeHeader(isFromServer, isResponse, sequence)
-    encodedNumWords = EncodeInt32(len(words))
-    [wordsSize, encodedWords] = EncodeWords(words)
-    encodedSize = EncodeInt32(wordsSize + 12)
-    return encodedHeader + encodedSize + encodedNumWords + encodedWords
-
-
-def DecodePacket(data):
-    """
-    Decode a request or response packet
-    Return format is:
-    [is_from_server, is_response, sequence, words]
-    where
-    is_from_server = the command in this command/response packet pair originated on the server
-        is_response = True if this is a response, False otherwise
-        sequence = sequence number
-        words = list of words
-    """
-    [isFromServer, isResponse, sequence] = DecodeHeader(data)
-    wordsSize = DecodeInt32(data[4:8]) - 12
-    words = DecodeWords(wordsSize, data[12:])
-    return [isFromServer, isResponse, sequence, words]
+# the packets are encoded the same way as the Frostbite (BFBC2, MoH) ones
+from b3.parsers.frostbite.protocol import DecodeHeader
+from b3.parsers.frostbite.protocol import DecodeInt32
+from b3.parsers.frostbite.protocol import DecodePacket
+from b3.parsers.frostbite.protocol import DecodeWords
+from b3.parsers.frostbite.protocol import EncodeHeader
+from b3.parsers.frostbite.protocol import EncodeInt32
+from b3.parsers.frostbite.protocol import EncodePacket
+from b3.parsers.frostbite.protocol import EncodeWords
+from b3.parsers.frostbite.protocol import PacketBuffer
+from b3.parsers.frostbite.protocol import containsCompletePacket
+from b3.parsers.frostbite.protocol import receivePacket
 
 
 clientSequenceNr = 0
+clientSequenceLock = threading.Lock()
 
 
 def EncodeClientRequest(words):
@@ -116,8 +54,9 @@ def EncodeClientRequest(words):
     Encode a request packet.
     """
     global clientSequenceNr
-    packet = EncodePacket(False, False, clientSequenceNr, words)
-    clientSequenceNr = (clientSequenceNr + 1) & 0x3fffffff
+    with clientSequenceLock:
+        packet = EncodePacket(False, False, clientSequenceNr, words)
+        clientSequenceNr = (clientSequenceNr + 1) & 0x3fffffff
     return packet
 
     
@@ -158,34 +97,6 @@ def generatePasswordHash(salt, password):
     m.update(password)
     return m.digest()
 
-def containsCompletePacket(data):
-    if len(data) < 8:
-        return False
-    if len(data) < DecodeInt32(data[4:8]):
-        return False
-    return True
-
-
-def receivePacket(_socket, receiveBuffer):
-    """
-    Wait until the local receive buffer contains a full packet (appending data from the network socket),
-    then split receive buffer into first packet and remaining buffer data
-    """
-    while not containsCompletePacket(receiveBuffer):
-        data = _socket.recv(4096) #was 16384
-        # make sure we raise a socket error when the socket is hanging
-        # on a loose end (receiving no data after server restart)
-        if not data:
-            raise socket.error('no data received - Remote end unexpectedly closed socket')
-        receiveBuffer += data
-
-    packetSize = DecodeInt32(receiveBuffer[4:8])
-
-    packet = receiveBuffer[0:packetSize]
-    receiveBuffer = receiveBuffer[packetSize:len(receiveBuffer)]
-
-    return [packet, receiveBuffer]
-
 
 class FrostbiteError(Exception):
     pass
@@ -215,6 +126,83 @@ class NetworkError(FrostbiteError):
     pass
 
 
+class CommandFuture(object):
+    """
+    Reply to a command sent to the Frostbite server.
+    The reply is set by the FrostbiteServer thread when the response packet matching the command sequence number
+    is received, so that many commands can be waiting for their reply at the same time.
+    """
+    def __init__(self, command_id, words, timeout=None, discard=None):
+        """
+        Object constructor.
+        :param command_id: The command sequence number
+        :param words: The command words
+        :param timeout: The default amount of seconds to wait for the reply
+        :param discard: A function called with the future when no reply is received in time
+        """
+        self.command_id = command_id
+        self.words = words
+        self.timeout = timeout
+        self._discard = discard
+        self._event = threading.Event()
+        self._response = None
+        self._error = None
+
+    def __repr__(self):
+        return 'CommandFuture(#%i %r)' % (self.command_id, self.words)
+
+    def done(self):
+        """
+        Return True if the reply has been received (or if the command failed).
+        """
+        return self._event.is_set()
+
+    def set_response(self, words):
+        """
+        Set the words of the response packet and wake up the threads waiting for it.
+        """
+        self._response = words
+        self._event.set()
+
+    def set_error(self, error):
+        """
+        Make the command fail and wake up the threads waiting for its reply.
+        """
+        self._error = error
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the reply is received or until timeout is reached.
+        :return: True if the reply has been received, False otherwise
+        """
+        return self._event.wait(self.timeout if timeout is None else timeout)
+
+    def result(self, timeout=None):
+        """
+        Block until the reply is received and return it (without the leading status word).
+        A command not receiving any reply in time is forgotten and further replies for it are dropped.
+        :param timeout: The amount of seconds to wait (defaults to the future timeout)
+        :raise CommandTimeoutError: If no reply has been received in time
+        :raise CommandFailedError: If the Frostbite server did not reply with a OK status
+        """
+        if not self.wait(timeout):
+            if self._discard is not None:
+                self._discard(self)
+            raise CommandTimeoutError("did not receive any response for sequence #%i" % self.command_id)
+        if self._error is not None:
+            raise self._error
+        response = self._response
+        if response[0] in ('CommandDisallowedOnRanked', 'CommandDisallowedOnOfficial'):
+            raise CommandDisallowedError(response)
+        elif response[0] == 'UnknownCommand':
+            raise CommandUnknownCommandError(response)
+        elif response[0] != "OK":
+            raise CommandFailedError(response)
+        else:
+            return response[1:]
+
+
 class FrostbiteDispatcher(asyncore.dispatcher_with_send):
 
     def __init__(self, host, port):
@@ -224,12 +212,16 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
         :param port: The Frostbite2 server port
         """
         asyncore.dispatcher_with_send.__init__(self)
-        self._buffer_in = ''
+        self._buffer_in = PacketBuffer()
+        self._send_lock = threading.RLock()
         self.getLogger().info("connecting")
         self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        # don't delay small command packets while waiting for the replies to previous ones
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         asyncore.dispatcher_with_send.connect(self, (host, port))
         self._frostbite_event_handler = None
         self._frostbite_command_response_handler = None
+        self._frostbite_close_handler = None
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -248,23 +240,37 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
         Register a function that will be called when the Frosbite server sends us a command reply.
         """
         self._frostbite_command_response_handler = func
-        
-    def send_command(self, *command):
+
+    def set_frostbite_close_handler(self, func):
         """
-        Send a command to the Frosbite server and return the command
-        id which can be used to find the matching reply later on.
+        Register a function that will be called when the connection to the Frosbite server is closed.
+        """
+        self._frostbite_close_handler = func
+
+    def encode_command(self, *command):
+        """
+        Encode a command request packet.
+        :return: A tuple (command id, words, request packet)
         """
-        self.getLogger().info("command : %s " % repr(command))
         if len(command) == 1 and type(command[0]) == tuple:
             words = command[0]
         else:
             words = command
 
         request = EncodeClientRequest(words)
-        [sequence, words] = DecodePacket(request)[2:]
+        sequence = DecodeHeader(request)[2]
+        return sequence, [str(x) for x in words], request
+
+    def send_command(self, *command):
+        """
+        Send a command to the Frosbite server and return the command
+        id which can be used to find the matching reply later on.
+        """
+        self.getLogger().info("command : %s " % repr(command))
+        sequence, words, request = self.encode_command(*command)
 
         self.getLogger().debug("sending command request #%i: %s " % (sequence, words))
-        asyncore.dispatcher_with_send.send(self, request)
+        self.send(request)
 
         return sequence
 
@@ -276,6 +282,15 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
 
     def getLogger(self):
         return logging.getLogger("FrostbiteDispatcher")
+
+    def send(self, data):
+        # commands are sent by other threads than the one running the asyncore loop
+        with self._send_lock:
+            asyncore.dispatcher_with_send.send(self, data)
+
+    def initiate_send(self):
+        with self._send_lock:
+            asyncore.dispatcher_with_send.initiate_send(self)
     
     def handle_connect(self):
         self.getLogger().debug("handle_connect")
@@ -286,6 +301,8 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
         """
         self.getLogger().debug("handle_close")
         self.close()
+        if self._frostbite_close_handler is not None:
+            self._frostbite_close_handler()
 
     def handle_read(self):
         """
@@ -293,29 +310,33 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
         """
         # received raw data
         data = self.recv(8192)
-        self._buffer_in += data
+        self._buffer_in.feed(data)
         self.getLogger().debug('read %s char from Frostbite2 gameserver' % len(data))
 
         # cook it into Frosbite packets
-        while containsCompletePacket(self._buffer_in):
-            packetSize = DecodeInt32(self._buffer_in[4:8])
-            packet = self._buffer_in[0:packetSize]
-            self._buffer_in = self._buffer_in[packetSize:len(self._buffer_in)]
-            self.handle_packet(packet)
-            
+        packet = self._buffer_in.read()
+        while packet is not None:
+            self.handle_decoded_packet(*packet)
+            packet = self._buffer_in.read()
+
     def handle_packet(self, packet):
         """
         Called when a full Frosbite packet has been received.
         """
-        [originServer, isResponse, sequence, words] = DecodePacket(packet)
-        self.getLogger().info("handle_packet(%s)" % repr([originServer, isResponse, sequence, words]))
+        self.handle_decoded_packet(*DecodePacket(packet))
+
+    def handle_decoded_packet(self, originServer, isResponse, sequence, words):
+        """
+        Called when a full Frosbite packet has been received and decoded.
+        """
+        self.getLogger().info("handle_packet(%r)", [originServer, isResponse, sequence, words])
         if not isResponse:
             # acknowledge the server
             self.send(EncodePacket(originServer, True, sequence, ("OK",)))
         if originServer:
             if isResponse:
                 self.getLogger().warn("received a bad packet from frosbite server pretending being a "
-                                      "response for a server request: %s" % repr(packet))
+                                      "response for a server request: %s" % repr(words))
             else:
                 self.handle_frostbite_event(words)
         else:
@@ -323,15 +344,15 @@ class FrostbiteDispatcher(asyncore.dispatcher_with_send):
                 self.handle_frostbite_command_response(sequence, words)
             else:
                 self.getLogger().warn("received a bad packet from frosbite server pretending "
-                                      "being a request from us: %s" % repr(DecodePacket(packet)))
+                                      "being a request from us: %s" % repr([originServer, isResponse, sequence, words]))
 
     def handle_frostbite_event(self, words):
-        self.getLogger().debug("received a game event from frosbite server: %s" % repr(words))
+        self.getLogger().debug("received a game event from frosbite server: %r", words)
         if self._frostbite_event_handler is not None:
             self._frostbite_event_handler(words)
 
     def handle_frostbite_command_response(self, command_id, words):
-        self.getLogger().debug("received a response for command #%i from frosbite server: %s" % (command_id, repr(words)))
+        self.getLogger().debug("received a response for command #%i from frosbite server: %r", command_id, words)
         if self._frostbite_command_response_handler is not None:
             self._frostbite_command_response_handler(command_id, words)
     
@@ -351,8 +372,9 @@ class FrostbiteServer(threading.Thread):
         self.command_timeout = command_timeout
         self.frostbite_dispatcher.set_frostbite_event_hander(self._on_event)
         self.frostbite_dispatcher.set_frostbite_command_response_handler(self._on_command_response)
+        self.frostbite_dispatcher.set_frostbite_close_handler(self._on_close)
         self.pending_commands = {}
-        self.__command_reply_event = threading.Event()
+        self._pending_lock = threading.Lock()
         self.observers = set()
         # ok start working
         self.start()
@@ -382,26 +404,25 @@ class FrostbiteServer(threading.Thread):
         Calling this method will block until we receive the reply packet from the
         game server or until we reach the timeout.
         """
-        if not self.connected:
-            raise NetworkError("not connected")
-        
-        self.getLogger().info("command : %s " % repr(command))
         if command is None:
             return None
+        return self.command_async(*command).result()
 
-        command_id = self.frostbite_dispatcher.send_command(*command)
-        self.pending_commands[command_id] = None
-        self.getLogger().debug("command #%i sent. %s " % (command_id, repr(command)))
-        
-        response = self._wait_for_response(command_id)
-        if response[0] in ('CommandDisallowedOnRanked', 'CommandDisallowedOnOfficial'):
-            raise CommandDisallowedError(response)
-        elif response[0] == 'UnknownCommand':
-            raise CommandUnknownCommandError(response)
-        elif response[0] != "OK":
-            raise CommandFailedError(response)
-        else:
-            return response[1:]
+    def command_async(self, *command):
+        """
+        Send command to the Frostbite server without waiting for the reply.
+        :return: A CommandFuture providing the reply once received
+        """
+        return self._send([self.frostbite_dispatcher.encode_command(*command)])[0]
+
+    def commands(self, *commands):
+        """
+        Send many commands to the Frostbite server at once without waiting for their replies, i.e.:
+            futures = commands(('admin.listPlayers', 'all'), 'serverInfo', 'mapList.list')
+            players, info, maps = [f.result() for f in futures]
+        :return: A list of CommandFuture (in the same order as the commands)
+        """
+        return self._send([self.frostbite_dispatcher.encode_command(x) for x in commands])
 
     def auth(self):
         """
@@ -423,6 +444,7 @@ class FrostbiteServer(threading.Thread):
     def stop(self):
         self._stopEvent.set()
         self.close()
+        self._on_close()
     
     ####################################################################################################################
     #                                                                                                                  #
@@ -459,41 +481,56 @@ class FrostbiteServer(threading.Thread):
             pass
         finally:
             self.frostbite_dispatcher.close()
+            self._on_close()
         self.getLogger().info('end loop')
 
     def _on_event(self, words):
-        self.getLogger().debug("received Frostbite event : %s" % repr(words))
+        self.getLogger().debug("received Frostbite event : %r", words)
         for func in self.observers:
             func(words)
 
+    def _send(self, requests):
+        """
+        Send encoded command requests to the Frostbite server.
+        :param requests: A list of tuples (command id, words, request packet)
+        :return: A list of CommandFuture
+        """
+        if not self.connected:
+            raise NetworkError("not connected")
+        futures = []
+        with self._pending_lock:
+            # register the commands before sending them so that a quick reply cannot be missed
+            for command_id, words, request in requests:
+                future = CommandFuture(command_id, words, timeout=self.command_timeout, discard=self._discard_command)
+                self.pending_commands[command_id] = future
+                futures.append(future)
+        self.getLogger().debug("sending commands %r" % futures)
+        self.frostbite_dispatcher.send(''.join(request for command_id, words, request in requests))
+        return futures
+
+    def _discard_command(self, future):
+        with self._pending_lock:
+            if self.pending_commands.get(future.command_id) is future:
+                del self.pending_commands[future.command_id]
+
+    def _on_close(self):
+        """
+        Make the commands waiting for a reply fail.
+        """
+        with self._pending_lock:
+            futures = self.pending_commands.values()
+            self.pending_commands.clear()
+        for future in futures:
+            future.set_error(NetworkError("Lost connection to Frostbite2 server"))
+
     def _on_command_response(self, command_id, words):
-        self.getLogger().debug("received Frostbite command #%i response: %s" % (command_id, repr(words)))
-        if command_id not in self.pending_commands:
+        self.getLogger().debug("received Frostbite command #%i response: %r", command_id, words)
+        with self._pending_lock:
+            future = self.pending_commands.pop(command_id, None)
+        if future is None:
             self.getLogger().warn("dropping Frostbite command #%i response as we are not waiting for it anymore" % command_id)
         else:
-            self.pending_commands[command_id] = words
-            self.__command_reply_event.set()
-
-    def _wait_for_response(self, command_id):
-        """
-        Block until response to for given command_id has been received or until timeout is reached.
-        """
-        expire_time = time.time() + self.command_timeout
-        while not self.isStopped() and command_id in self.pending_commands and self.pending_commands[command_id] is None:
-            if not self.connected:
-                raise NetworkError("Lost connection to Frostbite2 server")
-            if time.time() >= expire_time:
-                del self.pending_commands[command_id]
-                raise CommandTimeoutError("did not receive any response for sequence #%i" % command_id)
-            self.getLogger().debug("waiting for some command reply #%i: %r " % (command_id, self.pending_commands))
-            self.__command_reply_event.clear()
-            self.__command_reply_event.wait(self.command_timeout)
-        try:
-            response = self.pending_commands[command_id]
-            del self.pending_commands[command_id]
-            return response
-        except KeyError:
-            raise CommandTimeoutError("did not receive any response for sequence #%i" % command_id)
+            future.set_response(words)
 
 ########################################################################################################################
 # EXAMPLE PROGRAM                                                                                                      #
@@ -34,7 +34,7 @@ Then you can expect this class to work like the other Rcon classes
 """
 
 __author__ = 'Courgette'
-__version__ = '1.1'
+__version__ = '1.2'
 
 
 class Rcon(object):
@@ -53,10 +53,15 @@ class Rcon(object):
     def writelines(self, lines):
         """
         Write multiple RCON commands to the Frostbite2 server.
+        The commands are sent at once and their replies are waited for afterwards.
         :param lines: A list of commands to send
         """
-        for line in lines:
-            self.write(line)
+        if not self.frostbite_server:
+            return
+        self.console.verbose(u'RCON :\t %s' % repr(lines))
+        for future in self.frostbite_server.commands(*lines):
+            response = future.result()
+            self.console.verbose(u'RCON response:\t %s' % repr(response))
 
     def write(self, cmd, *args, **kwargs):
         """
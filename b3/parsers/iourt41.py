@@ -404,10 +404,10 @@ class Iourt41Parser(AbstractParser):
         Parse a log line returning extracted tokens.
         :param line: The line to be parsed
         """
-        line = re.sub(self._lineClear, '', line, 1)
+        line = self._lineClear.sub('', line, 1)
         m = None
-        for f in self._lineFormats:
-            m = re.match(f, line)
+        for f in self.getLineFormats(line):
+            m = f.match(line)
             if m:
                 break
 
@@ -35,7 +35,7 @@ from b3.plugins.spamcontrol import SpamcontrolPlugin
 
 
 __author__ = 'Courgette, Fenix'
-__version__ = '1.35'
+__version__ = '1.36'
 
 
 class Iourt42Client(Client):
@@ -534,14 +534,17 @@ class Iourt42Parser(Iourt41Parser):
         """
         Called after the parser is created before run().
         """
-        try:
-            cvar = self.getCvar('gamename')
-            gamename = cvar.getString() if cvar else None
-            if gamename != 'q3urt42':
-                self.error("The iourt42 B3 parser cannot be used with a game server other than Urban Terror 4.2")
-                raise SystemExit(220)
-        except Exception, e:
-            self.warning("Could not query server for gamename.", exc_info=e)
+        if self.replay:
+            self.debug("Replaying a game log file: not checking the game server gamename")
+        else:
+            try:
+                cvar = self.getCvar('gamename')
+                gamename = cvar.getString() if cvar else None
+                if gamename != 'q3urt42':
+                    self.error("The iourt42 B3 parser cannot be used with a game server other than Urban Terror 4.2")
+                    raise SystemExit(220)
+            except Exception, e:
+                self.warning("Could not query server for gamename.", exc_info=e)
 
         Iourt41Parser.startup(self)
 
@@ -35,7 +35,7 @@ from b3.plugins.spamcontrol import SpamcontrolPlugin
 
 
 __author__ = 'Courgette, Fenix, ptitbigorneau'
-__version__ = '0.2'
+__version__ = '0.3'
 
     
 class Iourt43Client(Client):
@@ -550,14 +550,17 @@ class Iourt43Parser(Iourt41Parser):
         """
         Called after the parser is created before run().
         """
-        try:
-            cvar = self.getCvar('gamename')
-            gamename = cvar.getString() if cvar else None
-            if gamename != 'q3urt43':
-                self.error("The iourt43 B3 parser cannot be used with a game server other than Urban Terror 4.3")
-                raise SystemExit(220)
-        except Exception, e:
-            self.warning("Could not query server for gamename.", exc_info=e)
+        if self.replay:
+            self.debug("Replaying a game log file: not checking the game server gamename")
+        else:
+            try:
+                cvar = self.getCvar('gamename')
+                gamename = cvar.getString() if cvar else None
+                if gamename != 'q3urt43':
+                    self.error("The iourt43 B3 parser cannot be used with a game server other than Urban Terror 4.3")
+                    raise SystemExit(220)
+            except Exception, e:
+                self.warning("Could not query server for gamename.", exc_info=e)
 
         Iourt41Parser.startup(self)
 
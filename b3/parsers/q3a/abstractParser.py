@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'ThorN, xlr8or'
-__version__ = '1.8.1'
+__version__ = '1.9'
 
 
 import re
@@ -52,7 +52,9 @@ class AbstractParser(b3.parser.Parser):
     OutputClass = rcon.Rcon
     PunkBuster = None
 
+    _actionHandlers = None  # action => event handler method (built lazily, one entry per action)
     _clientConnectID = None
+    _lineFormatsIndex = None  # line key => candidate line formats (built lazily, one entry per line key)
     _logSync = 2
 
     _commands = {
@@ -74,6 +76,8 @@ class AbstractParser(b3.parser.Parser):
     # remove the time off of the line
     _lineTime = re.compile(r'^(?P<minutes>[0-9]+):(?P<seconds>[0-9]+).*')
     _lineClear = re.compile(r'^(?:[0-9:]+\s?)?')
+    _lineKey = re.compile(r'^[a-z]*', re.IGNORECASE)
+    _lineFormatLead = re.compile(r'^\^\(\?P<action>([a-z]*)', re.IGNORECASE)
 
     _lineFormats = (
         # 1579:03ConnectInfo: 0: E24F9B2702B9E4A1223E905BF597FA92: ^w[^2AS^w]^2Lead: 3: 3: 24.153.180.106:2794
@@ -177,15 +181,54 @@ class AbstractParser(b3.parser.Parser):
     #                                                                                                                  #
     ####################################################################################################################
 
+    def getLineFormats(self, line):
+        """
+        Return the line formats which may match the given log line (in the same order they are declared in
+        _lineFormats). Line formats are indexed by the literal prefix of their action group (if any), so that
+        a line is only matched against the formats which are compatible with its leading word.
+        :param line: The log line (with the time already removed)
+        """
+        key = self._lineKey.match(line).group(0).lower()
+        if self._lineFormatsIndex is None:
+            self._lineFormatsIndex = {}
+        try:
+            return self._lineFormatsIndex[key]
+        except KeyError:
+            formats = []
+            for f in self._lineFormats:
+                m = self._lineFormatLead.match(f.pattern)
+                if not m or key.startswith(m.group(1).lower()):
+                    formats.append(f)
+            formats = tuple(formats)
+            if len(self._lineFormatsIndex) < 512:
+                # do not let malformed lines grow the index indefinitely
+                self._lineFormatsIndex[key] = formats
+            return formats
+
+    def getActionHandler(self, action):
+        """
+        Return the method handling the given log line action (None if there is no such method).
+        :param action: The log line action (lowercase)
+        """
+        if self._actionHandlers is None:
+            self._actionHandlers = {}
+        try:
+            return self._actionHandlers[action]
+        except KeyError:
+            handler = getattr(self, 'On%s' % string.capwords(action).replace(' ', ''), None)
+            if len(self._actionHandlers) < 512:
+                self._actionHandlers[action] = handler
+            return handler
+
     def getLineParts(self, line):
         """
         Parse a log line returning extracted tokens.
         :param line: The line to be parsed
         """
-        line = re.sub(self._lineClear, '', line, 1)
+        line = self._lineClear.sub('', line, 1)
         m = None
-        for f in self._lineFormats:
-            m = re.match(f, line)
+        for f in self.getLineFormats(line):
+            m = f.match(line)
             if m:
                 #self.debug('line matched %s' % f.pattern)
                 break
@@ -206,10 +249,9 @@ class AbstractParser(b3.parser.Parser):
             return False
 
         match, action, data, client, target = m
-        func = 'On%s' % string.capwords(action).replace(' ', '')
-        
-        if hasattr(self, func):
-            func = getattr(self, func)
+        func = self.getActionHandler(action)
+
+        if func:
             event = func(action, data, match)
             if event:
                 self.queueEvent(event)
@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'ThorN, Courgette'
-__version__ = '1.13'
+__version__ = '1.14'
 
 
 import re
@@ -96,6 +96,12 @@ class Plugin(object):
     loadAfterPlugins = []
     """:type: list"""
 
+    # Whether this plugin may stop the propagation of an event to the other plugins by raising b3.events.VetoEvent.
+    # Plugins which can veto events are given events synchronously by the B3 event handler thread, while all the other
+    # plugins are served concurrently by the event dispatcher (events are still processed in order within each plugin).
+    canVetoEvents = False
+    """:type: bool"""
+
     # Default messages which can be retrieved using the getMessage method: this dict will be
     # used in place of a missing 'messages' configuration file section.
     _default_messages = {}
@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'ThorN'
-__version__ = '1.6.1'
+__version__ = '1.6.2'
 
 import b3
 import os
@@ -416,6 +416,9 @@ class AdvPlugin(b3.plugin.Plugin):
             (m, s) = self._get_rate_minsec(self._rate)
             self._cronTab.minute = m
             self._cronTab.second = s
+            # add the crontab again so its next run is computed with the new rate
+            self.console.cron - self._cronTab
+            self.console.cron + self._cronTab
             if self._rate[-1] == 's':
                 client.message('^3Adv: ^7rate set to %s seconds' % self._rate[:-1])
             else:
@@ -22,7 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
-__version__ = '2.8'
+__version__ = '2.9'
 __author__  = 'Courgette'
 
 import b3
@@ -46,6 +46,11 @@ from ConfigParser import NoOptionError
 
 user_agent =  "B3 Banlist plugin/%s" % __version__
 
+# banlist line starting with an IP address, optionally followed by a CIDR prefix length
+_IP_ENTRY = re.compile(r'^(\d+)\.(\d+)\.(\d+)\.(\d+)(?:/(\d+))?')
+_IP_ADDRESS = re.compile(r'^(\d+)\.(\d+)\.(\d+)\.(\d+)$')
+_WORD_BOUNDARY = re.compile(r'\b')
+
 
 class BanlistPlugin(b3.plugin.Plugin):
 
@@ -346,6 +351,7 @@ class Banlist(object):
         self.file_content = ""  # the banlist file content
         self.cache = {}  # used to cache isBanned results. Must be cleared after banlist file change/update
         self.cache_time = 0  # holds the modifed time of the banlist file used to fill that cache
+        self.buildIndex()  # empty indexes until the banlist file is loaded
 
         node = config.find('name')
         if node is None or node.text is None or node.text == '':
@@ -506,8 +512,45 @@ class Banlist(object):
             with open(self.file) as f:
                 self.plugin.verbose("updating %s content cache from %s" % (self, self.file))
                 self.file_content = f.read()
+            self.buildIndex()
             self.clear_cache()
 
+    def buildIndex(self):
+        """
+        Index the banlist file content so that lookups don't have to scan it.
+        Called every time the banlist file content is loaded.
+        """
+        pass
+
+    def buildIdIndex(self):
+        """
+        Index the banlist lines by the (lowercased) ids they start with.
+        A line is indexed under every prefix of its first word which could be matched as a whole id
+        (i.e: "STEAM:0:1:1234 comment" is indexed under "steam", "steam:0", "steam:0:1" and "steam:0:1:1234").
+        """
+        self._ids = {}
+        for line in self.file_content.split('\n'):
+            words = line.split(None, 1)
+            if not words:
+                continue
+            word = words[0]
+            for m in _WORD_BOUNDARY.finditer(word):
+                if m.start():
+                    self._ids.setdefault(word[:m.start()].lower(), line)
+
+    def searchId(self, value):
+        """
+        Return the first banlist line starting with the given id (ignoring case and leading spaces).
+        :param value: The id to search for
+        :return: The matching banlist line or None if the id is not in the banlist
+        """
+        if not value.split() or len(value.split()) > 1 or value != value.strip():
+            # ids with spaces are not indexed: scan the whole banlist
+            m = re.search(r'''^(?P<entry>\s*%s\b.*)$''' % re.escape(value), self.file_content,
+                          re.IGNORECASE | re.MULTILINE)
+            return m.group('entry') if m else None
+        return self._ids.get(value.lower())
+
 
 class IpBanlist(Banlist):
 
@@ -528,6 +571,32 @@ class IpBanlist(Banlist):
             self._forceRange = False
         self.plugin.debug("%s [%s] force IP range : %s" % (self.__class__.__name__, self.name, self._forceRange))
 
+    def buildIndex(self):
+        """
+        Index the banlist lines starting with an IP address:
+          - by IP address, as written in the banlist (exact and .0 range matches)
+          - by their first three IP address parts (forced range matches)
+          - by network address and prefix length for the ones using the CIDR notation (i.e: 172.16.0.0/12)
+        """
+        self._entries = {}
+        self._ranges = {}
+        self._networks = {}
+        for line in self.file_content.splitlines():
+            m = _IP_ENTRY.match(line)
+            if not m:
+                continue
+            a, b, c, d, bits = m.groups()
+            entry = line.strip()
+            self._entries.setdefault('%s.%s.%s.%s' % (a, b, c, d), entry)
+            if len(d) <= 3:
+                self._ranges.setdefault('%s.%s.%s' % (a, b, c), entry)
+            if bits is not None and int(bits) <= 32 and max(int(a), int(b), int(c), int(d)) <= 255:
+                bits = int(bits)
+                mask = (0xFFFFFFFF << (32 - bits)) & 0xFFFFFFFF
+                address = (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+                self._networks.setdefault(bits, {}).setdefault(address & mask, entry)
+        self._networkBits = sorted(self._networks, reverse=True)
+
     def isBanned(self, client):
         """
         Check whether a client is banned
@@ -548,36 +617,41 @@ class IpBanlist(Banlist):
         return rv
 
     def isIpInBanlist(self, ip):
+        m = _IP_ADDRESS.match(ip)
+        if not m:
+            # not an IPv4 address: only search for the exact ip
+            rStrict = re.compile(r'''^(?P<entry>%s(?:[^\d\n\r].*)?)$''' % re.escape(ip), re.MULTILINE)
+            m = rStrict.search(self.file_content)
+            if m:
+                return ip, "ip '%s' matches banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
+            return False, "ip '%s' not found in banlist (%s %s)" % (ip, self.name, self.getHumanModifiedTime())
+
+        a, b, c, d = m.groups()
+
         # search the exact ip
-        rStrict = re.compile(r'''^(?P<entry>%s(?:[^\d\n\r].*)?)$''' % re.escape(ip), re.MULTILINE)
-        m = rStrict.search(self.file_content)
-        if m:
-            return ip, "ip '%s' matches banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
-
-        # search the ip with .0 at the end
-        rRange = re.compile(r'''^(?P<entry>%s\.0(?:[^\d\n\r].*)?)$''' % re.escape('.'.join(ip.split('.')[0:3])), re.MULTILINE)
-        m = rRange.search(self.file_content)
-        if m:
-            return ip, "ip '%s' matches (by range) banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
-
-        # search the ip with .0.0 at the end
-        rRange = re.compile(r'''^(?P<entry>%s\.0\.0(?:[^\d\n\r].*)?)$''' % re.escape('.'.join(ip.split('.')[0:2])), re.MULTILINE)
-        m = rRange.search(self.file_content)
-        if m:
-            return ip, "ip '%s' matches (by range) banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
-
-        # search the ip with .0.0.0 at the end
-        rRange = re.compile(r'''^(?P<entry>%s\.0\.0\.0(?:[^\d\n\r].*)?)$''' % re.escape('.'.join(ip.split('.')[0:1])), re.MULTILINE)
-        m = rRange.search(self.file_content)
-        if m:
-            return ip, "ip '%s' matches (by range) banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
+        entry = self._entries.get(ip)
+        if entry is not None:
+            return ip, "ip '%s' matches banlist entry %r (%s %s)" % (ip, entry, self.name, self.getHumanModifiedTime())
+
+        # search the ip with .0, .0.0 and .0.0.0 at the end
+        for key in ('%s.%s.%s.0' % (a, b, c), '%s.%s.0.0' % (a, b), '%s.0.0.0' % a):
+            entry = self._entries.get(key)
+            if entry is not None:
+                return ip, "ip '%s' matches (by range) banlist entry %r (%s %s)" % (ip, entry, self.name, self.getHumanModifiedTime())
 
         # if force range is set, enforce search by range even if banlist ip are not ending with ".0"
         if self._forceRange:
-            rForceRange = re.compile(r'''^(?P<entry>%s\.\d{1,3}(?:[^\d\n\r].*)?)$''' % re.escape('.'.join(ip.split('.')[0:3])), re.MULTILINE)
-            m = rForceRange.search(self.file_content)
-            if m:
-                return ip, "ip '%s' matches (by forced range) banlist entry %r (%s %s)" % (ip, m.group('entry').strip(), self.name, self.getHumanModifiedTime())
+            entry = self._ranges.get('%s.%s.%s' % (a, b, c))
+            if entry is not None:
+                return ip, "ip '%s' matches (by forced range) banlist entry %r (%s %s)" % (ip, entry, self.name, self.getHumanModifiedTime())
+
+        # search the networks written using the CIDR notation (most specific first)
+        if self._networkBits and max(int(a), int(b), int(c), int(d)) <= 255:
+            address = (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+            for bits in self._networkBits:
+                entry = self._networks[bits].get(address & ((0xFFFFFFFF << (32 - bits)) & 0xFFFFFFFF))
+                if entry is not None:
+                    return ip, "ip '%s' matches (by range) banlist entry %r (%s %s)" % (ip, entry, self.name, self.getHumanModifiedTime())
 
         return False, "ip '%s' not found in banlist (%s %s)" % (ip, self.name, self.getHumanModifiedTime())
 
@@ -603,11 +677,13 @@ class GuidBanlist(Banlist):
             self.plugin.verbose(msg)
         return rv
 
+    def buildIndex(self):
+        self.buildIdIndex()
+
     def isGuidInBanlist(self, guid):
-        re_guid = re.compile(r'''^(?P<entry>\s*%s\b.*)$''' % re.escape(guid), re.IGNORECASE | re.MULTILINE)
-        m = re_guid.search(self.file_content)
-        if m:
-            return guid, "guid '%s' matches banlist entry %r (%s %s)" % (guid, m.group('entry'), self.name, self.getHumanModifiedTime())
+        entry = self.searchId(guid)
+        if entry is not None:
+            return guid, "guid '%s' matches banlist entry %r (%s %s)" % (guid, entry, self.name, self.getHumanModifiedTime())
         return False, "guid '%s' not found in banlist (%s %s)" % (guid, self.name, self.getHumanModifiedTime())
 
 
@@ -632,11 +708,13 @@ class PbidBanlist(Banlist):
             self.plugin.verbose(msg)
         return rv
 
+    def buildIndex(self):
+        self.buildIdIndex()
+
     def isPbidInBanlist(self, pbid):
-        re_guid = re.compile(r'''^(?P<entry>\s*%s\b.*)$''' % re.escape(pbid), re.IGNORECASE | re.MULTILINE)
-        m = re_guid.search(self.file_content)
-        if m:
-            return pbid, "PBid '%s' matches banlist entry %r (%s %s)" % (pbid, m.group('entry'), self.name, self.getHumanModifiedTime())
+        entry = self.searchId(pbid)
+        if entry is not None:
+            return pbid, "PBid '%s' matches banlist entry %r (%s %s)" % (pbid, entry, self.name, self.getHumanModifiedTime())
         return False, "PBid '%s' not found in banlist (%s %s)" % (pbid, self.name, self.getHumanModifiedTime())
 
 
@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'ThorN, xlr8or, Bravo17, Courgette'
-__version__ = '3.3'
+__version__ = '3.5'
 
 import b3
 import re
@@ -72,6 +72,92 @@ class CensorData:
         return """CensorData(name=%r, penalty=%r, regexp=%r)""" % (self.name, self.penalty, self.regexp)
 
 
+class CensorMatcher(object):
+    """
+    Search texts for a list of censor rules at once.
+
+    The plain word rules (\\sword\\s) are looked up in a set of words, and the other rules regular expressions
+    are merged into a few alternations, so that a clean text (which is what most chat lines and names are) is
+    checked with a couple of searches instead of two searches per rule. When something matches, the rules are
+    tried one by one in their configuration order to find which one fired.
+    """
+    # python 2 regular expressions cannot hold more than 100 groups
+    _maxGroups = 99
+    # patterns using backreferences or inline flags would change meaning once merged with others
+    _reUnmergeable = re.compile(r'\\[1-9]|\(\?P=|\(\?[iLmsux]+\)')
+    _reWordRule = re.compile(r'^\\s(\w+)\\s$')
+    _reSpaces = re.compile(r'\s+')
+
+    def __init__(self, rules):
+        """
+        Object constructor.
+        :param rules: The list of CensorData to search for
+        """
+        self.rules = rules
+        self.size = len(rules)
+        self.words = set()
+        self.regexps = []
+        patterns = []
+        groups = 0
+        for rule in rules:
+            m = self._reWordRule.match(rule.regexp.pattern)
+            if m and rule.regexp.flags == re.IGNORECASE:
+                self.words.add(m.group(1).lower())
+                continue
+            if rule.regexp.flags != re.IGNORECASE or self._reUnmergeable.search(rule.regexp.pattern):
+                self.regexps.append(rule.regexp)
+                continue
+            if patterns and groups + rule.regexp.groups > self._maxGroups:
+                self._merge(patterns)
+                patterns = []
+                groups = 0
+            patterns.append(rule.regexp.pattern)
+            groups += rule.regexp.groups
+        self._merge(patterns)
+
+    def _merge(self, patterns):
+        """
+        Add a regular expression matching any of the given patterns.
+        """
+        if not patterns:
+            return
+        try:
+            self.regexps.append(re.compile('|'.join('(?:%s)' % x for x in patterns), re.IGNORECASE))
+        except (re.error, OverflowError, AssertionError):
+            self.regexps.extend(re.compile(x, re.IGNORECASE) for x in patterns)
+
+    def isBuiltFrom(self, rules):
+        """
+        Tell whether this matcher is up to date with the given list of rules.
+        """
+        return rules is self.rules and len(rules) == self.size
+
+    def _hasWord(self, text):
+        """
+        Tell whether the text contains one of the plain words surrounded by spaces.
+        """
+        if not self.words:
+            return False
+        # the first and last parts are not surrounded by spaces
+        return not self.words.isdisjoint(self._reSpaces.split(text.lower())[1:-1])
+
+    def search(self, *texts):
+        """
+        Search the given texts for the rules.
+        :return: A tuple (rule, text) with the first rule (in configuration order) matching any of the texts,
+                 and the first text it matches, or (None, None) if no rule matches
+        """
+        if not any(regexp.search(text) for regexp in self.regexps for text in texts) and \
+           not any(self._hasWord(text) for text in texts):
+            return None, None
+
+        for rule in self.rules:
+            for text in texts:
+                if rule.regexp.search(text):
+                    return rule, text
+        return None, None
+
+
 class CensorPlugin(b3.plugin.Plugin):
 
     _adminPlugin = None
@@ -82,8 +168,11 @@ class CensorPlugin(b3.plugin.Plugin):
     _ignoreLength = 3
     _badWords = None
     _badNames = None
+    _badWordsMatcher = None
+    _badNamesMatcher = None
 
     loadAfterPlugins = ['chatlogger']
+    canVetoEvents = True
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -233,6 +322,22 @@ class CensorPlugin(b3.plugin.Plugin):
 
         return CensorData(name=name, penalty=pd, regexp=regexp)
 
+    def getBadWordsMatcher(self):
+        """
+        Return the matcher for the badword rules (built again whenever the rules change).
+        """
+        if self._badWordsMatcher is None or not self._badWordsMatcher.isBuiltFrom(self._badWords):
+            self._badWordsMatcher = CensorMatcher(self._badWords)
+        return self._badWordsMatcher
+
+    def getBadNamesMatcher(self):
+        """
+        Return the matcher for the badname rules (built again whenever the rules change).
+        """
+        if self._badNamesMatcher is None or not self._badNamesMatcher.isBuiltFrom(self._badNames):
+            self._badNamesMatcher = CensorMatcher(self._badNames)
+        return self._badNamesMatcher
+
     ####################################################################################################################
     #                                                                                                                  #
     #    OTHER METHODS                                                                                                 #
@@ -300,20 +405,13 @@ class CensorPlugin(b3.plugin.Plugin):
         cleaned_name = ' ' + self.clean(client.exactName) + ' '
         self.info("checking '%s'=>'%s' for badname" % (client.exactName, cleaned_name))
 
-        was_penalized = False
-        for w in self._badNames:
-            if w.regexp.search(client.exactName):
+        w, matched = self.getBadNamesMatcher().search(client.exactName, cleaned_name)
+        if w:
+            if matched is client.exactName:
                 self.debug("badname rule [%s] matches '%s'" % (w.name, client.exactName))
-                self.penalizeClientBadname(w.penalty, client, '%s (rule %s)' % (client.exactName, w.name))
-                was_penalized = True
-                break
-            if w.regexp.search(cleaned_name):
+            else:
                 self.debug("badname rule [%s] matches cleaned name '%s' for player '%s'" % (w.name, cleaned_name, client.exactName))
-                self.penalizeClientBadname(w.penalty, client, '%s (rule %s)' % (client.exactName, w.name))
-                was_penalized = True
-                break
-
-        if was_penalized:
+            self.penalizeClientBadname(w.penalty, client, '%s (rule %s)' % (client.exactName, w.name))
             # check again in 1 minute
             t = threading.Timer(60, self.checkBadName, (client,))
             t.start()
@@ -328,15 +426,15 @@ class CensorPlugin(b3.plugin.Plugin):
         cleaned = ' ' + self.clean(text) + ' '
         text = ' ' + text + ' '
         self.debug("cleaned text: [%s]" % cleaned)
-        for w in self._badWords:
-            if w.regexp.search(text):
+        w, matched = self.getBadWordsMatcher().search(text, cleaned)
+        if w:
+            if matched is text:
                 self.debug("badword rule [%s] matches '%s'" % (w.name, text))
                 self.penalizeClient(w.penalty, client, text)
-                raise b3.events.VetoEvent
-            if w.regexp.search(cleaned):
+            else:
                 self.debug("badword rule [%s] matches cleaned text '%s'" % (w.name, cleaned))
                 self.penalizeClient(w.penalty, client, '%s => %s' % (text, cleaned))
-                raise b3.events.VetoEvent
+            raise b3.events.VetoEvent
 
     def clean(self, data):
         return re.sub(self._reClean, ' ', self.console.stripColors(data.lower()))
\ No newline at end of file
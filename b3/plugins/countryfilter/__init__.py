@@ -22,7 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
-__version__ = '1.7'
+__version__ = '1.8'
 __author__ = 'guwashi / xlr8or'
 
 import b3
@@ -33,6 +33,7 @@ import b3.plugin
 class CountryfilterPlugin(b3.plugin.Plugin):
 
     requiresPlugins = ['geolocation']
+    canVetoEvents = True
 
     cf_announce_accept = True
     cf_announce_reject = True
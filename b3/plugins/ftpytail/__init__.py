@@ -22,7 +22,7 @@
 #                                                                     #
 # ################################################################### #
  
-__version__ = '1.10'
+__version__ = '1.12'
 __author__ = 'Bakes, Courgette'
 
 import b3
@@ -35,12 +35,13 @@ import time
 from ConfigParser import NoOptionError
 from ftplib import FTP
 from b3 import functions
+from b3.checkpoint import LogCheckpoint
 
 
 class FtpytailPlugin(b3.plugin.Plugin):
 
     requiresConfigFile = False
-    buffer = None
+    checkpoint = None
     file = None
     ftpconfig = None
     lgame_log = None
@@ -66,6 +67,7 @@ class FtpytailPlugin(b3.plugin.Plugin):
     _gamelog_read_delay = 0.150
     _use_windows_cache_fix = False
     _cache_refresh_delay = 1
+    _checkpoint = True              # save the remote file offset so that it can be resumed after a restart
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -177,6 +179,16 @@ class FtpytailPlugin(b3.plugin.Plugin):
             self.error('could not load settings/long_delay config value: %s' % e)
             self.debug('using default value (%s) for settings/long_delay' % self._long_delay)
 
+        try:
+            self._checkpoint = self.config.getboolean('settings', 'checkpoint')
+            self.debug('loaded settings/checkpoint: %s' % self._checkpoint)
+        except NoOptionError:
+            self.warning('could not find settings/checkpoint in config file, '
+                         'using default: %s' % self._checkpoint)
+        except ValueError, e:
+            self.error('could not load settings/checkpoint config value: %s' % e)
+            self.debug('using default value (%s) for settings/checkpoint' % self._checkpoint)
+
         self.info("until %s consecutive errors are met, the bot will wait for %s seconds (short_delay), "
                   "then it will wait for %s seconds (long_delay)" % (self._maxConsecutiveConnFailure,
                                                                      self._short_delay, self._long_delay))
@@ -201,17 +213,21 @@ class FtpytailPlugin(b3.plugin.Plugin):
         """
         def handle_download(block):
             #self.debug('received %s bytes' % len(block))
-            self._remoteFileOffset += len(block)
-            if self.buffer is None:
-                self.buffer = block
-            else:
-                self.buffer = self.buffer + block
+            # write blocks as they come: large gaps are never held in memory
+            data = self.checkpoint.feed(block)
+            if data:
+                self.file.write(data)
         
         def force_windows_cache_reload(_):
             # no need to do anything here so
             return
             
         ftp = None
+        self.checkpoint = LogCheckpoint('ftp://%s:%s/%s' % (self.ftpconfig['host'], self.ftpconfig['port'],
+                                                          self.url_path),
+                                        self.lgame_log + '.checkpoint' if self._checkpoint else None)
+        if self._remoteFileOffset is not None:
+            self.checkpoint.reset(self._remoteFileOffset)
         self.file = open(self.lgame_log, 'ab')
         self.file.write('\r\n')
         self.file.write('B3 has been restarted\r\n')
@@ -234,7 +250,12 @@ class FtpytailPlugin(b3.plugin.Plugin):
                         remotesize = ftp.size(os.path.basename(self.url_path))
                         self.verbose("connection successful: remote file size is %s" % remotesize)
                         if self._remoteFileOffset is None:
-                            self._remoteFileOffset = remotesize
+                            if self.checkpoint.load():
+                                self.info('resuming the remote file from offset %s' % self.checkpoint.offset)
+                                self._remoteFileOffset = self.checkpoint.offset
+                            else:
+                                self._remoteFileOffset = remotesize
+                                self.checkpoint.reset(remotesize)
                         
                 if self._use_windows_cache_fix:
                     time.sleep(self._cache_refresh_delay)
@@ -246,22 +267,26 @@ class FtpytailPlugin(b3.plugin.Plugin):
                 if remotesize < self._remoteFileOffset:
                     self.debug("remote file rotation detected")
                     self._remoteFileOffset = 0
+                    self.checkpoint.reset(0)
                 if remotesize > self._remoteFileOffset:
                     if (remotesize - self._remoteFileOffset) > self._maxGap:
                         gap = remotesize - self._remoteFileOffset
                         self.debug('gap between local and remote file too large (%s bytes)', gap)
                         self.debug('downloading only the last %s bytes' % self._maxGap)
                         self._remoteFileOffset = remotesize - self._maxGap
+                        self.checkpoint.reset(self._remoteFileOffset)
                     #self.debug('RETR from remote offset %s. (expecting to read at least %s '
                     #           'bytes)' % (self._remoteFileOffset, remoteSize - self._remoteFileOffset))
+                    # the transfer starts a few bytes before the offset to check the remote file was not rotated
                     ftp.retrbinary('RETR ' + os.path.basename(self.url_path),
                                    handle_download,
-                                   rest=self._remoteFileOffset)
-
-                    if self.buffer:
-                        self.file.write(self.buffer)
-                        self.buffer = None
-                        self.file.flush()
+                                   rest=self.checkpoint.start())
+                    self.file.flush()
+                    if self.checkpoint.rotated:
+                        self.debug("remote file rotation detected")
+                        self.checkpoint.reset(0)
+                    self._remoteFileOffset = self.checkpoint.offset
+                    self.save_checkpoint()
 
                     if self.console._paused:
                         self.console.unpause()
@@ -305,6 +330,8 @@ class FtpytailPlugin(b3.plugin.Plugin):
 
         self.verbose("stopping Ftpytail update thread")
 
+        self.save_checkpoint(force=True)
+
         try:
             ftp.close()
         except Exception:
@@ -314,6 +341,16 @@ class FtpytailPlugin(b3.plugin.Plugin):
         except Exception:
             pass
     
+    def save_checkpoint(self, force=False):
+        """
+        Save the remote file offset.
+        :param force: Whether to save it even if it was saved less than a second ago
+        """
+        try:
+            self.checkpoint.save(force)
+        except (IOError, OSError), e:
+            self.warning('could not save the remote file offset: %s' % e)
+
     def ftpconnect(self):
         self.verbose('connecting to %s:%s ...' % (self.ftpconfig["host"], self.ftpconfig["port"]))
         ftp = FTP()
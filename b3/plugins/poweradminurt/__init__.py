@@ -22,7 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
-__version__ = '1.26'
+__version__ = '1.27'
 __author__ = 'xlr8or, courgette'
 
 
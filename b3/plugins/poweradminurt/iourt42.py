@@ -27,6 +27,7 @@ import b3.plugin
 
 from .iourt41 import Poweradminurt41Plugin
 from b3.functions import clamp
+from b3.ratelimit import RateLimiter
 
 
 class Poweradminurt42Plugin(Poweradminurt41Plugin):
@@ -64,6 +65,7 @@ class Poweradminurt42Plugin(Poweradminurt41Plugin):
     _rsp_mute_duration = 2
     _rsp_falloffRate = 2  # spam points will fall off by 1 point every 4 seconds
     _rsp_maxSpamins = 10
+    _rsp_limiter = None
 
     _round_based_gametypes = ['ts', 'bm', 'freeze']
 
@@ -100,6 +102,9 @@ class Poweradminurt42Plugin(Poweradminurt41Plugin):
         """
         self._rsp_enable = self.getSetting('radio_spam_protection', 'enable', b3.BOOL, self._rsp_enable)
         self._rsp_mute_duration = self.getSetting('radio_spam_protection', 'mute_duration', b3.INT, self._rsp_mute_duration, lambda x: clamp(x, minv=1))
+        self._rsp_limiter = RateLimiter(capacity=self._rsp_maxSpamins, falloff=self._rsp_falloffRate,
+                                        ignore=self._rsp_mute_duration - 1,
+                                        cooldown=lambda points: int(self._rsp_maxSpamins / 2.0))
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -115,48 +120,30 @@ class Poweradminurt42Plugin(Poweradminurt41Plugin):
             return
 
         client = event.client
-        if client.var(self, 'radio_ignore_till', self.getTime()).value > self.getTime():
+        now = self.getTime()
+        slot = self._rsp_limiter.slot(client)
+        if self._rsp_limiter.isIgnored(slot, now):
             self.debug("ignoring radio event")
             return
 
         points = 0
         data = repr(event.data)
-        last_message_data = client.var(self, 'last_radio_data').value
-
-        now = self.getTime()
-        last_radio_time = client.var(self, 'last_radio_time', None).value
-        gap = None
-        if last_radio_time is not None:
-            gap = now - last_radio_time
+        gap = slot.gap(now)
+        if gap is not None:
             if gap < 20:
                 points += 1
             if gap < 2:
                 points += 1
-                if data == last_message_data:
+                if data == slot.lastData:
                     points += 3
             if gap < 1:
                 points += 3
 
-        spamins = client.var(self, 'radio_spamins', 0).value + points
-
-        # apply natural points decrease due to time
-        if gap is not None:
-            spamins -= int(gap / self._rsp_falloffRate)
-
-        if spamins < 1:
-            spamins = 0
-
-        # set new values
-        self.verbose("radio_spamins for %s : %s" % (client.name, spamins))
-        client.setvar(self, 'radio_spamins', spamins)
-        client.setvar(self, 'last_radio_time', now)
-        client.setvar(self, 'last_radio_data', data)
-
-        # should we warn ?
-        if spamins >= self._rsp_maxSpamins:
+        # should we mute ?
+        muted = self._rsp_limiter.add(slot, points, data, now)
+        self.verbose("radio_spamins for %s : %s" % (client.name, slot.points))
+        if muted:
             self.console.writelines(["mute %s %s" % (client.cid, self._rsp_mute_duration)])
-            client.setvar(self, 'radio_spamins', int(self._rsp_maxSpamins / 2.0))
-            client.setvar(self, 'radio_ignore_till', int(self.getTime() + self._rsp_mute_duration - 1))
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -31,6 +31,7 @@ import time
 import threading
 
 from b3 import functions
+from b3.checkpoint import LogCheckpoint
 from ConfigParser import NoOptionError
 
 try:
@@ -43,7 +44,7 @@ except ImportError, ee:
                  "paramiko from http://www.lag.net/paramiko/")
     raise ee
 
-__version__ = '1.3'
+__version__ = '1.5'
 __author__ = 'Courgette'
 
 
@@ -52,6 +53,7 @@ class SftpytailPlugin(b3.plugin.Plugin):
     requiresConfigFile = False
     default_connection_timeout = 30  # time (in sec) to wait before reconnecting after loosing FTP connection
     default_maxGap = 20480           # max gap in bytes between remote file and local file
+    read_block_size = 32768          # max amount of bytes read at once from the remote file (SFTP max request size)
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -74,7 +76,8 @@ class SftpytailPlugin(b3.plugin.Plugin):
         self._publicIp = None
         self._remoteFileOffset = None
         self._sftpdelay = 0.150
-        self.buffer = None
+        self._checkpoint = True  # save the remote file offset so that it can be resumed after a restart
+        self.checkpoint = None
         self.file = None
         self.lgame_log = None
         self.sftpconfig = None
@@ -141,6 +144,17 @@ class SftpytailPlugin(b3.plugin.Plugin):
             self.error('could not load settings/maxGapBytes config value: %s' % e)
             self.debug('using default value (%s) for settings/maxGapBytes' % self._maxGap)
 
+        try:
+            self._checkpoint = self.config.getboolean('settings', 'checkpoint')
+            self.debug('loaded settings/checkpoint: %s' % self._checkpoint)
+        except NoOptionError:
+            self.warning('could not find settings/checkpoint in config file, '
+                         'using default: %s' % self._checkpoint)
+        except ValueError, e:
+            self._checkpoint = True
+            self.error('could not load settings/checkpoint config value: %s' % e)
+            self.debug('using default value (%s) for settings/checkpoint' % self._checkpoint)
+
         try:
             self.known_hosts_file = self.config.getpath('settings', 'known_hosts_file')
             if not os.path.isfile(self.known_hosts_file):
@@ -184,13 +198,18 @@ class SftpytailPlugin(b3.plugin.Plugin):
         """
         def handle_download(block):
             self.verbose('received %s bytes' % len(block))
-            self._remoteFileOffset += len(block)
-            if self.buffer is None:
-                self.buffer = block
-            else:
-                self.buffer = self.buffer + block
+            # write blocks as they come: large gaps are never held in memory
+            data = self.checkpoint.feed(block)
+            if data:
+                self.file.write(data)
+
         transport = sftp = None
         rfile = None
+        self.checkpoint = LogCheckpoint('sftp://%s:%s%s' % (self.sftpconfig['host'], self.sftpconfig['port'],
+                                                           self.sftpconfig['path']),
+                                        self.lgame_log + '.checkpoint' if self._checkpoint else None)
+        if self._remoteFileOffset is not None:
+            self.checkpoint.reset(self._remoteFileOffset)
         self.file = open(self.lgame_log, 'ab')
         self.file.write('\r\n')
         self.file.write('B3 has been restarted\r\n')
@@ -209,28 +228,48 @@ class SftpytailPlugin(b3.plugin.Plugin):
                     self.critical(err)
                     raise err
                 if self._remoteFileOffset is None:
-                    self._remoteFileOffset = remotesize
+                    if self.checkpoint.load():
+                        self.info('resuming the remote file from offset %s' % self.checkpoint.offset)
+                        self._remoteFileOffset = self.checkpoint.offset
+                    else:
+                        self._remoteFileOffset = remotesize
+                        self.checkpoint.reset(remotesize)
                 if remotesize < self._remoteFileOffset:
                     self.debug("remote file rotation detected")
                     self._remoteFileOffset = 0
+                    self.checkpoint.reset(0)
                 if remotesize > self._remoteFileOffset:
                     if (remotesize - self._remoteFileOffset) > self._maxGap:
                         gap = remotesize - self._remoteFileOffset
                         self.verbose('gap between local and remote file too large (%s bytes)', gap)
                         self.verbose('downloading only the last %s bytes' % self._maxGap)
                         self._remoteFileOffset = remotesize - self._maxGap
+                        self.checkpoint.reset(self._remoteFileOffset)
                     #self.debug('RETR from remote offset %s. (expecting to read at least %s bytes)' % (
                     #           self._remoteFileOffset, remoteSize - self._remoteFileOffset))
                     if not rfile:
                         self.debug('opening remote game log file %s for reading' % self.sftpconfig['path'])
                         rfile = sftp.open(self.sftpconfig['path'], 'r')
-                    rfile.seek(self._remoteFileOffset)
-                    self.debug('reading remote game log file from offset %s' % self._remoteFileOffset)
-                    handle_download(rfile.read())
-                    if self.buffer:
-                        self.file.write(self.buffer)
-                        self.buffer = None
-                        self.file.flush()
+                    # start a few bytes before the offset to check the remote file was not rotated
+                    start = self.checkpoint.start()
+                    rfile.seek(start)
+                    self.debug('reading remote game log file from offset %s' % start)
+                    # read up to the size we got: what is appended meanwhile is read on the next cycle
+                    remaining = remotesize - start
+                    while remaining > 0:
+                        block = rfile.read(min(remaining, self.read_block_size))
+                        if not block:
+                            break
+                        remaining -= len(block)
+                        handle_download(block)
+                        if self.checkpoint.rotated:
+                            break
+                    self.file.flush()
+                    if self.checkpoint.rotated:
+                        self.debug("remote file rotation detected")
+                        self.checkpoint.reset(0)
+                    self._remoteFileOffset = self.checkpoint.offset
+                    self.save_checkpoint()
                     if self.console._paused:
                         self.console.unpause()
                         self.debug('Unpausing')
@@ -273,6 +312,8 @@ class SftpytailPlugin(b3.plugin.Plugin):
 
         self.verbose("B3 is down: stopping sFtpytail thread")
 
+        self.save_checkpoint(force=True)
+
         try:
             rfile.close()
         except IOError:
@@ -286,6 +327,16 @@ class SftpytailPlugin(b3.plugin.Plugin):
         except IOError:
             pass
     
+    def save_checkpoint(self, force=False):
+        """
+        Save the remote file offset.
+        :param force: Whether to save it even if it was saved less than a second ago
+        """
+        try:
+            self.checkpoint.save(force)
+        except (IOError, OSError), e:
+            self.warning('could not save the remote file offset: %s' % e)
+
     def sftpconnect(self):
         """
         Connect to the sFTP server.
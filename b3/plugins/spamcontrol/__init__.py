@@ -29,19 +29,36 @@ import re
 
 from b3.functions import getCmd
 from b3.functions import clamp
+from b3.ratelimit import RateLimiter
 
 __author__ = 'ThorN, Courgette'
-__version__ = '1.4.4'
+__version__ = '1.6'
 
 
 class SpamcontrolPlugin(b3.plugin.Plugin):
 
+    canVetoEvents = True
+
     _adminPlugin = None
 
     _maxSpamins = 10
     _modLevel = 20
     _falloffRate = 6.5
 
+    # spam points given to the different kinds of messages
+    _weights = {
+        'message': 1,           # any other message
+        'repeat': 3,            # the previous message repeated
+        'color': 2,             # a message starting with a color code
+        'color_repeat': 5,      # the previous message, starting with a color code, repeated
+        'quickmessage': 2,      # a QUICKMESSAGE_ message
+        'command': 1,           # added to commands (messages starting with '!')
+        'quick': 1,             # added to messages sent less than 2 seconds after the previous one
+        'callvote': 3,          # a callvote
+    }
+
+    _limiter = None
+
     ####################################################################################################################
     #                                                                                                                  #
     #    STARTUP                                                                                                       #
@@ -56,6 +73,13 @@ class SpamcontrolPlugin(b3.plugin.Plugin):
         self._modLevel = self.getSetting('settings', 'mod_level', b3.LEVEL, self._modLevel)
         self._falloffRate = self.getSetting('settings', 'falloff_rate', b3.FLOAT, self._falloffRate)
 
+        weights = dict(self._weights)
+        for name in sorted(weights):
+            weights[name] = self.getSetting('weights', name, b3.INTEGER, weights[name], lambda x: clamp(x, minv=0))
+        self._weights = weights
+
+        self._limiter = RateLimiter(capacity=self._maxSpamins, falloff=self._falloffRate, ignore=2)
+
     def onStartup(self):
         """
         Initialize the plugin.
@@ -64,6 +88,9 @@ class SpamcontrolPlugin(b3.plugin.Plugin):
         self.registerEvent('EVT_CLIENT_SAY', self.onChat)
         self.registerEvent('EVT_CLIENT_TEAM_SAY', self.onChat)
         self.registerEvent('EVT_CLIENT_PRIVATE_SAY', self.onChat)
+        self.registerEvent('EVT_CLIENT_DISCONNECT', self.onDisconnect)
+        if self.console.getEventID('EVT_CLIENT_CALLVOTE'):
+            self.registerEvent('EVT_CLIENT_CALLVOTE', self.onCallvote)
 
         self._adminPlugin = self.console.getPlugin('admin')
 
@@ -97,35 +124,18 @@ class SpamcontrolPlugin(b3.plugin.Plugin):
         Add spam points to the given client.
         """
         now = self.getTime()
-        if client.var(self, 'ignore_till', now).value > now:
+        slot = self._limiter.slot(client)
+        if self._limiter.isIgnored(slot, now):
             # ignore the user
             raise b3.events.VetoEvent
 
-        last_message_time = client.var(self, 'last_message_time', now).value
-        gap = now - last_message_time
-
-        if gap < 2:
-            points += 1
-
-        spamins = client.var(self, 'spamins', 0).value + points
-
-        # apply natural points decrease due to time
-        spamins -= int(gap / self._falloffRate)
-
-        if spamins < 1:
-            spamins = 0
-
-        # set new values
-        client.setvar(self, 'spamins', spamins)
-        client.setvar(self, 'last_message_time', now)
-        client.setvar(self, 'last_message', text)
+        gap = slot.gap(now)
+        if gap is None or gap < 2:
+            points += self._weights['quick']
 
         # should we warn ?
-        if spamins >= self._maxSpamins:
-            client.setvar(self, 'ignore_till', now + 2)
+        if self._limiter.add(slot, points, text, now):
             self._adminPlugin.warnClient(client, 'spam')
-            spamins = int(spamins / 1.5)
-            client.setvar(self, 'spamins', spamins)
             raise b3.events.VetoEvent
 
     ####################################################################################################################
@@ -141,27 +151,47 @@ class SpamcontrolPlugin(b3.plugin.Plugin):
         if not event.client or event.client.maxLevel >= self._modLevel:
             return
 
-        points = 0
         client = event.client
         text = event.data
-        last_message = client.var(self, 'last_message').value
-        color = re.match(r'\^[0-9]', event.data)
-        if color and text == last_message:
-            points += 5
-        elif text == last_message:
-            points += 3
+        repeat = text == self._limiter.slot(client).lastData
+        color = re.match(r'\^[0-9]', text)
+        if color and repeat:
+            points = self._weights['color_repeat']
+        elif repeat:
+            points = self._weights['repeat']
         elif color:
-            points += 2
+            points = self._weights['color']
         elif text.startswith('QUICKMESSAGE_'):
-            points += 2
+            points = self._weights['quickmessage']
         else:
-            points += 1
+            points = self._weights['message']
 
         if text[:1] == '!':
-            points += 1
+            points += self._weights['command']
 
         self.add_spam_points(client, points, text)
 
+    def onCallvote(self, event):
+        """
+        Handle EVT_CLIENT_CALLVOTE
+        """
+        if not event.client or event.client.maxLevel >= self._modLevel:
+            return
+
+        try:
+            self.add_spam_points(event.client, self._weights['callvote'], event.data)
+        except b3.events.VetoEvent:
+            # stop the vote called by the spammer
+            self.console.write('veto')
+            raise
+
+    def onDisconnect(self, event):
+        """
+        Handle EVT_CLIENT_DISCONNECT
+        """
+        if event.client:
+            self._limiter.forget(event.client)
+
     ####################################################################################################################
     #                                                                                                                  #
     #    COMMANDS                                                                                                      #
@@ -183,13 +213,7 @@ class SpamcontrolPlugin(b3.plugin.Plugin):
             cmd.sayLoudOrPM(client, '%s ^7is too cool to spam' % sclient.exactName)
         else:
             now = self.getTime()
-            last_message_time = sclient.var(self, 'last_message_time', now).value
-            gap = now - last_message_time
-
-            msmin = smin = sclient.var(self, 'spamins', 0).value
-            smin -= int(gap / self._falloffRate)
-
-            if smin < 1:
-                smin = 0
-
+            slot = self._limiter.slot(sclient)
+            msmin = slot.points
+            smin = self._limiter.getPoints(slot, now)
             cmd.sayLoudOrPM(client, '%s ^7currently has %s spamins, peak was %s' % (sclient.exactName, smin, msmin))
\ No newline at end of file
@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__ = 'xlr8or & ttlogic'
-__version__ = '3.0.0-beta.17'
+__version__ = '3.0.0-beta.22'
 
 import b3
 import b3.events
@@ -41,6 +41,7 @@ import urllib2
 from b3.functions import escape
 from b3.functions import getCmd
 from b3.functions import right_cut
+from collections import OrderedDict
 from ConfigParser import NoOptionError
 
 KILLER = "killer"
@@ -107,8 +108,14 @@ class XlrstatsPlugin(b3.plugin.Plugin):
     provisional_ranking = True          # First Kswitch_confrontations will not alter opponents stats (unless both are under the limit)
     auto_correct = True                 # Auto correct skill points every two hours to maintain a healthy pool
     _auto_correct_ignore_days = 60      # How many days before ignoring a players skill in the auto-correct calculation
+    _skillpool_rebuild_hours = 24       # Hours after which the skill pool aggregates are computed again from the database
     auto_purge = False                  # Purge players and associated data automatically (cannot be undone!)
     _purge_player_days = 365            # Number of days after which players will be auto-purged
+    _purge_chunk_size = 500             # Maximum number of players (or history records) deleted at once when purging
+    _purge_chunk_pause = 0.1            # Seconds to wait between two purge chunks (lets the other queries through)
+    flush_interval = 10                 # Seconds updated stats are kept in memory before being written (0 = write immediately)
+    _flush_max_rows = 100               # Maximum number of records updated by a single query when flushing stats
+    cache_size = 5000                   # Maximum number of stat objects kept in the cache (0 = no cache)
 
     # keep some private map data to detect prematches and restarts
     _last_map = None
@@ -125,6 +132,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
     playermaps_table = 'xlr_playermaps'
     actionstats_table = 'xlr_actionstats'
     playeractions_table = 'xlr_playeractions'
+    skillpool_table = 'xlr_skillpool'
     clients_table = 'clients'
     penalties_table = 'penalties'
     # default tablenames for the history subplugin
@@ -159,6 +167,11 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         self._ctimePlugin = None
         self._xlrstatstables = []           # will contain a list of the xlrstats database tables
         self._cronTabCorrectStats = None
+        self._cronTabFlush = None
+        self._pending = {}                  # updated stat objects waiting to be written (write-behind)
+        self._cache = StatsCache()          # recently used stat objects
+        self._skillpool = SkillPool()       # skill aggregates of the active players pool
+        self._stats_lock = threading.Lock() # guards the pending stat objects and the cache
         self.query = None                   # shortcut to the storage.query function
         b3.plugin.Plugin.__init__(self, console, config)
 
@@ -201,11 +214,14 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         PlayerActions._table = self.playeractions_table
 
         # register the events we're interested in.
+        self.registerEvent('EVT_CLIENT_AUTH', self.onAuth)
+        self.registerEvent('EVT_CLIENT_DISCONNECT', self.onDisconnect)
         self.registerEvent('EVT_CLIENT_JOIN', self.onJoin)
         self.registerEvent('EVT_CLIENT_KILL', self.onKill)
         self.registerEvent('EVT_CLIENT_KILL_TEAM', self.onTeamKill)
         self.registerEvent('EVT_CLIENT_SUICIDE', self.onSuicide)
         self.registerEvent('EVT_GAME_ROUND_START', self.onRoundStart)
+        self.registerEvent('EVT_GAME_ROUND_END', self.onRoundEnd)
         self.registerEvent('EVT_CLIENT_ACTION', self.onAction)       # for game-events/actions
         self.registerEvent('EVT_CLIENT_DAMAGE', self.onDamage)       # for assist recognition
 
@@ -253,7 +269,13 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         else:
             self.debug('no webfront url available: using default')
 
+        # write the updated stats in batches
+        if self.flush_interval:
+            self._cronTabFlush = b3.cron.PluginCronTab(self, self.flush_Stats, '*/%s' % self.flush_interval)
+            self.console.cron + self._cronTabFlush
+
         # Analyze the ELO pool of points
+        self.load_SkillPool()
         self.correctStats()
         self._cronTabCorrectStats = b3.cron.PluginCronTab(self, self.correctStats, 0, '0', '*/2')
         self.console.cron + self._cronTabCorrectStats
@@ -275,9 +297,11 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         #p.onStartup()
 
         # get the map we're in, in case this is a new map and we need to create a db record for it.
-        mapstats = self.get_MapStats(self.console.game.mapName)
-        if mapstats:
-            self.verbose('map %s ready' % mapstats.name)
+        # the map may be unknown yet (i.e: when replaying a game log file): its record will be created on round start
+        if self.console.game.mapName:
+            mapstats = self.get_MapStats(self.console.game.mapName)
+            if mapstats:
+                self.verbose('map %s ready' % mapstats.name)
 
         # check number of online players (if available)
         self.checkMinPlayers()
@@ -320,6 +344,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         self.prematch_maxtime = self.getSetting('settings', 'prematch_maxtime', b3.INT, self.prematch_maxtime)
         self.announce = self.getSetting('settings', 'announce', b3.BOOL, self.announce)
         self.keep_time = self.getSetting('settings', 'keep_time', b3.BOOL, self.keep_time)
+        self.flush_interval = self.getSetting('settings', 'flush_interval', b3.INT, self.flush_interval,
+                                              lambda x: int(min(max(x, 0), 59)))
+        self.cache_size = self.getSetting('settings', 'cache_size', b3.INT, self.cache_size, lambda x: int(max(x, 0)))
+        self._cache.size = self.cache_size
 
         # load custom table names
         self.load_config_tables()
@@ -405,6 +433,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         load_conf('mapstats_table', 'mapstats')
         load_conf('playermaps_table', 'playermaps')
         load_conf('playeractions_table', 'playeractions')
+        load_conf('skillpool_table', 'skillpool')
         load_conf('history_monthly_table', 'history_monthly')
         load_conf('history_weekly_table', 'history_weekly')
         load_conf('ctime_table', 'ctime')
@@ -415,6 +444,21 @@ class XlrstatsPlugin(b3.plugin.Plugin):
     #                                                                                                                  #
     ####################################################################################################################
 
+    def onAuth(self, event):
+        """
+        Handle EVT_CLIENT_AUTH
+        """
+        if event.client and event.client.id and self.cache_size:
+            self.cache_Player(event.client)
+
+    def onDisconnect(self, event):
+        """
+        Handle EVT_CLIENT_DISCONNECT
+        """
+        if event.client and event.client.id:
+            with self._stats_lock:
+                self._cache.evictPlayer(event.client.id)
+
     def onJoin(self, event):
         """
         Handle EVT_CLIENT_JOIN
@@ -461,6 +505,12 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         self.checkMinPlayers(_roundstart=True)
         self.roundstart()
 
+    def onRoundEnd(self, _):
+        """
+        Handle EVT_GAME_ROUND_END
+        """
+        self.flush_Stats()
+
     def onAction(self, event):
         """
         Handle EVT_CLIENT_ACTION
@@ -468,6 +518,24 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         if self._xlrstats_active:
             self.action(event.client, event.data)
 
+    def onDisable(self):
+        """
+        Called when the plugin is disabled.
+        """
+        self.flush_Stats()
+
+    def onStop(self, event):
+        """
+        Handle EVT_STOP
+        """
+        self.flush_Stats()
+
+    def onExit(self, event):
+        """
+        Handle EVT_EXIT
+        """
+        self.flush_Stats()
+
     ####################################################################################################################
     #                                                                                                                  #
     #    OTHER METHODS                                                                                                 #
@@ -534,6 +602,12 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         else:
             client_id = client.id
 
+        s = self.get_CachedStat(PlayerStats, client_id)
+        if s:
+            # the number of confrontations may have reached the threshold since the record was cached
+            s.Kfactor = self.get_Kfactor(s)
+            return s
+
         q = """SELECT * from %s WHERE client_id = %s LIMIT 1""" % (self.playerstats_table, client_id)
         cursor = self.query(q)
         if cursor and not cursor.EOF:
@@ -542,10 +616,6 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.id = r['id']
             s.client_id = r['client_id']
             s.kills = r['kills']
-            if (s.kills + s.deaths) > self.Kswitch_confrontations:
-                s.Kfactor = self.Kfactor_low
-            else:
-                s.Kfactor = self.Kfactor_high
             s.deaths = r['deaths']
             s.teamkills = r['teamkills']
             s.teamdeaths = r['teamdeaths']
@@ -561,6 +631,9 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.hide = r['hide']
             s.fixed_name = r['fixed_name']
             s.id_token = r['id_token']
+            s.Kfactor = self.get_Kfactor(s)
+            s._pooled = self.get_PooledSkill(s) if self.is_InSkillPool(client, s) else None
+            self.cache_Stat(s)
             return s
         elif (client is None) or (client.maxLevel >= self.minlevel):
             s = PlayerStats()
@@ -572,10 +645,54 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         else:
             return None
 
+    def get_Kfactor(self, playerstats):
+        """
+        Return the K-factor to apply to the given player (lower once the player had enough confrontations).
+        """
+        if (playerstats.kills + playerstats.deaths) > self.Kswitch_confrontations:
+            return self.Kfactor_low
+        return self.Kfactor_high
+
+    def get_PooledSkill(self, playerstats):
+        """
+        Return the skill the given player adds to the active pool (None if the player is not part of the pool).
+        Players are removed from the pool because of inactivity only when the pool is rebuilt.
+        """
+        if playerstats.client_id == self._world_clientid:
+            return None
+        if (playerstats.kills + playerstats.deaths) <= self.Kswitch_confrontations:
+            return None
+        return playerstats.skill
+
+    def is_InSkillPool(self, client, playerstats):
+        """
+        Tell whether the skill of the given player, as loaded from the database, is accounted in the active pool.
+        The pool holds the players active within _auto_correct_ignore_days of its last build, plus the ones who
+        joined it since: anyone else is added back to the pool the next time their stats are saved.
+        """
+        if client is None or self.get_PooledSkill(playerstats) is None:
+            return False
+        with self._stats_lock:
+            pool = self._skillpool
+            if not pool.time_rebuilt:
+                return False
+            if playerstats.client_id in pool.joined:
+                return True
+            if client.lastVisit and int(client.timeEdit) > pool.time_rebuilt:
+                # connected since the pool was built: what matters is the activity before this connection
+                last_active = client.lastVisit
+            else:
+                last_active = client.timeEdit
+            return pool.time_rebuilt - int(last_active) <= self._auto_correct_ignore_days * 86400
+
     def get_PlayerAnon(self):
         return self.get_PlayerStats(None)
 
     def get_WeaponStats(self, name):
+        s = self.get_CachedStat(WeaponStats, name)
+        if s:
+            return s
+
         s = WeaponStats()
         q = """SELECT * from %s WHERE name = '%s' LIMIT 1""" % (self.weaponstats_table, name)
         cursor = self.query(q)
@@ -586,6 +703,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.kills = r['kills']
             s.suicides = r['suicides']
             s.teamkills = r['teamkills']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -593,6 +711,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_Bodypart(self, name):
+        s = self.get_CachedStat(Bodyparts, name)
+        if s:
+            return s
+
         s = Bodyparts()
         q = """SELECT * from %s WHERE name = '%s' LIMIT 1""" % (self.bodyparts_table, name)
         cursor = self.query(q)
@@ -603,6 +725,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.kills = r['kills']
             s.suicides = r['suicides']
             s.teamkills = r['teamkills']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -611,6 +734,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
 
     def get_MapStats(self, name):
         assert name is not None
+        s = self.get_CachedStat(MapStats, name)
+        if s:
+            return s
+
         s = MapStats()
         q = """SELECT * from %s WHERE name = '%s' LIMIT 1""" % (self.mapstats_table, name)
         cursor = self.query(q)
@@ -622,6 +749,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.suicides = r['suicides']
             s.teamkills = r['teamkills']
             s.rounds = r['rounds']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -629,6 +757,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_WeaponUsage(self, weaponid, playerid):
+        s = self.get_CachedStat(WeaponUsage, weaponid, playerid)
+        if s:
+            return s
+
         s = WeaponUsage()
         q = """SELECT * from %s WHERE weapon_id = %s AND player_id = %s LIMIT 1""" % (self.weaponusage_table, weaponid, playerid)
         cursor = self.query(q)
@@ -642,6 +774,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.suicides = r['suicides']
             s.teamkills = r['teamkills']
             s.teamdeaths = r['teamdeaths']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -650,6 +783,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_Opponent(self, killerid, targetid):
+        s = self.get_CachedStat(Opponents, killerid, targetid)
+        if s:
+            return s
+
         s = Opponents()
         q = """SELECT * from %s WHERE killer_id = %s AND target_id = %s LIMIT 1""" % (self.opponents_table, killerid, targetid)
         cursor = self.query(q)
@@ -660,6 +797,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.target_id = r['target_id']
             s.kills = r['kills']
             s.retals = r['retals']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -668,6 +806,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_PlayerBody(self, playerid, bodypartid):
+        s = self.get_CachedStat(PlayerBody, bodypartid, playerid)
+        if s:
+            return s
+
         s = PlayerBody()
         q = """SELECT * from %s WHERE bodypart_id = %s AND player_id = %s LIMIT 1""" % (self.playerbody_table, bodypartid, playerid)
         cursor = self.query(q)
@@ -681,6 +823,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.suicides = r['suicides']
             s.teamkills = r['teamkills']
             s.teamdeaths = r['teamdeaths']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -701,6 +844,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             else:
                 return None
 
+        s = self.get_CachedStat(PlayerMaps, mapid, playerid)
+        if s:
+            return s
+
         s = PlayerMaps()
         q = """SELECT * from %s WHERE map_id = %s AND player_id = %s LIMIT 1""" % (self.playermaps_table, mapid, playerid)
         cursor = self.query(q)
@@ -715,6 +862,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.teamkills = r['teamkills']
             s.teamdeaths = r['teamdeaths']
             s.rounds = r['rounds']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -723,6 +871,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_ActionStats(self, name):
+        s = self.get_CachedStat(ActionStats, name)
+        if s:
+            return s
+
         s = ActionStats()
         q = """SELECT * from %s WHERE name = '%s' LIMIT 1""" % (self.actionstats_table, name)
         cursor = self.query(q)
@@ -731,6 +883,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.id = r['id']
             s.name = r['name']
             s.count = r['count']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -738,6 +891,10 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             return s
 
     def get_PlayerActions(self, playerid, actionid):
+        s = self.get_CachedStat(PlayerActions, actionid, playerid)
+        if s:
+            return s
+
         s = PlayerActions()
         q = """SELECT * from %s WHERE action_id = %s AND player_id = %s LIMIT 1""" % (self.playeractions_table, actionid, playerid)
         cursor = self.query(q)
@@ -747,6 +904,7 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.player_id = r['player_id']
             s.action_id = r['action_id']
             s.count = r['count']
+            self.cache_Stat(s)
             return s
         else:
             s._new = True
@@ -754,27 +912,208 @@ class XlrstatsPlugin(b3.plugin.Plugin):
             s.action_id = actionid
             return s
 
+    def get_CachedStat(self, stat_class, *key):
+        """
+        Return a copy of the stat object waiting to be written (or cached) for the given key.
+        :param stat_class: The class of the stat object
+        :param key: The values of the fields identifying the stat object (see StatObject._keys)
+        :return: The stat object or None if it has to be read from the database
+        """
+        key = (stat_class,) + key
+        with self._stats_lock:
+            stat = self._pending.get(key) or self._cache.get(key)
+            return stat._copy() if stat else None
+
+    def cache_Stat(self, stat):
+        """
+        Keep a copy of the given stat object in the cache.
+        A stat object waiting to be written is more recent than the one read from the database: it's cached instead.
+        :param stat: The stat object
+        """
+        if self.cache_size and stat._keys and stat.id:
+            with self._stats_lock:
+                pending = self._pending.get(stat._key())
+                self._cache.put(pending if pending is not None else stat._copy())
+
+    def cache_Player(self, client):
+        """
+        Load the records of the given client (and those involving the other connected players) in the cache.
+        :param client: The client whose stats have to be cached
+        """
+        playerstats = self.get_PlayerStats(client)
+        if not playerstats or hasattr(playerstats, '_new'):
+            return
+
+        playerid = playerstats.id
+        queries = [(WeaponUsage, """SELECT * FROM %s WHERE player_id = %s""" % (self.weaponusage_table, playerid)),
+                   (PlayerBody, """SELECT * FROM %s WHERE player_id = %s""" % (self.playerbody_table, playerid)),
+                   (PlayerActions, """SELECT * FROM %s WHERE player_id = %s""" % (self.playeractions_table, playerid))]
+
+        if self.console.game.mapName:
+            mapstats = self.get_MapStats(self.console.game.mapName)
+            if mapstats and mapstats.id:
+                queries.append((PlayerMaps, """SELECT * FROM %s WHERE player_id = %s AND map_id = %s""" % (
+                                self.playermaps_table, playerid, mapstats.id)))
+
+        with self._stats_lock:
+            others = [self._cache.peek((PlayerStats, c.id)) for c in self.console.clients.getList() if c.id != client.id]
+        others = ', '.join(str(p.id) for p in others if p)
+        if others:
+            queries.append((Opponents, """SELECT * FROM %s WHERE (killer_id = %s AND target_id IN (%s))
+                                          OR (target_id = %s AND killer_id IN (%s))""" % (
+                            self.opponents_table, playerid, others, playerid, others)))
+
+        for stat_class, q in queries:
+            cursor = self.query(q)
+            while not cursor.EOF:
+                self.cache_Stat(stat_class._fromrow(cursor.getRow()))
+                cursor.moveNext()
+            cursor.close()
+
     def save_Stat(self, stat):
-        #self.verbose('*----> XLRstats: saving statistics for %s' % type(stat))
-        #self.verbose('*----> Contents: %s' %stat)
+        """
+        Save a stat object in the database.
+        New records are inserted immediately since their id is needed right away: updates are kept in memory
+        and written in batches by flush_Stats (unless the write-behind is disabled by setting flush_interval to 0).
+        :param stat: The stat object to save
+        """
+        if isinstance(stat, PlayerStats):
+            pooled = self.get_PooledSkill(stat)
+            if pooled != stat._pooled:
+                with self._stats_lock:
+                    if stat._pooled is None:
+                        self._skillpool.joined.add(stat.client_id)
+                    self._skillpool.replace(stat._pooled, pooled)
+                stat._pooled = pooled
+
         if hasattr(stat, '_new'):
             q = stat._insertquery()
-            #self.debug('Inserting using: %r', q)
             cursor = self.query(q)
             if cursor.rowcount > 0:
                 stat.id = cursor.lastrowid
                 delattr(stat, '_new')
+                self.cache_Stat(stat)
+        elif self.flush_interval and stat._keys and stat.id:
+            # a copy is kept so later changes to the given object are not written unless it's saved again
+            with self._stats_lock:
+                stat = stat._copy()
+                self._pending[stat._key()] = stat
+                if self.cache_size:
+                    self._cache.put(stat)
         else:
             q = stat._updatequery()
-            #self.debug('Updating using: %r', q)
             self.query(q)
+            self.cache_Stat(stat)
 
-        #print 'save_Stat: q= ', q
-        #self.query(q)
         # we could not really do anything with error checking on saving.
         # If it fails, that's just bad luck.
         return
 
+    def clear_Cache(self):
+        """
+        Empty the cache: needed when the stored records are modified without using save_Stat.
+        """
+        with self._stats_lock:
+            self._cache.clear()
+
+    def load_SkillPool(self):
+        """
+        Load the skill aggregates of the active players pool stored in the database.
+        """
+        cursor = self.query("""SELECT * FROM %s WHERE id = 1""" % self.skillpool_table)
+        if cursor.EOF:
+            cursor.close()
+            # the aggregates will be computed by the next correctStats run
+            self.query("""INSERT INTO %s (id) VALUES (1)""" % self.skillpool_table)
+            pool = SkillPool()
+        else:
+            r = cursor.getRow()
+            cursor.close()
+            pool = SkillPool(r['players'], r['sum_skill'], r['max_skill'], r['min_skill'], r['time_rebuilt'])
+
+        with self._stats_lock:
+            self._skillpool = pool
+
+    def save_SkillPool(self):
+        """
+        Store the skill aggregates of the active players pool if they changed.
+        """
+        with self._stats_lock:
+            pool = self._skillpool
+            if not pool.changed:
+                return
+            pool.changed = False
+            q = """UPDATE %s SET players=%s, sum_skill=%s, max_skill=%s, min_skill=%s, time_rebuilt=%s, time_edit=%s
+                   WHERE id = 1""" % (self.skillpool_table, pool.players, sqlvalue(pool.sum_skill),
+                                       sqlvalue(pool.max_skill), sqlvalue(pool.min_skill), pool.time_rebuilt,
+                                       int(time.time()))
+        self.query(q)
+
+    def build_SkillPool(self):
+        """
+        Compute the skill aggregates of the active players pool from the database.
+        This also drops the players who left the pool because of inactivity since the last time it was built.
+        """
+        _seconds = self._auto_correct_ignore_days * 86400
+        q = """SELECT MAX(%s.skill) AS max_skill, MIN(%s.skill) AS min_skill, SUM(%s.skill) AS sum_skill,
+               COUNT(%s.id) AS cnt
+               FROM %s, %s
+               WHERE %s.id = %s.client_id
+               AND %s.client_id <> %s
+               AND (%s.kills + %s.deaths) > %s
+               AND %s - %s.time_edit <= %s""" \
+               % (self.playerstats_table, self.playerstats_table, self.playerstats_table, self.playerstats_table,
+                  self.playerstats_table, self.clients_table,
+                  self.clients_table, self.playerstats_table,
+                  self.playerstats_table, self._world_clientid,
+                  self.playerstats_table, self.playerstats_table, self.Kswitch_confrontations,
+                  int(time.time()), self.clients_table, _seconds)
+
+        self.debug('building the skill pool')
+        start = time.time()
+        # no skill can change until the new aggregates are in place
+        with self._stats_lock:
+            self._flush_Pending()
+            r = self.query(q).getRow()
+            self._skillpool = SkillPool(r['cnt'], r['sum_skill'] or 0.0, r['max_skill'], r['min_skill'],
+                                        int(time.time()))
+            self._skillpool.changed = True
+
+        self.verbose('skill pool built in %.3f seconds', time.time() - start)
+        self.save_SkillPool()
+
+    def flush_Stats(self):
+        """
+        Write the updated stat objects kept in memory: updates are grouped by table into multi-row UPDATE queries.
+        """
+        self.save_SkillPool()
+        # the lock is held while writing so no stale record can be read from the database meanwhile
+        with self._stats_lock:
+            self._flush_Pending()
+
+    def _flush_Pending(self):
+        """
+        Write the updated stat objects kept in memory (the caller must hold the stats lock).
+        """
+        if not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = {}
+        bytable = {}
+        for stat in pending.itervalues():
+            bytable.setdefault(stat.__class__, []).append(stat)
+
+        start = time.time()
+        for stat_class, stats in bytable.iteritems():
+            for i in range(0, len(stats), self._flush_max_rows):
+                try:
+                    self.query(stat_class._updatemanyquery(stats[i:i + self._flush_max_rows]))
+                except Exception, msg:
+                    self.error('could not write %s stats: %s', stat_class._table, msg)
+
+        self.verbose('written %s updated stats in %.3f seconds', len(pending), time.time() - start)
+
     def check_Assists(self, client, target, data, etype=None):
         # determine eventual assists // an assist only counts if damage was done within # secs. before death
         # it will also punish teammates that have a 'negative' assist!
@@ -1509,14 +1848,9 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         # make sure _max and _diff are floating numbers (may be redundant)
         _oldkillbonus = self.kill_bonus
 
-        # querymax skill from players active in the last 20 days
-        seconds = 20 * 86400
-        q = """SELECT %s.time_edit, MAX(%s.skill) AS max_skill FROM %s, %s WHERE %s - %s.time_edit <= %s""" % (
-            self.clients_table, self.playerstats_table, self.clients_table, self.playerstats_table, int(time.time()),
-            self.clients_table, seconds)
-        cursor = self.query(q)
-        r = cursor.getRow()
-        _max = r['max_skill']
+        # max skill of the active players pool
+        with self._stats_lock:
+            _max = self._skillpool.max_skill
         if _max is None:
             _max = self.defaultskill
         _max = float(_max)
@@ -1539,25 +1873,13 @@ class XlrstatsPlugin(b3.plugin.Plugin):
 
     def correctStats(self):
         self.debug('gathering XLRstats statistics')
-        _seconds = self._auto_correct_ignore_days * 86400
-        q = """SELECT MAX(%s.skill) AS max_skill, MIN(%s.skill) AS min_skill, SUM(%s.skill) AS sum_skill,
-               AVG(%s.skill) AS avg_skill , COUNT(%s.id) AS cnt
-               FROM %s, %s
-               WHERE %s.id = %s.client_id
-               AND %s.client_id <> %s
-               AND (%s.kills + %s.deaths) > %s
-               AND %s - %s.time_edit <= %s""" \
-               % (self.playerstats_table, self.playerstats_table, self.playerstats_table,
-                  self.playerstats_table, self.playerstats_table,
-                  self.playerstats_table, self.clients_table,
-                  self.clients_table, self.playerstats_table,
-                  self.playerstats_table, self._world_clientid,
-                  self.playerstats_table, self.playerstats_table, self.Kswitch_confrontations,
-                  int(time.time()), self.clients_table, _seconds)
+        if time.time() - self._skillpool.time_rebuilt > self._skillpool_rebuild_hours * 3600:
+            self.build_SkillPool()
 
-        cursor = self.query(q)
-        # self.verbose(q)
-        r = cursor.getRow()
+        with self._stats_lock:
+            pool = self._skillpool
+            r = {'cnt': pool.players, 'sum_skill': pool.sum_skill, 'max_skill': pool.max_skill,
+                 'min_skill': pool.min_skill, 'avg_skill': pool.average()}
 
         if r['cnt'] == 0:
             return None
@@ -1597,35 +1919,43 @@ class XlrstatsPlugin(b3.plugin.Plugin):
 
         if self.auto_correct and round(_correction_factor, _factor_decimals) < 1:
             self.debug('correcting overall skill with factor %s...' % round(_correction_factor, _factor_decimals))
-            self.query("""UPDATE %s SET skill=(SELECT skill * %s ) WHERE %s.client_id <> %s""" % (
-                       self.playerstats_table, _correction_factor, self.playerstats_table, self._world_clientid))
+            with self._stats_lock:
+                self._flush_Pending()
+                self.query("""UPDATE %s SET skill=(SELECT skill * %s ) WHERE %s.client_id <> %s""" % (
+                           self.playerstats_table, _correction_factor, self.playerstats_table, self._world_clientid))
+                self._skillpool.scale(_correction_factor)
+                self._cache.clear()
+            self.save_SkillPool()
 
     def purgePlayers(self):
         if not self.auto_purge:
             return None
 
         self.debug('purgin players who haven\'t been online for %s days...', self._purge_player_days)
+        self.flush_Stats()
 
         # find players who haven't been online for a long time
         _seconds = self._purge_player_days * 86400
-        q = """SELECT %s.id, %s.time_edit, %s.client_id, %s.id as player_id FROM %s, %s
-               WHERE %s.id = %s.client_id
-               AND %s - %s.time_edit > %s""" % (
-               self.clients_table, self.clients_table, self.playerstats_table, self.playerstats_table,
-               self.clients_table, self.playerstats_table, self.clients_table, self.playerstats_table,
-               int(time.time()), self.clients_table, _seconds)
-
-        cursor = self.query(q)
-        if cursor and not cursor.EOF:
-            while not cursor.EOF:
-                r = cursor.getRow()
-                self.verbose(r)
-                self.purgePlayerStats(r['player_id'])
-                self.purgeAssociated(self.playeractions_table, r['player_id'])
-                self.purgeAssociated(self.playerbody_table, r['player_id'])
-                self.purgeAssociated(self.playermaps_table, r['player_id'])
-                self.purgeAssociated(self.weaponusage_table, r['player_id'])
-                cursor.moveNext()
+        select = """SELECT %s.id FROM %s, %s
+                    WHERE %s.id = %s.client_id
+                    AND %s - %s.time_edit > %s
+                    AND %s.id > %%(last)s ORDER BY %s.id LIMIT %%(limit)s""" % (
+                    self.playerstats_table, self.clients_table, self.playerstats_table,
+                    self.clients_table, self.playerstats_table,
+                    int(time.time()), self.clients_table, _seconds,
+                    self.playerstats_table, self.playerstats_table)
+
+        # associated records first: players whose records could not all be deleted will be found again next time
+        deletes = ["""DELETE FROM %s WHERE player_id IN (%%(ids)s)""" % table
+                   for table in (self.playeractions_table, self.playerbody_table, self.playermaps_table,
+                                 self.weaponusage_table)]
+        deletes.append("""DELETE FROM %s WHERE killer_id IN (%%(ids)s) OR target_id IN (%%(ids)s)""" %
+                       self.opponents_table)
+        deletes.append("""DELETE FROM %s WHERE id IN (%%(ids)s)""" % self.playerstats_table)
+
+        purge = BulkPurge(self, self._purge_chunk_size, self._purge_chunk_pause)
+        if purge.run('players', select, deletes):
+            self.clear_Cache()
 
     def purgePlayerStats(self, _id):
         self.query("""DELETE FROM %s WHERE id = %s""" % (self.playerstats_table, _id))
@@ -1688,6 +2018,9 @@ class XlrstatsPlugin(b3.plugin.Plugin):
                 if limit > 10:
                     limit = 10
 
+        # make sure the latest kills are taken into account
+        self.flush_Stats()
+
         q = 'SELECT %s.name, %s.time_edit, %s.id, kills, deaths, ratio, skill, winstreak, losestreak, rounds, fixed_name, ip \
              FROM %s, %s \
                  WHERE (%s.id = %s.client_id) \
@@ -1816,6 +2149,13 @@ class XlrstatsPlugin(b3.plugin.Plugin):
         client.message('^3auto_correct: %s, auto_purge: %s, k_b: %s, as_b: %s, ac_b: %s' %
                        (self.auto_correct, self.auto_purge, self.kill_bonus, self.assist_bonus, self.action_bonus))
 
+        if self.cache_size:
+            with self._stats_lock:
+                status = (len(self._cache), self._cache.size, self._cache.hitRate() * 100,
+                          self._cache.hits, self._cache.misses)
+            # do not hold the lock while talking to the game server
+            client.message('^3cache: %s/%s records, hit rate: %.1f%% (%s hits, %s misses)', *status)
+
     def cmd_xlrinit(self, data, client, cmd=None):
         """
         - initialize XLRstats database schema (!!!will remove all the collected stats!!!)
@@ -1834,8 +2174,13 @@ class XlrstatsPlugin(b3.plugin.Plugin):
                 self.info('inizializing table: %s', table)
                 self.console.storage.truncateTable(table)
 
+        with self._stats_lock:
+            self._pending = {}
+        self.clear_Cache()
+
         # eventually rebuild missing tables
         self.build_database_schema()
+        self.load_SkillPool()
         client.message('^3XLRstats database schema initialized')
 
 ########################################################################################################################
@@ -1916,6 +2261,8 @@ class XlrstatshistoryPlugin(b3.plugin.Plugin):
     _max_weeks = 12
     _hours = 5
     _minutes = 10
+    _purge_chunk_size = 500
+    _purge_chunk_pause = 0.1
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -2030,9 +2377,8 @@ class XlrstatshistoryPlugin(b3.plugin.Plugin):
             _yearPrev = int(_year)-1
         else:
             _yearPrev = int(_year)
-        q = """DELETE FROM %s WHERE (month < %s AND year <= %s) OR year < %s""" % (self.history_monthly_table, _month, _year, _yearPrev)
-        self.debug(u'QUERY: %s ' % q)
-        self.console.storage.query(q)
+        self.purgeTable(self.history_monthly_table, """(month < %s AND year <= %s) OR year < %s""" % (
+                        _month, _year, _yearPrev))
         # purge the weeks table
         if not self._max_weeks or self._max_weeks == 0:
             self.warning(u'max_weeks is invalid [%s]' % self._max_weeks)
@@ -2046,9 +2392,19 @@ class XlrstatshistoryPlugin(b3.plugin.Plugin):
             _yearPrev = int(_year)-1
         else:
             _yearPrev = int(_year)
-        q = """DELETE FROM %s WHERE (week < %s AND year <= %s) OR year < %s""" % (self.history_weekly_table, _week, _year, _yearPrev)
-        self.debug(u'QUERY: %s ' % q)
-        self.console.storage.query(q)
+        self.purgeTable(self.history_weekly_table, """(week < %s AND year <= %s) OR year < %s""" % (
+                        _week, _year, _yearPrev))
+
+    def purgeTable(self, table, condition):
+        """
+        Delete the history records matching the given condition.
+        :param table: The history table name
+        :param condition: The SQL condition the records to delete match
+        """
+        select = """SELECT id FROM %s WHERE (%s) AND id > %%(last)s ORDER BY id LIMIT %%(limit)s""" % (table, condition)
+        self.debug(u'QUERY: %s ' % select)
+        purge = BulkPurge(self, self._purge_chunk_size, self._purge_chunk_pause)
+        purge.run(table, select, ["""DELETE FROM %s WHERE id IN (%%(ids)s)""" % table])
 
 ########################################################################################################################
 #                                                                                                                      #
@@ -2284,9 +2640,252 @@ class BattlestatsPlugin(b3.plugin.Plugin):
 ########################################################################################################################
 
 
+def sqlvalue(value):
+    """
+    Format a value so it can be used in a SQL query.
+    """
+    if isinstance(value, basestring):
+        return "'%s'" % escape(value, "'")
+    if isinstance(value, bool):
+        return str(int(value))
+    if value is None:
+        return 'NULL'
+    return str(value)
+
+
+class StatsCache(object):
+    """
+    Keep the most recently used stat objects in memory.
+    Objects are indexed by player so the ones involving a disconnected player can be dropped at once.
+    """
+    def __init__(self, size=5000):
+        """
+        Object constructor.
+        :param size: The maximum number of stat objects to keep
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._stats = OrderedDict()     # least recently used first
+        self._players = {}              # player id -> keys of the cached objects involving the player
+
+    def __len__(self):
+        return len(self._stats)
+
+    def get(self, key):
+        """
+        Return the stat object cached for the given key (None if there is none).
+        """
+        stat = self._stats.pop(key, None)
+        if stat is None:
+            self.misses += 1
+            return None
+        self._stats[key] = stat
+        self.hits += 1
+        return stat
+
+    def peek(self, key):
+        """
+        Return the stat object cached for the given key without accounting for the lookup.
+        """
+        return self._stats.get(key)
+
+    def put(self, stat):
+        """
+        Cache the given stat object (replacing the one having the same key).
+        """
+        key = stat._key()
+        if key in self._stats:
+            # saved objects have just been looked up: no need to move them to the most recently used end again
+            self._stats[key] = stat
+            return
+        self._stats[key] = stat
+        for playerid in stat._playerids():
+            self._players.setdefault(playerid, set()).add(key)
+        while len(self._stats) > self.size:
+            self._discard(*self._stats.popitem(last=False))
+
+    def evictPlayer(self, client_id):
+        """
+        Drop the stat objects involving the player having the given client id.
+        """
+        playerstats = self._stats.pop((PlayerStats, client_id), None)
+        if playerstats is None:
+            return
+        for key in self._players.pop(playerstats.id, ()):
+            stat = self._stats.pop(key, None)
+            if stat is not None:
+                self._discard(key, stat)
+
+    def clear(self):
+        """
+        Drop all the cached stat objects.
+        """
+        self._stats.clear()
+        self._players.clear()
+
+    def hitRate(self):
+        """
+        Return the ratio of lookups which found a cached stat object.
+        """
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def _discard(self, key, stat):
+        for playerid in stat._playerids():
+            keys = self._players.get(playerid)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._players[playerid]
+
+
+class BulkPurge(object):
+    """
+    Delete records in chunks: each chunk of ids is deleted by a single query per table and the purge pauses between
+    chunks so the other queries (i.e: the ones of the kill events) are not held back until the whole purge is done.
+    """
+    def __init__(self, plugin, chunk_size=500, pause=0.1):
+        """
+        Object constructor.
+        :param plugin: The plugin running the purge (used to run the queries and log progress)
+        :param chunk_size: The maximum number of ids deleted at once
+        :param pause: The amount of seconds to wait between two chunks
+        """
+        self.plugin = plugin
+        self.chunk_size = max(1, chunk_size)
+        self.pause = pause
+        self.ids = 0
+        self.rows = 0
+
+    def run(self, name, select, deletes):
+        """
+        Run the purge.
+        :param name: The name of what is being purged (for logging)
+        :param select: A query selecting the ids to delete in ascending order: it's given the last id deleted
+                       (%(last)s) and the chunk size (%(limit)s)
+        :param deletes: The queries deleting the records of a chunk: they are given the comma separated ids (%(ids)s)
+        :return: The number of ids deleted
+        """
+        start = time.time()
+        last = 0
+        while True:
+            cursor = self.plugin.query(select % {'last': last, 'limit': self.chunk_size})
+            ids = []
+            while not cursor.EOF:
+                ids.append(cursor.getValue('id'))
+                cursor.moveNext()
+            cursor.close()
+            if not ids:
+                break
+
+            for q in deletes:
+                cursor = self.plugin.query(q % {'ids': ', '.join(str(x) for x in ids)})
+                self.rows += max(cursor.rowcount, 0)
+            self.ids += len(ids)
+            last = ids[-1]
+            self.plugin.verbose('purging %s: %s deleted so far (%s rows, %.0f rows/s)', name, self.ids, self.rows,
+                                self.rows / max(time.time() - start, 0.001))
+            if len(ids) < self.chunk_size:
+                break
+            time.sleep(self.pause)
+
+        if self.ids:
+            self.plugin.info('purged %s: %s deleted (%s rows in %.1f seconds)', name, self.ids, self.rows,
+                             time.time() - start)
+        return self.ids
+
+
+class SkillPool(object):
+    """
+    Skill aggregates of the players in the active pool (see XlrstatsPlugin.correctStats), updated as skills change.
+    The highest and lowest skills are not corrected when the player holding them moves towards the average:
+    like players leaving the pool because of inactivity, this is accounted for when the pool is built again.
+    """
+    def __init__(self, players=0, sum_skill=0.0, max_skill=None, min_skill=None, time_rebuilt=0):
+        """
+        Object constructor.
+        :param players: The number of players in the pool
+        :param sum_skill: The sum of the skill of the players in the pool
+        :param max_skill: The highest skill in the pool
+        :param min_skill: The lowest skill in the pool
+        :param time_rebuilt: The time the aggregates were last computed from the database
+        """
+        self.players = players
+        self.sum_skill = float(sum_skill)
+        self.max_skill = max_skill
+        self.min_skill = min_skill
+        self.time_rebuilt = time_rebuilt
+        self.joined = set()     # id of the clients who joined the pool since it was built
+        self.changed = False
+
+    def average(self):
+        """
+        Return the average skill of the players in the pool (None if the pool is empty).
+        """
+        return self.sum_skill / self.players if self.players else None
+
+    def replace(self, old, new):
+        """
+        Account for a change of the skill a player adds to the pool.
+        :param old: The skill previously added by the player (None if the player was not part of the pool)
+        :param new: The skill now added by the player (None if the player is not part of the pool anymore)
+        """
+        if old is not None:
+            self.players -= 1
+            self.sum_skill -= old
+        if new is not None:
+            self.players += 1
+            self.sum_skill += new
+            if self.max_skill is None or new > self.max_skill:
+                self.max_skill = new
+            if self.min_skill is None or new < self.min_skill:
+                self.min_skill = new
+        self.changed = True
+
+    def scale(self, factor):
+        """
+        Account for the skill of all the players being multiplied by the given factor.
+        """
+        self.sum_skill *= factor
+        if self.max_skill is not None:
+            self.max_skill *= factor
+        if self.min_skill is not None:
+            self.min_skill *= factor
+        self.changed = True
+
+
 class StatObject(object):
 
     _table = None
+    _keys = ()      # fields identifying a record besides its id (in the order used by the get_* plugin methods)
+    _fields = ()    # fields which can be updated
+    _players = ()   # fields holding the id of the players involved in the record
+
+    def _key(self):
+        return (self.__class__,) + tuple([getattr(self, k) for k in self._keys])
+
+    def _copy(self):
+        """
+        Return a shallow copy of this object (cheaper than copy.copy).
+        """
+        stat = self.__class__.__new__(self.__class__)
+        stat.__dict__.update(self.__dict__)
+        return stat
+
+    def _playerids(self):
+        return [getattr(self, k) for k in self._players]
+
+    @classmethod
+    def _fromrow(cls, row):
+        """
+        Create a stat object from a database record.
+        """
+        stat = cls()
+        stat.id = row['id']
+        for field in cls._keys + cls._fields:
+            setattr(stat, field, row[field])
+        return stat
 
     def _insertquery(self):
         return None
@@ -2294,17 +2893,35 @@ class StatObject(object):
     def _updatequery(self):
         return None
 
+    @classmethod
+    def _updatemanyquery(cls, stats):
+        """
+        Return a single query updating the records of all the given stat objects.
+        """
+        sets = []
+        for field in cls._fields:
+            cases = ' '.join('WHEN %s THEN %s' % (s.id, sqlvalue(getattr(s, field))) for s in stats)
+            sets.append('%s=CASE id %s END' % (field, cases))
+        return """UPDATE %s SET %s WHERE id IN (%s)""" % (cls._table, ', '.join(sets),
+                                                          ', '.join(str(s.id) for s in stats))
+
 
 class PlayerStats(StatObject):
 
     # default name of the table for this data object
     _table = 'playerstats'
 
+    _keys = ('client_id',)
+    _fields = ('kills', 'deaths', 'teamkills', 'teamdeaths', 'suicides', 'ratio', 'skill', 'assists',
+               'assistskill', 'curstreak', 'winstreak', 'losestreak', 'rounds', 'hide', 'fixed_name', 'id_token')
+    _players = ('id',)
+
     # fields of the table
     id = None
     client_id = 0
 
     Kfactor = 1
+    _pooled = None  # skill accounted in the active players pool (see XlrstatsPlugin.get_PooledSkill)
 
     kills = 0
     deaths = 0
@@ -2350,6 +2967,9 @@ class WeaponStats(StatObject):
     # default name of the table for this data object
     _table = 'weaponstats'
 
+    _keys = ('name',)
+    _fields = ('kills', 'suicides', 'teamkills')
+
     # fields of the table
     id = None
     name = ''
@@ -2373,6 +2993,10 @@ class WeaponUsage(StatObject):
     # default name of the table for this data object
     _table = 'weaponusage'
 
+    _keys = ('weapon_id', 'player_id')
+    _fields = ('kills', 'deaths', 'suicides', 'teamkills', 'teamdeaths')
+    _players = ('player_id',)
+
     # fields of the table
     id = None
     player_id = 0
@@ -2401,6 +3025,9 @@ class Bodyparts(StatObject):
     # default name of the table for this data object
     _table = 'bodyparts'
 
+    _keys = ('name',)
+    _fields = ('kills', 'suicides', 'teamkills')
+
     # fields of the table
     id = None
     name = ''
@@ -2424,6 +3051,9 @@ class MapStats(StatObject):
     # default name of the table for this data object
     _table = 'mapstats'
 
+    _keys = ('name',)
+    _fields = ('kills', 'suicides', 'teamkills', 'rounds')
+
     # fields of the table
     id = None
     name = ''
@@ -2448,6 +3078,10 @@ class PlayerBody(StatObject):
     # default name of the table for this data object
     _table = 'playerbody'
 
+    _keys = ('bodypart_id', 'player_id')
+    _fields = ('kills', 'deaths', 'suicides', 'teamkills', 'teamdeaths')
+    _players = ('player_id',)
+
     # fields of the table
     id = None
     player_id = 0
@@ -2476,6 +3110,10 @@ class PlayerMaps(StatObject):
     # default name of the table for this data object
     _table = 'playermaps'
 
+    _keys = ('map_id', 'player_id')
+    _fields = ('kills', 'deaths', 'suicides', 'teamkills', 'teamdeaths', 'rounds')
+    _players = ('player_id',)
+
     # fields of the table
     id = 0
     player_id = 0
@@ -2505,6 +3143,10 @@ class Opponents(StatObject):
     # default name of the table for this data object
     _table = 'opponents'
 
+    _keys = ('killer_id', 'target_id')
+    _fields = ('kills', 'retals')
+    _players = ('killer_id', 'target_id')
+
     # fields of the table
     id = None
     killer_id = 0
@@ -2528,6 +3170,9 @@ class ActionStats(StatObject):
     # default name of the table for this data object
     _table = 'actionstats'
 
+    _keys = ('name',)
+    _fields = ('count',)
+
     # fields of the table
     id = None
     name = ''
@@ -2547,6 +3192,10 @@ class PlayerActions(StatObject):
     # default name of the table for this data object
     _table = 'playeractions'
 
+    _keys = ('action_id', 'player_id')
+    _fields = ('count',)
+    _players = ('player_id',)
+
     # fields of the table
     id = None
     player_id = 0
@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS `%s` (
+  `id` TINYINT(3) UNSIGNED NOT NULL,
+  `players` INT(11) UNSIGNED NOT NULL DEFAULT '0',
+  `sum_skill` DOUBLE NOT NULL DEFAULT '0',
+  `max_skill` FLOAT DEFAULT NULL,
+  `min_skill` FLOAT DEFAULT NULL,
+  `time_rebuilt` INT(10) UNSIGNED NOT NULL DEFAULT '0',
+  `time_edit` INT(10) UNSIGNED NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8;
\ No newline at end of file
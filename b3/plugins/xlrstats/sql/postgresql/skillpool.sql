@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS %s (
+  id SMALLINT PRIMARY KEY,
+  players INTEGER NOT NULL DEFAULT '0',
+  sum_skill DOUBLE PRECISION NOT NULL DEFAULT '0',
+  max_skill FLOAT DEFAULT NULL,
+  min_skill FLOAT DEFAULT NULL,
+  time_rebuilt INTEGER NOT NULL DEFAULT '0',
+  time_edit INTEGER NOT NULL DEFAULT '0'
+);
\ No newline at end of file
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS `%s` (
+  `id` INTEGER PRIMARY KEY,
+  `players` INTEGER(11) NOT NULL DEFAULT '0',
+  `sum_skill` DOUBLE NOT NULL DEFAULT '0',
+  `max_skill` FLOAT DEFAULT NULL,
+  `min_skill` FLOAT DEFAULT NULL,
+  `time_rebuilt` INTEGER(10) NOT NULL DEFAULT '0',
+  `time_edit` INTEGER(10) NOT NULL DEFAULT '0'
+);
\ No newline at end of file
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+__version__ = '1.0'
+
+import time
+
+
+class RateLimitSlot(object):
+    """
+    Rate limiting state of a player.
+    """
+    __slots__ = ('client', 'points', 'lastTime', 'lastData', 'ignoreTill')
+
+    def __init__(self, client):
+        self.client = client
+        self.points = 0         # points in the bucket after the last action
+        self.lastTime = None    # time of the last action (None if the player did nothing yet)
+        self.lastData = None    # data of the last action (to detect repeated actions)
+        self.ignoreTill = 0     # actions are ignored until this time once the player has been limited
+
+    def gap(self, now):
+        """
+        Return the amount of seconds elapsed since the last action (None if the player did nothing yet).
+        """
+        return None if self.lastTime is None else now - self.lastTime
+
+
+class RateLimiter(object):
+    """
+    Per player rate limiting, to be shared by the plugins which need to limit how often players do something
+    (chat, radio messages, callvotes...).
+
+    Every player gets a slot, indexed by client id, holding a bucket of points: each action adds points to the
+    bucket (the caller decides how much an action weights) and the bucket leaks one point every `falloff`
+    seconds elapsed since the previous action. When the bucket reaches `capacity` points the player is limited:
+    the bucket is lowered to `cooldown(points)` and the player actions are ignored for `ignore` seconds.
+    """
+    def __init__(self, capacity=10, falloff=6.5, ignore=2, cooldown=None, clock=None):
+        """
+        Object constructor.
+        :param capacity: The amount of points which makes a player limited
+        :param falloff: The amount of seconds needed to leak one point
+        :param ignore: The amount of seconds actions are ignored for once a player is limited
+        :param cooldown: A function returning the points left in the bucket once a player is limited
+                         (by default two thirds of the points in the bucket)
+        :param clock: A function returning the current time (time.time by default)
+        """
+        self.capacity = capacity
+        self.falloff = falloff
+        self.ignore = ignore
+        self.cooldown = cooldown or (lambda points: int(points / 1.5))
+        self.clock = clock or time.time
+        self.slots = {}
+
+    def slot(self, client):
+        """
+        Return the slot of the given client (a new slot if the client id was used by another client).
+        """
+        slot = self.slots.get(client.cid)
+        if slot is None or slot.client is not client:
+            slot = self.slots[client.cid] = RateLimitSlot(client)
+        return slot
+
+    def forget(self, client):
+        """
+        Release the slot of the given client (i.e: when it disconnects).
+        """
+        slot = self.slots.get(client.cid)
+        if slot is not None and slot.client is client:
+            del self.slots[client.cid]
+
+    def isIgnored(self, slot, now=None):
+        """
+        Tell whether the actions of the slot player are ignored because the player has been limited.
+        """
+        return slot.ignoreTill > (self.clock() if now is None else now)
+
+    def getLeak(self, slot, now):
+        """
+        Return the amount of points leaked from the slot bucket since the last action.
+        """
+        gap = slot.gap(now)
+        return int(gap / self.falloff) if gap else 0
+
+    def getPoints(self, slot, now=None):
+        """
+        Return the points in the slot bucket at the given time.
+        """
+        points = slot.points - self.getLeak(slot, self.clock() if now is None else now)
+        return points if points >= 1 else 0
+
+    def add(self, slot, points, data=None, now=None):
+        """
+        Add points to the slot bucket for a player action.
+        :param slot: The slot of the player
+        :param points: The action weight
+        :param data: The action data (stored to detect repeated actions)
+        :param now: The time of the action
+        :return: True if the player reached the bucket capacity (and has been limited), False otherwise
+        """
+        if now is None:
+            now = self.clock()
+        points = slot.points + points - self.getLeak(slot, now)
+        slot.points = points if points >= 1 else 0
+        slot.lastTime = now
+        slot.lastData = data
+        if slot.points < self.capacity:
+            return False
+        slot.points = self.cooldown(slot.points)
+        slot.ignoreTill = now + self.ignore
+        return True
@@ -23,7 +23,7 @@
 # ################################################################### #
 
 __author__  = 'ThorN'
-__version__ = '1.8'
+__version__ = '1.9'
 
 import b3
 import b3.config
@@ -205,6 +205,7 @@ def main():
     p.add_argument('-r', '--restart', action='store_true', dest='restart', default=False, help='Auto-restart B3 on crash')
     p.add_argument('-s', '--setup',  action='store_true', dest='setup', default=False, help='Setup main b3.ini config file')
     p.add_argument('-u', '--update', action='store_true', dest='update', default=False, help='Update B3 database to latest version')
+    p.add_argument('-p', '--replay', dest='replay', default=None, metavar='games.log', help='Replay an archived game log file at full speed and exit. Example: -p games.log')
     p.add_argument('-v', '--version', action='version', default=False, version=b3.getB3versionString(), help='Show B3 version and exit')
     p.add_argument('-a', '--autorestart', action='store_true', dest='autorestart', default=False, help=argparse.SUPPRESS)
 
@@ -223,7 +224,7 @@ def main():
         ## UPDATE => CONSOLE
         run_update(config=options.config)
 
-    if options.restart:
+    if options.restart and not options.replay:
         ## AUTORESTART => CONSOLE
         if options.config:
             run_autorestart(['--config', options.config] + args)
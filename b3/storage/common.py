@@ -23,10 +23,12 @@
 # ################################################################### #
 
 import b3
+import b3.metrics
 import os
 import re
 import sys
 import thread
+import threading
 
 from b3.clients import Client
 from b3.clients import ClientBan
@@ -38,6 +40,7 @@ from b3.clients import Penalty
 from b3.querybuilder import QueryBuilder
 from b3.storage import Storage
 from b3.storage.cursor import Cursor as DBCursor
+from b3.storage.pool import ConnectionPool
 from contextlib import contextmanager
 from time import time
 
@@ -46,6 +49,12 @@ class DatabaseStorage(Storage):
     _lock = None
     _lastConnectAttempt = 0
     _consoleNotice = True
+    _batchSize = 0
+    _batchQueries = 0
+    _pool = None
+    _poolMinSize = 1
+    _poolMaxSize = 0
+    _poolTimeout = 30
     _reName = re.compile(r'([A-Z])')
     _reVar = re.compile(r'_([a-z])')
 
@@ -65,6 +74,7 @@ class DatabaseStorage(Storage):
         self.console = console
         self.db = None
         self._lock = thread.allocate_lock()
+        self._pinned = threading.local()
 
     ####################################################################################################################
     #                                                                                                                  #
@@ -98,6 +108,50 @@ class DatabaseStorage(Storage):
         """
         self.shutdown()
 
+    def setPoolSize(self, minsize, maxsize):
+        """
+        Set the size of the connection pool used to execute queries concurrently from different threads.
+        Pooled connections are opened in addition to the main one: a maximum size of 0 disables the pool.
+        Must be called before the connection with the storage layer is established.
+        :param minsize: The number of connections to open when connecting to the storage layer.
+        :param maxsize: The maximum number of pooled connections.
+        """
+        self._poolMaxSize = max(0, int(maxsize))
+        self._poolMinSize = max(0, min(int(minsize), self._poolMaxSize))
+
+    def _createConnection(self):
+        """
+        Open a new connection with the storage layer (used to fill the connection pool).
+        :return The new connection instance.
+        """
+        raise NotImplementedError
+
+    def _startPool(self):
+        """
+        Open the connection pool (if enabled): on failure queries will be executed using the main connection.
+        """
+        self._stopPool()
+        if self._poolMaxSize < 1:
+            return
+
+        pool = ConnectionPool(self._createConnection, self._poolMinSize, self._poolMaxSize, self.console)
+        try:
+            pool.start()
+        except Exception, e:
+            self.console.warning('Could not open the database connection pool: using a single connection: %s' % e)
+            pool.close()
+        else:
+            self.console.bot('Database connection pool started [min:%s, max:%s]', self._poolMinSize, self._poolMaxSize)
+            self._pool = pool
+
+    def _stopPool(self):
+        """
+        Close the connection pool (if any).
+        """
+        if self._pool:
+            self._pool.close()
+            self._pool = None
+
     ####################################################################################################################
     #                                                                                                                  #
     #   STORAGE INTERFACE                                                                                              #
@@ -598,22 +652,121 @@ class DatabaseStorage(Storage):
     def _query(self, query, bindata=None):
         """
         Execute a query on the storage layer (internal method).
+        The query runs on a pooled connection if the pool is active, otherwise on the main one.
         :param query: The query to execute.
         :param bindata: Data to bind to the given query.
         :raise Exception: If the query cannot be evaluated.
         """
+        pinned = getattr(self._pinned, 'connection', None)
+        if pinned is not None:
+            return self._execute(pinned, query, bindata)
+
+        pool = self._pool
+        if pool and not self._batchSize:
+            connection = pool.acquire(self._poolTimeout)
+            try:
+                dbcursor = self._execute(connection, query, bindata)
+            except Exception:
+                # get rid of the connection if the query failed because it has been lost
+                pool.release(connection, discard=not pool.ping(connection))
+                raise
+            pool.release(connection)
+            return dbcursor
+
         self._lock.acquire()
         try:
-            cursor = self.db.cursor()
-            if bindata is None:
-                cursor.execute(query)
-            else:
-                cursor.execute(query, bindata)
-            dbcursor = DBCursor(cursor, self.db)
+            if self._batchSize:
+                self._batchQuery()
+            dbcursor = self._execute(self.db, query, bindata)
         finally:
             self._lock.release()
         return dbcursor
 
+    @contextmanager
+    def _connection(self):
+        """
+        Execute all the queries of the current thread on the same pooled connection until the end of the block
+        (needed by statements changing the state of the session, like SET): nested blocks share the connection.
+        Without the connection pool the queries run on the main connection anyway.
+        """
+        pool = self._pool
+        if not pool or self._batchSize or getattr(self._pinned, 'connection', None) is not None:
+            yield
+            return
+
+        connection = pool.acquire(self._poolTimeout)
+        self._pinned.connection = connection
+        broken = False
+        try:
+            yield
+        except Exception:
+            # get rid of the connection if a query failed because it has been lost
+            broken = not pool.ping(connection)
+            raise
+        finally:
+            self._pinned.connection = None
+            pool.release(connection, discard=broken)
+
+    def _execute(self, connection, query, bindata=None):
+        """
+        Execute a query using the given connection (internal method).
+        :param connection: The connection to use.
+        :param query: The query to execute.
+        :param bindata: Data to bind to the given query.
+        :raise Exception: If the query cannot be evaluated.
+        """
+        cursor = self._cursor(connection)
+        if bindata is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query, bindata)
+        return DBCursor(cursor, connection)
+
+    def _cursor(self, connection):
+        """
+        Return a new cursor for the given connection (internal method).
+        :param connection: The connection to use.
+        """
+        return connection.cursor()
+
+    def _batchQuery(self):
+        """
+        Account for a query being executed in batch mode (internal method).
+        Open a new transaction if none is active and commit the active one once it holds enough queries.
+        """
+        if self._batchQueries >= self._batchSize:
+            self.db.cursor().execute('COMMIT')
+            self._batchQueries = 0
+        if not self._batchQueries:
+            self.db.cursor().execute('BEGIN')
+        self._batchQueries += 1
+
+    def startBatch(self, size=1000):
+        """
+        Start executing queries in batch mode: queries are grouped into transactions of the given
+        size so the storage layer does not have to commit them one by one (useful for bulk writes).
+        :param size: The number of queries to execute in a single transaction.
+        """
+        self._lock.acquire()
+        try:
+            self._batchSize = max(1, int(size))
+            self._batchQueries = 0
+        finally:
+            self._lock.release()
+
+    def endBatch(self):
+        """
+        Commit the active transaction (if any) and go back to executing queries one by one.
+        """
+        self._lock.acquire()
+        try:
+            if self._batchQueries and self.db:
+                self.db.cursor().execute('COMMIT')
+            self._batchSize = 0
+            self._batchQueries = 0
+        finally:
+            self._lock.release()
+
     def query(self, query, bindata=None):
         """
         Execute a query on the storage layer.
@@ -628,7 +781,8 @@ class DatabaseStorage(Storage):
 
         try:
             # always return a cursor instance (also when EOF is reached)
-            return self._query(query=query, bindata=bindata)
+            with b3.metrics.storage_query_seconds.time():
+                return self._query(query=query, bindata=bindata)
         except Exception, e:
             # log so we can inspect the issue and raise again
             self.console.error('Query failed [%s] %r: %s', query, bindata, e)
@@ -685,9 +839,11 @@ class DatabaseStorage(Storage):
         with open(path, 'r') as sqlfile:
             statements = self.getQueriesFromFile(sqlfile)
 
-        for stmt in statements:
-            # will stop if a single query generate an exception
-            self.query(stmt)
+        # statements like SET must apply to the following ones
+        with self._connection():
+            for stmt in statements:
+                # will stop if a single query generate an exception
+                self.query(stmt)
 
         # reset standard error output
         sys.stderr = orig_stderr
@@ -62,6 +62,7 @@ class PymysqlStorage(DatabaseStorage):
         """
         Close the current active database connection.
         """
+        self._stopPool()
         if self.db and self.db.open:
             # checking 'open' will prevent exception raising
             self.console.bot('Closing connection with MySQL database...')
@@ -98,6 +99,14 @@ class MysqlConnectorStorage(DatabaseStorage):
         """
         super(MysqlConnectorStorage, self).__init__(dsn, dsnDict, console)
 
+    def _cursor(self, connection):
+        """
+        Return a new cursor for the given connection (internal method).
+        Results are buffered so the connection can be used by other queries before all the rows are fetched.
+        :param connection: The connection to use.
+        """
+        return connection.cursor(buffered=True)
+
     ####################################################################################################################
     #                                                                                                                  #
     #   CONNECTION INITIALIZATION/TERMINATION/RETRIEVAL                                                                #
@@ -117,6 +126,7 @@ class MysqlConnectorStorage(DatabaseStorage):
         """
         Close the current active database connection.
         """
+        self._stopPool()
         if self.db and self.db._socket is not None:
             # the shutdown method is already exception safe
             self.console.bot('Closing connection with MySQL database...')
@@ -172,6 +182,7 @@ class MySQLdbStorage(DatabaseStorage):
         """
         Close the current active database connection.
         """
+        self._stopPool()
         if self.db and self.db.open:
             # checking 'open' will prevent exception raising
             self.console.bot('Closing connection with MySQL database...')
@@ -278,16 +289,10 @@ class MysqlStorage(DatabaseStorage):
             self.console.bot('Connecting to MySQL database: %(protocol)s://%(user)s:******@%(host)s:%(port)s%(path)s...', self.dsnDict)
 
             try:
-                # create the connection instance using the specified connector
-                self.db = self.__driver.connect(host=self.dsnDict['host'],
-                                                port=self.dsnDict['port'],
-                                                user=self.dsnDict['user'],
-                                                passwd=self.dsnDict['password'],
-                                                db=self.dsnDict['path'][1:],
-                                                charset="utf8")
-
+                self.db = self._createConnection()
                 self.console.bot('Successfully established a connection with MySQL database')
                 self._lastConnectAttempt = 0
+                self._startPool()
 
                 if self._consoleNotice:
                     self.console.screen.write('Connecting to DB : OK\n')
@@ -317,6 +322,18 @@ class MysqlStorage(DatabaseStorage):
 
         return self.db
 
+    def _createConnection(self):
+        """
+        Open a new connection with the MySQL database using the specified connector.
+        :return The new connection instance.
+        """
+        return self.__driver.connect(host=self.dsnDict['host'],
+                                     port=self.dsnDict['port'],
+                                     user=self.dsnDict['user'],
+                                     passwd=self.dsnDict['password'],
+                                     db=self.dsnDict['path'][1:],
+                                     charset="utf8")
+
     ####################################################################################################################
     #                                                                                                                  #
     #   STORAGE INTERFACE                                                                                              #
@@ -344,17 +361,19 @@ class MysqlStorage(DatabaseStorage):
         :param table: The database table or a collection of tables
         :raise KeyError: If the table is not present in the database
         """
-        try:
-            self.query("""SET FOREIGN_KEY_CHECKS=0;""")
-            current_tables = self.getTables()
-            if isinstance(table, tuple) or isinstance(table, list):
-                for v in table:
-                    if not v in current_tables:
-                        raise KeyError("could not find table '%s' in the database" % v)
-                    self.query("TRUNCATE TABLE %s;" % v)
-            else:
-                if not table in current_tables:
-                     raise KeyError("could not find table '%s' in the database" % table)
-                self.query("TRUNCATE TABLE %s;" % table)
-        finally:
-            self.query("""SET FOREIGN_KEY_CHECKS=1;""")
\ No newline at end of file
+        # the foreign key checks setting only applies to the connection it's issued on
+        with self._connection():
+            try:
+                self.query("""SET FOREIGN_KEY_CHECKS=0;""")
+                current_tables = self.getTables()
+                if isinstance(table, tuple) or isinstance(table, list):
+                    for v in table:
+                        if not v in current_tables:
+                            raise KeyError("could not find table '%s' in the database" % v)
+                        self.query("TRUNCATE TABLE %s;" % v)
+                else:
+                    if not table in current_tables:
+                         raise KeyError("could not find table '%s' in the database" % table)
+                    self.query("TRUNCATE TABLE %s;" % table)
+            finally:
+                self.query("""SET FOREIGN_KEY_CHECKS=1;""")
\ No newline at end of file
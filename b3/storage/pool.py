@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+__version__ = '1.0'
+
+import threading
+
+from collections import deque
+from time import time
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection could be acquired from the pool in time.
+    """
+    pass
+
+
+class ConnectionPool(object):
+    """
+    Keep a set of database connections which can be used concurrently by several threads.
+    Connections idle for a while are checked before being handed out again: the broken ones are replaced.
+    """
+    def __init__(self, factory, minsize=1, maxsize=4, console=None, check_interval=30):
+        """
+        Object constructor.
+        :param factory: A callable returning a new database connection
+        :param minsize: The number of connections to open when the pool is started
+        :param maxsize: The maximum number of connections the pool can hold
+        :param console: The console instance (used for logging)
+        :param check_interval: The amount of seconds a connection can stay idle before being checked again
+        """
+        self.factory = factory
+        self.minsize = max(0, min(minsize, maxsize))
+        self.maxsize = max(1, maxsize)
+        self.console = console
+        self.check_interval = check_interval
+        self._idle = deque()  # (connection, last time used) tuples
+        self._size = 0  # number of connections opened (idle or in use)
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+    def start(self):
+        """
+        Open the minimum number of connections.
+        """
+        for i in range(self.minsize):
+            with self._cond:
+                if self._size >= self.maxsize:
+                    break
+                self._size += 1
+            connection = self._open()
+            self.release(connection)
+
+    def acquire(self, timeout=None):
+        """
+        Return a connection which is not being used by any other thread.
+        Wait for a connection to be released when the pool is exhausted.
+        :param timeout: The maximum amount of seconds to wait for a connection
+        :raise PoolTimeout: If no connection could be acquired within the given timeout
+        """
+        expire = None if timeout is None else time() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('connection pool is closed')
+                if self._idle:
+                    # last released first: busy connections stay warm while the others can be checked
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxsize:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = None if expire is None else expire - time()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout('no database connection available after %s seconds' % timeout)
+                self._cond.wait(remaining)
+
+        if connection is None:
+            return self._open()
+
+        if time() - last_used > self.check_interval and not self.ping(connection):
+            if self.console:
+                self.console.warning('Database connection lost: reconnecting')
+            self._close(connection)
+            return self._open()
+
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Give a connection back to the pool.
+        :param connection: The connection to release
+        :param discard: Whether the connection is broken and must be closed
+        """
+        if discard or self._closed:
+            self._close(connection)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+        else:
+            with self._cond:
+                self._idle.append((connection, time()))
+                self._cond.notify()
+
+    @staticmethod
+    def ping(connection):
+        """
+        Check whether a connection is still usable.
+        :param connection: The connection to check
+        :return: True if the connection is working, False otherwise
+        """
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def size(self):
+        """
+        Return the number of connections opened by the pool.
+        """
+        with self._cond:
+            return self._size
+
+    def close(self):
+        """
+        Close all the idle connections: connections in use are closed as soon as they are released.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, last_used in idle:
+            self._close(connection)
+
+    def _open(self):
+        """
+        Open a new connection (the pool size must have been increased already).
+        """
+        try:
+            return self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    @staticmethod
+    def _close(connection):
+        """
+        Close a connection ignoring errors.
+        """
+        try:
+            connection.close()
+        except Exception:
+            pass
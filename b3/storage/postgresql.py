@@ -97,18 +97,10 @@ class PostgresqlStorage(DatabaseStorage):
 
             try:
 
-                import psycopg2
-                self.db = psycopg2.connect(host=self.dsnDict['host'],
-                                           port=self.dsnDict['port'],
-                                           user=self.dsnDict['user'],
-                                           password=self.dsnDict['password'],
-                                           database=self.dsnDict['path'][1:])
-
-                self.db.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
-                self.db.set_client_encoding("UTF8")
-
+                self.db = self._createConnection()
                 self.console.bot('Successfully established a connection with PostgreSQL database')
                 self._lastConnectAttempt = 0
+                self._startPool()
 
                 if self._consoleNotice:
                     self.console.screen.write('Connecting to DB : OK\n')
@@ -139,6 +131,22 @@ class PostgresqlStorage(DatabaseStorage):
 
         return self.db
 
+    def _createConnection(self):
+        """
+        Open a new connection with the PostgreSQL database.
+        :return The new connection instance.
+        """
+        import psycopg2
+        connection = psycopg2.connect(host=self.dsnDict['host'],
+                                      port=self.dsnDict['port'],
+                                      user=self.dsnDict['user'],
+                                      password=self.dsnDict['password'],
+                                      database=self.dsnDict['path'][1:])
+
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        connection.set_client_encoding("UTF8")
+        return connection
+
     def getConnection(self):
         """
         Return the database connection. If the connection has not been established yet, will establish a new one.
@@ -152,6 +160,7 @@ class PostgresqlStorage(DatabaseStorage):
         """
         Close the current active database connection.
         """
+        self._stopPool()
         if self.db and not self.db.closed:
             self.console.bot('Closing connection with PostgreSQL database...')
             self.db.close()
@@ -201,46 +210,42 @@ class PostgresqlStorage(DatabaseStorage):
     #                                                                                                                  #
     ####################################################################################################################
 
-    def _query(self, query, bindata=None):
+    def _execute(self, connection, query, bindata=None):
         """
-        Execute a query on the storage layer (internal method).
+        Execute a query using the given connection (internal method).
+        :param connection: The connection to use.
         :param query: The query to execute.
         :param bindata: Data to bind to the given query.
         :raise Exception: If the query cannot be evaluated.
         """
-        self._lock.acquire()
+        # postgresql doesn't support backticks: the query will be logged with backticks since
+        # logging is handled in 'query()' but we will strip them out before executing the query.
+        newquery = query.replace('`','').strip()
 
-        try:
-            # postgresql doesn't support backticks: the query will be logged with backticks since
-            # logging is handled in 'query()' but we will strip them out before executing the query.
-            newquery = query.replace('`','').strip()
-
-            cursor = self.db.cursor()
-            if bindata is None:
-                cursor.execute(newquery)
-            else:
-                cursor.execute(newquery, bindata)
-
-            # create our cursor instance
-            dbcursor = DBCursor(cursor, self.db)
-
-            if self._reInsert.match(newquery):
-                # if this is an insert query try to get the last insert id:
-                # this needs a separate query in postgresql: it can be done in a single query
-                # adding 'RETURNING id' to the INSERT statement but then we would have added
-                # a constraint on the name of the PRIMARY KEY for each table
-                try:
-                    cursor = self.db.cursor()
-                    cursor.execute("SELECT LASTVAL();")
-                    dbcursor.lastrowid = cursor.fetchone()[0]
-                    dbcursor._cursor.lastrowid = dbcursor.lastrowid
-                    cursor.close()
-                except Exception, e:
-                    # can't recover in any case
-                    pass
-
-        finally:
-            self._lock.release()
+        cursor = connection.cursor()
+        if bindata is None:
+            cursor.execute(newquery)
+        else:
+            cursor.execute(newquery, bindata)
+
+        # create our cursor instance
+        dbcursor = DBCursor(cursor, connection)
+
+        if self._reInsert.match(newquery):
+            # if this is an insert query try to get the last insert id:
+            # this needs a separate query in postgresql: it can be done in a single query
+            # adding 'RETURNING id' to the INSERT statement but then we would have added
+            # a constraint on the name of the PRIMARY KEY for each table (LASTVAL is
+            # session bound so it must be executed on the same connection)
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT LASTVAL();")
+                dbcursor.lastrowid = cursor.fetchone()[0]
+                dbcursor._cursor.lastrowid = dbcursor.lastrowid
+                cursor.close()
+            except Exception, e:
+                # can't recover in any case
+                pass
 
         return dbcursor
 
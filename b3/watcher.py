@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+__version__ = '1.0'
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from b3.exceptions import MissingRequirement
+
+# inotify flags (see /usr/include/sys/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class PollingLogWatcher(object):
+    """
+    Wait for a game log file to change by simply sleeping (works everywhere).
+    """
+    def __init__(self, path):
+        """
+        Object constructor.
+        :param path: The path of the game log file
+        """
+        self.path = path
+
+    def wait(self, timeout):
+        """
+        Wait for the game log file to change.
+        :param timeout: The maximum amount of seconds to wait
+        :return: True if the game log file changed, False if the timeout elapsed (always False here)
+        """
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        """
+        Release the resources allocated by the watcher.
+        """
+        pass
+
+
+class InotifyLogWatcher(object):
+    """
+    Wait for a game log file to change using the Linux inotify API.
+    """
+    _mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, path):
+        """
+        Object constructor.
+        :param path: The path of the game log file
+        :raise MissingRequirement: If inotify is not available on this system
+        """
+        self.path = path
+        if isinstance(path, unicode):
+            # inotify_add_watch expects the path as a byte string
+            path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+        self._bpath = path
+        self._libc = self._load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise MissingRequirement('could not initialize inotify: %s' % os.strerror(ctypes.get_errno()))
+        self._wd = -1
+        self._add_watch()
+
+    @staticmethod
+    def _load_libc():
+        """
+        Load the C library exposing the inotify API.
+        """
+        if not sys.platform.startswith('linux'):
+            raise MissingRequirement('inotify is only available on Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise MissingRequirement('inotify is not supported by the C library')
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+
+    def _add_watch(self):
+        """
+        Watch the game log file: this needs to be done again when the file is replaced.
+        :return: True if the game log file is being watched, False otherwise
+        """
+        self._wd = self._libc.inotify_add_watch(self._fd, self._bpath, self._mask)
+        return self._wd >= 0
+
+    def _read_events(self):
+        """
+        Read the pending inotify events.
+        :return: The combined mask of the events read
+        """
+        mask = 0
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, event_mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                mask |= event_mask
+                offset += _EVENT_HEADER.size + length
+        return mask
+
+    def wait(self, timeout):
+        """
+        Wait for the game log file to change.
+        :param timeout: The maximum amount of seconds to wait
+        :return: True if the game log file changed, False if the timeout elapsed
+        """
+        if self._wd < 0 and not self._add_watch():
+            # the game log file is gone (being rotated): retry on next call
+            time.sleep(timeout)
+            return False
+
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return False
+            raise
+
+        if not readable:
+            return False
+
+        mask = self._read_events()
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            # the file has been moved or deleted: watch the new one (if already there)
+            if mask & IN_MOVE_SELF:
+                self._libc.inotify_rm_watch(self._fd, self._wd)
+            self._wd = -1
+            self._add_watch()
+        return True
+
+    def close(self):
+        """
+        Release the resources allocated by the watcher.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def getLogWatcher(path, use_inotify=True):
+    """
+    Return the best available watcher for the given game log file.
+    :param path: The path of the game log file
+    :param use_inotify: Whether to try to use inotify before falling back to polling
+    """
+    if use_inotify:
+        try:
+            return InotifyLogWatcher(path)
+        except (MissingRequirement, OSError, AttributeError, UnicodeError, ctypes.ArgumentError):
+            pass
+    return PollingLogWatcher(path)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+"""
+Benchmarks for B3 hot paths.
+
+Benchmark modules are named bench_*.py so that they are not collected by the test runners: run them
+individually from the B3 root directory, i.e:
+
+    python -m tests.benchmarks.bench_pacing [games.log]
+
+Benchmarks which replay a game log can be given a recorded log file: when none is given a synthetic
+Urban Terror 4.3 (or CS:GO) log is generated.
+"""
+
+import logging
+import random
+import time
+
+from b3.config import XmlConfigParser
+from tests import logging_disabled
+
+logging.getLogger('output').setLevel(logging.CRITICAL)
+
+NAMES = ['Joe', 'Bob', 'Alice', 'Marcel', 'Patate', 'psyp', 'Fat\'Matic', '[FR]d4dou', 'Biddle', 'Fenix',
+         'ThorN', 'Courgette', 'xlr8or', 'Bakes', 'Ozon', 'Chucky']
+
+WEAPONS = [('UT_MOD_KNIFE', 12, 1), ('UT_MOD_BERETTA', 14, 2), ('UT_MOD_DEAGLE', 15, 3), ('UT_MOD_SPAS', 16, 4),
+           ('UT_MOD_MP5K', 17, 5), ('UT_MOD_UMP45', 18, 6), ('UT_MOD_LR300', 21, 8), ('UT_MOD_G36', 22, 9),
+           ('UT_MOD_PSG1', 23, 10), ('UT_MOD_SR8', 28, 14), ('UT_MOD_AK103', 30, 15), ('UT_MOD_M4', 38, 19),
+           ('UT_MOD_GLOCK', 39, 20)]
+
+HIT_LOCATIONS = [(1, 'Head'), (2, 'Helmet'), (3, 'Torso'), (4, 'Vest'), (5, 'Left Arm'), (6, 'Right Arm'),
+                 (7, 'Groin'), (8, 'Butt'), (9, 'Left Upper Leg'), (10, 'Right Upper Leg')]
+
+CHAT = ['gg', 'nice shot', 'lol', '!xlrstats', '!help', 'go go go', 'rush B', '!time', 'anyone for a cw ?', 'ty']
+
+
+def iourt43_log_lines(rounds=10, players=16, kills_per_round=200, seed=1):
+    """
+    Generate the lines of a synthetic Urban Terror 4.3 game log.
+    :param rounds: The number of rounds to generate
+    :param players: The number of players connected to the server
+    :param kills_per_round: The number of kills in each round
+    :param seed: The random generator seed (the same seed produces the same log)
+    """
+    rnd = random.Random(seed)
+    clock = [0]
+
+    def line(text):
+        clock[0] += rnd.choice((0, 0, 1))
+        return '%3i:%02i %s' % (clock[0] / 60, clock[0] % 60, text)
+
+    for r in range(rounds):
+        yield line(r'InitGame: \sv_allowdownload\0\g_matchmode\0\g_gametype\4\sv_maxclients\32\sv_floodprotect\1'
+                   r'\g_warmup\5\capturelimit\0\mapname\ut4_turnpike\gamename\q3urt43')
+        for cid in range(players):
+            name = '%s%s' % (NAMES[cid % len(NAMES)], cid)
+            guid = ('%032X' % (cid + 1))
+            yield line('ClientConnect: %s' % cid)
+            yield line(r'ClientUserinfo: %s \ip\11.22.33.%s:27960\name\%s\racered\2\raceblue\2\rate\25000'
+                       r'\ut_timenudge\0\cg_rgb\128 128 128\funred\ninja,caprd,bartsor\funblue\ninja,gasmask,capbl'
+                       r'\cg_physics\1\snaps\20\color1\4\color2\5\handicap\100\sex\male\cg_autoPickup\-1\cg_ghost\0'
+                       r'\cl_time\n34|0610q5qH=t<a\racefree\1\gear\GZAAVWT\authc\0\cl_guid\%s'
+                       r'\weapmodes\01000110220000020002000' % (cid, cid + 1, name, guid))
+            yield line(r'ClientUserinfoChanged: %s n\%s\t\%s\r\1\tl\0\f0\\f1\\f2\\a0\0\a1\255\a2\0'
+                       % (cid, name, 1 + cid % 2))
+            yield line('ClientBegin: %s' % cid)
+        for k in range(kills_per_round):
+            killer, victim = rnd.sample(range(players), 2)
+            kname = '%s%s' % (NAMES[killer % len(NAMES)], killer)
+            vname = '%s%s' % (NAMES[victim % len(NAMES)], victim)
+            weapon, mod, hitweapon = rnd.choice(WEAPONS)
+            for h in range(rnd.randint(1, 3)):
+                loc, locname = rnd.choice(HIT_LOCATIONS)
+                yield line('Hit: %s %s %s %s: %s hit %s in the %s' % (victim, killer, loc, hitweapon, kname, vname,
+                                                                       locname))
+            yield line('Kill: %s %s %s: %s killed %s by %s' % (killer, victim, mod, kname, vname, weapon))
+            if k % 10 == 0:
+                yield line('say: %s %s: %s' % (killer, kname, rnd.choice(CHAT)))
+            if k % 25 == 0:
+                yield line('Radio: %s - 3 - 3 - "Courtyard" - "Affirmative"' % victim)
+            if k % 30 == 0:
+                yield line('Item: %s ut_weapon_sr8' % killer)
+        yield line('Exit: Timelimit hit.')
+        yield line('ShutdownGame:')
+        yield line('-' * 60)
+
+
+def csgo_log_lines(rounds=10, players=16, kills_per_round=20, seed=1):
+    """
+    Generate the lines of a synthetic CS:GO game log.
+    :param rounds: The number of rounds to generate
+    :param players: The number of players connected to the server
+    :param kills_per_round: The number of kills in each round
+    :param seed: The random generator seed (the same seed produces the same log)
+    """
+    rnd = random.Random(seed)
+    clock = [0]
+    teams = ('CT', 'TERRORIST')
+    weapons = ('ak47', 'm4a1', 'awp', 'deagle', 'glock', 'hkp2000', 'famas', 'galilar', 'knife_default_ct')
+    items = ('ak47', 'm4a1', 'vesthelm', 'hegrenade', 'flashbang', 'smokegrenade', 'molotov', 'defuser')
+
+    def line(text):
+        clock[0] += rnd.choice((0, 0, 1))
+        return 'L 08/26/2012 - %02i:%02i:%02i: %s' % (clock[0] / 3600 % 24, clock[0] / 60 % 60, clock[0] % 60, text)
+
+    def player(cid):
+        name = '%s%s' % (NAMES[cid % len(NAMES)], cid)
+        return '%s<%s><STEAM_1:0:%s><%s>' % (name, cid + 2, 1000000 + cid, teams[cid % 2])
+
+    def coords():
+        return '[%s %s %s]' % (rnd.randint(-2000, 2000), rnd.randint(-2000, 2000), rnd.randint(-200, 200))
+
+    yield line('Log file started (file "logs/L000_000_000_000_27015_201208260322_000.log") (game "/csgo") '
+               '(version "5014")')
+    yield line('server cvars start')
+    for cvar in ('mp_friendlyfire', 'mp_timelimit', 'mp_maxrounds', 'mp_roundtime', 'mp_freezetime',
+                 'sv_alltalk', 'sv_cheats', 'mp_autokick', 'mp_c4timer', 'mp_buytime'):
+        yield line('"%s" = "%s"' % (cvar, rnd.randint(0, 60)))
+    yield line('server cvars end')
+    yield line('Loading map "de_dust2"')
+    yield line('Started map "de_dust2" (CRC "1592693790")')
+    for cid in range(players):
+        name = '%s%s' % (NAMES[cid % len(NAMES)], cid)
+        guid = 'STEAM_1:0:%s' % (1000000 + cid)
+        yield line('"%s<%s><%s><>" connected, address "11.22.33.%s:27005"' % (name, cid + 2, guid, cid + 1))
+        yield line('"%s<%s><%s><>" STEAM USERID validated' % (name, cid + 2, guid))
+        yield line('"%s<%s><%s><>" entered the game' % (name, cid + 2, guid))
+        yield line('"%s<%s><%s>" switched from team <Unassigned> to <%s>' % (name, cid + 2, guid, teams[cid % 2]))
+    for r in range(rounds):
+        yield line('World triggered "Round_Start"')
+        for cid in range(players):
+            for i in range(rnd.randint(1, 3)):
+                yield line('"%s" purchased "%s"' % (player(cid), rnd.choice(items)))
+        for k in range(kills_per_round):
+            killer, victim = rnd.sample(range(players), 2)
+            if k % 3 == 0:
+                yield line('"%s" threw hegrenade %s' % (player(killer), coords()))
+            yield line('"%s" %s killed "%s" %s with "%s"%s' % (player(killer), coords(), player(victim), coords(),
+                                                               rnd.choice(weapons),
+                                                               rnd.choice(('', '', ' (headshot)'))))
+            if k % 4 == 0:
+                assister = rnd.choice([x for x in range(players) if x not in (killer, victim)])
+                yield line('"%s" assisted killing "%s"' % (player(assister), player(victim)))
+            if k % 5 == 0:
+                yield line('"%s" say "%s"' % (player(killer), rnd.choice(CHAT)))
+            if k % 7 == 0:
+                yield line('"%s" say_team "%s"' % (player(victim), rnd.choice(CHAT)))
+        yield line('"%s" triggered "Planted_The_Bomb"' % player(1))
+        yield line('Team "%s" triggered "SFUI_Notice_Target_Bombed" (CT "%s") (T "%s")' % (teams[1], r, r + 1))
+        yield line('Team "CT" scored "%s" with "%s" players' % (r, players / 2))
+        yield line('Team "TERRORIST" scored "%s" with "%s" players' % (r + 1, players / 2))
+        yield line('World triggered "Round_End"')
+
+
+def battleye_messages(count=10000, players=40, seed=1):
+    """
+    Generate synthetic Arma 3 BattlEye server messages (mostly chat, like on a busy server).
+    :param count: The number of messages to generate
+    :param players: The number of players connected to the server
+    :param seed: The random generator seed (the same seed produces the same messages)
+    """
+    rnd = random.Random(seed)
+    channels = ('Global', 'Side', 'Group', 'Vehicle', 'Direct', 'Command', 'Lobby')
+
+    def player(cid):
+        return '%s%s' % (NAMES[cid % len(NAMES)], cid)
+
+    def guid(cid):
+        return '%032x' % (0x73c5e50a7860475f + cid)
+
+    for i in range(count):
+        cid = rnd.randint(0, players - 1)
+        kind = rnd.randint(0, 19)
+        if kind < 12:
+            yield '(%s) %s: %s' % (rnd.choice(channels), player(cid), rnd.choice(CHAT))
+        elif kind < 14:
+            yield 'Player #%s %s (11.22.33.%s:2304) connected' % (cid, player(cid), cid + 1)
+        elif kind == 14:
+            yield 'Player #%s %s - GUID: %s (unverified)' % (cid, player(cid), guid(cid))
+        elif kind == 15:
+            yield 'Verified GUID (%s) of player #%s %s' % (guid(cid), cid, player(cid))
+        elif kind == 16:
+            yield 'Player #%s %s disconnected' % (cid, player(cid))
+        elif kind == 17:
+            yield 'CreateVehicle Log: #%s %s (%s) - #0 "B_Heli_Light_01_F"' % (cid, player(cid), guid(cid))
+        elif kind == 18:
+            yield 'RCon admin #%s (11.22.33.44:2306) logged in' % rnd.randint(0, 3)
+        else:
+            yield 'Player #%s %s (%s) has been kicked by BattlEye: Client not responding' % (cid, player(cid),
+                                                                                          guid(cid))
+
+
+def write_iourt43_log(path, **kwargs):
+    """
+    Write a synthetic Urban Terror 4.3 game log into the given file.
+    :param path: The path of the file to write
+    :return: The number of lines written
+    """
+    count = 0
+    with open(path, 'w') as f:
+        for text in iourt43_log_lines(**kwargs):
+            f.write(text + '\n')
+            count += 1
+    return count
+
+
+def create_iourt_parser(parser_class):
+    """
+    Create an Urban Terror parser instance not bound to any game server.
+    :param parser_class: The parser class to instantiate (Iourt41Parser, Iourt42Parser or Iourt43Parser)
+    """
+    from b3.fake import FakeConsole
+    from b3.parsers.q3a.abstractParser import AbstractParser
+    AbstractParser.__bases__ = (FakeConsole,)
+
+    conf = XmlConfigParser()
+    conf.loadFromString("""<configuration><settings name="server"><set name="game_log"/></settings></configuration>""")
+    with logging_disabled():
+        console = parser_class(conf)
+    console.PunkBuster = None
+
+    gamename = {'Iourt41Parser': 'q3urt41', 'Iourt42Parser': 'q3urt42'}.get(parser_class.__name__, 'q3urt43')
+
+    def write(*args, **kwargs):
+        if args == ('gamename',):
+            return r'''"gamename" is:"%s^7"''' % gamename
+        return ''
+
+    console.write = write
+    # there is no game server to sync the client list with: InitGame lines would
+    # otherwise make a background thread disconnect the clients being replayed
+    console.clients.sync = lambda *args, **kwargs: None
+    with logging_disabled():
+        console.startup()
+    logging.getLogger('output').setLevel(logging.CRITICAL)
+    return console
+
+
+def report(label, count, elapsed, unit='lines'):
+    """
+    Print a benchmark result line.
+    :param label: The label of the benchmarked item
+    :param count: The number of processed items
+    :param elapsed: The time spent processing the items (in seconds)
+    :param unit: The name of the processed items
+    """
+    rate = count / elapsed if elapsed else float('inf')
+    print '%-40s %10i %s in %8.3fs : %12.1f %s/s' % (label, count, unit, elapsed, rate, unit)
+
+
+class Timer(object):
+    """
+    Context manager measuring elapsed wall time.
+    """
+    def __enter__(self):
+        self.start = time.time()
+        self.elapsed = 0
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.time() - self.start
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the banlist lookups per second on large banlist files, searching the file content with regular
+expressions (the former lookup) and using the indexes built when the banlist file is loaded.
+
+USAGE:
+    python -m tests.benchmarks.bench_banlist [number of banlist lines]
+"""
+
+import os
+import random
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+from mock import Mock
+from b3.plugins.banlist import GuidBanlist
+from b3.plugins.banlist import IpBanlist
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+
+LOOKUPS = 2000
+
+
+def create_banlist(cls, path, force_range=True):
+    """
+    Create a banlist of the given class reading the given file.
+    """
+    return cls(Mock(), ET.fromstring(r"""
+        <banlist>
+            <name>bench</name>
+            <file>%s</file>
+            <force_ip_range>%s</force_ip_range>
+            <message>$name is BANNED</message>
+        </banlist>
+    """ % (path, 'yes' if force_range else 'no')))
+
+
+def write_file(content):
+    """
+    Write the given content to a temporary file.
+    :return: The file path
+    """
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return path
+
+
+def regex_ip_lookup(content, ip, force_range):
+    """
+    Search the ip the way the banlist plugin used to.
+    """
+    parts = ip.split('.')
+    patterns = [r'^(?P<entry>%s(?:[^\d\n\r].*)?)$' % re.escape(ip)]
+    for i in (3, 2, 1):
+        patterns.append(r'^(?P<entry>%s%s(?:[^\d\n\r].*)?)$' % (re.escape('.'.join(parts[0:i])), r'\.0' * (4 - i)))
+    if force_range:
+        patterns.append(r'^(?P<entry>%s\.\d{1,3}(?:[^\d\n\r].*)?)$' % re.escape('.'.join(parts[0:3])))
+    for pattern in patterns:
+        m = re.search(pattern, content, re.MULTILINE)
+        if m:
+            return m.group('entry').strip()
+
+
+def regex_guid_lookup(content, guid):
+    """
+    Search the guid the way the banlist plugin used to.
+    """
+    m = re.search(r'^(?P<entry>\s*%s\b.*)$' % re.escape(guid), content, re.IGNORECASE | re.MULTILINE)
+    if m:
+        return m.group('entry')
+
+
+def random_ip(rnd):
+    return '%s.%s.%s.%s' % (rnd.randint(1, 223), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(1, 254))
+
+
+def random_guid(rnd):
+    return '%032X' % rnd.getrandbits(128)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rnd = random.Random(1)
+    ips = [random_ip(rnd) for i in range(count)]
+    guids = [random_guid(rnd) for i in range(count)]
+    ip_content = '\n'.join('%s // banned player %s' % (ip, i) for i, ip in enumerate(ips)) + '\n'
+    guid_content = '\n'.join('%s // banned player %s' % (guid, i) for i, guid in enumerate(guids)) + '\n'
+    # half of the searched values are banned
+    ip_lookups = [rnd.choice(ips) if i % 2 else random_ip(rnd) for i in range(LOOKUPS)]
+    guid_lookups = [rnd.choice(guids) if i % 2 else random_guid(rnd) for i in range(LOOKUPS)]
+
+    ip_path = write_file(ip_content)
+    guid_path = write_file(guid_content)
+    try:
+        ip_banlist = create_banlist(IpBanlist, ip_path)
+        with Timer() as timer:
+            ip_banlist.refreshBanlistContent()
+        report('ip banlist load lines=%s' % count, count, timer.elapsed, 'lines')
+        guid_banlist = create_banlist(GuidBanlist, guid_path)
+        with Timer() as timer:
+            guid_banlist.refreshBanlistContent()
+        report('guid banlist load lines=%s' % count, count, timer.elapsed, 'lines')
+
+        # the regular expression lookups are slow: only run a tenth of them
+        regex_lookups = LOOKUPS // 10
+        with Timer() as timer:
+            found = sum(1 for ip in ip_lookups[:regex_lookups] if regex_ip_lookup(ip_content, ip, True))
+        report('ip regex (%s found)' % found, regex_lookups, timer.elapsed, 'lookups')
+        with Timer() as timer:
+            found = sum(1 for ip in ip_lookups if ip_banlist.isIpInBanlist(ip)[0])
+        report('ip index (%s found)' % found, LOOKUPS, timer.elapsed, 'lookups')
+        with Timer() as timer:
+            found = sum(1 for guid in guid_lookups[:regex_lookups] if regex_guid_lookup(guid_content, guid))
+        report('guid regex (%s found)' % found, regex_lookups, timer.elapsed, 'lookups')
+        with Timer() as timer:
+            found = sum(1 for guid in guid_lookups if guid_banlist.isGuidInBanlist(guid)[0])
+        report('guid index (%s found)' % found, LOOKUPS, timer.elapsed, 'lookups')
+
+        # both lookups must find the same banlist entries
+        for ip in ip_lookups[:regex_lookups]:
+            result = ip_banlist.isIpInBanlist(ip)
+            entry = regex_ip_lookup(ip_content, ip, True)
+            assert bool(result[0]) == bool(entry) and (not entry or repr(entry) in result[1]), ip
+    finally:
+        os.unlink(ip_path)
+        os.unlink(guid_path)
+
+
+if __name__ == '__main__':
+    main()
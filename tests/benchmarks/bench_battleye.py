@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the time needed by several threads to query a BattlEye server answering each command after a
+fixed latency, with the commands serialized by a lock (like the former global command lock did) and with
+the commands in flight at the same time.
+
+USAGE:
+    python -m tests.benchmarks.bench_battleye [latency in ms]
+"""
+
+import sys
+import threading
+import time
+
+from mock import patch
+from b3.parsers.battleye import protocol
+from b3.parsers.battleye.protocol import BattleyeServer
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+from tests.core.parsers.battleye.test_protocol import FakeBattleyeServer
+
+COMMANDS = ('players', 'bans', 'admins')
+THREADS = 4
+ROUNDS = 10
+
+
+def run_threads(target):
+    """
+    Run the target function in THREADS threads.
+    :return: The elapsed seconds
+    """
+    threads = [threading.Thread(target=target) for i in range(THREADS)]
+    with Timer() as timer:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return timer.elapsed
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else .02
+    server = FakeBattleyeServer()
+    for command in COMMANDS:
+        server.responses[command] = '%s response' % command
+        server.delays[command] = latency
+    with patch.object(protocol.time, 'sleep'):
+        conn = BattleyeServer('127.0.0.1', server.port, 'password')
+    while not (conn.connected and conn.write_thread):
+        time.sleep(.01)
+    lock = threading.Lock()
+
+    def serialized():
+        for i in range(ROUNDS):
+            for command in COMMANDS:
+                with lock:
+                    conn.command(command)
+
+    def concurrent():
+        for i in range(ROUNDS):
+            for command in COMMANDS:
+                conn.command(command)
+
+    try:
+        count = THREADS * ROUNDS * len(COMMANDS)
+        report('serialized (latency %sms)' % (latency * 1000), count, run_threads(serialized), 'commands')
+        report('concurrent (latency %sms)' % (latency * 1000), count, run_threads(concurrent), 'commands')
+    finally:
+        conn.stop()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
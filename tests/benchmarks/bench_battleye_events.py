@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the time spent by the BattlEye parsers to find the handler of the server messages, with the
+former chain of startswith/endswith tests and with the routing tables.
+
+USAGE:
+    python -m tests.benchmarks.bench_battleye_events [number of messages]
+"""
+
+import sys
+
+from b3.parsers.battleye.abstractParser import AbstractParser
+from tests.benchmarks import Timer
+from tests.benchmarks import battleye_messages
+from tests.benchmarks import report
+
+
+def former_route(message):
+    """
+    Find the handler of a message like the former routeBattleyeEvent did.
+    """
+    if message.startswith('RCon admin #'):
+        return 'OnServerMessage', message[12:]
+    elif message.startswith('Player #'):
+        if message.endswith(' disconnected'):
+            return 'OnPlayerLeave', message[8:len(message)-13]
+        elif message.endswith(' connected'):
+            return 'OnPlayerConnected', message[8:len(message)-10]
+        elif message.endswith('(unverified)'):
+            return 'OnUnverifiedGUID', message[8:len(message)-13]
+        elif message.find(' has been kicked by BattlEye: '):
+            return 'OnBattleyeKick', message[8:]
+        else:
+            return 'OnUnknownEvent', None
+    elif message.startswith('Verified GUID'):
+        return 'OnVerifiedGUID', message[15:]
+    elif message.startswith('(Lobby)'):
+        return 'OnPlayerChat', message[8:] + ' (Lobby)'
+    elif message.startswith('(Global)'):
+        return 'OnPlayerChat', message[9:] + ' (Global)'
+    elif message.startswith('(Direct)'):
+        return 'OnPlayerChat', message[9:] + ' (Direct)'
+    elif message.startswith('(Vehicle)'):
+        return 'OnPlayerChat', message[10:] + ' (Vehicle)'
+    elif message.startswith('(Group)'):
+        return 'OnPlayerChat', message[8:] + ' (Group)'
+    elif message.startswith('(Side)'):
+        return 'OnPlayerChat', message[7:] + ' (Side)'
+    elif message.startswith('(Command)'):
+        return 'OnPlayerChat', message[10:] + ' (Command)'
+    elif message.startswith('(Unknown)'):
+        return 'OnPlayerChat', message[10:] + ' (Unknown)'
+    elif message.find(' Log: #') != -1:
+        return 'OnBattleyeScriptLog', message
+    else:
+        return 'OnUnknownEvent', None
+
+
+class Router(object):
+    """
+    Stand-in parser holding the BattlEye routing tables.
+    """
+    _battleyeEvents = AbstractParser._battleyeEvents
+    _battleyePlayerEvents = AbstractParser._battleyePlayerEvents
+    getBattleyeEventRoute = AbstractParser.getBattleyeEventRoute.im_func
+
+    def debug(self, msg, *args, **kwargs):
+        pass
+
+
+def run(route, messages):
+    """
+    Find the handler of every message.
+    :return: The elapsed seconds
+    """
+    with Timer() as timer:
+        for message in messages:
+            route(message)
+    return timer.elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    messages = [unicode(x) for x in battleye_messages(count)]
+    router = Router()
+    for message in messages[:1000]:
+        assert former_route(message) == router.getBattleyeEventRoute(message), message
+    report('if/elif chain', count, run(former_route, messages), 'messages')
+    report('routing tables', count, run(router.getBattleyeEventRoute, messages), 'messages')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the chat lines checked per second by the censor plugin with a large list of badword rules, trying
+every rule one by one (the former check) and using the merged rules matcher.
+
+USAGE:
+    python -m tests.benchmarks.bench_censor [number of rules]
+"""
+
+import random
+import re
+import sys
+
+from b3.config import XmlConfigParser
+from b3.plugins.censor import CensorData
+from b3.plugins.censor import CensorMatcher
+from tests.benchmarks import Timer
+from tests.benchmarks import iourt43_log_lines
+from tests.benchmarks import report
+
+_reSay = re.compile(r'^\s*\d+:\d+\s*say(?:team)?: \d+ [^:]+: (?P<text>.*)$')
+_reClean = re.compile(r'[^0-9a-z ]+', re.I)
+
+
+def create_rules(count, seed=1):
+    """
+    Create badword rules: the ones of the default configuration file followed by generated plain words.
+    """
+    conf = XmlConfigParser()
+    conf.load('b3/conf/plugin_censor.xml')
+    rules = []
+    for e in conf.get('badwords/badword'):
+        word_node = e.find('word')
+        regexp_node = e.find('regexp')
+        if regexp_node is not None:
+            pattern = regexp_node.text.strip()
+        else:
+            pattern = '\\s' + word_node.text.strip() + '\\s'
+        rules.append(CensorData(name=e.get('name'), penalty=None, regexp=re.compile(pattern, re.IGNORECASE)))
+    rnd = random.Random(seed)
+    while len(rules) < count:
+        word = ''.join(rnd.choice('bcdfgjkpqvwxz') for i in range(rnd.randint(5, 9)))
+        rules.append(CensorData(name=word, penalty=None, regexp=re.compile('\\s%s\\s' % word, re.IGNORECASE)))
+    return rules[:count]
+
+
+def chat_lines():
+    """
+    Return the chat lines of the benchmark game log, with their cleaned version.
+    """
+    lines = []
+    for line in iourt43_log_lines(rounds=20):
+        m = _reSay.match(line)
+        if m:
+            text = m.group('text')
+            lines.append((' ' + text + ' ', ' ' + _reClean.sub(' ', text.lower()) + ' '))
+    return lines
+
+
+def run_loop(rules, lines):
+    """
+    Try every rule one by one on the raw and the cleaned text.
+    :return: A tuple (number of penalized lines, elapsed seconds)
+    """
+    penalized = 0
+    with Timer() as timer:
+        for text, cleaned in lines:
+            for rule in rules:
+                if rule.regexp.search(text) or rule.regexp.search(cleaned):
+                    penalized += 1
+                    break
+    return penalized, timer.elapsed
+
+
+def run_matcher(rules, lines):
+    """
+    Check the lines with the merged rules matcher.
+    :return: A tuple (number of penalized lines, elapsed seconds)
+    """
+    penalized = 0
+    matcher = CensorMatcher(rules)
+    with Timer() as timer:
+        for text, cleaned in lines:
+            if matcher.search(text, cleaned)[0]:
+                penalized += 1
+    return penalized, timer.elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    rules = create_rules(count)
+    lines = chat_lines()
+    penalized, elapsed = run_loop(rules, lines)
+    report('loop rules=%s (%s penalized)' % (count, penalized), len(lines), elapsed, 'lines')
+    penalized, elapsed = run_matcher(rules, lines)
+    report('matcher rules=%s (%s penalized)' % (count, penalized), len(lines), elapsed, 'lines')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+"""
+Measure the time spent by the cron scheduler to find the tabs to run over one hour of simulated
+clock, checking every tab each second (the former scheduler loop) and popping the due tabs from
+the next run time heap.
+
+USAGE:
+    python -m tests.benchmarks.bench_cron [number of tabs]
+"""
+
+import random
+import sys
+import time
+
+from mock import Mock
+from b3.cron import Cron
+from b3.cron import CronTab
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+
+SECONDS = 3600
+START = 1400000000
+
+
+def create_tabs(count, seed=1):
+    """
+    Create cron tabs with rates similar to the ones used by the B3 plugins.
+    :param count: The number of tabs to create
+    :param seed: The random generator seed
+    """
+    rnd = random.Random(seed)
+    tabs = []
+    for i in range(count):
+        kind = rnd.randint(0, 3)
+        if kind == 0:
+            tab = CronTab(lambda: None, second='*/%s' % rnd.choice((5, 10, 15, 30)))
+        elif kind == 1:
+            tab = CronTab(lambda: None, second=rnd.randint(0, 59), minute='*/%s' % rnd.choice((1, 2, 5, 10)))
+        elif kind == 2:
+            tab = CronTab(lambda: None, second=rnd.randint(0, 59), minute=rnd.randint(0, 59))
+        else:
+            tab = CronTab(lambda: None, second=0, minute=rnd.randint(0, 59), hour=rnd.randint(0, 23))
+        tabs.append(tab)
+    return tabs
+
+
+def run_scan(tabs):
+    """
+    Match every tab each second.
+    :return: A tuple (number of runs, elapsed seconds)
+    """
+    cron = Cron(Mock(), workers=0)
+    with Timer() as timer:
+        for now in xrange(START, START + SECONDS):
+            t = time.gmtime(now)
+            for tab in tabs:
+                if tab.match(t):
+                    cron.execute(tab)
+    return sum(tab.numRuns for tab in tabs), timer.elapsed
+
+
+def run_heap(tabs):
+    """
+    Pop the due tabs from the scheduler heap each second.
+    :return: A tuple (number of runs, elapsed seconds)
+    """
+    cron = Cron(Mock(), workers=0)
+    cron.time = lambda: START - 1
+    for tab in tabs:
+        cron.add(tab)
+    with Timer() as timer:
+        for now in xrange(START, START + SECONDS):
+            cron._runDue(now)
+    return sum(tab.numRuns for tab in tabs), timer.elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    runs, elapsed = run_scan(create_tabs(count))
+    report('scan tabs=%s (%s runs)' % (count, runs), SECONDS, elapsed, 'seconds')
+    runs, elapsed = run_heap(create_tabs(count))
+    report('heap tabs=%s (%s runs)' % (count, runs), SECONDS, elapsed, 'seconds')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the time needed to query a Frostbite server answering each command after a fixed latency,
+sending the commands one at a time and sending them in batches of 3 (admin.listPlayers, serverInfo
+and mapList.list, like the poweradmin and parser cron jobs do), from several threads.
+
+USAGE:
+    python -m tests.benchmarks.bench_frostbite [latency in ms]
+"""
+
+import sys
+import threading
+import time
+
+from mock import patch
+from b3.parsers.frostbite2 import protocol
+from b3.parsers.frostbite2.protocol import FrostbiteServer
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+from tests.core.parsers.frostbite2.test_protocol import FakeFrostbiteServer
+
+COMMANDS = (('admin.listPlayers', 'all'), ('serverInfo',), ('mapList.list',))
+THREADS = 4
+ROUNDS = 20
+
+
+def run_threads(target):
+    """
+    Run the target function in THREADS threads.
+    :return: The elapsed seconds
+    """
+    threads = [threading.Thread(target=target) for i in range(THREADS)]
+    with Timer() as timer:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return timer.elapsed
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else .01
+    server = FakeFrostbiteServer()
+    for command in COMMANDS:
+        server.delays[command[0]] = latency
+    with patch.object(protocol.time, 'sleep'):
+        conn = FrostbiteServer('127.0.0.1', server.server_address[1])
+    while not conn.connected:
+        time.sleep(.01)
+
+    def one_at_a_time():
+        for i in range(ROUNDS):
+            for command in COMMANDS:
+                conn.command(command)
+
+    def batch():
+        for i in range(ROUNDS):
+            for future in conn.commands(*COMMANDS):
+                future.result()
+
+    try:
+        count = THREADS * ROUNDS * len(COMMANDS)
+        report('one at a time (latency %sms)' % (latency * 1000), count, run_threads(one_at_a_time), 'commands')
+        report('batch (latency %sms)' % (latency * 1000), count, run_threads(batch), 'commands')
+    finally:
+        conn.stop()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
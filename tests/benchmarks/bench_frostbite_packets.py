@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the Frostbite packets encoding and decoding throughput, with a full 64 players server
+admin.listPlayers response and chat events received in 8KB network reads, comparing the former
+string based decoder (buffer concatenation and slicing) with the PacketBuffer one.
+
+USAGE:
+    python -m tests.benchmarks.bench_frostbite_packets [number of packets]
+"""
+
+import sys
+
+from struct import pack
+from struct import unpack
+from b3.parsers.frostbite.protocol import DecodePacket
+from b3.parsers.frostbite.protocol import EncodePacket
+from b3.parsers.frostbite.protocol import PacketBuffer
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+
+
+def former_encode(isFromServer, isResponse, sequence, words):
+    header = sequence & 0x3fffffff
+    if isFromServer:
+        header += 0x80000000
+    if isResponse:
+        header += 0x40000000
+    size = 0
+    encodedWords = ''
+    for word in words:
+        strWord = str(word)
+        encodedWords += pack('<I', len(strWord))
+        encodedWords += strWord
+        encodedWords += '\x00'
+        size += len(strWord) + 5
+    return pack('<I', header) + pack('<I', size + 12) + pack('<I', len(words)) + encodedWords
+
+
+def former_decode(data):
+    [header] = unpack('<I', data[0:4])
+    size = unpack('<I', data[4:8])[0] - 12
+    data = data[12:]
+    words = []
+    offset = 0
+    while offset < size:
+        wordLen = unpack('<I', data[offset:offset + 4])[0]
+        words.append(data[offset + 4:offset + 4 + wordLen])
+        offset += wordLen + 5
+    return [header & 0x80000000, header & 0x40000000, header & 0x3fffffff, words]
+
+
+def former_stream(chunks, handle):
+    """
+    Decode the packets like the former asyncore dispatcher did.
+    """
+    buffer_in = ''
+    for data in chunks:
+        buffer_in += data
+        while len(buffer_in) >= 8 and len(buffer_in) >= unpack('<I', buffer_in[4:8])[0]:
+            packetSize = unpack('<I', buffer_in[4:8])[0]
+            packet = buffer_in[0:packetSize]
+            buffer_in = buffer_in[packetSize:len(buffer_in)]
+            handle(former_decode(packet))
+
+
+def buffer_stream(chunks, handle):
+    """
+    Decode the packets with a PacketBuffer.
+    """
+    packet_buffer = PacketBuffer()
+    for data in chunks:
+        packet_buffer.feed(data)
+        packet = packet_buffer.read()
+        while packet is not None:
+            handle(packet)
+            packet = packet_buffer.read()
+
+
+def list_players_words():
+    fields = ['name', 'guid', 'teamId', 'squadId', 'kills', 'deaths', 'score', 'rank', 'ping', 'type']
+    words = ['OK', str(len(fields))] + fields + ['64']
+    for i in range(64):
+        words += ['Player%02d' % i, 'EA_%032X' % (i * 7919), str(i % 2 + 1), str(i % 8), '12', '3', '1450', '87',
+                  '45', '0']
+    return words
+
+
+def chat_words(i):
+    return ['player.onChat', 'Player%02d' % (i % 64), 'gg everyone, nice round number %s' % i, 'all']
+
+
+def chunked(data, size=8192):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def repeat(func, count):
+    for i in xrange(count):
+        func(i)
+
+
+def run(label, func, count, unit):
+    with Timer() as timer:
+        func()
+    report(label, count, timer.elapsed, unit)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    players = list_players_words()
+    assert former_encode(False, True, 1, players) == EncodePacket(False, True, 1, players)
+    run('encode listPlayers former', lambda: repeat(lambda i: former_encode(False, True, i, players), count),
+        count, 'packets')
+    run('encode listPlayers', lambda: repeat(lambda i: EncodePacket(False, True, i, players), count),
+        count, 'packets')
+
+    packet = EncodePacket(False, True, 1, players)
+    assert former_decode(packet) == DecodePacket(packet)
+    run('decode listPlayers former', lambda: repeat(lambda i: former_decode(packet), count), count, 'packets')
+    run('decode listPlayers', lambda: repeat(lambda i: DecodePacket(packet), count), count, 'packets')
+
+    for name, words in (('listPlayers', lambda i: players), ('chat events', chat_words)):
+        chunks = chunked(''.join(EncodePacket(True, False, i, words(i)) for i in xrange(count)))
+        former_packets = []
+        buffer_packets = []
+        former_stream(chunks[:100], former_packets.append)
+        buffer_stream(chunks[:100], buffer_packets.append)
+        assert former_packets == buffer_packets
+        run('stream %s former' % name, lambda: former_stream(chunks, len), count, 'packets')
+        run('stream %s' % name, lambda: buffer_stream(chunks, len), count, 'packets')
+
+
+if __name__ == '__main__':
+    main()
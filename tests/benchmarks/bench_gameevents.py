@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the game events routed per second by the CS:GO parser GameEventRouter, trying every regular expression
+in declaration order (the former routing) and using the router literal pre-filter and hit ordering.
+
+USAGE:
+    python -m tests.benchmarks.bench_gameevents [csgo games.log]
+"""
+
+import re
+import sys
+
+from b3.parsers.csgo import RE_HL_LOG_LINE
+from b3.parsers.csgo import ger
+from tests.benchmarks import Timer
+from tests.benchmarks import csgo_log_lines
+from tests.benchmarks import report
+
+
+def read_events(path=None):
+    """
+    Return the game events (log lines without their timestamp) of the given CS:GO log file,
+    or of a synthetic log when no file is given.
+    """
+    if path:
+        with open(path) as f:
+            lines = [x.rstrip('\r\n') for x in f]
+    else:
+        lines = list(csgo_log_lines(rounds=100))
+    events = []
+    for line in lines:
+        m = re.match(RE_HL_LOG_LINE, line.decode('UTF-8', 'replace'))
+        if m and m.group('data'):
+            events.append(m.group('data'))
+    return events
+
+
+def scan_handler(gameEvent):
+    """
+    Route the game event the way the GameEventRouter used to.
+    """
+    for regex, hfunc in ger._gameevents_mapping:
+        match = regex.match(gameEvent)
+        if match:
+            return hfunc, match.groupdict()
+    return None, {}
+
+
+def main():
+    events = read_events(sys.argv[1] if len(sys.argv) > 1 else None)
+
+    with Timer() as timer:
+        scanned = [scan_handler(x)[0] for x in events]
+    report('declaration order scan', len(events), timer.elapsed, 'events')
+    with Timer() as timer:
+        routed = [ger.getHandler(x)[0] for x in events]
+    report('router', len(events), timer.elapsed, 'events')
+    assert scanned == routed, 'the router and the scan picked different handlers'
+
+    print
+    print 'hits per regular expression:'
+    for pattern, name, hits in sorted(ger.getHits(), key=lambda x: -x[2]):
+        if hits:
+            print '%8s  %-28s %s' % (hits, name, pattern[:70])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+"""
+Measure the q3a line matching (getLineParts) and action dispatching (parseLine) throughput of the Urban Terror
+parsers, comparing the indexed line formats and the cached action handlers with the sequential scan of all the
+line formats and the per line handler name lookup.
+
+USAGE:
+    python -m tests.benchmarks.bench_lineparsing [games.log]
+"""
+
+import re
+import string
+import sys
+
+from b3.parsers.iourt41 import Iourt41Parser
+from b3.parsers.iourt42 import Iourt42Parser
+from b3.parsers.iourt43 import Iourt43Parser
+from tests.benchmarks import Timer
+from tests.benchmarks import create_iourt_parser
+from tests.benchmarks import iourt43_log_lines
+from tests.benchmarks import report
+
+
+def sequential_getLineParts(console, line):
+    """
+    Match a log line against every line format in sequence.
+    """
+    line = re.sub(console._lineClear, '', line, 1)
+    m = None
+    for f in console._lineFormats:
+        m = re.match(f, line)
+        if m:
+            break
+    if m:
+        try:
+            data = m.group('data').strip()
+        except IndexError:
+            data = None
+        return m, m.group('action').lower(), data, None, None
+
+
+def sequential_getActionHandler(console, action):
+    """
+    Lookup an action handler building its name.
+    """
+    func = 'On%s' % string.capwords(action).replace(' ', '')
+    if hasattr(console, func):
+        return getattr(console, func)
+
+
+def bench_matching(console, lines, getLineParts):
+    with Timer() as t:
+        for line in lines:
+            getLineParts(line)
+    return t.elapsed
+
+
+def bench_dispatching(console, parts, getActionHandler):
+    with Timer() as t:
+        for action in parts:
+            getActionHandler(action)
+    return t.elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            lines = [x.strip() for x in f if x.strip()]
+    else:
+        lines = list(iourt43_log_lines(rounds=20, players=24, kills_per_round=500))
+
+    for parser_class in (Iourt41Parser, Iourt42Parser, Iourt43Parser):
+        console = create_iourt_parser(parser_class)
+        name = parser_class.__name__
+
+        elapsed = bench_matching(console, lines, lambda x: sequential_getLineParts(console, x))
+        report('%s getLineParts (sequential)' % name, len(lines), elapsed)
+        elapsed = bench_matching(console, lines, console.getLineParts)
+        report('%s getLineParts (indexed)' % name, len(lines), elapsed)
+
+        actions = [p[1] for p in (console.getLineParts(x) for x in lines) if p]
+        elapsed = bench_dispatching(console, actions, lambda x: sequential_getActionHandler(console, x))
+        report('%s action lookup (per line)' % name, len(actions), elapsed, 'actions')
+        elapsed = bench_dispatching(console, actions, console.getActionHandler)
+        report('%s action lookup (cached)' % name, len(actions), elapsed, 'actions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+"""
+Measure the number of events per second going through the B3 game log reading loop (Parser.run), the event
+queue (Parser.queueEvent) and the event handler thread (Parser.handleEvents) with the 'fixed' and the 'adaptive'
+game log pacing modes.
+
+USAGE:
+    python -m tests.benchmarks.bench_pacing [games.log]
+"""
+
+import StringIO
+import os
+import sys
+import tempfile
+import thread
+import threading
+import time
+import types
+
+from b3.events import EventQueue
+from b3.events import EventsStats
+from b3.parser import Parser
+from b3.parsers.iourt43 import Iourt43Parser
+from tests.benchmarks import create_iourt_parser
+from tests.benchmarks import report
+from tests.benchmarks import write_iourt43_log
+
+
+class CountingHandler(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def isEnabled(self):
+        return True
+
+    def parseEvent(self, event):
+        self.count += 1
+
+
+class FakeOutput(object):
+
+    def close(self):
+        pass
+
+
+def replay(path, pacing):
+    """
+    Replay a game log through the parser reading loop using the given pacing mode.
+    :param path: The game log file path
+    :param pacing: The pacing mode
+    :return: A tuple (number of lines, number of handled events, elapsed seconds)
+    """
+    console = create_iourt_parser(Iourt43Parser)
+    console.screen = StringIO.StringIO()
+    console.output = FakeOutput()
+    console.pacing = pacing
+    console.queue = EventQueue(50)
+    console._eventsStats = EventsStats(console)
+    console._dispatcher = None
+    console.working = True
+    console.input = open(path, 'r')
+    handler = CountingHandler()
+    console._handlers = dict((event_id, [handler]) for event_id in console.Events.events.values())
+
+    with open(path) as f:
+        lines = sum(1 for line in f if line.strip())
+
+    parsed = [0]
+    original_parseLine = console.parseLine
+
+    def parseLine(line):
+        original_parseLine(line)
+        parsed[0] += 1
+
+    queued = [0]
+    original_queueEvent = types.MethodType(Parser.queueEvent, console)
+
+    def queueEvent(event, expire=10):
+        if original_queueEvent(event, expire):
+            queued[0] += 1
+
+    console.parseLine = parseLine
+    console.queueEvent = queueEvent
+    console.run = types.MethodType(Parser.run, console)
+    console.handleEvents = types.MethodType(Parser.handleEvents, console)
+
+    def stop_when_done():
+        while parsed[0] < lines or not console.queue.empty() or handler.count < queued[0]:
+            time.sleep(.001)
+        console.working = False
+
+    threading.Thread(target=stop_when_done).start()
+    thread.start_new_thread(console.handleEvents, ())
+    start = time.time()
+    console.run()
+    elapsed = time.time() - start
+    return lines, handler.count, elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+        cleanup = False
+    else:
+        fd, path = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+        write_iourt43_log(path, rounds=1, players=16, kills_per_round=150)
+        cleanup = True
+
+    try:
+        for pacing in ('fixed', 'adaptive'):
+            lines, events, elapsed = replay(path, pacing)
+            report('pacing=%s (lines)' % pacing, lines, elapsed, 'lines')
+            report('pacing=%s (events)' % pacing, events, elapsed, 'events')
+    finally:
+        if cleanup:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+"""
+Measure the chat lines per second handled by the spamcontrol plugin bookkeeping, storing the spam points
+in client variables (the former bookkeeping) and in the rate limiter slots.
+
+USAGE:
+    python -m tests.benchmarks.bench_spamcontrol [number of chat lines]
+"""
+
+import random
+import re
+import sys
+
+from b3.clients import Client
+from b3.ratelimit import RateLimiter
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+
+MAX_SPAMINS = 10
+FALLOFF_RATE = 6.5
+
+
+def create_chat(count, players=32, seed=1):
+    """
+    Return a list of (time, client index, text) chat lines.
+    """
+    rnd = random.Random(seed)
+    texts = ['gg', 'nice shot', '^1lol', 'QUICKMESSAGE_1', '!help', 'rush B', 'ty', 'noob']
+    now = 0.0
+    chat = []
+    for i in xrange(count):
+        now += rnd.random()
+        chat.append((now, rnd.randrange(players), rnd.choice(texts)))
+    return chat
+
+
+def message_points(text, last_message):
+    color = re.match(r'\^[0-9]', text)
+    if color and text == last_message:
+        points = 5
+    elif text == last_message:
+        points = 3
+    elif color or text.startswith('QUICKMESSAGE_'):
+        points = 2
+    else:
+        points = 1
+    if text[:1] == '!':
+        points += 1
+    return points
+
+
+def run_clientvars(chat, clients):
+    """
+    Keep the spam points in client variables.
+    :return: A tuple (number of warnings, elapsed seconds)
+    """
+    plugin = object()
+    warnings = 0
+    with Timer() as timer:
+        for now, index, text in chat:
+            client = clients[index]
+            if client.var(plugin, 'ignore_till', now).value > now:
+                continue
+            points = message_points(text, client.var(plugin, 'last_message').value)
+            gap = now - client.var(plugin, 'last_message_time', now).value
+            if gap < 2:
+                points += 1
+            spamins = client.var(plugin, 'spamins', 0).value + points - int(gap / FALLOFF_RATE)
+            if spamins < 1:
+                spamins = 0
+            client.setvar(plugin, 'spamins', spamins)
+            client.setvar(plugin, 'last_message_time', now)
+            client.setvar(plugin, 'last_message', text)
+            if spamins >= MAX_SPAMINS:
+                client.setvar(plugin, 'ignore_till', now + 2)
+                client.setvar(plugin, 'spamins', int(spamins / 1.5))
+                warnings += 1
+    return warnings, timer.elapsed
+
+
+def run_limiter(chat, clients):
+    """
+    Keep the spam points in the rate limiter slots.
+    :return: A tuple (number of warnings, elapsed seconds)
+    """
+    limiter = RateLimiter(capacity=MAX_SPAMINS, falloff=FALLOFF_RATE, ignore=2)
+    warnings = 0
+    with Timer() as timer:
+        for now, index, text in chat:
+            slot = limiter.slot(clients[index])
+            if limiter.isIgnored(slot, now):
+                continue
+            points = message_points(text, slot.lastData)
+            gap = slot.gap(now)
+            if gap is None or gap < 2:
+                points += 1
+            if limiter.add(slot, points, text, now):
+                warnings += 1
+    return warnings, timer.elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    chat = create_chat(count)
+    warnings, elapsed = run_clientvars(chat, [Client(cid=str(i)) for i in range(32)])
+    report('client variables (%s warnings)' % warnings, count, elapsed, 'lines')
+    warnings, elapsed = run_limiter(chat, [Client(cid=str(i)) for i in range(32)])
+    report('rate limiter (%s warnings)' % warnings, count, elapsed, 'lines')
+
+
+if __name__ == '__main__':
+    main()
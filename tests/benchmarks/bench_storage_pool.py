@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+"""
+Measure the number of queries per second executed by several threads sharing the B3 storage layer
+with a single database connection and with a connection pool.
+
+The storage layer runs on a SQLite database file wrapped in a stand-in connection which waits a few
+milliseconds on every query to simulate the network round trip of a MySQL or PostgreSQL server.
+
+USAGE:
+    python -m tests.benchmarks.bench_storage_pool [latency in ms]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+from mock import Mock
+from time import sleep
+from b3.functions import splitDSN
+from b3.storage.sqlite import SqliteStorage
+from tests.benchmarks import Timer
+from tests.benchmarks import report
+
+THREADS = 8
+QUERIES_PER_THREAD = 200
+
+
+class LatencyCursor(object):
+
+    def __init__(self, cursor, latency):
+        self._cursor = cursor
+        self._latency = latency
+
+    def execute(self, *args):
+        # sleep like a thread waiting on a socket: other threads can run meanwhile
+        sleep(self._latency)
+        return self._cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class LatencyConnection(object):
+
+    def __init__(self, path, latency):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.isolation_level = None
+        self._latency = latency
+
+    def cursor(self):
+        return LatencyCursor(self._connection.cursor(), self._latency)
+
+    def close(self):
+        self._connection.close()
+
+
+def create_storage(path, latency, poolsize):
+    """
+    Create a storage layer running queries through stand-in connections.
+    :param path: The SQLite database file path
+    :param latency: The time spent by every query waiting for the database server (in seconds)
+    :param poolsize: The maximum size of the connection pool (0 to use a single connection)
+    """
+    storage = SqliteStorage('sqlite://' + path, splitDSN('sqlite://' + path), Mock())
+    storage.connect()
+    storage.db = LatencyConnection(path, latency)
+    storage._createConnection = lambda: LatencyConnection(path, latency)
+    storage.setPoolSize(1, poolsize)
+    storage._startPool()
+    return storage
+
+
+def run(storage):
+    """
+    Run queries on the given storage layer from several threads.
+    :return: A tuple (number of queries, elapsed seconds)
+    """
+    def worker(num):
+        for i in range(QUERIES_PER_THREAD):
+            cursor = storage.query("SELECT data_value FROM data WHERE data_key = ?", ('key%s' % ((num + i) % 100),))
+            cursor.close()
+
+    threads = [threading.Thread(target=worker, args=(num,)) for num in range(THREADS)]
+    with Timer() as timer:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return THREADS * QUERIES_PER_THREAD, timer.elapsed
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.002
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.unlink(path)
+
+    try:
+        storage = create_storage(path, 0, 0)
+        for i in range(100):
+            storage.query("INSERT INTO data (data_key, data_value) VALUES (?, ?)", ('key%s' % i, 'value%s' % i))
+        storage.shutdown()
+
+        for poolsize in (0, 2, 4, 8):
+            storage = create_storage(path, latency, poolsize)
+            queries, elapsed = run(storage)
+            storage._stopPool()
+            storage.shutdown()
+            report('threads=%s pool=%s' % (THREADS, poolsize), queries, elapsed, 'queries')
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+import binascii
+import socket
+import threading
+import time
+import unittest2 as unittest
+
+from mock import patch
+from struct import pack
+from b3.parsers.battleye import protocol
+from b3.parsers.battleye.protocol import BattleyeServer
+from b3.parsers.battleye.protocol import CommandFailedError
+from b3.parsers.battleye.protocol import CommandTimeoutError
+from b3.parsers.battleye.protocol import NetworkError
+
+
+def encode_packet(packet_type, sequence, data):
+    payload = '\xff' + chr(packet_type) + chr(sequence) + data
+    return 'BE' + pack('<I', binascii.crc32(payload) & 0xffffffff) + payload
+
+
+class FakeBattleyeServer(object):
+    """
+    Minimal BattlEye RCon server: accept any password and reply to commands with the configured responses.
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(.1)
+        self.port = self.sock.getsockname()[1]
+        self.client = None
+        self.requests = []
+        self.responses = {}     # command -> response (None for no reply)
+        self.delays = {}        # command -> response delay (in seconds)
+        self.part_size = None   # split responses in parts of that size
+        self.reverse_parts = False
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while not self._stop.is_set():
+            try:
+                data, self.client = self.sock.recvfrom(8192)
+            except socket.error:
+                continue
+            packet_type = ord(data[7])
+            if packet_type == 0:
+                self.sock.sendto(encode_packet(0, 1, ''), self.client)
+            elif packet_type == 1:
+                sequence, cmd = ord(data[8]), data[9:]
+                self.requests.append(cmd)
+                response = self.responses.get(cmd, '')
+                if response is None:
+                    continue
+                timer = threading.Timer(self.delays.get(cmd, 0), self.reply, (sequence, response))
+                timer.daemon = True
+                timer.start()
+
+    def reply(self, sequence, response):
+        if not self.part_size:
+            self.sock.sendto(encode_packet(1, sequence, response), self.client)
+            return
+        parts = [response[i:i + self.part_size] for i in range(0, len(response), self.part_size)]
+        packets = [encode_packet(1, sequence, '\x00' + chr(len(parts)) + chr(i) + part) for i, part in enumerate(parts)]
+        if self.reverse_parts:
+            packets.reverse()
+        for packet in packets:
+            self.sock.sendto(packet, self.client)
+
+    def event(self, message, sequence=0):
+        self.sock.sendto(encode_packet(2, sequence, message), self.client)
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join()
+        self.sock.close()
+
+
+class Test_BattleyeServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeBattleyeServer()
+        with patch.object(protocol.time, 'sleep'):
+            self.conn = BattleyeServer('127.0.0.1', self.server.port, 'password')
+        expire = time.time() + 5
+        while not (self.conn.connected and self.conn.write_thread) and time.time() < expire:
+            time.sleep(.01)
+        self.conn.command_timeout = 1
+
+    def tearDown(self):
+        self.conn.stop()
+        self.server.stop()
+
+    def test_command(self):
+        # GIVEN
+        self.server.responses['players'] = 'Players on server:\n(0 players in total)'
+        # THEN
+        self.assertEqual('Players on server:\n(0 players in total)', self.conn.command('players'))
+        self.assertEqual({}, self.conn.pending_commands)
+
+    def test_unknown_command(self):
+        # GIVEN
+        self.server.responses['foo'] = 'Unknown command'
+        # THEN
+        self.assertRaises(CommandFailedError, self.conn.command, 'foo')
+
+    def test_command_timeout(self):
+        # GIVEN
+        self.server.responses['foo'] = None
+        # THEN
+        self.assertRaises(CommandTimeoutError, self.conn.command, 'foo', .1)
+        self.assertEqual({}, self.conn.pending_commands)
+
+    def test_say_does_not_wait_for_pending_commands(self):
+        # GIVEN
+        self.server.responses['bans'] = 'GUID Bans:'
+        self.server.delays['bans'] = .5
+        future = self.conn.command_async('bans')
+        # WHEN
+        start = time.time()
+        self.conn.command('say -1 hello')
+        # THEN
+        self.assertLess(time.time() - start, .2)
+        self.assertEqual('GUID Bans:', future.result())
+
+    def test_commands_in_flight(self):
+        # GIVEN
+        self.server.responses['bans'] = 'GUID Bans:'
+        self.server.responses['players'] = 'Players on server:'
+        self.server.delays['bans'] = .3
+        # WHEN
+        bans = self.conn.command_async('bans')
+        players = self.conn.command_async('players')
+        # THEN
+        self.assertEqual('Players on server:', players.result())
+        self.assertFalse(bans.done())
+        self.assertEqual('GUID Bans:', bans.result())
+
+    def test_multipart_responses_in_flight(self):
+        # GIVEN
+        self.server.part_size = 10
+        self.server.reverse_parts = True
+        self.server.responses['bans'] = 'GUID Bans:\n' + '\n'.join('%s ban' % i for i in range(20))
+        self.server.responses['players'] = 'Players on server:\n' + '\n'.join('%s player' % i for i in range(20))
+        # WHEN
+        bans = self.conn.command_async('bans')
+        players = self.conn.command_async('players')
+        # THEN
+        self.assertEqual(self.server.responses['players'], players.result())
+        self.assertEqual(self.server.responses['bans'], bans.result())
+        self.assertEqual({}, self.conn._multi_packet_response)
+
+    def test_threads_waiting_for_their_own_response(self):
+        # GIVEN
+        results = {}
+        for i in range(10):
+            self.server.responses['cmd%s' % i] = 'response %s' % i
+            self.server.delays['cmd%s' % i] = .3 - i * .03
+
+        def run(i):
+            results[i] = self.conn.command('cmd%s' % i)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(10)]
+        # WHEN
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # THEN
+        self.assertEqual(dict((i, 'response %s' % i) for i in range(10)), results)
+
+    def test_stalled_commands(self):
+        # GIVEN
+        now = time.time()
+        self.conn.sent_data_seq = dict((seq, now) for seq in range(20))
+        self.conn.sent_data_seq[20] = now - 5
+        # THEN
+        self.assertListEqual([20], self.conn._stalled_commands())
+
+    def test_event(self):
+        # GIVEN
+        events = []
+        self.conn.subscribe(lambda message: events.append(message))
+        # WHEN
+        self.server.event('Player #1 Joe disconnected')
+        # THEN
+        expire = time.time() + 2
+        while not events and time.time() < expire:
+            time.sleep(.01)
+        self.assertEqual([u'Player #1 Joe disconnected'], events)
+
+    def test_stop_fails_pending_commands(self):
+        # GIVEN
+        self.server.responses['foo'] = None
+        future = self.conn.command_async('foo')
+        # WHEN
+        self.conn.stop()
+        # THEN
+        self.assertRaises(NetworkError, future.result)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+import socket
+import unittest2 as unittest
+
+from b3.parsers.frostbite.protocol import DecodePacket
+from b3.parsers.frostbite.protocol import EncodePacket
+from b3.parsers.frostbite.protocol import PacketBuffer
+
+
+class Test_packets(unittest.TestCase):
+
+    def test_encode(self):
+        self.assertEqual('\x05\x00\x00\x40\x1c\x00\x00\x00\x02\x00\x00\x00'
+                         '\x02\x00\x00\x00OK\x00\x04\x00\x00\x00True\x00',
+                         EncodePacket(False, True, 5, ['OK', True]))
+
+    def test_decode(self):
+        packet = EncodePacket(True, False, 42, ['player.onChat', 'Joe', 'hello', ''])
+        self.assertEqual([0x80000000, 0, 42, ['player.onChat', 'Joe', 'hello', '']], DecodePacket(packet))
+
+    def test_decode_bytearray_offset(self):
+        packet = EncodePacket(False, True, 3, ['OK', 'foo'])
+        data = bytearray('garbage' + packet + 'more')
+        words = DecodePacket(data, 7)[3]
+        self.assertEqual(['OK', 'foo'], words)
+        self.assertIs(str, type(words[1]))
+
+
+class Test_PacketBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = PacketBuffer()
+
+    def test_empty(self):
+        self.assertIsNone(self.buffer.read())
+        self.assertEqual(0, len(self.buffer))
+
+    def test_packet_split_over_many_reads(self):
+        # GIVEN
+        packet = EncodePacket(False, True, 7, ['OK'] + ['word %s' % i for i in range(100)])
+        # WHEN
+        for i in range(0, len(packet), 10):
+            self.assertIsNone(self.buffer.read())
+            self.buffer.feed(packet[i:i + 10])
+        # THEN
+        self.assertEqual(DecodePacket(packet), self.buffer.read())
+        self.assertIsNone(self.buffer.read())
+        self.assertEqual(0, len(self.buffer))
+
+    def test_many_packets_in_one_read(self):
+        # GIVEN
+        packets = [EncodePacket(True, False, i, ['event', str(i)]) for i in range(5)]
+        data = ''.join(packets)
+        # WHEN
+        self.buffer.feed(data[:-3])
+        # THEN
+        self.assertEqual([DecodePacket(p) for p in packets[:4]], [self.buffer.read() for i in range(4)])
+        self.assertIsNone(self.buffer.read())
+        self.buffer.feed(data[-3:])
+        self.assertEqual(DecodePacket(packets[4]), self.buffer.read())
+
+    def test_invalid_packet_size(self):
+        self.buffer.feed('\x00' * 16)
+        self.assertRaises(ValueError, self.buffer.read)
+
+    def test_receive(self):
+        # GIVEN
+        sock, server = socket.socketpair()
+        self.addCleanup(sock.close)
+        packet = EncodePacket(False, True, 1, ['OK', 'x' * 10000])
+        server.sendall(packet + packet[:20])
+        # THEN
+        self.assertEqual(DecodePacket(packet), self.buffer.receive(sock))
+        server.close()
+        self.assertRaises(socket.error, self.buffer.receive, sock)
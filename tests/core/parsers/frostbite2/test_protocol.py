@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+import SocketServer
+import socket
+import threading
+import time
+import unittest2 as unittest
+
+from mock import patch
+from b3.parsers.frostbite2 import protocol
+from b3.parsers.frostbite2.protocol import CommandFailedError
+from b3.parsers.frostbite2.protocol import CommandTimeoutError
+from b3.parsers.frostbite2.protocol import CommandUnknownCommandError
+from b3.parsers.frostbite2.protocol import DecodePacket
+from b3.parsers.frostbite2.protocol import EncodePacket
+from b3.parsers.frostbite2.protocol import FrostbiteServer
+from b3.parsers.frostbite2.protocol import NetworkError
+from b3.parsers.frostbite2.protocol import receivePacket
+
+
+class FakeFrostbiteHandler(SocketServer.BaseRequestHandler):
+    """
+    Reply to the command requests with the server responses, after the server delay.
+    """
+    def handle(self):
+        self.server.clients.append(self.request)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer_in = ''
+        while True:
+            try:
+                packet, buffer_in = receivePacket(self.request, buffer_in)
+            except Exception:
+                break
+            sequence, words = DecodePacket(packet)[2:]
+            self.server.requests.append(words)
+            response = self.server.responses.get(words[0], ['OK'])
+            if response is None:
+                continue
+            reply = EncodePacket(False, True, sequence, response)
+            delay = self.server.delays.get(words[0])
+            if delay:
+                timer = threading.Timer(delay, self.reply, (reply,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self.reply(reply)
+
+    def reply(self, packet):
+        with self.server.lock:
+            self.request.sendall(packet)
+
+
+class FakeFrostbiteServer(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), FakeFrostbiteHandler)
+        self.lock = threading.Lock()
+        self.clients = []
+        self.requests = []
+        self.responses = {}     # command -> response words (None for no reply)
+        self.delays = {}        # command -> reply delay (in seconds)
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        for client in self.clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            client.close()
+        self.shutdown()
+        self.server_close()
+
+
+class Test_FrostbiteServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeFrostbiteServer()
+        with patch.object(protocol.time, 'sleep'):
+            self.conn = FrostbiteServer('127.0.0.1', self.server.server_address[1], command_timeout=2)
+        expire = time.time() + 5
+        while not self.conn.connected and time.time() < expire:
+            time.sleep(.01)
+
+    def tearDown(self):
+        self.conn.stop()
+        self.server.stop()
+
+    def test_command(self):
+        # GIVEN
+        self.server.responses['serverInfo'] = ['OK', 'my server', '0', '16']
+        # THEN
+        self.assertEqual(['my server', '0', '16'], self.conn.command('serverInfo'))
+        self.assertEqual([], self.conn.command(('login.hashed', 'f00')))
+        self.assertEqual([['serverInfo'], ['login.hashed', 'f00']], self.server.requests)
+        self.assertEqual({}, self.conn.pending_commands)
+
+    def test_command_errors(self):
+        # GIVEN
+        self.server.responses['foo'] = ['UnknownCommand']
+        self.server.responses['bar'] = ['InvalidArguments']
+        # THEN
+        self.assertRaises(CommandUnknownCommandError, self.conn.command, 'foo')
+        self.assertRaises(CommandFailedError, self.conn.command, 'bar')
+
+    def test_command_timeout(self):
+        # GIVEN
+        self.server.responses['foo'] = None
+        # WHEN
+        future = self.conn.command_async('foo')
+        # THEN
+        self.assertRaises(CommandTimeoutError, future.result, .1)
+        self.assertEqual({}, self.conn.pending_commands)
+
+    def test_commands_in_flight(self):
+        # GIVEN
+        self.server.responses['slow'] = ['OK', 'slow']
+        self.server.responses['fast'] = ['OK', 'fast']
+        self.server.delays['slow'] = .3
+        # WHEN
+        slow = self.conn.command_async('slow')
+        fast = self.conn.command_async('fast')
+        # THEN
+        self.assertEqual(['fast'], fast.result())
+        self.assertFalse(slow.done())
+        self.assertEqual(['slow'], slow.result())
+
+    def test_commands_batch(self):
+        # GIVEN
+        self.server.responses['admin.listPlayers'] = ['OK', '0']
+        self.server.responses['serverInfo'] = ['OK', 'my server']
+        self.server.responses['mapList.list'] = ['OK', '0', '3']
+        for command in self.server.responses:
+            self.server.delays[command] = .2
+        # WHEN
+        start = time.time()
+        futures = self.conn.commands(('admin.listPlayers', 'all'), 'serverInfo', ('mapList.list',))
+        results = [f.result() for f in futures]
+        # THEN
+        self.assertEqual([['0'], ['my server'], ['0', '3']], results)
+        self.assertLess(time.time() - start, .4)
+        self.assertEqual([['admin.listPlayers', 'all'], ['serverInfo'], ['mapList.list']], self.server.requests)
+
+    def test_threads_waiting_for_their_own_reply(self):
+        # GIVEN
+        results = {}
+        for i in range(10):
+            self.server.responses['foo%s' % i] = ['OK', str(i)]
+            self.server.delays['foo%s' % i] = .3 - i * .03
+
+        def run(i):
+            results[i] = self.conn.command('foo%s' % i)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(10)]
+        # WHEN
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # THEN
+        self.assertEqual(dict((i, [str(i)]) for i in range(10)), results)
+
+    def test_connection_lost(self):
+        # GIVEN
+        self.server.responses['foo'] = None
+        future = self.conn.command_async('foo')
+        # WHEN
+        self.server.stop()
+        # THEN
+        self.assertRaises(NetworkError, future.result)
@@ -54,6 +54,79 @@ class Test(unittest.TestCase):
         assertGetCvar('mapname', '"mapname" is:"ut4_abbey^7"', ("mapname", 'ut4_abbey', None))
 
 
+class Test_getLineFormats(unittest.TestCase):
+
+    def setUp(self):
+        from b3.parsers.iourt43 import Iourt43Parser
+        self.parser = Mock(spec=Iourt43Parser)
+        self.parser._lineKey = Iourt43Parser._lineKey
+        self.parser._lineFormatLead = Iourt43Parser._lineFormatLead
+        self.parser._lineFormats = Iourt43Parser._lineFormats
+        self.parser._lineFormatsIndex = None
+
+    def getLineFormats(self, line):
+        return AbstractParser.getLineFormats(self.parser, line)
+
+    def assertSameMatch(self, line):
+        expected = None
+        for f in self.parser._lineFormats:
+            expected = f.match(line)
+            if expected:
+                break
+        actual = None
+        for f in self.getLineFormats(line):
+            actual = f.match(line)
+            if actual:
+                break
+        if expected is None:
+            self.assertIsNone(actual)
+        else:
+            self.assertEqual(expected.re, actual.re)
+            self.assertEqual(expected.groupdict(), actual.groupdict())
+
+    def test_formats_keep_declaration_order(self):
+        formats = self.getLineFormats('Radio: 0 - 7 - 2 - "New Alley" - "I\'m going for the flag"')
+        indexes = [self.parser._lineFormats.index(f) for f in formats]
+        self.assertListEqual(sorted(indexes), indexes)
+
+    def test_literal_formats_are_filtered_out(self):
+        formats = self.getLineFormats('Kill: 0 1 38: Patate killed psyp by UT_MOD_GLOCK')
+        patterns = [f.pattern for f in formats]
+        self.assertFalse([p for p in patterns if p.startswith('^(?P<action>Radio)')])
+        self.assertTrue([p for p in patterns if p.startswith('^(?P<action>[a-z]+)')])
+        self.assertLess(len(formats), len(self.parser._lineFormats))
+
+    def test_index_is_cached(self):
+        self.assertIs(self.getLineFormats('Kill: 0 1 38: Joe killed Bob by UT_MOD_GLOCK'),
+                      self.getLineFormats('Kill: 1 0 38: Bob killed Joe by UT_MOD_GLOCK'))
+
+    def test_same_match_as_sequential_scan(self):
+        for line in (r'''Radio: 0 - 7 - 2 - "New Alley" - "I'm going for the flag"''',
+                     r'''Callvote: 1 - "map dressingroom"''',
+                     r'''Vote: 0 - 2''',
+                     r'''VotePassed: 1 - 0 - "reload"''',
+                     r'''FlagCaptureTime: 0: 1234567890''',
+                     r'''Hit: 6 3 5 8: Fat'Matic hit [FR]d4dou in the Torso''',
+                     r'''Kill: 0 1 38: Patate killed psyp by UT_MOD_GLOCK''',
+                     r'''say: 6 ^5Marcel^2[^6CZARMY^2]: !help''',
+                     r'''ClientJumpRunStopped: 0 - way: 1 - time: 12345 - attempt: 1 of 5''',
+                     r'''ClientSavePosition: 0 - 335.384887 - 67.469154 - -23.875000''',
+                     r'''ClientGoto: 0 - 1 - 335.384887 - 67.469154 - -23.875000''',
+                     r'''ClientSpawn: 0''',
+                     r'''Freeze: 0 1 16: Alice froze Bob by UT_MOD_SPAS''',
+                     r'''ThawOutStarted: 0 1: Alice started thawing out Biddle''',
+                     r'''Assist: 0 14 15: -[TPF]-PtitBigorneau assisted Bot1 to kill Bot2''',
+                     r'''Flag Return: RED''',
+                     r'''Bombholder is 2''',
+                     r'''Bomb was planted by 2''',
+                     r'''Pop!''',
+                     r'''ShutdownGame:''',
+                     r'''Item: 2 ut_weapon_sr8''',
+                     r'''------------------------------------------------------------''',
+                     r'''this line does not match anything'''):
+            self.assertSameMatch(line)
+
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
@@ -303,3 +303,52 @@ Players on server:
         self.assertEqual("Max", client_from_db.name)
         self.assertEqual("73c5e50a7860475f0000000000000000", client_from_db.guid)
         self.assertEqual("111.222.200.50", client_from_db.ip)
+
+
+class Test_battleye_event_routing(EventParsingTestCase):
+
+    def assert_route(self, message, func, data):
+        self.assertEqual((func, data), self.parser.getBattleyeEventRoute(message))
+
+    def test_player_events(self):
+        self.assert_route(u'Player #8 Max (111.222.200.50:2304) connected',
+                          'OnPlayerConnected', u'8 Max (111.222.200.50:2304)')
+        self.assert_route(u'Player #8 Max disconnected', 'OnPlayerLeave', u'8 Max')
+        self.assert_route(u'Player #8 Max - GUID: 73c5e50a7860475f0000000000000000 (unverified)',
+                          'OnUnverifiedGUID', u'8 Max - GUID: 73c5e50a7860475f0000000000000000')
+        self.assert_route(u'Player #8 Max (73c5e50a7860475f0000000000000000) has been kicked by BattlEye: Admin Kick',
+                          'OnBattleyeKick', u'8 Max (73c5e50a7860475f0000000000000000) has been kicked by BattlEye: Admin Kick')
+
+    def test_chat(self):
+        self.assert_route(u'(Lobby) Max: hello', 'OnPlayerChat', u'Max: hello (Lobby)')
+        self.assert_route(u'(Global) Max: hello', 'OnPlayerChat', u'Max: hello (Global)')
+        self.assert_route(u'(Direct) Max: hello', 'OnPlayerChat', u'Max: hello (Direct)')
+        self.assert_route(u'(Vehicle) Max: hello', 'OnPlayerChat', u'Max: hello (Vehicle)')
+        self.assert_route(u'(Group) Max: hello', 'OnPlayerChat', u'Max: hello (Group)')
+        self.assert_route(u'(Side) Max: hello', 'OnPlayerChat', u'Max: hello (Side)')
+        self.assert_route(u'(Command) Max: hello', 'OnPlayerChat', u'Max: hello (Command)')
+        self.assert_route(u'(Unknown) Max: hello', 'OnPlayerChat', u'Max: hello (Unknown)')
+
+    def test_server_events(self):
+        self.assert_route(u'RCon admin #0 (111.222.200.50:2306) logged in', 'OnServerMessage',
+                          u'0 (111.222.200.50:2306) logged in')
+        self.assert_route(u'Verified GUID (73c5e50a7860475f0000000000000000) of player #8 Max', 'OnVerifiedGUID',
+                          u'73c5e50a7860475f0000000000000000) of player #8 Max')
+        self.assert_route(u'CreateVehicle Log: #8 Max (73c5e50a7860475f0000000000000000) - #0 "B_Heli"',
+                          'OnBattleyeScriptLog',
+                          u'CreateVehicle Log: #8 Max (73c5e50a7860475f0000000000000000) - #0 "B_Heli"')
+
+    def test_unknown_events(self):
+        self.assert_route(u'RCon something else', 'OnUnknownEvent', None)
+        self.assert_route(u'Ban check timed out, no response from BE Master', 'OnUnknownEvent', None)
+        self.assert_route(u'', 'OnUnknownEvent', None)
+
+    def test_route_chat(self):
+        # GIVEN
+        self.parser.routeBattleyeEvent(u'Player #8 Max (111.222.200.50:2304) connected')
+        self.parser.routeBattleyeEvent(u'Verified GUID (73c5e50a7860475f0000000000000000) of player #8 Max')
+        self.clear_events()
+        # WHEN
+        self.parser.routeBattleyeEvent(u'(Global) Max: hello')
+        # THEN
+        self.assert_has_event('EVT_CLIENT_SAY', data=u'hello (Global)')
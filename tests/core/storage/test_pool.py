@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest2 as unittest
+
+from mock import Mock
+from b3.functions import splitDSN
+from b3.storage.pool import ConnectionPool
+from b3.storage.pool import PoolTimeout
+from b3.storage.sqlite import SqliteStorage
+from tests import B3TestCase
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def cursor(self):
+        cursor = Mock()
+        if not self.alive:
+            cursor.execute.side_effect = Exception('connection lost')
+        return cursor
+
+    def close(self):
+        self.closed = True
+
+
+class Test_ConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+        self.pool = ConnectionPool(self.factory, minsize=1, maxsize=2, console=Mock())
+
+    def factory(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_start_opens_min_connections(self):
+        # WHEN
+        self.pool.start()
+        # THEN
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual(1, self.pool.size())
+
+    def test_connections_are_reused(self):
+        # GIVEN
+        self.pool.start()
+        # WHEN
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        # THEN
+        self.assertIs(self.connections[0], self.pool.acquire())
+        self.assertEqual(1, len(self.connections))
+
+    def test_pool_grows_up_to_max_size(self):
+        # GIVEN
+        self.pool.start()
+        # WHEN
+        connection1 = self.pool.acquire()
+        connection2 = self.pool.acquire()
+        # THEN
+        self.assertIsNot(connection1, connection2)
+        self.assertEqual(2, self.pool.size())
+        self.assertRaises(PoolTimeout, self.pool.acquire, 0.05)
+
+    def test_acquire_waits_for_release(self):
+        # GIVEN
+        connection1 = self.pool.acquire()
+        self.pool.acquire()
+        threading.Timer(0.05, self.pool.release, (connection1,)).start()
+        # WHEN
+        connection = self.pool.acquire(5)
+        # THEN
+        self.assertIs(connection1, connection)
+
+    def test_discarded_connection_is_closed(self):
+        # GIVEN
+        connection = self.pool.acquire()
+        # WHEN
+        self.pool.release(connection, discard=True)
+        # THEN
+        self.assertTrue(connection.closed)
+        self.assertEqual(0, self.pool.size())
+
+    def test_lost_connection_is_replaced(self):
+        # GIVEN
+        self.pool.check_interval = 0
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        connection.alive = False
+        time.sleep(0.01)
+        # WHEN
+        new_connection = self.pool.acquire()
+        # THEN
+        self.assertIsNot(connection, new_connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(1, self.pool.size())
+
+    def test_failed_factory_does_not_leak(self):
+        # GIVEN
+        self.pool.factory = Mock(side_effect=Exception('cannot connect'))
+        # WHEN
+        self.assertRaises(Exception, self.pool.acquire)
+        # THEN
+        self.assertEqual(0, self.pool.size())
+
+    def test_close(self):
+        # GIVEN
+        self.pool.start()
+        idle_connection = self.pool.acquire()
+        busy_connection = self.pool.acquire()
+        self.pool.release(idle_connection)
+        # WHEN
+        self.pool.close()
+        # THEN
+        self.assertTrue(idle_connection.closed)
+        self.assertFalse(busy_connection.closed)
+        self.assertRaises(PoolTimeout, self.pool.acquire)
+        self.pool.release(busy_connection)
+        self.assertTrue(busy_connection.closed)
+        self.assertEqual(0, self.pool.size())
+
+
+class Test_DatabaseStorage_pool(B3TestCase):
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        fd, self.db_file = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.unlink(self.db_file)
+        self.storage = SqliteStorage('sqlite://' + self.db_file, splitDSN('sqlite://' + self.db_file), self.console)
+        self.storage.connect()
+        # sqlite has no pool support: use a stand-in connection factory
+        self.opened = []
+        self.storage._createConnection = self.create_connection
+        self.storage.setPoolSize(1, 2)
+        self.storage._startPool()
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage._stopPool()
+        self.storage.shutdown()
+        os.unlink(self.db_file)
+
+    def create_connection(self):
+        connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        connection.isolation_level = None
+        self.opened.append(connection)
+        return connection
+
+    def test_queries_use_pooled_connections(self):
+        # WHEN
+        cursor = self.storage.query("INSERT INTO data (data_key, data_value) VALUES (?, ?)", ('key', 'value'))
+        # THEN
+        self.assertIs(self.opened[0], cursor._conn)
+        self.assertEqual(1, cursor.lastrowid)
+        cursor = self.storage.query("SELECT data_value FROM data WHERE data_key = ?", ('key',))
+        self.assertEqual('value', cursor.getOneRow()['data_value'])
+
+    def test_connection_block_pins_a_connection(self):
+        # WHEN
+        with self.storage._connection():
+            # make another connection idle in the pool
+            self.storage._pool.release(self.storage._pool.acquire())
+            cursors = [self.storage.query("SELECT 1") for i in range(3)]
+        # THEN
+        self.assertEqual(2, len(self.opened))
+        self.assertListEqual([self.opened[0]] * 3, [cursor._conn for cursor in cursors])
+        self.assertEqual(2, len(self.storage._pool._idle))
+
+    def test_batches_use_the_main_connection(self):
+        # GIVEN
+        self.storage.startBatch(10)
+        # WHEN
+        cursor = self.storage.query("INSERT INTO data (data_key, data_value) VALUES (?, ?)", ('key', 'value'))
+        self.storage.endBatch()
+        # THEN
+        self.assertIs(self.storage.db, cursor._conn)
+
+    def test_setPoolSize(self):
+        # WHEN
+        self.storage.setPoolSize(5, 3)
+        # THEN
+        self.assertEqual(3, self.storage._poolMinSize)
+        self.assertEqual(3, self.storage._poolMaxSize)
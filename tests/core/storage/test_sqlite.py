@@ -23,6 +23,9 @@
 # ################################################################### #
 
 import nose
+import os
+import sqlite3
+import tempfile
 
 from b3.functions import splitDSN
 from b3.storage.sqlite import SqliteStorage
@@ -57,6 +60,53 @@ class Test_sqlite(B3TestCase, StorageAPITest):
              'data',
             ]), set(self.storage.getTables()))
 
+class Test_sqlite_batch(B3TestCase):
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        fd, self.db_file = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.unlink(self.db_file)
+        self.storage = SqliteStorage('sqlite://' + self.db_file, splitDSN('sqlite://' + self.db_file), self.console)
+        self.storage.connect()
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage.shutdown()
+        os.unlink(self.db_file)
+
+    def count_from_other_connection(self):
+        db = sqlite3.connect(self.db_file)
+        try:
+            return db.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+        finally:
+            db.close()
+
+    def insert(self, i):
+        self.storage.query("INSERT INTO data (data_key, data_value) VALUES (?, ?)", ('key%s' % i, 'value'))
+
+    def test_queries_are_committed_by_batch(self):
+        # GIVEN
+        self.storage.startBatch(3)
+        # WHEN
+        for i in range(4):
+            self.insert(i)
+        # THEN
+        self.assertEqual(3, self.count_from_other_connection())
+        self.assertEqual(4, self.storage.query("SELECT COUNT(*) AS c FROM data").getValue('c'))
+
+    def test_endBatch_commits_pending_queries(self):
+        # GIVEN
+        self.storage.startBatch(100)
+        self.insert(1)
+        self.assertEqual(0, self.count_from_other_connection())
+        # WHEN
+        self.storage.endBatch()
+        self.insert(2)
+        # THEN
+        self.assertEqual(2, self.count_from_other_connection())
+
+
 if __name__ == '__main__':
     nose.main()
     
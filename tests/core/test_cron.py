@@ -22,9 +22,12 @@
 #                                                                     #
 # ################################################################### #
 
+import calendar
+import random
+import threading
 import time
 import unittest2 as unittest
-from mock import sentinel, Mock
+from mock import sentinel, Mock, patch
 from b3.cron import CronTab, OneTimeCronTab, PluginCronTab, Cron
 from tests import B3TestCase
 
@@ -119,8 +122,8 @@ class Test_OneTimeCrontab(unittest.TestCase):
 
 class Test_PluginCronTab(unittest.TestCase):
 
+    @patch.object(CronTab, 'match', Mock(return_value=True))
     def test(self):
-        CronTab.match = Mock(return_value=True)
         mock_command = Mock()
         p = Mock()
         tab = PluginCronTab(plugin=p, command=mock_command)
@@ -253,5 +256,253 @@ class Test_Cron(B3TestCase):
         self.assertEqual(CronTab, type(self.cron._tabs[crontab_id]))
 
 
+class Test_Cron_execute(B3TestCase):
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.cron = Cron(self.console, workers=2)
+        self.gate = threading.Event()
+        self.done = []
+
+    def tearDown(self):
+        self.gate.set()
+        self.cron.stop()
+        B3TestCase.tearDown(self)
+
+    def slow(self):
+        self.gate.wait(5)
+        self.done.append('slow')
+
+    def fast(self):
+        self.done.append('fast')
+
+    def wait_for(self, condition, timeout=5):
+        expire = time.time() + timeout
+        while not condition() and time.time() < expire:
+            time.sleep(.01)
+        return condition()
+
+    def test_slow_tab_does_not_delay_the_others(self):
+        # WHEN
+        self.cron.execute(CronTab(self.slow))
+        self.cron.execute(CronTab(self.fast))
+        # THEN
+        self.assertTrue(self.wait_for(lambda: self.done == ['fast']))
+        self.gate.set()
+        self.assertTrue(self.wait_for(lambda: self.done == ['fast', 'slow']))
+
+    def test_overrun_is_skipped(self):
+        # GIVEN
+        tab = CronTab(self.slow)
+        self.cron.execute(tab)
+        # WHEN
+        result = self.cron.execute(tab)
+        self.cron.execute(tab)
+        # THEN
+        self.assertFalse(result)
+        self.assertEqual(2, tab.overruns)
+        self.gate.set()
+        self.assertTrue(self.wait_for(lambda: not tab.running))
+        self.assertListEqual(['slow'], self.done)
+        self.assertEqual(1, tab.numRuns)
+
+    def test_overruns_are_coalesced(self):
+        # GIVEN
+        tab = CronTab(self.slow)
+        tab.overrun = CronTab.COALESCE
+        self.cron.execute(tab)
+        # WHEN
+        self.cron.execute(tab)
+        self.cron.execute(tab)
+        # THEN
+        self.gate.set()
+        self.assertTrue(self.wait_for(lambda: not tab.running))
+        self.assertListEqual(['slow', 'slow'], self.done)
+        self.assertEqual(2, tab.numRuns)
+
+    def test_worker_threads_are_bounded(self):
+        # WHEN
+        for i in range(4):
+            self.cron.execute(CronTab(self.slow))
+        # THEN
+        self.assertEqual(2, len(self.cron._threads))
+        self.gate.set()
+        self.assertTrue(self.wait_for(lambda: len(self.done) == 4))
+
+    def test_duration_is_recorded(self):
+        # GIVEN
+        self.cron.workers = 0
+        clock = [100.0]
+        durations = [.25, .5]
+
+        def run():
+            clock[0] += durations.pop(0)
+
+        tab = CronTab(run)
+        # WHEN
+        with patch('b3.cron.time') as cron_time:
+            cron_time.time.side_effect = lambda: clock[0]
+            self.cron.execute(tab)
+            self.cron.execute(tab)
+        # THEN
+        self.assertEqual(2, tab.numRuns)
+        self.assertEqual(.5, tab.lastDuration)
+        self.assertEqual(.75, tab.totalDuration)
+
+    def test_exception_is_logged(self):
+        # GIVEN
+        self.console.error = Mock()
+        tab = CronTab(Mock(side_effect=ValueError('boom')))
+        # WHEN
+        self.cron.execute(tab)
+        # THEN
+        self.assertTrue(self.wait_for(lambda: self.console.error.called and not tab.running))
+
+    def test_no_workers(self):
+        # GIVEN
+        self.cron.workers = 0
+        # WHEN
+        self.cron.execute(CronTab(self.fast))
+        # THEN
+        self.assertListEqual(['fast'], self.done)
+        self.assertListEqual([], self.cron._threads)
+
+
+class Test_Crontab_nextTime(unittest.TestCase):
+
+    def t(self, *args):
+        return calendar.timegm(args + (0,) * (6 - len(args)))
+
+    def test_default(self):
+        tab = CronTab(None)
+        self.assertEqual(self.t(2015, 1, 1, 0, 1), tab.nextTime(self.t(2015, 1, 1, 0, 0, 30)))
+        self.assertEqual(self.t(2015, 1, 1, 0, 2), tab.nextTime(self.t(2015, 1, 1, 0, 1)))
+
+    def test_seconds(self):
+        tab = CronTab(None, second='*/10')
+        self.assertEqual(self.t(2015, 1, 1, 0, 0, 10), tab.nextTime(self.t(2015, 1, 1, 0, 0, 5)))
+        self.assertEqual(self.t(2015, 1, 1, 0, 1, 0), tab.nextTime(self.t(2015, 1, 1, 0, 0, 50)))
+
+    def test_hour_and_minute(self):
+        tab = CronTab(None, minute=15, hour=3)
+        self.assertEqual(self.t(2015, 1, 2, 3, 15), tab.nextTime(self.t(2015, 1, 1, 4)))
+
+    def test_dow(self):
+        # 2015-01-01 is a thursday: next monday is 2015-01-05
+        tab = CronTab(None, minute=0, hour=0, dow=0)
+        self.assertEqual(self.t(2015, 1, 5), tab.nextTime(self.t(2015, 1, 1)))
+
+    def test_month_and_day(self):
+        tab = CronTab(None, minute=0, hour=0, day=29, month=2)
+        self.assertEqual(self.t(2016, 2, 29), tab.nextTime(self.t(2015, 1, 1)))
+
+    def test_never(self):
+        tab = CronTab(None, day=0)
+        self.assertIsNone(tab.nextTime(self.t(2015, 1, 1)))
+
+    def test_same_as_match(self):
+        rnd = random.Random(1)
+        rates = [('*', '*/5', '*/20', '10-40/3', '0,15,30,45', 7), ('*', '*/10', '5-9', 59),
+                 ('*', '*/2', '1-3', 0, 23)]
+        start = self.t(2015, 12, 31, 22, 30)
+        for i in range(50):
+            tab = CronTab(None, second=rnd.choice(rates[0]), minute=rnd.choice(rates[1]), hour=rnd.choice(rates[2]))
+            # brute force: the first second matching the tab
+            expected = start + 1
+            while not tab.match(time.gmtime(expected)):
+                expected += 1
+            self.assertEqual(expected, tab.nextTime(start), tab.__dict__)
+
+
+class Test_Cron_scheduling(B3TestCase):
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.now = 1420070400  # 2015-01-01 00:00:00
+        self.cron = Cron(self.console, workers=0)
+        self.cron.time = lambda: self.now
+        self.command = Mock()
+
+    def tearDown(self):
+        self.cron.stop()
+        B3TestCase.tearDown(self)
+
+    def test_tab_runs_at_its_next_time(self):
+        # GIVEN
+        self.cron + CronTab(self.command, second='*/10')
+        # WHEN
+        self.cron._runDue(self.now + 9)
+        # THEN
+        self.assertFalse(self.command.called)
+        self.cron._runDue(self.now + 10)
+        self.assertEqual(1, self.command.call_count)
+        self.assertEqual(self.now + 20, self.cron._heap[0][0])
+
+    def test_late_scheduler_runs_tab_once(self):
+        # GIVEN
+        self.cron + CronTab(self.command, second='*/10')
+        # WHEN
+        self.cron._runDue(self.now + 65)
+        # THEN
+        self.assertEqual(1, self.command.call_count)
+        self.assertEqual(self.now + 70, self.cron._heap[0][0])
+
+    def test_cancelled_tab_does_not_run(self):
+        # GIVEN
+        tab = CronTab(self.command, second='*/10')
+        self.cron + tab
+        # WHEN
+        self.cron - tab
+        self.cron._runDue(self.now + 10)
+        # THEN
+        self.assertFalse(self.command.called)
+        self.assertListEqual([], self.cron._heap)
+
+    def test_tab_added_again_runs_once(self):
+        # GIVEN
+        tab = CronTab(self.command, second='*/10')
+        self.cron + tab
+        # WHEN
+        self.cron - tab
+        self.cron + tab
+        self.cron - tab
+        self.cron + tab
+        self.cron._runDue(self.now + 10)
+        # THEN
+        self.assertEqual(1, self.command.call_count)
+        self.assertEqual(1, len(self.cron._heap))
+
+    def test_one_time_tab_is_removed(self):
+        # GIVEN
+        self.cron + OneTimeCronTab(self.command, second='*/10')
+        # WHEN
+        self.cron._runDue(self.now + 10)
+        self.cron._runDue(self.now + 20)
+        # THEN
+        self.assertEqual(1, self.command.call_count)
+        self.assertDictEqual({}, self.cron._tabs)
+
+    def test_disabled_plugin_tab_does_not_run(self):
+        # GIVEN
+        plugin = Mock()
+        plugin.isEnabled.return_value = False
+        self.cron + PluginCronTab(plugin, self.command, second='*/10')
+        # WHEN
+        self.cron._runDue(self.now + 10)
+        # THEN
+        self.assertFalse(self.command.called)
+        self.assertEqual(self.now + 20, self.cron._heap[0][0])
+
+    def test_scheduler_thread(self):
+        # GIVEN
+        self.cron = Cron(self.console, workers=0)
+        event = threading.Event()
+        self.cron.start()
+        # WHEN
+        self.cron + CronTab(event.set, second='*/1')
+        # THEN
+        self.assertTrue(event.wait(3))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
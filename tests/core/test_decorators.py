@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+import re
+import unittest2 as unittest
+
+from b3.decorators import GameEventRouter
+
+
+class Test_GameEventRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.ger = ger = GameEventRouter()
+
+        @ger.gameEvent(r'^//', r'^server cvars (start|end)$')
+        def ignored_line():
+            pass
+
+        @ger.gameEvent(r'^"(?P<name>.+)" killed "(?P<victim>.+)"$')
+        def on_kill(name, victim):
+            pass
+
+        @ger.gameEvent(r'^"(?P<name>.+)" say "(?P<text>.*)"$')
+        def on_say(name, text):
+            pass
+
+        @ger.gameEvent(re.compile(r'^team (?P<team>\w+)$', re.IGNORECASE))
+        def on_team(team):
+            pass
+
+        @ger.gameEvent(r'CurrentMap is: (?P<mapname>.+)')
+        def on_map(mapname):
+            pass
+
+        @ger.gameEvent(r'^(?P<data>.+)$')
+        def on_unknown(data):
+            pass
+
+    def assertRouted(self, name, gameEvent, groups=None):
+        hfunc, param_dict = self.ger.getHandler(gameEvent)
+        self.assertEqual(name, hfunc.__name__ if hfunc else None)
+        if groups is not None:
+            self.assertDictEqual(groups, param_dict)
+
+    def test_routing(self):
+        self.assertRouted('ignored_line', '// comment')
+        self.assertRouted('ignored_line', 'server cvars end')
+        self.assertRouted('on_kill', '"Joe" killed "Bill"', {'name': 'Joe', 'victim': 'Bill'})
+        self.assertRouted('on_say', '"Joe" say "hi"', {'name': 'Joe', 'text': 'hi'})
+        self.assertRouted('on_team', 'TEAM red', {'team': 'red'})
+        self.assertRouted('on_map', 'CurrentMap is: ut4_casa', {'mapname': 'ut4_casa'})
+        self.assertRouted('on_unknown', 'server cvars', {'data': 'server cvars'})
+        self.assertRouted(None, '', {})
+
+    def test_unicode(self):
+        self.assertRouted('on_say', u'"J\xf6e" say "h\xe9"', {'name': u'J\xf6e', 'text': u'h\xe9'})
+
+    def test_declaration_order_wins(self):
+        # GIVEN
+        self.ger.sort_interval = 1
+        for i in range(10):
+            self.assertRouted('on_say', '"Joe" say "hi"')
+        # WHEN
+        gameEvent = '"Joe" killed "Bill" say "hi"'
+        # THEN
+        self.assertRouted('on_kill', gameEvent, {'name': 'Joe', 'victim': 'Bill" say "hi'})
+
+    def test_most_matched_are_tried_first(self):
+        # GIVEN
+        self.ger.sort_interval = 4
+        # WHEN
+        for i in range(4):
+            self.assertRouted('on_say', '"Joe" say "hi"')
+        # THEN
+        candidates = self.ger._candidates['"']
+        self.assertEqual('on_say', candidates[0].func.__name__)
+        self.assertEqual('on_kill', candidates[1].func.__name__)
+
+    def test_hits(self):
+        # WHEN
+        self.ger.getHandler('"Joe" killed "Bill"')
+        self.ger.getHandler('"Joe" killed "Bill"')
+        self.ger.getHandler('// comment')
+        # THEN
+        self.assertListEqual([
+            ('^//', 'ignored_line', 1),
+            ('^server cvars (start|end)$', 'ignored_line', 0),
+            ('^"(?P<name>.+)" killed "(?P<victim>.+)"$', 'on_kill', 2),
+            ('^"(?P<name>.+)" say "(?P<text>.*)"$', 'on_say', 0),
+            ('^team (?P<team>\w+)$', 'on_team', 0),
+            ('CurrentMap is: (?P<mapname>.+)', 'on_map', 0),
+            ('^(?P<data>.+)$', 'on_unknown', 0),
+        ], self.ger.getHits())
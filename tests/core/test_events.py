@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+import Queue
+import threading
+import time
+import unittest2 as unittest
+
+from mock import Mock
+from b3.events import Event
+from b3.events import EventDispatcher
+from b3.events import EventQueue
+from b3.events import EventsStats
+from b3.events import eventManager
+
+
+class FakeHandler(object):
+
+    def __init__(self, name, delay=0, gate=None):
+        self.name = name
+        self.delay = delay
+        self.gate = gate
+        self.handled = []
+
+    def isEnabled(self):
+        return True
+
+    def handle(self, event):
+        if self.gate:
+            self.gate.wait(5)
+        if self.delay:
+            time.sleep(self.delay)
+        self.handled.append(event)
+
+
+class Test_EventDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.console = Mock()
+        self.console.time = time.time
+        self.dispatcher = None
+
+    def tearDown(self):
+        if self.dispatcher:
+            self.dispatcher.stop()
+
+    def create_dispatcher(self, workers=4, lane_size=50):
+        callback = lambda handler, event, event_name: handler.handle(event)
+        self.dispatcher = EventDispatcher(self.console, callback, workers=workers, lane_size=lane_size,
+                                          stats=EventsStats(self.console))
+        return self.dispatcher
+
+    def wait_for(self, condition, timeout=5):
+        expire = time.time() + timeout
+        while not condition() and time.time() < expire:
+            time.sleep(.01)
+        return condition()
+
+    def test_events_are_handled_in_order_per_handler(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher(workers=4, lane_size=200)
+        handler1 = FakeHandler('handler1', delay=.001)
+        handler2 = FakeHandler('handler2')
+        dispatcher.start()
+        # WHEN
+        for i in range(100):
+            dispatcher.dispatch(handler1, i, 'EVT_TEST', time.time() + 10)
+            dispatcher.dispatch(handler2, i, 'EVT_TEST', time.time() + 10)
+        # THEN
+        self.assertTrue(self.wait_for(lambda: len(handler1.handled) == 100 and len(handler2.handled) == 100))
+        self.assertListEqual(range(100), handler1.handled)
+        self.assertListEqual(range(100), handler2.handled)
+
+    def test_stuck_handler_does_not_block_other_handlers(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher(workers=2)
+        gate = threading.Event()
+        stuck_handler = FakeHandler('stuck', gate=gate)
+        handler = FakeHandler('handler')
+        dispatcher.start()
+        # WHEN
+        dispatcher.dispatch(stuck_handler, 'a', 'EVT_TEST', time.time() + 10)
+        dispatcher.dispatch(stuck_handler, 'b', 'EVT_TEST', time.time() + 10)
+        for i in range(10):
+            dispatcher.dispatch(handler, i, 'EVT_TEST', time.time() + 10)
+        # THEN
+        self.assertTrue(self.wait_for(lambda: len(handler.handled) == 10))
+        self.assertListEqual([], stuck_handler.handled)
+        self.assertEqual(1, dispatcher.pending(stuck_handler))
+        gate.set()
+        self.assertTrue(self.wait_for(lambda: len(stuck_handler.handled) == 2))
+        self.assertListEqual(['a', 'b'], stuck_handler.handled)
+
+    def test_stop_handles_the_events_left_in_the_lanes(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher(workers=2)
+        handler = FakeHandler('handler', delay=.01)
+        dispatcher.start()
+        for i in range(10):
+            dispatcher.dispatch(handler, i, 'EVT_TEST', time.time() + 10)
+        # WHEN
+        dispatcher.stop()
+        # THEN
+        self.assertListEqual(range(10), handler.handled)
+
+    def test_full_lane(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher(lane_size=2)
+        handler = FakeHandler('handler')
+        # WHEN (not started so events are kept in the lane)
+        results = [dispatcher.dispatch(handler, i, 'EVT_TEST', time.time() + 10) for i in range(3)]
+        # THEN
+        self.assertListEqual([True, True, False], results)
+        self.assertEqual(2, dispatcher.pending(handler))
+
+    def test_no_lane_size_limit(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher(lane_size=0)
+        handler = FakeHandler('handler')
+        # WHEN (not started so events are kept in the lane)
+        results = [dispatcher.dispatch(handler, i, 'EVT_TEST', time.time() + 10) for i in range(100)]
+        # THEN
+        self.assertTrue(all(results))
+        self.assertEqual(100, dispatcher.pending(handler))
+
+    def test_expired_events_are_not_handled(self):
+        # GIVEN
+        dispatcher = self.create_dispatcher()
+        handler = FakeHandler('handler')
+        dispatcher.dispatch(handler, 'expired', 'EVT_TEST', time.time() - 1)
+        dispatcher.dispatch(handler, 'valid', 'EVT_TEST', time.time() + 10)
+        # WHEN
+        dispatcher.start()
+        # THEN
+        self.assertTrue(self.wait_for(lambda: len(handler.handled) == 1))
+        self.assertListEqual(['valid'], handler.handled)
+        self.assertTrue(self.console.error.called)
+        self.assertDictEqual({'EVT_TEST': 1}, self.dispatcher.stats.get_expired_events())
+
+def make_item(key, data=None):
+    return time.time(), time.time() + 10, Event(eventManager.getId(key), data)
+
+
+class Test_EventQueue(unittest.TestCase):
+
+    def test_events_are_served_by_priority(self):
+        # GIVEN
+        queue = EventQueue(10)
+        for key in ('EVT_CLIENT_DAMAGE', 'EVT_GAME_ROUND_START', 'EVT_CLIENT_KILL', 'EVT_CLIENT_SAY',
+                    'EVT_CLIENT_JOIN', 'EVT_CLIENT_BAN'):
+            queue.put(make_item(key))
+        # WHEN
+        served = [eventManager.getKey(queue.get(False)[2].type) for _ in range(6)]
+        # THEN
+        self.assertListEqual(['EVT_CLIENT_SAY', 'EVT_CLIENT_BAN', 'EVT_GAME_ROUND_START', 'EVT_CLIENT_JOIN',
+                              'EVT_CLIENT_DAMAGE', 'EVT_CLIENT_KILL'], served)
+        self.assertTrue(queue.empty())
+
+    def test_priorities_have_their_own_capacity(self):
+        # GIVEN
+        queue = EventQueue(2)
+        queue.put(make_item('EVT_CLIENT_DAMAGE'))
+        queue.put(make_item('EVT_CLIENT_DAMAGE'))
+        # WHEN
+        queue.put(make_item('EVT_CLIENT_SAY'), True, 0.1)
+        # THEN
+        self.assertEqual(3, queue.qsize())
+        self.assertEqual(2, queue.qsize(EventQueue.LOW))
+        self.assertEqual(1, queue.qsize(EventQueue.HIGH))
+
+    def test_block_policy(self):
+        # GIVEN
+        queue = EventQueue(1)
+        queue.put(make_item('EVT_CLIENT_SAY', 'first'))
+        # WHEN
+        start = time.time()
+        self.assertRaises(Queue.Full, queue.put, make_item('EVT_CLIENT_SAY', 'second'), True, 0.1)
+        # THEN
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        self.assertRaises(Queue.Full, queue.put, make_item('EVT_CLIENT_SAY', 'second'), False)
+
+    def test_block_policy_waits_for_room(self):
+        # GIVEN
+        queue = EventQueue(1)
+        queue.put(make_item('EVT_CLIENT_SAY', 'first'))
+        threading.Timer(0.05, queue.get).start()
+        # WHEN
+        queue.put(make_item('EVT_CLIENT_SAY', 'second'), True, 5)
+        # THEN
+        self.assertEqual('second', queue.get(False)[2].data)
+
+    def test_drop_new_policy(self):
+        # GIVEN
+        queue = EventQueue(1, policies={EventQueue.NORMAL: EventQueue.DROP_NEW})
+        queue.put(make_item('EVT_GAME_ROUND_START', 'first'))
+        # WHEN
+        start = time.time()
+        self.assertRaises(Queue.Full, queue.put, make_item('EVT_GAME_ROUND_START', 'second'), True, 5)
+        # THEN
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual('first', queue.get(False)[2].data)
+
+    def test_drop_old_policy(self):
+        # GIVEN
+        queue = EventQueue(2, policies={EventQueue.LOW: EventQueue.DROP_OLD})
+        queue.put(make_item('EVT_CLIENT_KILL', 1))
+        queue.put(make_item('EVT_CLIENT_KILL', 2))
+        # WHEN
+        dropped = queue.put(make_item('EVT_CLIENT_KILL', 3))
+        # THEN
+        self.assertEqual(1, dropped[2].data)
+        self.assertListEqual([2, 3], [queue.get(False)[2].data for _ in range(2)])
+
+    def test_no_size_limit(self):
+        # GIVEN
+        queue = EventQueue(0)
+        # WHEN
+        for i in range(100):
+            queue.put(make_item('EVT_CLIENT_SAY', i), False)
+        # THEN
+        self.assertEqual(100, queue.qsize())
+
+    def test_get_timeout(self):
+        queue = EventQueue(1)
+        self.assertRaises(Queue.Empty, queue.get, True, 0.05)
+        self.assertRaises(Queue.Empty, queue.get, False)
+
+    def test_setPriority(self):
+        # GIVEN
+        queue = EventQueue(10)
+        evt_round_start = eventManager.getId('EVT_GAME_ROUND_START')
+        # WHEN
+        queue.setPriority(evt_round_start, EventQueue.LOW)
+        # THEN
+        self.assertEqual(EventQueue.LOW, queue.getPriority(evt_round_start))
+        self.assertEqual(EventQueue.NORMAL, queue.getPriority(eventManager.getId('EVT_CLIENT_JOIN')))
+
+
+class Test_EventsStats(unittest.TestCase):
+
+    def test_counters(self):
+        # GIVEN
+        stats = EventsStats(Mock())
+        # WHEN
+        stats.add_event_dropped('Client Kill')
+        stats.add_event_dropped('Client Kill')
+        stats.add_event_expired('Say')
+        # THEN
+        self.assertDictEqual({'Client Kill': 2}, stats.get_dropped_events())
+        self.assertDictEqual({'Say': 1}, stats.get_expired_events())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+import threading
+import urllib2
+import unittest2 as unittest
+
+from b3.metrics import Counter
+from b3.metrics import Histogram
+from b3.metrics import MetricsRegistry
+from b3.metrics import MetricsServer
+
+
+class Test_Counter(unittest.TestCase):
+
+    def test_inc(self):
+        # GIVEN
+        counter = Counter('test_total', 'Test counter.', ('event',))
+        # WHEN
+        counter.inc('Say')
+        counter.inc('Say', amount=2)
+        counter.inc('Kill')
+        # THEN
+        self.assertEqual(3, counter.value('Say'))
+        self.assertListEqual(['test_total{event="Kill"} 1', 'test_total{event="Say"} 3'], counter.collect())
+
+    def test_wrong_label_values(self):
+        counter = Counter('test_total', 'Test counter.', ('event',))
+        self.assertRaises(ValueError, counter.inc)
+
+    def test_threads_are_merged(self):
+        # GIVEN
+        counter = Counter('test_total', 'Test counter.')
+        def work():
+            for i in range(1000):
+                counter.inc()
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        # WHEN
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counter.inc()
+        # THEN (twice: dead threads shards are retired on first collection)
+        self.assertEqual(8001, counter.value())
+        self.assertEqual(8001, counter.value())
+
+
+class Test_Histogram(unittest.TestCase):
+
+    def test_collect(self):
+        # GIVEN
+        histogram = Histogram('test_seconds', 'Test histogram.', ('plugin',), buckets=(0.1, 1))
+        # WHEN
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, 'admin')
+        # THEN
+        self.assertEqual(4, histogram.count('admin'))
+        self.assertListEqual(['test_seconds_bucket{plugin="admin",le="0.1"} 2',
+                              'test_seconds_bucket{plugin="admin",le="1"} 3',
+                              'test_seconds_bucket{plugin="admin",le="+Inf"} 4',
+                              'test_seconds_sum{plugin="admin"} 2.65',
+                              'test_seconds_count{plugin="admin"} 4'], histogram.collect())
+
+    def test_time(self):
+        histogram = Histogram('test_seconds', 'Test histogram.')
+        with histogram.time():
+            pass
+        self.assertEqual(1, histogram.count())
+
+
+class Test_MetricsRegistry(unittest.TestCase):
+
+    def test_render(self):
+        # GIVEN
+        registry = MetricsRegistry()
+        registry.counter('test_total', 'Test counter.', ('event',)).inc('say "hi"\\')
+        registry.gauge('test_depth', 'Test gauge.', ('priority',), function=lambda: {('high',): 3})
+        # WHEN
+        text = registry.render()
+        # THEN
+        self.assertEqual('# HELP test_depth Test gauge.\n'
+                         '# TYPE test_depth gauge\n'
+                         'test_depth{priority="high"} 3\n'
+                         '# HELP test_total Test counter.\n'
+                         '# TYPE test_total counter\n'
+                         'test_total{event="say \\"hi\\"\\\\"} 1\n', text)
+
+
+class Test_MetricsServer(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.counter('test_total', 'Test counter.').inc()
+        self.server = MetricsServer(self.registry, '127.0.0.1', 0)
+        self.server.start()
+        self.url = 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_metrics(self):
+        response = urllib2.urlopen(self.url + '/metrics', timeout=5)
+        self.assertEqual(200, response.getcode())
+        self.assertTrue(response.info()['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('test_total 1\n', response.read())
+
+    def test_not_found(self):
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            urllib2.urlopen(self.url + '/foo', timeout=5)
+        self.assertEqual(404, cm.exception.code)
@@ -23,8 +23,18 @@
 # ################################################################### #
 
 import logging
+import os
+import Queue
+import re
+import tempfile
+import time
 import unittest2 as unittest
+import b3.events
+from mock import Mock, call, patch
 from b3.clients import Client
+from b3.events import Event
+from b3.events import EventDispatcher
+from b3.events import VetoEvent
 from b3.parser import Parser
 
 
@@ -172,5 +182,305 @@ class Test_getWrap(unittest.TestCase):
         self.assertListEqual(wrapped_text, ["Lorem ipsum dolor sit amet"])
 
 
+class Test_handleEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.Events = b3.events.eventManager
+        self.parser.working = True
+        self.parser.queue = Queue.Queue()
+        self.parser._eventsStats = Mock()
+        self.parser._handlers = {}
+        self.parser._dispatcher = None
+        self.evt_say = self.parser.getEventID('EVT_CLIENT_SAY')
+        self.handled = []
+
+    def tearDown(self):
+        if self.parser._dispatcher:
+            self.parser._dispatcher.stop()
+
+    def create_handler(self, name, can_veto=False, veto=False):
+        def parseEvent(event):
+            self.handled.append(name)
+            if veto:
+                raise VetoEvent
+        handler = Mock(name=name)
+        handler.canVetoEvents = can_veto
+        handler.isEnabled.return_value = True
+        handler.parseEvent.side_effect = parseEvent
+        return handler
+
+    def handle(self, *events):
+        for event in events:
+            self.parser.queue.put((time.time(), time.time() + 10, event))
+        self.parser.queue.put((time.time(), time.time() + 10, Event(self.parser.getEventID('EVT_STOP'), '')))
+        self.parser._handlers[self.parser.getEventID('EVT_STOP')] = []
+        self.parser.handleEvents()
+
+    def test_veto_stops_propagation(self):
+        # GIVEN
+        self.parser._handlers[self.evt_say] = [self.create_handler('p1'),
+                                               self.create_handler('p2', can_veto=True, veto=True),
+                                               self.create_handler('p3', can_veto=True)]
+        # WHEN
+        self.handle(Event(self.evt_say, 'hi'))
+        # THEN
+        self.assertListEqual(['p1', 'p2'], self.handled)
+
+    def test_veto_stops_propagation_with_dispatcher(self):
+        # GIVEN
+        self.parser._dispatcher = EventDispatcher(self.parser, self.parser._handleEventWith, workers=2)
+        self.parser._dispatcher.start()
+        self.parser._handlers[self.evt_say] = [self.create_handler('p1'),
+                                               self.create_handler('p2', can_veto=True, veto=True),
+                                               self.create_handler('p3')]
+        # WHEN
+        self.handle(Event(self.evt_say, 'hi'))
+        # THEN
+        self.assertListEqual(['p1', 'p2'], sorted(self.handled))
+
+    def test_undeclared_veto_is_ignored_with_dispatcher(self):
+        # GIVEN
+        self.parser._dispatcher = EventDispatcher(self.parser, self.parser._handleEventWith, workers=2)
+        self.parser._dispatcher.start()
+        p1 = self.create_handler('p1', veto=True)
+        self.parser._handlers[self.evt_say] = [p1]
+        # WHEN
+        self.assertFalse(self.parser._handleEventWith(p1, Event(self.evt_say, 'hi'), 'Say'))
+        # THEN
+        self.assertListEqual(['p1'], self.handled)
+
+    def test_handling_time_is_wall_clock_time(self):
+        # GIVEN
+        self.parser._eventsStats = Mock()
+        p1 = self.create_handler('p1')
+        # WHEN
+        with patch('b3.parser.time') as parser_time:
+            parser_time.time.side_effect = [100.0, 100.25]
+            self.parser._handleEventWith(p1, Event(self.evt_say, 'hi'), 'Say')
+        # THEN
+        self.parser._eventsStats.add_event_handled.assert_called_once_with(p1.__class__.__name__, 'Say', 250.0)
+
+
+class Test_queueEvent(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.Events = b3.events.eventManager
+        self.parser._eventsStats = b3.events.EventsStats(Mock())
+        self.parser.pacing = 'adaptive'
+        self.parser.queue = b3.events.EventQueue(1, policies={b3.events.EventQueue.LOW: b3.events.EventQueue.DROP_OLD,
+                                                              b3.events.EventQueue.NORMAL: b3.events.EventQueue.DROP_NEW})
+        self.parser._handlers = dict((self.parser.getEventID(k), [Mock()]) for k in ('EVT_CLIENT_SAY',
+                                                                                     'EVT_CLIENT_KILL',
+                                                                                     'EVT_GAME_ROUND_START'))
+        self.parser.error = Mock()
+
+    def queue(self, key, data=None):
+        return self.parser.queueEvent(Event(self.parser.getEventID(key), data))
+
+    def test_high_priority_events_do_not_expire(self):
+        # WHEN
+        self.queue('EVT_CLIENT_SAY')
+        self.queue('EVT_GAME_ROUND_START')
+        # THEN
+        self.assertEqual(float('inf'), self.parser.queue.get(False)[1])
+        self.assertLessEqual(self.parser.queue.get(False)[1], self.parser.time() + 10)
+
+    def test_dropped_events_are_counted(self):
+        # WHEN
+        self.assertTrue(self.queue('EVT_CLIENT_KILL', 1))
+        self.assertTrue(self.queue('EVT_CLIENT_KILL', 2))
+        self.assertTrue(self.queue('EVT_GAME_ROUND_START'))
+        self.assertFalse(self.queue('EVT_GAME_ROUND_START'))
+        # THEN
+        self.assertDictEqual({'Client Kill': 1, 'Game Round Start': 1}, self.parser._eventsStats.get_dropped_events())
+
+    def test_expired_events_are_counted(self):
+        # GIVEN
+        self.parser.working = True
+        self.parser._dispatcher = None
+        self.parser.queue = b3.events.EventQueue(10)
+        self.parser.queue.put((time.time(), time.time() - 1, Event(self.parser.getEventID('EVT_GAME_ROUND_START'), '')))
+        self.parser.queue.put((time.time(), time.time() + 10, Event(self.parser.getEventID('EVT_STOP'), '')))
+        self.parser._handlers[self.parser.getEventID('EVT_STOP')] = []
+        # WHEN
+        self.parser.handleEvents()
+        # THEN
+        self.assertDictEqual({'Game Round Start': 1}, self.parser._eventsStats.get_expired_events())
+
+
+class Test_getEventQueueSetting(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.config = Mock()
+        self.parser.warning = Mock()
+        self.default = {b3.events.EventQueue.HIGH: 'block', b3.events.EventQueue.NORMAL: 'block',
+                        b3.events.EventQueue.LOW: 'drop_old'}
+
+    def get_setting(self, value, default, convert):
+        self.parser.config.has_option.return_value = value is not None
+        self.parser.config.get.return_value = value
+        return self.parser._getEventQueueSetting('test', default, convert)
+
+    def test_missing(self):
+        self.assertDictEqual({0: 50, 1: 50, 2: 50}, self.get_setting(None, 50, int))
+
+    def test_single_value(self):
+        self.assertDictEqual({0: 20, 1: 20, 2: 20}, self.get_setting('20', 50, int))
+
+    def test_priority_values(self):
+        self.assertDictEqual({0: 100, 1: 50, 2: 10}, self.get_setting('high: 100, LOW:10', 50, int))
+
+    def test_policies(self):
+        convert = b3.events.EventQueue.policy_names.__getitem__
+        self.assertDictEqual({0: 'drop_new', 1: 'block', 2: 'drop_old'},
+                             self.get_setting('high: drop_new', self.default, convert))
+        self.assertDictEqual({0: 'block', 1: 'block', 2: 'block'}, self.get_setting('block', self.default, convert))
+
+    def test_invalid(self):
+        convert = b3.events.EventQueue.policy_names.__getitem__
+        self.assertDictEqual(self.default, self.get_setting('high: whatever', self.default, convert))
+        self.assertDictEqual({0: 50, 1: 50, 2: 50}, self.get_setting('foo:12', 50, int))
+        self.assertEqual(2, self.parser.warning.call_count)
+
+
+class Test_run_pacing(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.game_log = tempfile.mkstemp()
+        os.write(fd, "0:01 line1\n0:01 line2\n0:02 line3\n")
+        os.close(fd)
+        self.parser = DummyParser()
+        self.parser.input = open(self.game_log, 'r')
+        self.parser.output = Mock()
+        self.parser.screen = Mock()
+        self.parser.console = Mock()
+        self.parser.updateDocumentation = Mock()
+        self.parser.parseLine = Mock()
+        self.parser._lineTime = re.compile(r'^(?P<minutes>[0-9]+):(?P<seconds>[0-9]+).*')
+        self.parser.working = True
+
+    def tearDown(self):
+        self.parser.input.close()
+        os.unlink(self.game_log)
+
+    def run_until_sleep(self, max_sleeps):
+        sleeps = []
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) >= max_sleeps:
+                self.parser.working = False
+        with patch('time.sleep', side_effect=sleep):
+            self.parser.run()
+        return sleeps
+
+    def test_fixed(self):
+        # GIVEN
+        self.parser.pacing = 'fixed'
+        # WHEN
+        sleeps = self.run_until_sleep(4)
+        # THEN
+        self.assertEqual(3, self.parser.parseLine.call_count)
+        self.assertListEqual([self.parser.delay2] * 3 + [self.parser.delay], sleeps)
+
+    def test_adaptive(self):
+        # GIVEN
+        self.parser.pacing = 'adaptive'
+        self.parser.delay = 0.05
+        # WHEN
+        sleeps = self.run_until_sleep(4)
+        # THEN
+        self.assertListEqual([call('0:01 line1'), call('0:01 line2'), call('0:02 line3')],
+                             self.parser.parseLine.mock_calls)
+        self.assertListEqual([0.01, 0.02, 0.04, 0.05], sleeps)
+
+
+class Test_replay(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.game_log = tempfile.mkstemp()
+        os.write(fd, "0:01 line1\n0:30 line2\n2:00 line3\n0:05 restart\n0:10 line4\n")
+        os.close(fd)
+        os.utime(self.game_log, (1400000000, 1400000000))
+        self.parser = DummyParser()
+        self.parser.Events = b3.events.eventManager
+        self.parser.screen = Mock()
+        self.parser.console = Mock()
+        self.parser.storage = Mock()
+        self.parser.output = Mock()
+        self.parser.updateDocumentation = Mock()
+        self.parser.shutdown = Mock(side_effect=lambda: setattr(self.parser, 'working', False))
+        self.parser._eventsStats = Mock()
+        self.parser._handlers = {}
+        self.parser._dispatcher = None
+        self.parser._lineTime = re.compile(r'^(?P<minutes>[0-9]+):(?P<seconds>[0-9]+).*')
+        self.parser.replay = True
+        self.parser.pacing = 'adaptive'
+        self.parser.working = True
+        self.parser.input = None
+        patcher = patch('b3.getShortPath', side_effect=lambda path, *args: path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if self.parser.input:
+            self.parser.input.close()
+        os.unlink(self.game_log)
+
+    def test_virtual_clock_ends_at_game_log_modification_time(self):
+        # WHEN
+        self.parser.openReplayLog(self.game_log)
+        # THEN the game log covers 119 seconds before the time reset and 5 seconds after it
+        self.assertEqual(1400000000 - 124, self.parser.time())
+        for line in open(self.game_log):
+            self.parser.trackLogTime(line.strip())
+        self.assertEqual(1400000000, self.parser.time())
+
+    def test_events_are_handled_right_away_with_game_log_time(self):
+        # GIVEN
+        evt_say = self.parser.getEventID('EVT_CLIENT_SAY')
+        handler = Mock()
+        handler.isEnabled.return_value = True
+        self.parser._handlers[evt_say] = [handler]
+        self.parser.queue = Mock()
+        self.parser.openReplayLog(self.game_log)
+        event = Event(evt_say, 'hi')
+        # WHEN
+        self.assertTrue(self.parser.queueEvent(event))
+        # THEN
+        handler.parseEvent.assert_called_once_with(event)
+        self.assertFalse(self.parser.queue.put.called)
+        self.assertEqual(1400000000 - 124, event.time)
+
+    def test_run_replays_the_whole_file_and_stops(self):
+        # GIVEN
+        self.parser.parseLine = Mock()
+        self.parser.openReplayLog(self.game_log)
+        # WHEN
+        with patch('time.sleep') as sleep:
+            self.parser.run()
+        # THEN
+        self.assertEqual(5, self.parser.parseLine.call_count)
+        self.assertFalse(sleep.called)
+        self.parser.storage.endBatch.assert_called_once_with()
+        self.parser.shutdown.assert_called_once_with()
+        self.assertFalse(self.parser.output.write.called)
+
+    def test_run_does_not_stop_on_a_batch_of_blank_lines(self):
+        # GIVEN
+        self.parser.parseLine = Mock()
+        self.parser.openReplayLog(self.game_log)
+        read = self.parser.read
+        batches = [['\n', '   \n']]
+        self.parser.read = lambda: batches.pop(0) if batches else read()
+        # WHEN
+        self.parser.run()
+        # THEN
+        self.assertEqual(5, self.parser.parseLine.call_count)
+        self.parser.shutdown.assert_called_once_with()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+
+import unittest2 as unittest
+
+from mock import Mock
+from b3.ratelimit import RateLimiter
+
+
+class Test_RateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = RateLimiter(capacity=10, falloff=5, ignore=2)
+        self.joe = Mock(cid='1')
+
+    def test_slot_is_kept(self):
+        self.assertIs(self.limiter.slot(self.joe), self.limiter.slot(self.joe))
+
+    def test_slot_is_renewed_for_new_client(self):
+        # GIVEN
+        slot = self.limiter.slot(self.joe)
+        self.limiter.add(slot, 5, now=0)
+        # WHEN
+        bill = Mock(cid='1')
+        # THEN
+        self.assertIsNot(slot, self.limiter.slot(bill))
+        self.assertEqual(0, self.limiter.slot(bill).points)
+
+    def test_forget(self):
+        # GIVEN
+        slot = self.limiter.slot(self.joe)
+        # WHEN
+        self.limiter.forget(self.joe)
+        # THEN
+        self.assertEqual({}, self.limiter.slots)
+        self.assertIsNot(slot, self.limiter.slot(self.joe))
+
+    def test_gap(self):
+        slot = self.limiter.slot(self.joe)
+        self.assertIsNone(slot.gap(10))
+        self.limiter.add(slot, 1, now=10)
+        self.assertEqual(3, slot.gap(13))
+
+    def test_points_leak(self):
+        # GIVEN
+        slot = self.limiter.slot(self.joe)
+        self.limiter.add(slot, 4, 'hi', now=0)
+        # THEN
+        self.assertEqual(4, self.limiter.getPoints(slot, now=4))
+        self.assertEqual(3, self.limiter.getPoints(slot, now=5))
+        self.assertEqual(0, self.limiter.getPoints(slot, now=100))
+        # WHEN
+        self.assertFalse(self.limiter.add(slot, 2, 'hello', now=11))
+        # THEN
+        self.assertEqual(4, slot.points)
+        self.assertEqual('hello', slot.lastData)
+
+    def test_limited(self):
+        # GIVEN
+        slot = self.limiter.slot(self.joe)
+        self.assertFalse(self.limiter.add(slot, 6, now=0))
+        # WHEN
+        limited = self.limiter.add(slot, 6, now=1)
+        # THEN
+        self.assertTrue(limited)
+        self.assertEqual(8, slot.points)
+        self.assertTrue(self.limiter.isIgnored(slot, now=2))
+        self.assertFalse(self.limiter.isIgnored(slot, now=3))
+
+    def test_cooldown(self):
+        # GIVEN
+        self.limiter.cooldown = lambda points: 0
+        slot = self.limiter.slot(self.joe)
+        # WHEN
+        self.assertTrue(self.limiter.add(slot, 15, now=0))
+        # THEN
+        self.assertEqual(0, slot.points)
+
+    def test_clock(self):
+        # GIVEN
+        self.limiter.clock = Mock(return_value=100)
+        slot = self.limiter.slot(self.joe)
+        # WHEN
+        self.limiter.add(slot, 1)
+        # THEN
+        self.assertEqual(100, slot.lastTime)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest2 as unittest
+
+from mock import patch
+from b3.watcher import InotifyLogWatcher
+from b3.watcher import PollingLogWatcher
+from b3.watcher import getLogWatcher
+
+
+class Test_PollingLogWatcher(unittest.TestCase):
+
+    def test_wait(self):
+        watcher = PollingLogWatcher('/some/where/games_mp.log')
+        with patch('time.sleep') as sleep:
+            self.assertFalse(watcher.wait(.05))
+        sleep.assert_called_once_with(.05)
+
+    def test_getLogWatcher_without_inotify(self):
+        self.assertIsInstance(getLogWatcher('/some/where/games_mp.log', use_inotify=False), PollingLogWatcher)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is only available on Linux')
+class Test_InotifyLogWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.game_log = os.path.join(self.tmpdir, 'games_mp.log')
+        open(self.game_log, 'w').close()
+        self.watcher = getLogWatcher(self.game_log)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.tmpdir)
+
+    def append(self, text, delay=0):
+        def _append():
+            time.sleep(delay)
+            with open(self.game_log, 'a') as f:
+                f.write(text)
+        threading.Thread(target=_append).start()
+
+    def test_getLogWatcher(self):
+        self.assertIsInstance(self.watcher, InotifyLogWatcher)
+
+    def test_wait_timeout(self):
+        self.assertFalse(self.watcher.wait(.05))
+
+    def test_getLogWatcher_non_ascii_path(self):
+        # WHEN
+        watcher = getLogWatcher(os.path.join(unicode(self.tmpdir), u'games_mp_\xe9.log'))
+        self.addCleanup(watcher.close)
+        # THEN
+        self.assertFalse(watcher.wait(.05))
+
+    def test_wait_wakes_up_on_append(self):
+        # GIVEN
+        self.append('0:00 InitGame:\n', delay=.1)
+        # WHEN
+        start = time.time()
+        changed = self.watcher.wait(5)
+        # THEN
+        self.assertTrue(changed)
+        self.assertLess(time.time() - start, 2)
+
+    def test_wait_wakes_up_on_truncation(self):
+        # GIVEN
+        with open(self.game_log, 'a') as f:
+            f.write('0:00 InitGame:\n')
+        self.watcher.wait(0)
+        # WHEN
+        open(self.game_log, 'w').close()
+        # THEN
+        self.assertTrue(self.watcher.wait(5))
+
+    def test_wait_after_rotation(self):
+        # GIVEN
+        os.rename(self.game_log, self.game_log + '.1')
+        open(self.game_log, 'w').close()
+        self.assertTrue(self.watcher.wait(5))  # move detected: now watching the new file
+        # WHEN
+        self.append('0:00 InitGame:\n', delay=.1)
+        # THEN
+        self.assertTrue(self.watcher.wait(5))
@@ -22,6 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
+import os
 import sys
 import xml.etree.ElementTree as ET
 from mock import Mock
@@ -76,6 +77,11 @@ class Test_GuidBanlist(BanlistTestCase):
         self.assertNotBanned("STEAM:0:1:123456")
 
 
+    def test_missing_banlist_file(self):
+        os.path.isfile.return_value = False
+        self.assertFalse(self.isBanned("STEAM:0:1:123456"))
+
+
     def test_match(self):
         self.file_content = '''\
 STEAM:0:1:111111
@@ -130,3 +136,14 @@ STeam:0:1:333333
         self.assertBanned("STEAM:0:1:333333")
         self.assertBanned("64A8FC41E14548C2B8A0C50637FAF16E")
         self.assertBanned("690CD3D4975A4D4B83C1960A9CA0C060")
+
+
+    def test_id_prefix(self):
+        self.file_content = '''\
+  STEAM:0:1:111111 leading spaces
+STEAM:0:1:2222223
+'''
+        self.assertBanned("STEAM:0:1:111111", "  STEAM:0:1:111111 leading spaces")
+        self.assertBanned("STEAM:0:1", "  STEAM:0:1:111111 leading spaces")
+        self.assertNotBanned("STEAM:0:1:11111")
+        self.assertNotBanned("STEAM:0:1:222222")
@@ -22,6 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
+import os
 import sys
 import xml.etree.ElementTree as ET
 from mock import Mock
@@ -65,6 +66,11 @@ class Test_IpBanlist(BanlistTestCase):
         self.ip_banlist.plugin.verbose.assert_called_with("ip '11.22.33.44' not found in banlist (Banlist_name 2000-01-01 00:00:00)")
 
 
+    def test_missing_banlist_file(self):
+        os.path.isfile.return_value = False
+        self.assertFalse(self.isBanned("11.22.33.44"))
+
+
     def test_match_strict(self):
         self.file_content = '''\
 11.22.33.44:-1
@@ -164,3 +170,45 @@ class Test_IpBanlist(BanlistTestCase):
         assertBanned("33.44.55.77", "33.44.55.66")
         assertBanned("33.44.55.6", "33.44.55.66")
 
+
+    def test_match_cidr(self):
+        self.file_content = '''\
+11.22.33.0/24 // whole class C
+172.16.0.0/12
+44.55.66.77/32:-1
+99.99.99.99/33
+'''
+        def assertBanned(ip, expected_matched_line):
+            self.ip_banlist.plugin.info.reset_mock()
+            self.assertTrue(self.isBanned(ip))
+            self.ip_banlist.plugin.info.assert_called_with("ip '%s' matches (by range) banlist entry '%s' (Banlist_name 2000-01-01 00:00:00)" % (ip, expected_matched_line))
+
+        def assertNotBanned(ip):
+            self.ip_banlist.plugin.verbose.reset_mock()
+            self.assertFalse(self.isBanned(ip))
+            self.ip_banlist.plugin.verbose.assert_called_with("ip '%s' not found in banlist (Banlist_name 2000-01-01 00:00:00)" % ip)
+
+        assertBanned("11.22.33.44", "11.22.33.0/24 // whole class C")
+        assertBanned("11.22.33.255", "11.22.33.0/24 // whole class C")
+        assertNotBanned("11.22.34.1")
+        assertBanned("172.16.0.1", "172.16.0.0/12")
+        assertBanned("172.31.255.254", "172.16.0.0/12")
+        assertNotBanned("172.32.0.1")
+        assertNotBanned("44.55.66.78")
+        assertNotBanned("99.99.99.98")
+
+
+    def test_banlist_file_update(self):
+        self.file_content = '''\
+11.22.33.44
+'''
+        self.assertTrue(self.isBanned("11.22.33.44"))
+        self.assertFalse(self.isBanned("55.66.77.88"))
+        # WHEN
+        self.file_content = '''\
+55.66.77.88
+'''
+        self.ip_banlist.getModifiedTime.return_value = 946684801
+        # THEN
+        self.assertFalse(self.isBanned("11.22.33.44"))
+        self.assertTrue(self.isBanned("55.66.77.88"))
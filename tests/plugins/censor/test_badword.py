@@ -22,6 +22,7 @@
 #                                                                     #
 # ################################################################### #
 
+import xml.etree.ElementTree as ET
 from tests.plugins.censor import Detection_TestCase
 
 class Test_Censor_badword(Detection_TestCase):
@@ -73,4 +74,36 @@ class Test_Censor_badword(Detection_TestCase):
         self.assert_chat_is_penalized('you fat fuck')
         self.assert_chat_is_penalized('f*ck u')
         self.assert_chat_is_penalized('f*****ck')
-        self.assert_chat_is_penalized('f*uu**ck')
\ No newline at end of file
+        self.assert_chat_is_penalized('f*uu**ck')
+
+    def test_rules_order(self):
+        self.p._badWords = []
+        self.p._add_bad_word(rulename='first', regexp=r'noob', penalty=ET.fromstring('<penalty type="warning" reasonkeyword="first"/>'))
+        self.p._add_bad_word(rulename='second', regexp=r'idiot', penalty=ET.fromstring('<penalty type="warning" reasonkeyword="second"/>'))
+        # the first rule wins even if the second one matches earlier in the text
+        penalty, client, data = self.assert_chat_is_penalized('idiot noob')
+        self.assertEqual('first', penalty.keyword)
+        # a rule matching the cleaned text (without color codes) wins over the next rules matching the raw text
+        penalty, client, data = self.assert_chat_is_penalized('no^1ob idiot')
+        self.assertEqual('first', penalty.keyword)
+        self.assertIn('=>', data)
+
+
+    def test_unmergeable_regexp(self):
+        self.p._badWords = []
+        self.p._add_bad_word(rulename='repeat', regexp=r'\b(\w)\1{4}\b')
+        self.p._add_bad_word(rulename='verbose', regexp=r'(?x) b a d')
+        self.assert_chat_is_penalized('aaaaa')
+        self.assert_chat_is_penalized('so bad')
+        self.assert_chat_is_not_penalized('b a d')
+        self.assert_chat_is_not_penalized('abcde')
+
+
+    def test_many_rules(self):
+        self.p._badWords = []
+        for i in range(300):
+            self.p._add_bad_word(rulename='rule%s' % i, regexp=r'(bad)(word)%s\b' % i)
+        self.assertGreater(len(self.p.getBadWordsMatcher().regexps), 1)
+        self.assert_chat_is_penalized('badword0')
+        self.assert_chat_is_penalized('you badword299')
+        self.assert_chat_is_not_penalized('badword300')
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+# ################################################################### #
+#                                                                     #
+#  BigBrotherBot(B3) (www.bigbrotherbot.net)                          #
+#  Copyright (C) 2005 Michael "ThorN" Thornton                        #
+#                                                                     #
+#  This program is free software; you can redistribute it and/or      #
+#  modify it under the terms of the GNU General Public License        #
+#  as published by the Free Software Foundation; either version 2     #
+#  of the License, or (at your option) any later version.             #
+#                                                                     #
+#  This program is distributed in the hope that it will be useful,    #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of     #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the       #
+#  GNU General Public License for more details.                       #
+#                                                                     #
+#  You should have received a copy of the GNU General Public License  #
+#  along with this program; if not, write to the Free Software        #
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA      #
+#  02110-1301, USA.                                                   #
+#                                                                     #
+# ################################################################### #
+
+import BaseHTTPServer
+import SocketServer
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest2 as unittest
+
+from b3.checkpoint import LogCheckpoint
+from b3.plugins.httpytail import HttpLogTail
+from b3.plugins.httpytail import HttpTailError
+from b3.plugins.httpytail import HttpytailPlugin
+from tests import B3TestCase
+
+
+class LogRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serve the server content supporting keep-alive, ranges and ETags (like Apache or nginx would).
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_HEAD(self):
+        self.server.requests.append(('HEAD', dict(self.headers)))
+        self.send_response(200)
+        self.send_common_headers(len(self.server.content))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append(('GET', dict(self.headers)))
+        content = self.server.content
+        if self.server.etags and self.headers.get('If-None-Match') == self.etag():
+            self.send_response(304)
+            self.send_common_headers(0)
+            self.end_headers()
+            return
+        m = re.match(r'^bytes=(\d+)-(\d*)$', self.headers.get('Range') or '')
+        if not self.server.ranges or not m:
+            self.send_response(200)
+            self.send_common_headers(len(content))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        first = int(m.group(1))
+        last = min(int(m.group(2) or len(content) - 1), len(content) - 1)
+        if first >= len(content):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%s' % len(content))
+            self.send_common_headers(0)
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header('Content-Range', 'bytes %s-%s/%s' % (first, last, len(content)))
+        self.send_common_headers(last - first + 1)
+        self.end_headers()
+        self.wfile.write(content[first:last + 1])
+
+    def etag(self):
+        return '"%x"' % len(self.server.content)
+
+    def send_common_headers(self, length):
+        self.send_header('Content-Length', str(length))
+        if self.server.etags:
+            self.send_header('ETag', self.etag())
+        if not self.server.keepalive:
+            self.send_header('Connection', 'close')
+            self.close_connection = 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class LogServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), LogRequestHandler)
+        self.content = ''
+        self.connections = 0
+        self.requests = []
+        self.ranges = True
+        self.etags = True
+        self.keepalive = True
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path='/games.log', credentials=''):
+        return 'http://%s127.0.0.1:%s%s' % (credentials, self.server_address[1], path)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class HttpLogTailTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LogServer()
+        self.server.content = 'line 1\nline 2\n'
+        self.tail = HttpLogTail(self.server.url(), timeout=5, maxgap=1024)
+
+    def tearDown(self):
+        self.tail.close()
+        self.server.stop()
+
+
+class Test_HttpLogTail(HttpLogTailTestCase):
+
+    def test_first_fetch_skips_existing_content(self):
+        # WHEN
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('', data)
+        self.assertEqual(len(self.server.content), self.tail.offset)
+        self.assertEqual(['HEAD'], [method for method, headers in self.server.requests])
+
+    def test_appended_bytes(self):
+        # GIVEN
+        self.tail.fetch()
+        # WHEN
+        self.server.content += 'line 3\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('line 3\n', data)
+        self.assertEqual('bytes=14-1037', self.server.requests[-1][1]['range'])
+        self.assertEqual(7, self.tail.bytesFetched)
+        self.assertEqual(2, self.tail.requests)
+
+    def test_connection_is_reused(self):
+        # GIVEN
+        self.tail.fetch()
+        # WHEN
+        for i in range(5):
+            self.server.content += 'line %s\n' % i
+            self.assertEqual('line %s\n' % i, self.tail.fetch())
+        # THEN
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(1, self.tail.connections)
+
+    def test_unchanged_file(self):
+        # GIVEN
+        self.tail.fetch()
+        # WHEN
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('', data)
+        self.assertIn('if-none-match', self.server.requests[-1][1])
+
+    def test_unchanged_file_without_etag(self):
+        # GIVEN
+        self.server.etags = False
+        self.tail.fetch()
+        # WHEN
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('', data)
+        self.assertEqual(14, self.tail.offset)
+
+    def test_rotation(self):
+        # GIVEN
+        self.server.etags = False
+        self.tail.fetch()
+        # WHEN
+        self.server.content = 'new\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('new\n', data)
+        self.assertEqual(4, self.tail.offset)
+
+    def test_rotation_to_a_larger_file(self):
+        # GIVEN
+        self.tail.fetch()
+        self.server.content += 'line 3\n'
+        self.tail.fetch()
+        # WHEN
+        self.server.content = 'a new log file larger than the previous one\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual(self.server.content, data)
+        self.assertEqual(len(self.server.content), self.tail.offset)
+
+    def test_resume_from_checkpoint(self):
+        # GIVEN
+        fd, path = tempfile.mkstemp(suffix='.checkpoint')
+        os.close(fd)
+        os.unlink(path)
+        self.addCleanup(lambda: os.path.exists(path) and os.unlink(path))
+        self.tail = HttpLogTail(self.server.url(), checkpoint=LogCheckpoint(self.server.url(), path))
+        self.tail.fetch()
+        self.server.content += 'line 3\n'
+        self.tail.fetch()
+        self.tail.checkpoint.save(force=True)
+        self.tail.close()
+        # WHEN
+        self.server.content += 'line 4\n'
+        self.tail = HttpLogTail(self.server.url(), checkpoint=LogCheckpoint(self.server.url(), path))
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('line 4\n', data)
+        self.assertNotIn('HEAD', [method for method, headers in self.server.requests[2:]])
+
+    def test_gap_larger_than_maxgap(self):
+        # GIVEN
+        self.tail.fetch()
+        # WHEN
+        self.server.content += 'x' * 5000 + 'last line\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual(1024, len(data))
+        self.assertTrue(data.endswith('last line\n'))
+        self.assertEqual(len(self.server.content), self.tail.offset)
+
+    def test_server_without_range_support(self):
+        # GIVEN
+        self.server.ranges = False
+        self.tail.fetch()
+        # WHEN
+        self.server.content += 'line 3\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('line 3\n', data)
+
+    def test_server_closing_connections(self):
+        # GIVEN
+        self.server.keepalive = False
+        self.tail.fetch()
+        # WHEN
+        self.server.content += 'line 3\n'
+        data = self.tail.fetch()
+        # THEN
+        self.assertEqual('line 3\n', data)
+        self.assertEqual(2, self.server.connections)
+
+    def test_authentication(self):
+        # GIVEN
+        self.tail = HttpLogTail(self.server.url(credentials='john:secret@'))
+        # WHEN
+        self.tail.fetch()
+        # THEN
+        self.assertEqual('Basic am9objpzZWNyZXQ=', self.server.requests[-1][1]['authorization'])
+
+    def test_server_down(self):
+        # GIVEN
+        self.tail.fetch()
+        self.server.stop()
+        self.tail.close()
+        # THEN
+        self.assertRaises(HttpTailError, self.tail.fetch)
+
+    def test_invalid_url(self):
+        self.assertRaises(HttpTailError, HttpLogTail, 'ftp://127.0.0.1/games.log')
+
+
+class Test_HttpytailPlugin_stream(B3TestCase):
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.server = LogServer()
+        self.server.content = 'line 1\n'
+        fd, self.local_log = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+        self.p = HttpytailPlugin(self.console)
+        self.p.lgame_log = self.local_log
+        self.p._httpdelay = 0.01
+
+    def tearDown(self):
+        self.p.onShutdown(None)
+        self.server.stop()
+        os.unlink(self.local_log)
+        os.unlink(self.local_log + '.checkpoint')
+        B3TestCase.tearDown(self)
+
+    def wait_for(self, condition, timeout=5):
+        expire = time.time() + timeout
+        while not condition() and time.time() < expire:
+            time.sleep(.01)
+        return condition()
+
+    def test_appended_lines_are_written_to_the_local_log(self):
+        # GIVEN
+        self.p.initThread(self.server.url())
+        self.assertTrue(self.wait_for(lambda: self.p.tail and self.p.tail.offset is not None))
+        # WHEN
+        self.server.content += 'line 2\nline 3\n'
+        # THEN
+        self.assertTrue(self.wait_for(lambda: open(self.local_log).read().endswith('line 2\nline 3\n')))
+        self.assertNotIn('line 1', open(self.local_log).read())
+        self.assertEqual(1, self.server.connections)
+
+    def test_offset_is_saved_on_shutdown(self):
+        # GIVEN
+        self.p.initThread(self.server.url())
+        self.assertTrue(self.wait_for(lambda: self.p.tail and self.p.tail.offset is not None))
+        self.server.content += 'line 2\n'
+        self.assertTrue(self.wait_for(lambda: self.p.tail.offset == 14))
+        # WHEN
+        self.p.onShutdown(None)
+        # THEN
+        checkpoint = LogCheckpoint(self.server.url(), self.local_log + '.checkpoint')
+        self.assertTrue(checkpoint.load())
+        self.assertEqual(14, checkpoint.offset)
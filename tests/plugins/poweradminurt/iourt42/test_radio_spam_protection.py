@@ -97,7 +97,7 @@ mute_duration: 2
             self.console.parseLine('''Radio: 0 - %s - %s - "%s" - "%s"''' % (msg_group, msg_id, location, text))
 
         def assertSpampoints(points):
-            self.assertEqual(points, self.joe.var(self.p, 'radio_spamins', 0).value)
+            self.assertEqual(points, self.p._rsp_limiter.slot(self.joe).points)
 
         assertSpampoints(0)
 
@@ -96,4 +96,16 @@ class Test_config(SpamcontrolTestCase):
             [settings]
             mod_level: senioradmin
         """))
-        self.assertEqual(80, self.p._modLevel)
\ No newline at end of file
+        self.assertEqual(80, self.p._modLevel)
+
+    def test_weights(self):
+        self.init_plugin(dedent("""
+            [weights]
+            repeat: 6
+            command: f00
+            callvote: -1
+        """))
+        self.assertEqual(6, self.p._weights['repeat'])
+        self.assertEqual(1, self.p._weights['command'])
+        self.assertEqual(0, self.p._weights['callvote'])
+        self.assertEqual(5, self.p._weights['color_repeat'])
@@ -51,7 +51,7 @@ class Test_plugin(SpamcontrolTestCase):
 
 
     def assertSpaminsPoints(self, client, points):
-        actual = client.var(self.p, 'spamins', 0).value
+        actual = self.p._limiter.slot(client).points
         self.assertEqual(points, actual, "expecting %s to have %s spamins points" % (client.name, points))
 
     def test_say(self):
@@ -69,4 +69,18 @@ class Test_plugin(SpamcontrolTestCase):
         self.assertSpaminsPoints(self.joe, 3)
 
         self.joe.says("hi") # 120s
-        self.assertSpaminsPoints(self.joe, 0)
\ No newline at end of file
+        self.assertSpaminsPoints(self.joe, 0)
+
+    def test_weights(self):
+        self.p._weights['repeat'] = 7
+        when(self.p).getTime().thenReturn(0).thenReturn(10)
+        self.joe.says("doh") # 0s
+        self.assertSpaminsPoints(self.joe, 2)
+        self.joe.says("doh") # 10s
+        self.assertSpaminsPoints(self.joe, 8)
+
+    def test_points_are_forgotten_on_disconnect(self):
+        when(self.p).getTime().thenReturn(0)
+        self.joe.says("doh")
+        self.joe.disconnects()
+        self.assertEqual({}, self.p._limiter.slots)
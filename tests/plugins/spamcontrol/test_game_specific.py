@@ -68,3 +68,32 @@ class Test_game_specific_spam(SpamcontrolTestCase):
         self.joe.radios("doh 4")
         self.joe.says("doh 5")
         self.assertEqual(1, self.joe.warn.call_count)
+
+
+class Test_callvote_spam(SpamcontrolTestCase):
+
+    def setUp(self):
+        SpamcontrolTestCase.setUp(self)
+        # let's say our game has callvotes
+        self.EVT_CLIENT_CALLVOTE = self.console.Events.createEvent('EVT_CLIENT_CALLVOTE', 'Event client call vote')
+
+        with open(b3.getAbsolutePath('@b3/conf/plugin_spamcontrol.ini')) as default_conf:
+            self.init_plugin(default_conf.read())
+
+        self.joe = FakeClient(self.console, name="Joe", exactName="Joe", guid="zaerezarezar", groupBits=1)
+        self.joe.connects("1")
+        self.console.write = Mock()
+
+    def callvote(self, client, vote):
+        self.console.queueEvent(Event(type=self.EVT_CLIENT_CALLVOTE, client=client, data=vote))
+
+    def test_callvote_spam(self):
+        when(self.p).getTime().thenReturn(0)
+        self.joe.warn = Mock()
+        self.callvote(self.joe, "map ut4_abbey")
+        self.callvote(self.joe, "map ut4_turnpike")
+        self.assertEqual(0, self.joe.warn.call_count)
+        self.assertFalse(self.console.write.called)
+        self.callvote(self.joe, "map ut4_casa")
+        self.assertEqual(1, self.joe.warn.call_count)
+        self.console.write.assert_called_once_with('veto')
@@ -24,6 +24,8 @@
 
 import logging
 import os
+import time
+import unittest2 as unittest
 from textwrap import dedent
 
 from mock import Mock
@@ -35,6 +37,12 @@ from b3 import __file__ as b3_module__file__
 from b3 import TEAM_RED
 from b3 import TEAM_BLUE
 from b3.config import CfgConfigParser
+from b3.plugins.xlrstats import Opponents
+from b3.plugins.xlrstats import PlayerStats
+from b3.plugins.xlrstats import SkillPool
+from b3.plugins.xlrstats import StatsCache
+from b3.plugins.xlrstats import WeaponStats
+from b3.plugins.xlrstats import WeaponUsage
 from b3.plugins.xlrstats import XlrstatsPlugin
 from b3.fake import FakeClient
 from b3.plugins.admin import AdminPlugin
@@ -711,4 +719,406 @@ class Test_events(XlrstatsTestCase):
         self.fireEvent("EVT_CLIENT_JOIN", client=self.p1)
         # THEN
         player_stats = self.p.get_PlayerStats(client=self.p1)
-        self.assertEqual(2, player_stats.rounds)
\ No newline at end of file
+        self.assertEqual(2, player_stats.rounds)
+
+class Test_write_behind(XlrstatsTestCase):
+
+    def setUp(self):
+        XlrstatsTestCase.setUp(self)
+        self.init()
+        # GIVEN two registered players P1 and P2 having stats
+        self.p1 = FakeClient(console=self.console, name="P1", guid="P1_GUID", team=TEAM_BLUE, groupBits=1)
+        self.p1.connects("1")
+        self.p2 = FakeClient(console=self.console, name="P2", guid="P2_GUID", team=TEAM_RED, groupBits=1)
+        self.p2.connects("2")
+        self.p._xlrstats_active = True
+        self.console.game.mapName = 'ut4_turnpike'
+        self.p1stats = self.p.get_PlayerStats(self.p1)
+        self.p.save_Stat(self.p1stats)
+
+    def stored_kills(self, client):
+        cursor = self.console.storage.query("SELECT kills FROM %s WHERE client_id = %s" % (self.p.playerstats_table,
+                                                                                           client.id))
+        return cursor.getOneRow()['kills']
+
+    def test_updates_are_kept_in_memory(self):
+        # WHEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # THEN
+        self.assertEqual(0, self.stored_kills(self.p1))
+        self.assertEqual(2, self.p.get_PlayerStats(self.p1).kills)
+
+    def test_flush_Stats(self):
+        # GIVEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # WHEN
+        self.p.flush_Stats()
+        # THEN
+        self.assertEqual(2, self.stored_kills(self.p1))
+        self.assertEqual(2, self.p.get_PlayerStats(self.p1).kills)
+        self.assertDictEqual({}, self.p._pending)
+
+    def test_updates_are_coalesced(self):
+        # GIVEN
+        for i in range(5):
+            self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p.query = Mock(wraps=self.p.query)
+        # WHEN
+        self.p.flush_Stats()
+        # THEN a single query per table
+        tables = [args[0].split()[1] for args, kwargs in self.p.query.call_args_list]
+        self.assertItemsEqual([self.p.playerstats_table, self.p.weaponstats_table, self.p.weaponusage_table,
+                               self.p.bodyparts_table, self.p.playerbody_table, self.p.opponents_table,
+                               self.p.mapstats_table, self.p.playermaps_table], tables)
+
+    def test_unsaved_changes_are_not_written(self):
+        # GIVEN
+        self.p1stats.kills = 5
+        self.p.save_Stat(self.p1stats)
+        # WHEN
+        self.p1stats.kills = 10
+        self.p.flush_Stats()
+        # THEN
+        self.assertEqual(5, self.stored_kills(self.p1))
+
+    def test_round_end_flushes_stats(self):
+        # GIVEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # WHEN
+        self.console.queueEvent(self.console.getEvent('EVT_GAME_ROUND_END'))
+        # THEN
+        self.assertEqual(1, self.stored_kills(self.p1))
+
+    def test_write_behind_disabled(self):
+        # GIVEN
+        self.p.flush_interval = 0
+        # WHEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # THEN
+        self.assertEqual(1, self.stored_kills(self.p1))
+
+
+class Test_StatsCache(unittest.TestCase):
+
+    def create_stat(self, playerid, weaponid):
+        stat = WeaponUsage()
+        stat.id = playerid * 100 + weaponid
+        stat.player_id = playerid
+        stat.weapon_id = weaponid
+        return stat
+
+    def test_least_recently_used_are_dropped(self):
+        # GIVEN
+        cache = StatsCache(size=2)
+        cache.put(self.create_stat(1, 1))
+        cache.put(self.create_stat(1, 2))
+        cache.get((WeaponUsage, 1, 1))
+        # WHEN
+        cache.put(self.create_stat(1, 3))
+        # THEN
+        self.assertEqual(2, len(cache))
+        self.assertIsNotNone(cache.peek((WeaponUsage, 1, 1)))
+        self.assertIsNone(cache.peek((WeaponUsage, 2, 1)))
+        self.assertIsNotNone(cache.peek((WeaponUsage, 3, 1)))
+
+    def test_evictPlayer(self):
+        # GIVEN
+        cache = StatsCache()
+        playerstats = PlayerStats()
+        playerstats.id = 1
+        playerstats.client_id = 10
+        cache.put(playerstats)
+        cache.put(self.create_stat(1, 1))
+        cache.put(self.create_stat(2, 1))
+        # WHEN
+        cache.evictPlayer(10)
+        # THEN
+        self.assertEqual(1, len(cache))
+        self.assertIsNotNone(cache.peek((WeaponUsage, 1, 2)))
+
+    def test_hitRate(self):
+        # GIVEN
+        cache = StatsCache()
+        cache.put(self.create_stat(1, 1))
+        # WHEN
+        cache.get((WeaponUsage, 1, 1))
+        cache.get((WeaponUsage, 1, 1))
+        cache.get((WeaponUsage, 2, 1))
+        # THEN
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertAlmostEqual(2 / 3.0, cache.hitRate())
+
+
+class Test_cache(XlrstatsTestCase):
+
+    def setUp(self):
+        XlrstatsTestCase.setUp(self)
+        self.init()
+        # GIVEN two registered players P1 and P2 who fought each other
+        self.p1 = FakeClient(console=self.console, name="P1", guid="P1_GUID", team=TEAM_BLUE, groupBits=1)
+        self.p1.connects("1")
+        self.p2 = FakeClient(console=self.console, name="P2", guid="P2_GUID", team=TEAM_RED, groupBits=1)
+        self.p2.connects("2")
+        self.p._xlrstats_active = True
+        self.console.game.mapName = 'ut4_turnpike'
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p.flush_Stats()
+        self.p1stats = self.p.get_PlayerStats(self.p1)
+        self.p2stats = self.p.get_PlayerStats(self.p2)
+        self.knife = self.p.get_WeaponStats('knife')
+
+    def test_disconnect_evicts_player_records(self):
+        # WHEN
+        self.p1.disconnects()
+        # THEN
+        self.assertIsNone(self.p._cache.peek((PlayerStats, self.p1.id)))
+        self.assertIsNone(self.p._cache.peek((WeaponUsage, self.knife.id, self.p1stats.id)))
+        self.assertIsNone(self.p._cache.peek((Opponents, self.p1stats.id, self.p2stats.id)))
+        self.assertIsNotNone(self.p._cache.peek((PlayerStats, self.p2.id)))
+        self.assertIsNotNone(self.p._cache.peek((WeaponStats, 'knife')))
+
+    def test_auth_loads_player_records(self):
+        # GIVEN
+        self.p1.disconnects()
+        # WHEN
+        self.p1.connects("1")
+        self.p.cache_Player(self.p1)
+        # THEN
+        self.assertIsNotNone(self.p._cache.peek((PlayerStats, self.p1.id)))
+        self.assertEqual(1, self.p._cache.peek((WeaponUsage, self.knife.id, self.p1stats.id)).kills)
+        self.assertEqual(1, self.p._cache.peek((Opponents, self.p1stats.id, self.p2stats.id)).kills)
+
+    def test_reconnect_before_flush_keeps_pending_records(self):
+        # GIVEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p1.disconnects()
+        # WHEN
+        self.p1.connects("1")
+        self.p.cache_Player(self.p1)
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        self.p.flush_Stats()
+        # THEN
+        self.p.clear_Cache()
+        self.assertEqual(3, self.p.get_WeaponUsage(self.knife.id, self.p1stats.id).kills)
+
+    def test_kill_is_served_from_cache(self):
+        # GIVEN
+        self.p.query = Mock(wraps=self.p.query)
+        # WHEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # THEN
+        self.assertListEqual([], [args[0] for args, kwargs in self.p.query.call_args_list
+                                  if args[0].startswith('SELECT')])
+        self.assertEqual(2, self.p.get_PlayerStats(self.p1).kills)
+
+    def test_cached_records_are_copies(self):
+        # WHEN
+        self.p1stats.kills = 100
+        # THEN
+        self.assertEqual(1, self.p.get_PlayerStats(self.p1).kills)
+
+    def test_xlrstatus_reports_hit_rate(self):
+        # GIVEN
+        self.p1.says("!register")
+        self.p1.clearMessageHistory()
+        # WHEN
+        self.p1.says("!xlrstatus")
+        # THEN
+        self.assertRegexpMatches(self.p1.message_history[-1], r'^cache: \d+/5000 records, hit rate: [\d.]+% '
+                                                              r'\(\d+ hits, \d+ misses\)$')
+
+
+class Test_SkillPool(unittest.TestCase):
+
+    def test_replace(self):
+        # GIVEN
+        pool = SkillPool()
+        # WHEN
+        pool.replace(None, 1000.0)
+        pool.replace(None, 1200.0)
+        pool.replace(1000.0, 900.0)
+        pool.replace(1200.0, None)
+        # THEN
+        self.assertEqual(1, pool.players)
+        self.assertEqual(900.0, pool.sum_skill)
+        self.assertEqual(1200.0, pool.max_skill)
+        self.assertEqual(900.0, pool.min_skill)
+        self.assertTrue(pool.changed)
+
+    def test_scale(self):
+        # GIVEN
+        pool = SkillPool(2, 2400.0, 1400.0, 1000.0)
+        # WHEN
+        pool.scale(0.5)
+        # THEN
+        self.assertEqual(1200.0, pool.sum_skill)
+        self.assertEqual(700.0, pool.max_skill)
+        self.assertEqual(500.0, pool.min_skill)
+        self.assertEqual(600.0, pool.average())
+
+
+class Test_skill_pool(XlrstatsTestCase):
+
+    def setUp(self):
+        XlrstatsTestCase.setUp(self)
+        self.init()
+        self.p.Kswitch_confrontations = 2
+        self.p.provisional_ranking = False
+        # GIVEN two registered players P1 and P2 who fought enough to be part of the active pool
+        self.p1 = FakeClient(console=self.console, name="P1", guid="P1_GUID", team=TEAM_BLUE, groupBits=1)
+        self.p1.connects("1")
+        self.p2 = FakeClient(console=self.console, name="P2", guid="P2_GUID", team=TEAM_RED, groupBits=1)
+        self.p2.connects("2")
+        self.p._xlrstats_active = True
+        self.console.game.mapName = 'ut4_turnpike'
+        for i in range(3):
+            self.p1.kills(self.p2, weapon='knife', hit_location='head')
+
+    def test_kills_update_the_pool(self):
+        # GIVEN
+        p1stats = self.p.get_PlayerStats(self.p1)
+        p2stats = self.p.get_PlayerStats(self.p2)
+        # THEN
+        self.assertEqual(2, self.p._skillpool.players)
+        self.assertAlmostEqual(p1stats.skill + p2stats.skill, self.p._skillpool.sum_skill)
+        self.assertAlmostEqual(p1stats.skill, self.p._skillpool.max_skill)
+
+    def test_inactive_player_rejoins_the_pool(self):
+        # GIVEN a pool built while P1 was inactive
+        self.p.flush_Stats()
+        p2skill = self.p.get_PlayerStats(self.p2).skill
+        self.p._skillpool = SkillPool(1, p2skill, p2skill, p2skill, int(time.time()))
+        self.p1.lastVisit = time.time() - (self.p._auto_correct_ignore_days + 1) * 86400
+        self.p1.timeEdit = self.p._skillpool.time_rebuilt + 1
+        self.p.clear_Cache()
+        # WHEN
+        self.p1.kills(self.p2, weapon='knife', hit_location='head')
+        # THEN
+        p1stats = self.p.get_PlayerStats(self.p1)
+        p2stats = self.p.get_PlayerStats(self.p2)
+        self.assertEqual(2, self.p._skillpool.players)
+        self.assertAlmostEqual(p1stats.skill + p2stats.skill, self.p._skillpool.sum_skill)
+
+    def test_build_SkillPool(self):
+        # GIVEN
+        players, sum_skill = self.p._skillpool.players, self.p._skillpool.sum_skill
+        # WHEN
+        self.p.build_SkillPool()
+        # THEN
+        self.assertEqual(players, self.p._skillpool.players)
+        self.assertAlmostEqual(sum_skill, self.p._skillpool.sum_skill)
+        self.assertGreater(self.p._skillpool.time_rebuilt, 0)
+
+    def test_pool_is_stored(self):
+        # GIVEN
+        self.p.flush_Stats()
+        players, sum_skill = self.p._skillpool.players, self.p._skillpool.sum_skill
+        # WHEN
+        self.p._skillpool = SkillPool()
+        self.p.load_SkillPool()
+        # THEN
+        self.assertEqual(players, self.p._skillpool.players)
+        self.assertAlmostEqual(sum_skill, self.p._skillpool.sum_skill)
+
+    def test_calculateKillBonus_does_not_query_the_database(self):
+        # GIVEN
+        self.p._skillpool = SkillPool(1, self.p.defaultskill + 500, self.p.defaultskill + 500,
+                                      self.p.defaultskill + 500, time.time())
+        self.p.query = Mock(wraps=self.p.query)
+        # WHEN
+        self.p.calculateKillBonus()
+        # THEN
+        self.assertFalse(self.p.query.called)
+        self.assertEqual(1.4, self.p.kill_bonus)
+
+    def test_correctStats_scales_the_pool(self):
+        # GIVEN
+        self.p.auto_correct = True
+        self.p._skillpool.time_rebuilt = time.time()
+        self.p._skillpool.replace(None, 5000.0)
+        # WHEN
+        self.p.correctStats()
+        # THEN
+        self.assertAlmostEqual(self.p.defaultskill + 100, self.p._skillpool.average())
+
+    def test_correctStats_rebuilds_a_stale_pool(self):
+        # GIVEN
+        self.p._skillpool.time_rebuilt = 0
+        self.p.build_SkillPool = Mock()
+        # WHEN
+        self.p.correctStats()
+        # THEN
+        self.assertTrue(self.p.build_SkillPool.called)
+
+
+class Test_purge(XlrstatsTestCase):
+
+    def setUp(self):
+        XlrstatsTestCase.setUp(self)
+        self.init()
+        self.p.auto_purge = True
+        self.p._purge_chunk_size = 2
+        self.p._purge_chunk_pause = 0
+        self.p._xlrstats_active = True
+        self.console.game.mapName = 'ut4_turnpike'
+        # GIVEN five registered players who fought each other
+        self.clients = []
+        for i in range(5):
+            client = FakeClient(console=self.console, name="P%s" % i, guid="P%s_GUID" % i, groupBits=1,
+                                team=TEAM_BLUE if i % 2 else TEAM_RED)
+            client.connects(str(i))
+            self.clients.append(client)
+        for killer, victim in zip(self.clients, self.clients[1:] + self.clients[:1]):
+            killer.kills(victim, weapon='knife', hit_location='head')
+        self.p.flush_Stats()
+
+    def count(self, table, condition='1 = 1'):
+        return self.console.storage.query("SELECT COUNT(*) AS cnt FROM %s WHERE %s" % (table, condition)).getOneRow()['cnt']
+
+    def test_purgePlayers(self):
+        # GIVEN the first three players have not been online for a long time
+        stale = [self.p.get_PlayerStats(c).id for c in self.clients[:3]]
+        self.console.storage.query("UPDATE clients SET time_edit = 0 WHERE id IN (%s)" %
+                                   ', '.join(str(c.id) for c in self.clients[:3]))
+        ids = ', '.join(str(x) for x in stale)
+        self.p.query = Mock(wraps=self.p.query)
+        # WHEN
+        self.p.purgePlayers()
+        # THEN
+        self.assertEqual(0, self.count(self.p.playerstats_table, 'id IN (%s)' % ids))
+        self.assertEqual(2, self.count(self.p.playerstats_table, 'client_id <> %s' % self.p._world_clientid))
+        self.assertEqual(0, self.count(self.p.weaponusage_table, 'player_id IN (%s)' % ids))
+        self.assertEqual(0, self.count(self.p.playerbody_table, 'player_id IN (%s)' % ids))
+        self.assertEqual(0, self.count(self.p.playermaps_table, 'player_id IN (%s)' % ids))
+        self.assertEqual(0, self.count(self.p.opponents_table, 'killer_id IN (%s) OR target_id IN (%s)' % (ids, ids)))
+        self.assertEqual(2, self.count(self.p.weaponusage_table))
+        # two chunks of ids (2 + 1) deleted with one query per table
+        deletes = [args[0] for args, kwargs in self.p.query.call_args_list if args[0].startswith('DELETE')]
+        self.assertEqual(12, len(deletes))
+
+    def test_purgePlayers_nothing_to_purge(self):
+        # GIVEN
+        self.p.query = Mock(wraps=self.p.query)
+        # WHEN
+        self.p.purgePlayers()
+        # THEN
+        self.assertListEqual([], [args[0] for args, kwargs in self.p.query.call_args_list
+                                  if args[0].startswith('DELETE')])
+        self.assertEqual(5, self.count(self.p.playerstats_table, 'client_id <> %s' % self.p._world_clientid))
+
+    def test_purge_history(self):
+        # GIVEN
+        history = self.p._xlrstatsHistoryPlugin
+        history._purge_chunk_size = 2
+        history._purge_chunk_pause = 0
+        for year in (2000, 2000, 2000, time.gmtime().tm_year):
+            self.console.storage.query("""INSERT INTO %s (client_id, year, month, week, day)
+                                          VALUES (1, %s, 1, 1, 1)""" % (self.p.history_monthly_table, year))
+        # WHEN
+        history.purge()
+        # THEN
+        self.assertEqual(0, self.count(self.p.history_monthly_table, 'year = 2000'))
+        self.assertEqual(1, self.count(self.p.history_monthly_table))